@@ -56,6 +56,7 @@ export interface ComplaintHistoryUser {
 }
 
 export interface ComplaintHistoryEvent {
+  id: number
   type: string
   date: string | null
   user: ComplaintHistoryUser | null
@@ -63,11 +64,15 @@ export interface ComplaintHistoryEvent {
   description: string
   icon: string
   color: string
+  old_status: string
+  new_status: string
 }
 
 export interface ComplaintHistoryResponse {
   events: ComplaintHistoryEvent[]
   total: number
+  next: string | null
+  first?: string
 }
 
 export type ComplaintStatus =
@@ -0,0 +1,107 @@
+"""
+Метаданные файлов вложений (рекламаций, заказов, замеров).
+
+Раньше размер вложения читался из хранилища при каждом обращении: file.size в
+сериализаторах списка и в HTML письма на фабрику — по stat (или HEAD-запросу
+у облачного хранилища) на каждый файл. Теперь размер, MIME-тип, размеры
+изображения и SHA-256 снимаются один раз при загрузке — за один проход по
+содержимому, пока файл ещё в памяти/временном файле — и хранятся в колонках
+модели (AttachmentMetadata). Вывод списков и писем к хранилищу не обращается.
+
+Старые строки заполняет `python manage.py backfill_attachment_metadata`.
+"""
+import hashlib
+import mimetypes
+
+from django.db import models
+
+CHUNK_SIZE = 64 * 1024
+
+METADATA_FIELDS = ('size', 'content_type', 'width', 'height', 'checksum')
+
+
+def _image_dimensions(fileobj):
+    """(ширина, высота) по заголовку изображения; (None, None), если Pillow его не понимает"""
+    try:
+        from PIL import Image
+    except ImportError:
+        return None, None
+    try:
+        fileobj.seek(0)
+        with Image.open(fileobj) as image:
+            return image.size
+    except Exception:
+        return None, None
+
+
+def read_file_metadata(fileobj, name=''):
+    """
+    Размер, MIME-тип, размеры изображения и SHA-256 открытого файла.
+    Содержимое читается один раз кусками по CHUNK_SIZE; позиция возвращается в начало.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    fileobj.seek(0)
+    while True:
+        chunk = fileobj.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        digest.update(chunk)
+        size += len(chunk)
+
+    content_type = (
+        getattr(fileobj, 'content_type', None)
+        or mimetypes.guess_type(name)[0]
+        or 'application/octet-stream'
+    )
+    width = height = None
+    if content_type.startswith('image/'):
+        width, height = _image_dimensions(fileobj)
+    fileobj.seek(0)
+    return {
+        'size': size,
+        'content_type': content_type[:100],
+        'width': width,
+        'height': height,
+        'checksum': digest.hexdigest(),
+    }
+
+
+class AttachmentMetadata(models.Model):
+    """
+    Колонки метаданных файла вложения. У модели должно быть FileField с именем file.
+    Заполняются в save() при загрузке нового файла.
+    """
+    size = models.PositiveBigIntegerField(null=True, blank=True, editable=False, verbose_name='Размер, байт')
+    content_type = models.CharField(max_length=100, blank=True, editable=False, verbose_name='MIME-тип')
+    width = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name='Ширина, px')
+    height = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name='Высота, px')
+    checksum = models.CharField(max_length=64, blank=True, editable=False, verbose_name='SHA-256')
+
+    class Meta:
+        abstract = True
+
+    def capture_file_metadata(self):
+        """
+        Снимает метаданные с файла. Новый (ещё не сохранённый) файл читается из
+        загрузки, уже сохранённый — открывается из хранилища (только для бэкфилла).
+        """
+        field_file = self.file
+        if not field_file:
+            return False
+        if field_file._committed:
+            with field_file.open('rb') as fileobj:
+                metadata = read_file_metadata(fileobj, field_file.name)
+        else:
+            metadata = read_file_metadata(field_file.file, field_file.name)
+        for name, value in metadata.items():
+            setattr(self, name, value)
+        return True
+
+    def save(self, *args, **kwargs):
+        if self.file and not self.file._committed:
+            self.capture_file_metadata()
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'file' in update_fields:
+                kwargs['update_fields'] = set(update_fields) | set(METADATA_FIELDS)
+        super().save(*args, **kwargs)
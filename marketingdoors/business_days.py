@@ -0,0 +1,181 @@
+"""
+Производственный календарь: рабочие дни для сроков и просрочек (кроны замеров
+и рекламаций, срок ответа СМ).
+
+Раньше рабочие дни считались в нескольких местах перебором по одному дню и
+только как «пн–пт». Теперь календарь один:
+
+- нерабочие дни — суббота, воскресенье и праздники ст. 112 ТК РФ
+  (1–8 января, 23 февраля, 8 марта, 1 и 9 мая, 12 июня, 4 ноября); праздник,
+  выпавший на выходной (кроме январских), переносится на следующий рабочий день;
+- переносы, которые каждый год утверждает Правительство, задаются в настройках:
+  BUSINESS_CALENDAR_HOLIDAYS — дополнительные выходные (в т.ч. перенесённые),
+  BUSINESS_CALENDAR_WORKING_DAYS — рабочие дни вопреки правилам выше (рабочие
+  субботы, отменённый постановлением автоматический перенос);
+- календарь строится один раз на процесс как массив префиксных сумм рабочих
+  дней за FIRST_YEAR..LAST_YEAR, поэтому workdays_between / add_workdays /
+  workdays_cutoff — O(1) без перебора дней;
+- overdue_q() — то же в SQL: порог в рабочих днях переводится в границу
+  даты-времени, и просроченные строки отбираются условием `поле < граница`.
+"""
+import datetime
+from array import array
+from functools import lru_cache
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+FIRST_YEAR = 2010
+LAST_YEAR = 2060
+
+# (месяц, день) нерабочих праздничных дней, ст. 112 ТК РФ
+PUBLIC_HOLIDAYS = frozenset(
+    [(1, day) for day in range(1, 9)] + [(2, 23), (3, 8), (5, 1), (5, 9), (6, 12), (11, 4)]
+)
+
+_EPOCH = datetime.date(FIRST_YEAR, 1, 1)
+_END = datetime.date(LAST_YEAR, 12, 31)
+
+
+def _as_date(value):
+    if isinstance(value, datetime.datetime):
+        if timezone.is_aware(value):
+            return timezone.localdate(value)
+        return value.date()
+    return value
+
+
+def _parse_dates(values):
+    return frozenset(
+        value if isinstance(value, datetime.date) else datetime.date.fromisoformat(str(value).strip())
+        for value in values or ()
+        if str(value).strip()
+    )
+
+
+class BusinessCalendar:
+    """
+    Рабочие дни FIRST_YEAR..LAST_YEAR. prefix[i] — число рабочих дней с начала
+    календаря по день i включительно, workdays[k] — номер (k+1)-го рабочего дня.
+    """
+
+    def __init__(self, holidays=(), working_days=()):
+        holidays = _parse_dates(holidays)
+        working_days = _parse_dates(working_days)
+        size = (_END - _EPOCH).days + 1
+        self.prefix = array('l', [0]) * size
+        self.workdays = array('l')
+        count = 0
+        # Праздники, выпавшие на выходной и ждущие переноса на ближайший рабочий день
+        pending_transfers = 0
+        for index in range(size):
+            day = _EPOCH + datetime.timedelta(days=index)
+            holiday = (day.month, day.day) in PUBLIC_HOLIDAYS
+            if day in working_days:
+                working = True
+                if pending_transfers and day.weekday() < 5:
+                    # Постановлением перенос отменён (выходной перенесён на другую дату)
+                    pending_transfers -= 1
+            elif day.weekday() >= 5 or day in holidays:
+                working = False
+                if holiday and day.month != 1 and day.weekday() >= 5:
+                    pending_transfers += 1
+            elif holiday:
+                working = False
+            elif pending_transfers:
+                working = False
+                pending_transfers -= 1
+            else:
+                working = True
+            if working:
+                count += 1
+                self.workdays.append(index)
+            self.prefix[index] = count
+
+    def _index(self, day):
+        if not _EPOCH <= day <= _END:
+            raise ValueError(f'Дата {day} вне производственного календаря ({FIRST_YEAR}–{LAST_YEAR})')
+        return (day - _EPOCH).days
+
+    def is_workday(self, value):
+        index = self._index(_as_date(value))
+        return self.prefix[index] != (self.prefix[index - 1] if index else 0)
+
+    def workdays_between(self, start, end):
+        """
+        Кол-во рабочих дней строго ПОСЛЕ start и до end включительно.
+        Пример: start=пятница, end=понедельник → 1 (только понедельник).
+        Если end <= start или одна из дат не задана → 0.
+        """
+        start, end = _as_date(start), _as_date(end)
+        if start is None or end is None or end <= start:
+            return 0
+        return self.prefix[self._index(end)] - self.prefix[self._index(start)]
+
+    def add_workdays(self, start, days):
+        """
+        days-й рабочий день после start (для datetime время сохраняется).
+        days=0 — сам start.
+        """
+        if days <= 0:
+            return start
+        start_date = _as_date(start)
+        number = self.prefix[self._index(start_date)] + days
+        if number > len(self.workdays):
+            raise ValueError(f'Дата вне производственного календаря ({FIRST_YEAR}–{LAST_YEAR})')
+        result = _EPOCH + datetime.timedelta(days=self.workdays[number - 1])
+        return start + (result - start_date)
+
+    def workdays_cutoff(self, end, workdays):
+        """
+        Граница просрочки: workdays_between(start, end) > workdays ровно тогда,
+        когда start < результата (дата (workdays+1)-го рабочего дня назад от end).
+        """
+        number = self.prefix[self._index(_as_date(end))] - workdays
+        if number < 1:
+            return _EPOCH
+        return _EPOCH + datetime.timedelta(days=self.workdays[number - 1])
+
+
+@lru_cache(maxsize=4)
+def _calendar(holidays, working_days):
+    return BusinessCalendar(holidays, working_days)
+
+
+def calendar():
+    """Календарь по текущим настройкам (строится один раз на набор переносов)"""
+    return _calendar(
+        tuple(getattr(settings, 'BUSINESS_CALENDAR_HOLIDAYS', ())),
+        tuple(getattr(settings, 'BUSINESS_CALENDAR_WORKING_DAYS', ())),
+    )
+
+
+def is_workday(value):
+    return calendar().is_workday(value)
+
+
+def workdays_between(start, end):
+    return calendar().workdays_between(start, end)
+
+
+def add_workdays(start, days):
+    return calendar().add_workdays(start, days)
+
+
+def workdays_cutoff(end, workdays):
+    return calendar().workdays_cutoff(end, workdays)
+
+
+def overdue_boundary(workdays, now=None):
+    """Начало (локальное) дня-границы: строки раньше него просрочены больше чем на workdays раб. дней"""
+    day = workdays_cutoff(timezone.localdate(now or timezone.now()), workdays)
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def overdue_q(field, workdays, now=None):
+    """
+    Условие для filter(): с даты-времени field прошло больше workdays рабочих дней
+    (то же, что workdays_between(field, now) > workdays, но в SQL и по индексу).
+    """
+    return Q(**{f'{field}__lt': overdue_boundary(workdays, now)})
@@ -0,0 +1,113 @@
+"""
+Кэш снимков счётчиков дашбордов (плитки рекламаций, папки заказов и замеров).
+
+SPA опрашивает счётчики из каждой открытой вкладки, поэтому результат кэшируется
+во фреймворке кэша Django (CACHES['default']: locmem по умолчанию, Redis при
+REDIS_URL) с ключом (домен, роль, город, пользователь, scope).
+
+Инвалидация — через счётчик поколения домена: Complaint.save / Order.save
+(в т.ч. change_status) / Measurement.save и реестры увеличивают поколение своего
+домена, и все снимки этого домена перестают совпадать по ключу. Снимки других
+доменов не трогаются. DASHBOARD_CACHE_TIMEOUT ограничивает жизнь снимка сверху.
+
+Попадания/промахи считаются в том же кэше (общие для всех воркеров при Redis)
+и отдаются get_metrics() — см. /api/v1/dashboard/cache-stats/.
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+COMPLAINTS = 'complaints'
+ORDERS = 'orders'
+MEASUREMENTS = 'measurements'
+REGISTRIES = 'registries'
+DOMAINS = (COMPLAINTS, ORDERS, MEASUREMENTS, REGISTRIES)
+
+KEY_PREFIX = 'dash'
+# Счётчики метрик и поколений живут без срока
+FOREVER = None
+
+
+def _generation_key(domain):
+    return f'{KEY_PREFIX}:gen:{domain}'
+
+
+def _metric_key(domain, kind):
+    return f'{KEY_PREFIX}:metric:{domain}:{kind}'
+
+
+def _incr(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Ключа ещё нет (или вытеснен) — создаём; add() не перетрёт параллельную запись
+        if cache.add(key, 1, timeout=FOREVER):
+            return 1
+        return cache.incr(key)
+
+
+def _generation(domain):
+    return cache.get_or_set(_generation_key(domain), 1, timeout=FOREVER)
+
+
+def make_key(domain, user, scope=''):
+    city_id = getattr(user, 'city_id', None) or 0
+    return (
+        f'{KEY_PREFIX}:{domain}:g{_generation(domain)}:'
+        f'{getattr(user, "role", "")}:{city_id}:{user.pk}:{scope}'
+    )
+
+
+def cached_counters(domain, user, compute, scope=''):
+    """
+    Возвращает снимок счётчиков из кэша или считает compute() и кладёт в кэш.
+    scope — всё, что ещё влияет на результат (query-параметры, дата «сегодня»).
+    """
+    key = make_key(domain, user, scope)
+    value = cache.get(key)
+    if value is not None:
+        _incr(_metric_key(domain, 'hits'))
+        return value
+    _incr(_metric_key(domain, 'misses'))
+    value = compute()
+    cache.set(key, value, timeout=getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 60))
+    return value
+
+
+def _bump(domains):
+    for domain in domains:
+        try:
+            _incr(_generation_key(domain))
+        except Exception as exc:  # noqa: BLE001 — кэш недоступен: снимки истекут по таймауту
+            logger.warning('Не удалось инвалидировать кэш дашборда %s: %s', domain, exc)
+
+
+def invalidate(*domains):
+    """
+    Сбрасывает снимки указанных доменов (новое поколение ключей).
+    Внутри транзакции сбрасываем ещё раз после commit — иначе параллельный запрос
+    успел бы закэшировать счётчики по данным до фиксации.
+    """
+    _bump(domains)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _bump(domains))
+
+
+def get_metrics():
+    """Попадания/промахи и доля попаданий по доменам"""
+    result = {}
+    for domain in DOMAINS:
+        hits = cache.get(_metric_key(domain, 'hits')) or 0
+        misses = cache.get(_metric_key(domain, 'misses')) or 0
+        total = hits + misses
+        result[domain] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / total, 4) if total else None,
+            'generation': cache.get(_generation_key(domain)) or 1,
+        }
+    return result
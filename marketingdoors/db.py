@@ -0,0 +1,37 @@
+"""
+Соединения с БД вне HTTP-запросов.
+
+Django проверяет и закрывает соединения (CONN_MAX_AGE, CONN_HEALTH_CHECKS, возврат
+в пул psycopg) только на границах HTTP-запроса — по сигналам request_started /
+request_finished. Долгоживущий процесс без запросов (run_crons, воркер уведомлений)
+иначе держал бы одно соединение бесконечно, в т.ч. оборванное рестартом
+PostgreSQL/PgBouncer, и падал бы на следующем запросе.
+
+db_task() — та же граница для одной фоновой задачи: до и после неё устаревшие
+и сломанные соединения закрываются, исправные переиспользуются. Так у кронов
+и воркеров одна стратегия соединений с веб-процессами.
+"""
+from contextlib import contextmanager
+
+from django.db import connections
+
+
+def close_old_connections():
+    """
+    django.db.close_old_connections, но соединения внутри открытой транзакции
+    (atomic вызывающего кода, TestCase) не трогает: задача внутри транзакции —
+    не граница, а закрытие там пометило бы транзакцию на откат.
+    """
+    for conn in connections.all(initialized_only=True):
+        if not conn.in_atomic_block:
+            conn.close_if_unusable_or_obsolete()
+
+
+@contextmanager
+def db_task():
+    """Граница фоновой задачи для соединений с БД (как один HTTP-запрос)"""
+    close_old_connections()
+    try:
+        yield
+    finally:
+        close_old_connections()
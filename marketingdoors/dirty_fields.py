@@ -0,0 +1,135 @@
+"""
+Отслеживание изменённых полей модели в памяти.
+
+Раньше, чтобы понять, что поменялось, save() перечитывал строку из БД
+(Complaint.save делал Complaint.objects.get(pk=self.pk) ради сравнения
+монтажника), а сохранение без update_fields переписывало все колонки.
+DirtyFieldsMixin запоминает значения, с которыми объект загружен (from_db),
+и после каждого save()/refresh_from_db():
+
+- is_dirty('поле') / get_dirty_fields() / loaded_value('поле') — без запросов;
+- save() без update_fields у загруженного объекта пишет только изменённые
+  колонки (плюс auto_now, например updated_at);
+- changed_fields(update_fields) — что реально изменится при сохранении
+  (для решений «сбрасывать ли кэш дашборда»).
+
+Ставится перед models.Model: class Complaint(DirtyFieldsMixin, models.Model).
+"""
+import copy
+
+from django.db.models.fields.files import FieldFile
+
+
+def _frozen(value):
+    """Значение для снимка: файлы — по имени, dict/list (JSONField) — копией"""
+    if isinstance(value, FieldFile):
+        return value.name
+    if isinstance(value, (dict, list)):
+        return copy.deepcopy(value)
+    return value
+
+
+def _differs(current, loaded):
+    if isinstance(current, FieldFile):
+        # Новый, ещё не сохранённый файл — изменение, даже если имя совпало
+        return not current._committed or current.name != loaded
+    return current != loaded
+
+
+class DirtyFieldsMixin:
+    # save() без update_fields у загруженного объекта пишет только изменённые колонки
+    save_dirty_only = True
+
+    # Значения при загрузке/последнем сохранении: {attname: значение}; None — объект не из БД
+    _loaded_values = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot()
+        return instance
+
+    def _snapshot(self, attnames=None):
+        """Запоминает текущие значения полей (всех загруженных или только attnames)"""
+        if self._loaded_values is None:
+            self._loaded_values = {}
+        for field in self._meta.concrete_fields:
+            if attnames is not None and field.attname not in attnames:
+                continue
+            if field.attname in self.__dict__:
+                self._loaded_values[field.attname] = _frozen(self.__dict__[field.attname])
+
+    def _attnames(self, names):
+        return {self._meta.get_field(name).attname for name in names}
+
+    def _attname_dirty(self, attname):
+        if attname not in self.__dict__:
+            return False
+        if attname not in self._loaded_values:
+            # Отложенное поле (.only()/.defer()), которому присвоили значение:
+            # при загрузке его не было, прежнее значение неизвестно
+            return True
+        return _differs(self.__dict__[attname], self._loaded_values[attname])
+
+    def is_dirty(self, *attnames):
+        """Поле изменено после загрузки. Для объекта не из БД — всегда True."""
+        if self._loaded_values is None:
+            return True
+        return any(self._attname_dirty(attname) for attname in attnames)
+
+    def loaded_value(self, attname, default=None):
+        """Значение поля на момент загрузки (или последнего сохранения)"""
+        if self._loaded_values is None:
+            return default
+        return self._loaded_values.get(attname, default)
+
+    def get_dirty_fields(self):
+        """
+        {attname: значение при загрузке} для изменённых полей; для объекта не из БД — все поля.
+        Присвоенное отложенное поле — с None (значение при загрузке неизвестно).
+        """
+        if self._loaded_values is None:
+            return {field.attname: None for field in self._meta.concrete_fields if not field.primary_key}
+        return {
+            field.attname: self._loaded_values.get(field.attname)
+            for field in self._meta.concrete_fields
+            if self._attname_dirty(field.attname)
+        }
+
+    def changed_fields(self, update_fields=None):
+        """
+        Имена полей (name), которые изменит ближайший save(update_fields=...).
+        None — неизвестно (новый объект или объект не из БД): считаем, что меняется всё.
+        """
+        if self._state.adding or self._loaded_values is None:
+            return None
+        names = {self._meta.get_field(attname).name for attname in self.get_dirty_fields()}
+        if update_fields is not None:
+            names &= {self._meta.get_field(name).name for name in update_fields}
+        return names
+
+    def _dirty_update_fields(self):
+        fields = [self._meta.get_field(attname).name for attname in self.get_dirty_fields()]
+        fields += [
+            field.name for field in self._meta.concrete_fields
+            if getattr(field, 'auto_now', False) and field.name not in fields
+        ]
+        return fields
+
+    def save(self, *args, **kwargs):
+        if (
+            self.save_dirty_only
+            and not args
+            and kwargs.get('update_fields') is None
+            and not kwargs.get('force_insert')
+            and not self._state.adding
+            and self._loaded_values is not None
+        ):
+            kwargs['update_fields'] = self._dirty_update_fields()
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        self._snapshot(None if update_fields is None else self._attnames(update_fields))
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        self._snapshot(None if fields is None else self._attnames(fields))
@@ -0,0 +1,244 @@
+"""
+Keyset-пагинация списков API.
+
+Списки рекламаций, заказов, замеров, уведомлений и реестров отдаются целиком,
+пока клиент не попросит страницу параметром ?cursor= или ?page_size= (SPA пока
+читает списки целиком и по next не ходит). Страница выбирается условием «строго
+после позиции последней строки предыдущей страницы» по упорядочиванию
+(-created_at, id) — без OFFSET, поэтому размер ответа и время запроса не растут
+с историей.
+
+- ?page_size=N — размер страницы (по умолчанию API_PAGE_SIZE, не больше API_MAX_PAGE_SIZE);
+- ?cursor=… — непрозрачная позиция из поля next предыдущего ответа;
+- ?ordering=… (OrderingFilter) учитывается, если все поля сортировки NOT NULL
+  (по NULL keyset-условие не построить) — иначе берётся ordering вьюсета,
+  а если и он не годится — (-created_at, id).
+  Последним полем всегда добавляется id, чтобы позиция была уникальной.
+
+CountedKeysetPagination дополнительно отдаёт count — общее число строк выборки
+с учётом фильтров, но без курсора (одинаково на всех страницах).
+MergedKeysetPagination листает несколько выборок подряд одним курсором
+(заявки без замера + замеры в MeasurementViewSet.list).
+"""
+import base64
+import binascii
+import datetime
+import json
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+DEFAULT_ORDERING = ('-created_at', 'id')
+
+
+def encode_cursor(data):
+    raw = json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(value):
+    try:
+        return json.loads(base64.urlsafe_b64decode(value.encode('ascii')).decode('utf-8'))
+    except (binascii.Error, UnicodeError, ValueError):
+        raise NotFound('Неверный курсор')
+
+
+def keyset_filter(ordering, values):
+    """
+    Условие «строго после позиции values» для ordering вида ('-created_at', 'id'):
+    created_at < v1 OR (created_at = v1 AND id > v2).
+    """
+    condition = Q()
+    prefix = {}
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        condition |= Q(**prefix, **{f'{name}__{lookup}': value})
+        prefix[name] = value
+    return condition
+
+
+def _json_value(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def instance_position(instance, ordering):
+    """Позиция строки (объект модели или словарь из .values()) по полям сортировки"""
+    if isinstance(instance, dict):
+        return [_json_value(instance[field.lstrip('-')]) for field in ordering]
+    return [_json_value(getattr(instance, field.lstrip('-'))) for field in ordering]
+
+
+def _keyset_safe(queryset, field):
+    """Поле годится для keyset-условия: колонка модели NOT NULL или аннотация"""
+    name = field.lstrip('-')
+    if name in queryset.query.annotations:
+        return True
+    if '__' in name:
+        return False
+    try:
+        return not queryset.model._meta.get_field(name).null
+    except FieldDoesNotExist:
+        return False
+
+
+class KeysetPagination(BasePagination):
+    """Курсорная пагинация по ключу сортировки (по умолчанию -created_at, id)"""
+    ordering = DEFAULT_ORDERING
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    with_count = False
+
+    def __init__(self):
+        self.page_size = getattr(settings, 'API_PAGE_SIZE', 50)
+        self.max_page_size = getattr(settings, 'API_MAX_PAGE_SIZE', 200)
+
+    def is_requested(self, request):
+        """Клиент просит страницу: передан ?cursor= или ?page_size="""
+        return any(
+            param in request.query_params
+            for param in (self.cursor_query_param, self.page_size_query_param)
+        )
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size,
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def get_ordering(self, request, queryset, view):
+        """
+        Первое годное для keyset упорядочивание: из ?ordering= (OrderingFilter),
+        ordering вьюсета по умолчанию, ordering пагинатора.
+        """
+        candidates = []
+        for backend in getattr(view, 'filter_backends', []):
+            if issubclass(backend, OrderingFilter):
+                candidates.append(backend().get_ordering(request, queryset, view))
+        candidates += [getattr(view, 'ordering', None), self.ordering]
+        for ordering in candidates:
+            if ordering and all(_keyset_safe(queryset, field) for field in ordering):
+                break
+        ordering = tuple(ordering)
+        if not any(field.lstrip('-') in ('id', 'pk') for field in ordering):
+            ordering += ('id',)
+        return ordering
+
+    def _start(self, request):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        raw = request.query_params.get(self.cursor_query_param)
+        return decode_cursor(raw) if raw else None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_requested(request):
+            return None
+        cursor = self._start(request)
+        ordering = self.get_ordering(request, queryset, view)
+        self.count = queryset.count() if self.with_count else None
+
+        queryset = queryset.order_by(*ordering)
+        if cursor is not None:
+            if not isinstance(cursor, list) or len(cursor) != len(ordering):
+                raise NotFound('Неверный курсор')
+            queryset = queryset.filter(keyset_filter(ordering, cursor))
+
+        rows = list(queryset[:self.page_size + 1])
+        page = rows[:self.page_size]
+        self.next_cursor = (
+            encode_cursor(instance_position(page[-1], ordering))
+            if len(rows) > self.page_size else None
+        )
+        return page
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param, self.next_cursor)
+
+    def get_first_link(self):
+        return remove_query_param(self.base_url, self.cursor_query_param)
+
+    def get_paginated_response(self, data):
+        payload = {}
+        if self.count is not None:
+            payload['count'] = self.count
+        payload['next'] = self.get_next_link()
+        payload['first'] = self.get_first_link()
+        payload['results'] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        properties = {
+            'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+            'first': {'type': 'string', 'format': 'uri'},
+            'results': schema,
+        }
+        if self.with_count:
+            properties['count'] = {'type': 'integer'}
+        return {'type': 'object', 'required': ['results'], 'properties': properties}
+
+
+class CountedKeysetPagination(KeysetPagination):
+    """Keyset-пагинация с общим числом строк (для списков, где UI показывает итог)"""
+    with_count = True
+
+
+class MergedKeysetPagination(CountedKeysetPagination):
+    """
+    Несколько выборок одним потоком: сначала вся первая, затем вторая и т.д.
+    Курсор хранит номер выборки и позицию в ней.
+    """
+
+    def paginate_streams(self, streams, request):
+        """
+        streams — список пар (queryset, ordering).
+        Возвращает список пар (номер выборки, объект) для текущей страницы,
+        None — если страница не запрошена (как paginate_queryset).
+        """
+        if not self.is_requested(request):
+            return None
+        cursor = self._start(request)
+        self.count = sum(queryset.count() for queryset, _ in streams)
+
+        start_stream, position = 0, None
+        if cursor is not None:
+            try:
+                start_stream, position = int(cursor['s']), cursor['p']
+            except (KeyError, TypeError, ValueError):
+                raise NotFound('Неверный курсор')
+            if not 0 <= start_stream < len(streams) or len(position) != len(streams[start_stream][1]):
+                raise NotFound('Неверный курсор')
+
+        rows = []
+        for index in range(start_stream, len(streams)):
+            queryset, ordering = streams[index]
+            queryset = queryset.order_by(*ordering)
+            if index == start_stream and position is not None:
+                queryset = queryset.filter(keyset_filter(ordering, position))
+            rows.extend((index, obj) for obj in queryset[:self.page_size + 1 - len(rows)])
+            if len(rows) > self.page_size:
+                break
+
+        page = rows[:self.page_size]
+        self.next_cursor = None
+        if len(rows) > self.page_size:
+            index, obj = page[-1]
+            self.next_cursor = encode_cursor({'s': index, 'p': instance_position(obj, streams[index][1])})
+        return page
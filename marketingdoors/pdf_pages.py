@@ -0,0 +1,74 @@
+"""
+Однопроходное извлечение страниц PDF для парсеров КП и рекламаций.
+
+Раньше projects.pdf_parser вызывал page.extract_text() для каждой страницы
+трижды (общий текст, разбор изделий, «первая строка следующей страницы»)
+плюс extract_tables(), а orders.pdf_parser открывал и разбирал файл отдельно.
+Вёрстка текста в pdfplumber — самая дорогая операция, поэтому теперь каждая
+страница обходится один раз: текст (и по запросу таблицы/слова) извлекаются
+сразу, кэши pdfplumber страницы освобождаются, а дальше парсеры работают с
+готовыми PageContent.
+
+PDF_PARSE_MAX_PAGES ограничивает число страниц: файл длиннее отклоняется до
+извлечения текста (ValueError), чтобы 200-страничный документ не занимал
+воркер разбора.
+"""
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Any, List
+
+import pdfplumber
+from django.conf import settings
+
+
+@dataclass
+class PageContent:
+    """Извлечённое содержимое одной страницы"""
+    number: int
+    text: str
+    tables: List[Any] = field(default_factory=list)
+    words: List[dict] = field(default_factory=list)
+
+    @cached_property
+    def lines(self) -> List[str]:
+        """Непустые строки текста без краевых пробелов"""
+        return [line.strip() for line in self.text.split('\n') if line.strip()]
+
+    @property
+    def first_line(self) -> str:
+        return self.lines[0] if self.lines else ''
+
+
+def max_pages() -> int:
+    """Предел страниц в разбираемом PDF (0 — без ограничения)"""
+    return int(getattr(settings, 'PDF_PARSE_MAX_PAGES', 0) or 0)
+
+
+def extract_pages(pdf_file, tables: bool = False, words: bool = False) -> List[PageContent]:
+    """
+    Открывает PDF и один раз обходит страницы: текст всегда, таблицы и слова —
+    если запрошены. После страницы её кэши pdfplumber освобождаются.
+    """
+    pages = []
+    limit = max_pages()
+    with pdfplumber.open(pdf_file) as pdf:
+        if limit and len(pdf.pages) > limit:
+            raise ValueError(f'В PDF {len(pdf.pages)} стр., допускается не больше {limit}')
+        for number, page in enumerate(pdf.pages, start=1):
+            try:
+                pages.append(PageContent(
+                    number=number,
+                    text=page.extract_text() or '',
+                    tables=page.extract_tables() if tables else [],
+                    words=page.extract_words() if words else [],
+                ))
+            finally:
+                page.close()
+    return pages
+
+
+def joined_text(pages: List[PageContent], skip_empty: bool = False) -> str:
+    """Текст всех страниц через перевод строки (skip_empty — без пустых страниц)"""
+    if skip_empty:
+        return ''.join(f'{page.text}\n' for page in pages if page.text)
+    return '\n'.join(page.text for page in pages)
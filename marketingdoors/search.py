@@ -0,0 +1,204 @@
+"""
+Поиск по заказам, замерам и рекламациям через денормализованный поисковый документ.
+
+Раньше ?search= (DRF SearchFilter) превращался в `ILIKE '%…%'` по 4–11 колонкам,
+в т.ч. через JOIN на менеджера и напоминания, — без индекса, полным
+проходом таблицы на каждый ввод символа в строке поиска SPA. Теперь:
+
+- у Order и Complaint есть поле search_document — одна строка в нижнем регистре
+  (ё → е) с клиентом, адресом, номером КП/заказа, ФИО менеджера и телефонами;
+- телефоны кладутся только цифрами и в нескольких вариантах (+7…, 8…, без кода
+  страны), поэтому «+7 (999) 123» и «8999123» находят один и тот же номер;
+- документ пересчитывают save() моделей (только когда изменились исходные поля)
+  и команда rebuild_search_documents (после массовых правок и переименования
+  менеджеров);
+- SearchDocumentFilter ищет каждое слово запроса условием
+  `search_document LIKE '%слово%'`. На PostgreSQL по колонке построен GIN-индекс
+  pg_trgm (gin_trgm_ops) — такой LIKE идёт по индексу. На SQLite (тесты) индекса
+  нет, запрос тот же.
+"""
+import re
+
+from django.db.models import Q
+from rest_framework.filters import SearchFilter
+
+# Разделитель частей документа: слово запроса не «склеит» соседние поля
+SEPARATOR = ' | '
+
+# Строка целиком из цифр и телефонной пунктуации — ищем её как номер
+_PHONE_QUERY = re.compile(r'^[\d\s()+\-.]*\d[\d\s()+\-.]*$')
+_NON_DIGITS = re.compile(r'\D+')
+_SPACES = re.compile(r'\s+')
+
+
+def normalize_text(value):
+    """Нижний регистр, ё → е, один пробел между словами"""
+    return _SPACES.sub(' ', str(value or '').lower().replace('ё', 'е')).strip()
+
+
+def phone_variants(value):
+    """
+    Цифры телефона во всех привычных записях: для российского номера из 10–11
+    цифр — 7XXXXXXXXXX, 8XXXXXXXXXX и XXXXXXXXXX; для прочих — цифры как есть.
+    """
+    digits = _NON_DIGITS.sub('', str(value or ''))
+    if not digits:
+        return []
+    if len(digits) == 11 and digits[0] in '78':
+        local = digits[1:]
+    elif len(digits) == 10:
+        local = digits
+    else:
+        return [digits]
+    return [f'7{local}', f'8{local}', local]
+
+
+def build_document(texts=(), phones=()):
+    """Поисковый документ из текстовых частей и телефонов (пустые пропускаются)"""
+    parts = [normalize_text(text) for text in texts]
+    for phone in phones:
+        parts.extend(phone_variants(phone))
+    return SEPARATOR.join(dict.fromkeys(part for part in parts if part))
+
+
+def user_names(user):
+    """ФИО и логин пользователя для документа (только поля — подходит и для моделей миграций)"""
+    if not user:
+        return []
+    return [f'{user.first_name} {user.last_name}', user.username]
+
+
+def order_document(order, manager=None, salon=None, request=None):
+    """
+    Документ заказа: КП, клиент, адрес, комментарий, салон, менеджер и телефоны,
+    включая контакт из заявки на замер (по нему ищут и в списке замеров).
+    """
+    texts = [order.kp_number, order.client_name, order.address, order.comment]
+    phones = [order.contact_phone]
+    if salon:
+        texts.append(salon.name)
+    texts += user_names(manager)
+    if request:
+        texts.append(request.contact_name)
+        phones.append(request.contact_phone)
+    return build_document(texts, phones)
+
+
+def complaint_document(complaint, manager=None):
+    """Документ рекламации: номер заказа, клиент, адрес, контактное лицо, менеджер, телефон"""
+    texts = [complaint.order_number, complaint.client_name, complaint.address, complaint.contact_person]
+    texts += user_names(manager)
+    return build_document(texts, [complaint.contact_phone])
+
+
+def refresh_search_document(instance, save_kwargs, source_fields, build):
+    """
+    Перед save(): пересобирает instance.search_document через build(), если
+    изменилось хотя бы одно из source_fields (для нового объекта — всегда).
+    При явном update_fields добавляет в него search_document.
+    """
+    update_fields = save_kwargs.get('update_fields')
+    if update_fields is not None:
+        source_fields = [
+            name for name in source_fields
+            if name in update_fields or f'{name}_id' in update_fields
+        ]
+        if not source_fields:
+            return
+    if not instance._state.adding and not instance.is_dirty(*instance._attnames(source_fields)):
+        return
+    document = build()
+    if document == instance.search_document:
+        return
+    instance.search_document = document
+    if update_fields is not None:
+        save_kwargs['update_fields'] = [*update_fields, 'search_document']
+
+
+def search_term_variants(query):
+    """
+    Слова запроса в нормализованном виде, каждое — кортежем вариантов. Запрос-телефон
+    («+7 (999) 12-3») — одно слово; цифровое слово ищется и одними цифрами (телефоны
+    в документе лежат без пунктуации), и как написано — номер заказа «12-345», КП
+    «2024-17» или дом «5-7» хранятся в документе с дефисом.
+    """
+    query = str(query or '').replace('\x00', '').strip()
+    if not query:
+        return []
+    words = [query] if _PHONE_QUERY.match(query) else normalize_text(query).split(' ')
+    result = []
+    for word in words:
+        word = normalize_text(word)
+        variants = (_NON_DIGITS.sub('', word), word) if _PHONE_QUERY.match(word) else (word,)
+        variants = tuple(dict.fromkeys(variant for variant in variants if variant))
+        if variants and variants not in result:
+            result.append(variants)
+    return result
+
+
+def search_terms(query):
+    """
+    Слова запроса в нормализованном виде. Запрос-телефон («+7 (999) 12-3»)
+    даёт одно слово из цифр; в обычном запросе цифровые слова тоже чистятся
+    от пунктуации. Исходная запись цифровых слов — в search_term_variants().
+    """
+    return [variants[0] for variants in search_term_variants(query)]
+
+
+def search_q(field, query, id_fields=()):
+    """
+    Условие filter(): каждое слово запроса (хотя бы один его вариант) входит в
+    документ field. Запрос из одного числа дополнительно ищется по id_fields
+    (номер заказа/замера). None — пустой запрос.
+    """
+    terms = search_term_variants(query)
+    if not terms:
+        return None
+    condition = Q()
+    for variants in terms:
+        matches = Q()
+        for variant in variants:
+            matches |= Q(**{f'{field}__contains': variant})
+        condition &= matches
+    digits = terms[0][0]
+    if len(terms) == 1 and digits.isdigit() and len(digits) <= 9:
+        for id_field in id_fields:
+            condition |= Q(**{id_field: int(digits)})
+    return condition
+
+
+class SearchDocumentFilter(SearchFilter):
+    """
+    ?search= по поисковому документу. Вьюсет задаёт search_document_field
+    (путь до поля search_document, в т.ч. через связь) и search_id_fields;
+    без search_document_field работает как обычный SearchFilter.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        field = getattr(view, 'search_document_field', None)
+        if not field:
+            return super().filter_queryset(request, queryset, view)
+        condition = search_q(
+            field,
+            request.query_params.get(self.search_param, ''),
+            getattr(view, 'search_id_fields', ()),
+        )
+        if condition is None:
+            return queryset
+        return queryset.filter(condition)
+
+
+def create_trigram_index(schema_editor, table, index_name, column='search_document'):
+    """Для миграций: GIN-индекс pg_trgm по колонке. На других СУБД (SQLite в тестах) — ничего."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {index_name} ON {table} USING gin ({column} gin_trgm_ops)'
+    )
+
+
+def drop_trigram_index(schema_editor, index_name):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {index_name}')
@@ -102,16 +102,67 @@ WSGI_APPLICATION = 'marketingdoors.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+def _env_flag(name, default):
+    return os.getenv(name, default).strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+# Соединения с БД (драйвер — psycopg 3):
+# - DATABASE_CONN_MAX_AGE — сколько секунд держать соединение между запросами
+#   (0 — закрывать после каждого запроса, пусто — без ограничения);
+#   DATABASE_CONN_HEALTH_CHECKS — проверять его перед повторным использованием;
+# - DATABASE_POOL=1 — встроенный пул psycopg_pool (Django 5.1+) на процесс, размеры —
+#   DATABASE_POOL_MIN_SIZE / DATABASE_POOL_MAX_SIZE, ожидание свободного соединения —
+#   DATABASE_POOL_TIMEOUT сек. С пулом Django требует CONN_MAX_AGE = 0;
+# - DATABASE_PGBOUNCER=1 — за PgBouncer в режиме transaction: без серверных курсоров.
+DATABASE_ENGINE = os.getenv('DATABASE_ENGINE', 'django.db.backends.postgresql')
+DATABASE_POOL = _env_flag('DATABASE_POOL', 'False') and DATABASE_ENGINE == 'django.db.backends.postgresql'
+_conn_max_age = os.getenv('DATABASE_CONN_MAX_AGE', '60').strip()
+
 DATABASES = {
     'default': {
-        'ENGINE': os.getenv('DATABASE_ENGINE', 'django.db.backends.postgresql'),
+        'ENGINE': DATABASE_ENGINE,
         'NAME': os.getenv('DATABASE_NAME', 'marketingdoors'),
         'USER': os.getenv('DATABASE_USER', 'postgres'),
         'PASSWORD': os.getenv('DATABASE_PASSWORD', ''),
         'HOST': os.getenv('DATABASE_HOST', 'localhost'),
         'PORT': os.getenv('DATABASE_PORT', '5432'),
+        'CONN_MAX_AGE': 0 if DATABASE_POOL else (int(_conn_max_age) if _conn_max_age else None),
+        'CONN_HEALTH_CHECKS': _env_flag('DATABASE_CONN_HEALTH_CHECKS', 'True'),
+        'DISABLE_SERVER_SIDE_CURSORS': _env_flag('DATABASE_PGBOUNCER', 'False'),
     }
 }
+if DATABASE_POOL:
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.getenv('DATABASE_POOL_MIN_SIZE', '2')),
+            'max_size': int(os.getenv('DATABASE_POOL_MAX_SIZE', '10')),
+            'timeout': float(os.getenv('DATABASE_POOL_TIMEOUT', '10')),
+        },
+    }
+
+
+# Cache
+# По умолчанию — локальная память процесса. Для нескольких воркеров gunicorn
+# задать REDIS_URL (redis://host:6379/1) — тогда кэш и его инвалидация общие.
+REDIS_URL = os.getenv('REDIS_URL', '')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'marketingdoors',
+        }
+    }
+
+# Время жизни снимка счётчиков дашборда (сек). Страховка на случай изменений
+# в обход save() и для условий, зависящих от текущего времени (просрочки).
+DASHBOARD_CACHE_TIMEOUT = int(os.getenv('DASHBOARD_CACHE_TIMEOUT', '60'))
 
 
 # Password validation
@@ -144,6 +195,14 @@ USE_I18N = True
 
 USE_TZ = True
 
+# Производственный календарь (marketingdoors/business_days.py): к выходным и праздникам
+# ст. 112 ТК РФ добавляются ежегодные переносы — даты ГГГГ-ММ-ДД через запятую:
+# дополнительные выходные и рабочие субботы/воскресенья
+BUSINESS_CALENDAR_HOLIDAYS = [d.strip() for d in os.getenv('BUSINESS_CALENDAR_HOLIDAYS', '').split(',') if d.strip()]
+BUSINESS_CALENDAR_WORKING_DAYS = [
+    d.strip() for d in os.getenv('BUSINESS_CALENDAR_WORKING_DAYS', '').split(',') if d.strip()
+]
+
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
@@ -178,6 +237,11 @@ REST_FRAMEWORK = {
     'EXCEPTION_HANDLER': 'marketingdoors.exceptions.custom_exception_handler',
 }
 
+# Keyset-пагинация списков API (marketingdoors.pagination), включается ?cursor= / ?page_size=:
+# размер страницы при одном ?cursor= и верхняя граница ?page_size=
+API_PAGE_SIZE = int(os.getenv('API_PAGE_SIZE', '50'))
+API_MAX_PAGE_SIZE = int(os.getenv('API_MAX_PAGE_SIZE', '200'))
+
 # Настройка для предотвращения редиректов на API запросы
 LOGIN_URL = '/api/v1/login/'  # Веб-страница логина
 LOGIN_REDIRECT_URL = '/api/v1/dashboard/'  # Редирект после логина
@@ -217,8 +281,18 @@ VAPID_PRIVATE_KEY = os.getenv('VAPID_PRIVATE_KEY', '')
 # VAPID Contact Info (email/URL для идентификации сервера)
 VAPID_CLAIM_EMAIL = os.getenv('VAPID_CLAIM_EMAIL', 'support@marketingdoors.ru')
 
+# Параллельных отправок при пакетной push-рассылке (users.push_utils.send_push_batch)
+PUSH_MAX_WORKERS = int(os.getenv('PUSH_MAX_WORKERS', '8'))
+
 # SMS.ru API Settings
 SMS_RU_API_ID = os.getenv('SMS_RU_API_ID', '')
+# Клиент SMS (users.sms_client): SmsRuClient — реальный sms.ru, FakeSmsGateway — локальная заглушка
+SMS_CLIENT = os.getenv('SMS_CLIENT', 'users.sms_client.SmsRuClient')
+# Не больше SMS_RU_RATE_PER_SECOND запросов к sms.ru в секунду (всплеск до SMS_RU_BURST),
+# до SMS_RU_BATCH_SIZE номеров в одном запросе
+SMS_RU_RATE_PER_SECOND = float(os.getenv('SMS_RU_RATE_PER_SECOND', '5'))
+SMS_RU_BURST = int(os.getenv('SMS_RU_BURST', '5'))
+SMS_RU_BATCH_SIZE = int(os.getenv('SMS_RU_BATCH_SIZE', '100'))
 
 # Включение/выключение SMS клиенту по ЗАКАЗАМ (на время тестирования).
 # Рекламаций не касается. Выключить: ORDERS_SMS_ENABLED=False в .env, затем рестарт.
@@ -241,6 +315,34 @@ SERVER_EMAIL = DEFAULT_FROM_EMAIL
 # OR Email (Operational Manager Email)
 OR_EMAIL = os.getenv('OR_EMAIL', '')
 
+# Кэш отрендеренных PDF-бланков замера (orders/pdf_cache.py)
+PDF_CACHE_DIR = os.getenv('PDF_CACHE_DIR', str(MEDIA_ROOT / 'pdf_cache'))
+# Рендер PDF в пуле процессов (orders/pdf_render_pool.py): процессов на веб-воркер
+# (0 — рендер синхронно в запросе), сколько публичная ссылка ждёт рендер до ответа 202
+PDF_RENDER_WORKERS = int(os.getenv('PDF_RENDER_WORKERS', '2'))
+PDF_RENDER_WAIT_SECONDS = float(os.getenv('PDF_RENDER_WAIT_SECONDS', '8'))
+PDF_RENDER_MAX_TASKS_PER_CHILD = int(os.getenv('PDF_RENDER_MAX_TASKS_PER_CHILD', '50'))
+# Фото в PDF-бланках (orders/pdf_images.py): длинная сторона копии, px, и качество JPEG
+PDF_IMAGE_MAX_PX = int(os.getenv('PDF_IMAGE_MAX_PX', '1600'))
+PDF_IMAGE_QUALITY = int(os.getenv('PDF_IMAGE_QUALITY', '82'))
+# Кэш разбора загруженных PDF КП/рекламаций (projects/pdf_parse_cache.py): записей в LRU процесса
+PDF_PARSE_CACHE_SIZE = int(os.getenv('PDF_PARSE_CACHE_SIZE', '64'))
+# Разбор PDF в дочерних процессах (projects/pdf_parse_service.py): одновременных разборов
+# на веб-процесс (0 — в самом запросе, без лимитов), сколько синхронный запрос ждёт
+# свободного слота до ответа 503, лимиты процессорного времени и памяти на разбор,
+# предельные размер файла и число страниц
+PDF_PARSE_WORKERS = int(os.getenv('PDF_PARSE_WORKERS', '2'))
+PDF_PARSE_SLOT_WAIT_SECONDS = float(os.getenv('PDF_PARSE_SLOT_WAIT_SECONDS', '5'))
+PDF_PARSE_TIMEOUT_SECONDS = float(os.getenv('PDF_PARSE_TIMEOUT_SECONDS', '30'))
+PDF_PARSE_MEMORY_MB = int(os.getenv('PDF_PARSE_MEMORY_MB', '768'))
+PDF_PARSE_MAX_MB = float(os.getenv('PDF_PARSE_MAX_MB', '20'))
+PDF_PARSE_MAX_PAGES = int(os.getenv('PDF_PARSE_MAX_PAGES', '50'))
+
 # Base URL for generating absolute URLs for media files
 # If not set, will use first ALLOWED_HOST with http/https scheme
 BASE_URL = os.getenv('BASE_URL', '')
+
+# Очередь уведомлений (users/notification_outbox.py, manage.py run_notification_dispatcher)
+NOTIFICATION_SENDER = os.getenv('NOTIFICATION_SENDER', 'users.notification_outbox.NetworkSender')
+NOTIFICATION_RETRY_BASE_SECONDS = int(os.getenv('NOTIFICATION_RETRY_BASE_SECONDS', '30'))
+NOTIFICATION_RETRY_MAX_SECONDS = int(os.getenv('NOTIFICATION_RETRY_MAX_SECONDS', '3600'))
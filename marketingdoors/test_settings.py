@@ -7,3 +7,12 @@ DATABASES = {
         'NAME': ':memory:',
     }
 }
+
+# Уведомления в тестах не уходят в сеть
+NOTIFICATION_SENDER = 'users.notification_outbox.LocalSender'
+SMS_CLIENT = 'users.sms_client.FakeSmsGateway'
+
+# PDF рендерится синхронно, без пула процессов
+PDF_RENDER_WORKERS = 0
+# PDF разбирается в самом запросе, без дочерних процессов
+PDF_PARSE_WORKERS = 0
@@ -6,16 +6,23 @@ from rest_framework.views import APIView
 from rest_framework.filters import SearchFilter, OrderingFilter
 from django_filters.rest_framework import DjangoFilterBackend
 from datetime import timedelta
-from django.db.models import Q, Prefetch
+from django.db.models import OuterRef, Prefetch, Q, Subquery
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.conf import settings
 
+from marketingdoors import dashboard_cache
+from marketingdoors.pagination import KeysetPagination, MergedKeysetPagination
+from marketingdoors.search import SearchDocumentFilter, search_q
+from projects.models import ParsedPdf
+from projects.pdf_parse_cache import cached_parse
+
 from .models import (
-    Salon, Order, OrderItem, OrderAddon, OrderAttachment,
+    Salon, Order, OrderItem, OrderAttachment,
     MeasurementRequest, OrderActionReminder, OrderStatus, ActivityKind,
     Measurement, MeasurementOpening, MeasurementAttachment, OrderActivityLog,
 )
-from . import sms_templates
+from . import kp_import, sms_templates
 from .serializers import (
     SalonSerializer,
     OrderListSerializer,
@@ -34,7 +41,7 @@ from .serializers import (
     MeasurementAttachmentSerializer,
     OrderActivityLogSerializer,
 )
-from .pdf_parser import parse_kp_pdf
+from .pdf_render_pool import prewarm_blanks
 from .recommendations import (
     calculate_door_recommendation,
     calculate_opening_recommendation,
@@ -59,41 +66,78 @@ def get_orders_queryset_for_user(user):
             queryset=OrderAttachment.objects.filter(order_item__isnull=True),
         ),
     )
+    return qs.filter(order_access_q(user))
+
+
+def order_access_q(user, prefix=''):
+    """
+    ACL заказов как Q-условие относительно пути до заказа (prefix, напр. 'order__'
+    или 'measurement__request__order__'). Условие остаётся в SQL (JOIN по пути),
+    без выгрузки id доступных заказов в Python и гигантского IN (...).
+    Нет доступа — условие, дающее пустую выборку.
+    """
     if user.role == 'admin':
-        return qs
+        return Q()
     if user.role in ('leader', 'service_manager'):
-        if hasattr(user, 'city') and user.city:
-            return qs.filter(salon__city=user.city)
-        return qs.none()
+        if getattr(user, 'city_id', None):
+            return Q(**{f'{prefix}salon__city_id': user.city_id})
+        return Q(pk__in=[])
     if user.role == 'manager':
-        if hasattr(user, 'salon') and user.salon_id:
-            return qs.filter(salon=user.salon)
-        return qs.filter(manager=user)
-    return qs.none()
+        if getattr(user, 'salon_id', None):
+            return Q(**{f'{prefix}salon_id': user.salon_id})
+        return Q(**{f'{prefix}manager': user})
+    return Q(pk__in=[])
+
+
+def latest_measurement_openings_prefetch(lookup='items__measurement_openings'):
+    """Prefetch самого свежего связанного MeasurementOpening позиции в latest_measurement_openings"""
+    latest_id = (
+        MeasurementOpening.objects
+        .filter(order_item=OuterRef('order_item'))
+        .order_by('-id')
+        .values('id')[:1]
+    )
+    return Prefetch(
+        lookup,
+        queryset=MeasurementOpening.objects.filter(id=Subquery(latest_id)),
+        to_attr='latest_measurement_openings',
+    )
+
+
+def with_latest_measurement_openings(qs):
+    """
+    Подгружает для каждой позиции заказов самый свежий связанный MeasurementOpening
+    (item.latest_measurement_openings — список из 0/1 элемента) одним запросом
+    на все позиции, вместо запроса на позицию в OrderItemSerializer.get_measurement_data.
+    """
+    return qs.prefetch_related(latest_measurement_openings_prefetch())
 
 
 def send_client_sms(order, phone, message, *, actor=None, meta=None):
     """
-    Отправляет SMS клиенту/контактному и пишет событие в журнал заказа.
-    Возвращает True если отправка прошла или была намеренно отключена (тест-режим).
-    Логирует всегда (с пометками sms_ok / suppressed).
+    Ставит SMS клиенту/контактному в очередь уведомлений и пишет событие в журнал заказа.
+    Возвращает True если SMS поставлено в очередь или было намеренно отключено (тест-режим).
+    Логирует всегда (с пометками sms_ok / suppressed, outbox_id — задание в очереди).
+    Диспетчер отправляет накопленные SMS пачкой через users.sms_client (одна сессия,
+    мульти-запрос sms.ru to[...]).
 
     SMS по заказам можно отключить флагом ORDERS_SMS_ENABLED=False (на время теста).
     """
-    from users.push_utils import send_sms_to_phone
+    from users.notification_outbox import enqueue_sms
     enabled = getattr(settings, 'ORDERS_SMS_ENABLED', True)
     suppressed = not enabled
-    ok = False
+    job = None
     if enabled and phone:
-        try:
-            ok = send_sms_to_phone(phone, message)
-        except Exception:  # noqa: BLE001
-            ok = False
+        job = enqueue_sms(message, phone_number=phone)
+    ok = job is not None
     order.log_activity(
         ActivityKind.SMS_SENT,
         actor=actor,
         description=message[:500],
-        meta={**(meta or {}), 'phone': phone or '', 'sms_ok': ok, 'suppressed': suppressed},
+        meta={
+            **(meta or {}), 'phone': phone or '', 'sms_ok': ok, 'suppressed': suppressed,
+            'outbox_id': job.id if job else None,
+        },
     )
     # В тест-режиме считаем «обработанным», чтобы экшены (недозвон) не падали 400.
     return ok or suppressed
@@ -186,10 +230,13 @@ def apply_order_folder(qs, folder):
 
 class OrderViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    search_fields = ['kp_number', 'client_name', 'address', 'contact_phone']
+    filter_backends = [DjangoFilterBackend, SearchDocumentFilter, OrderingFilter]
+    # ?search= — по поисковому документу заказа (КП, клиент, адрес, телефоны, менеджер)
+    search_document_field = 'search_document'
+    search_id_fields = ['id']
     ordering_fields = ['created_at', 'updated_at', 'status', 'kp_date', 'client_name']
     ordering = ['-created_at']
+    pagination_class = KeysetPagination
     filterset_fields = ['status', 'salon']
 
     def get_queryset(self):
@@ -224,6 +271,9 @@ class OrderViewSet(viewsets.ModelViewSet):
         if folder:
             qs = apply_order_folder(qs, folder)
 
+        if self.action == 'retrieve':
+            qs = with_latest_measurement_openings(qs)
+
         return qs
 
     @action(detail=False, methods=['get'], url_path='folder_counts')
@@ -232,18 +282,27 @@ class OrderViewSet(viewsets.ModelViewSet):
         Счётчики по папкам заказов для Dashboard (Фаза 6).
         Учитывает ACL пользователя. ?mine=true — только свои заказы.
         """
-        base = get_orders_queryset_for_user(request.user)
-        if request.query_params.get('mine') == 'true':
-            base = base.filter(manager=request.user)
-        result = []
-        for folder, label, overdue in ORDER_FOLDERS:
-            result.append({
-                'folder': folder,
-                'label': label,
-                'overdue': overdue,
-                'count': apply_order_folder(base, folder).count(),
-            })
-        return Response(result)
+        mine = request.query_params.get('mine') == 'true'
+
+        def compute():
+            base = get_orders_queryset_for_user(request.user)
+            if mine:
+                base = base.filter(manager=request.user)
+            result = []
+            for folder, label, overdue in ORDER_FOLDERS:
+                result.append({
+                    'folder': folder,
+                    'label': label,
+                    'overdue': overdue,
+                    'count': apply_order_folder(base, folder).count(),
+                })
+            return result
+
+        # Папки «Сегодня/завтра замер» зависят от даты — она входит в ключ снимка
+        return Response(dashboard_cache.cached_counters(
+            dashboard_cache.ORDERS, request.user, compute,
+            scope=f'mine={mine}:{timezone.localdate().isoformat()}',
+        ))
 
     def get_serializer_class(self):
         if self.action == 'list':
@@ -269,7 +328,8 @@ class OrderViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
         try:
-            data = parse_kp_pdf(pdf_file)
+            # Повторная загрузка того же файла берётся из кэша разбора
+            data = cached_parse(ParsedPdf.KIND_KP, pdf_file)
         except ValueError as exc:
             return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
         # Decimal-поля нужно сериализовать как строки
@@ -282,6 +342,7 @@ class OrderViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['post'])
     def create_from_parsed(self, request):
         """Создаёт заказ из распарсенных данных. Принимает dict от parse_kp + поля salon/comment."""
+        from django.db import transaction
         data = request.data.copy() if hasattr(request.data, 'copy') else dict(request.data)
         salon_id = data.pop('salon', None)
         if not salon_id:
@@ -309,6 +370,11 @@ class OrderViewSet(viewsets.ModelViewSet):
 
         items = data.pop('items', []) or []
         addons = data.pop('addons', []) or []
+        # Все строки КП проверяем до записи: ошибка в одной строке не оставит полузаказ
+        try:
+            new_items, new_addons = kp_import.validate(items, addons)
+        except kp_import.KpImportError as exc:
+            return Response({'detail': str(exc), 'errors': exc.errors}, status=status.HTTP_400_BAD_REQUEST)
 
         order_kwargs = {
             'salon_id': salon_id,
@@ -323,50 +389,18 @@ class OrderViewSet(viewsets.ModelViewSet):
             'last_activity_at': timezone.now(),
             'last_activity_kind': ActivityKind.CREATED,
         }
-        order = Order.objects.create(**order_kwargs)
-
-        for idx, item in enumerate(items):
-            OrderItem.objects.create(
-                order=order,
-                opening_number=int(item.get('opening_number') or (idx + 1)),
-                room_name=(item.get('room_name') or '')[:255],
-                model_name=(item.get('model_name') or '')[:500],
-                quantity=int(item.get('quantity') or 1),
-                price=item.get('price') or None,
-                amount=item.get('amount') or None,
-                door_type=item.get('door_type') or '',
-                opening_type=item.get('opening_type') or '',
-                door_height=item.get('door_height') or None,
-                door_width=item.get('door_width') or None,
-                door_width_parts=(item.get('door_width_parts') or '')[:50],
-                recommended_opening_height=item.get('recommended_opening_height') or None,
-                recommended_opening_width=item.get('recommended_opening_width') or None,
-                notes=(item.get('notes') or ''),
-                position=idx,
-            )
+        with transaction.atomic():
+            order = Order.objects.create(**order_kwargs)
+            kp_import.create(order, new_items, new_addons)
 
-        for idx, addon in enumerate(addons):
-            OrderAddon.objects.create(
+            # Создаём обязательное «следующее действие»
+            OrderActionReminder.objects.create(
                 order=order,
-                kind=addon.get('kind') or 'extra',
-                name=(addon.get('name') or '')[:500],
-                quantity=addon.get('quantity') or 1,
-                size=(addon.get('size') or '')[:100],
-                opening_type=addon.get('opening_type') or '',
-                price=addon.get('price') or None,
-                amount=addon.get('amount') or None,
-                comment=(addon.get('comment') or ''),
-                position=idx,
+                action_text=next_action_text[:500],
+                due_at=next_action_due,
+                created_by=request.user,
             )
 
-        # Создаём обязательное «следующее действие»
-        OrderActionReminder.objects.create(
-            order=order,
-            action_text=next_action_text[:500],
-            due_at=next_action_due,
-            created_by=request.user,
-        )
-
         serializer = OrderDetailSerializer(order, context={'request': request})
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -375,15 +409,20 @@ class OrderViewSet(viewsets.ModelViewSet):
         """
         Заменяет КП в существующем заказе данными нового распарсенного КП
         (если первое КП было загружено неверно или клиенту выставили новое).
-        Шапка обновляется, позиции и сопутствующие пересоздаются. Замер и его
-        проёмы сохраняются; связки проёмов с позициями КП сбрасываются
-        (order_item → NULL), их нужно привязать заново.
+        Шапка обновляется, позиции сопоставляются с текущими по номеру проёма:
+        совпавшие обновляются на месте — связки проёмов замера (order_item) и
+        вложения позиций сохраняются; новые создаются, лишние удаляются.
+        Сопутствующие пересоздаются.
         """
         from django.db import transaction
         order = self.get_object()
         data = request.data.copy() if hasattr(request.data, 'copy') else dict(request.data)
         items = data.pop('items', []) or []
         addons = data.pop('addons', []) or []
+        try:
+            new_items, new_addons = kp_import.validate(items, addons, order=order)
+        except kp_import.KpImportError as exc:
+            return Response({'detail': str(exc), 'errors': exc.errors}, status=status.HTTP_400_BAD_REQUEST)
 
         with transaction.atomic():
             order.client_name = (data.get('client_name') or '').strip()[:255] or order.client_name
@@ -394,44 +433,7 @@ class OrderViewSet(viewsets.ModelViewSet):
             if data.get('comment'):
                 order.comment = data['comment']
 
-            # Позиции пересоздаём: у проёмов замера order_item обнулится (SET_NULL),
-            # сами проёмы и данные замера не трогаем.
-            order.items.all().delete()
-            order.addons.all().delete()
-
-            for idx, item in enumerate(items):
-                OrderItem.objects.create(
-                    order=order,
-                    opening_number=int(item.get('opening_number') or (idx + 1)),
-                    room_name=(item.get('room_name') or '')[:255],
-                    model_name=(item.get('model_name') or '')[:500],
-                    quantity=int(item.get('quantity') or 1),
-                    price=item.get('price') or None,
-                    amount=item.get('amount') or None,
-                    door_type=item.get('door_type') or '',
-                    opening_type=item.get('opening_type') or '',
-                    door_height=item.get('door_height') or None,
-                    door_width=item.get('door_width') or None,
-                    door_width_parts=(item.get('door_width_parts') or '')[:50],
-                    recommended_opening_height=item.get('recommended_opening_height') or None,
-                    recommended_opening_width=item.get('recommended_opening_width') or None,
-                    notes=(item.get('notes') or ''),
-                    position=idx,
-                )
-
-            for idx, addon in enumerate(addons):
-                OrderAddon.objects.create(
-                    order=order,
-                    kind=addon.get('kind') or 'extra',
-                    name=(addon.get('name') or '')[:500],
-                    quantity=addon.get('quantity') or 1,
-                    size=(addon.get('size') or '')[:100],
-                    opening_type=addon.get('opening_type') or '',
-                    price=addon.get('price') or None,
-                    amount=addon.get('amount') or None,
-                    comment=(addon.get('comment') or ''),
-                    position=idx,
-                )
+            stats = kp_import.replace(order, new_items, new_addons, kp_import.existing_items(order))
 
             order.touch_activity(ActivityKind.ITEMS_CHANGED, save=False)
             order.save()
@@ -439,6 +441,7 @@ class OrderViewSet(viewsets.ModelViewSet):
                 ActivityKind.ITEMS_CHANGED,
                 actor=request.user,
                 description=f'Заменено КП (повторная загрузка): № {order.kp_number or "—"}',
+                meta=stats,
             )
 
         serializer = OrderDetailSerializer(order, context={'request': request})
@@ -456,8 +459,6 @@ class OrderViewSet(viewsets.ModelViewSet):
         отмеченные позиции (так отсеиваются повторные услуги вроде доставки).
         """
         from django.db import transaction
-        from django.db.models import Max
-
         order = self.get_object()
         data = request.data.copy() if hasattr(request.data, 'copy') else dict(request.data)
         items = data.pop('items', []) or []
@@ -470,45 +471,18 @@ class OrderViewSet(viewsets.ModelViewSet):
             )
 
         with transaction.atomic():
-            last_opening = order.items.aggregate(v=Max('opening_number'))['v'] or 0
-            last_item_pos = order.items.aggregate(v=Max('position'))['v']
-            last_item_pos = -1 if last_item_pos is None else last_item_pos
-            last_addon_pos = order.addons.aggregate(v=Max('position'))['v']
-            last_addon_pos = -1 if last_addon_pos is None else last_addon_pos
-
-            for idx, item in enumerate(items):
-                OrderItem.objects.create(
-                    order=order,
-                    opening_number=last_opening + idx + 1,
-                    room_name=(item.get('room_name') or '')[:255],
-                    model_name=(item.get('model_name') or '')[:500],
-                    quantity=int(item.get('quantity') or 1),
-                    price=item.get('price') or None,
-                    amount=item.get('amount') or None,
-                    door_type=item.get('door_type') or '',
-                    opening_type=item.get('opening_type') or '',
-                    door_height=item.get('door_height') or None,
-                    door_width=item.get('door_width') or None,
-                    door_width_parts=(item.get('door_width_parts') or '')[:50],
-                    recommended_opening_height=item.get('recommended_opening_height') or None,
-                    recommended_opening_width=item.get('recommended_opening_width') or None,
-                    notes=(item.get('notes') or ''),
-                    position=last_item_pos + 1 + idx,
-                )
-
-            for idx, addon in enumerate(addons):
-                OrderAddon.objects.create(
-                    order=order,
-                    kind=addon.get('kind') or 'extra',
-                    name=(addon.get('name') or '')[:500],
-                    quantity=addon.get('quantity') or 1,
-                    size=(addon.get('size') or '')[:100],
-                    opening_type=addon.get('opening_type') or '',
-                    price=addon.get('price') or None,
-                    amount=addon.get('amount') or None,
-                    comment=(addon.get('comment') or ''),
-                    position=last_addon_pos + 1 + idx,
+            current_items = kp_import.existing_items(order)
+            current_addons = list(order.addons.all())
+            try:
+                new_items, new_addons = kp_import.validate(
+                    items, addons, order=order,
+                    first_opening=max((i.opening_number for i in current_items), default=0) + 1,
+                    first_position=max((i.position for i in current_items), default=-1) + 1,
+                    first_addon_position=max((a.position for a in current_addons), default=-1) + 1,
                 )
+            except kp_import.KpImportError as exc:
+                return Response({'detail': str(exc), 'errors': exc.errors}, status=status.HTTP_400_BAD_REQUEST)
+            kp_import.append(order, new_items, new_addons, current_items, current_addons)
 
             # Номера КП копим в существующем поле через запятую.
             # Поле ограничено 100 символами: если новый номер не влезает, позиции
@@ -756,8 +730,7 @@ class OrderItemViewSet(viewsets.ModelViewSet):
     http_method_names = ['get', 'patch', 'put', 'delete', 'head', 'options']
 
     def get_queryset(self):
-        accessible_orders = get_orders_queryset_for_user(self.request.user).values_list('id', flat=True)
-        qs = OrderItem.objects.filter(order_id__in=list(accessible_orders))
+        qs = OrderItem.objects.filter(order_access_q(self.request.user, 'order__'))
         order_id = self.request.query_params.get('order')
         if order_id:
             qs = qs.filter(order_id=order_id)
@@ -805,8 +778,7 @@ class OrderActionReminderViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
-        accessible_ids = list(get_orders_queryset_for_user(user).values_list('id', flat=True))
-        qs = OrderActionReminder.objects.filter(order_id__in=accessible_ids).select_related(
+        qs = OrderActionReminder.objects.filter(order_access_q(user, 'order__')).select_related(
             'order', 'created_by'
         )
         if self.request.query_params.get('mine') == 'true':
@@ -893,20 +865,23 @@ class WorkshopViewSet(viewsets.ReadOnlyModelViewSet):
     """Список Наработок — заказы менеджера со связкой ближайшее напоминание + статус + телефон."""
     permission_classes = [IsAuthenticated]
     serializer_class = WorkshopOrderSerializer
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, SearchDocumentFilter, OrderingFilter]
     filterset_fields = ['status', 'salon', 'manager']
-    # Поиск по любому из полей таблицы (как в рекламациях)
-    search_fields = [
-        'id', 'kp_number', 'client_name', 'address', 'contact_phone',
-        'comment', 'salon__name', 'manager__first_name', 'manager__last_name',
-        'manager__username', 'action_reminders__action_text',
-    ]
-    ordering_fields = ['created_at', 'last_activity_at', 'status', 'client_name', 'kp_number']
-    ordering = ['-last_activity_at']
+    # Поиск по номеру и поисковому документу заказа: КП, клиент, адрес, телефоны,
+    # комментарий, салон, менеджер
+    search_document_field = 'search_document'
+    search_id_fields = ['id']
+    ordering_fields = ['created_at', 'last_activity_at', 'activity_at', 'status', 'client_name', 'kp_number']
+    # activity_at = last_activity_at, а для заказов без активности — дата создания
+    # (NOT NULL, поэтому годится для keyset-пагинации)
+    ordering = ['-activity_at']
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         user = self.request.user
-        qs = get_orders_queryset_for_user(user)
+        qs = get_orders_queryset_for_user(user).annotate(
+            activity_at=Coalesce('last_activity_at', 'created_at'),
+        )
         # Подгружаем ближайшее активное напоминание
         qs = qs.prefetch_related(
             Prefetch(
@@ -935,24 +910,23 @@ class WorkshopViewSet(viewsets.ReadOnlyModelViewSet):
 
     def list(self, request, *args, **kwargs):
         qs = self.filter_queryset(self.get_queryset())
-        for order in qs:
+        page = self.paginate_queryset(qs)
+        orders = page if page is not None else list(qs)
+        for order in orders:
             active = getattr(order, '_active_reminders', None)
             order._next_reminder = active[0] if active else None
-        page = self.paginate_queryset(qs)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-        serializer = self.get_serializer(qs, many=True)
-        return Response(serializer.data)
+        serializer = self.get_serializer(orders, many=True)
+        if page is None:
+            return Response(serializer.data)
+        return self.get_paginated_response(serializer.data)
 
 
 # ==================== Phase 3: Замер ====================
 
 def get_measurements_queryset_for_user(user):
     """ACL для замеров — те же правила, что и для заказов."""
-    accessible_orders = get_orders_queryset_for_user(user).values_list('id', flat=True)
     return Measurement.objects.filter(
-        request__order_id__in=list(accessible_orders)
+        order_access_q(user, 'request__order__')
     ).select_related(
         'request', 'request__order', 'request__order__manager',
         'request__order__salon', 'service_manager',
@@ -997,13 +971,11 @@ class MeasurementViewSet(viewsets.ModelViewSet):
     CRUD замеров. Доступен СМ (свой город), менеджеру (свой салон), admin/leader.
     """
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, SearchDocumentFilter, OrderingFilter]
     filterset_fields = ['is_done', 'is_processed', 'is_draft', 'service_manager']
-    search_fields = [
-        'id', 'request__order__id', 'request__order__client_name',
-        'request__order__address', 'request__order__kp_number',
-        'request__contact_name', 'request__contact_phone',
-    ]
+    # Документ заказа содержит и контакт заявки на замер
+    search_document_field = 'request__order__search_document'
+    search_id_fields = ['id', 'request__order_id']
     ordering_fields = ['created_at', 'measurement_date', 'done_at']
     ordering = ['-created_at']
 
@@ -1021,17 +993,25 @@ class MeasurementViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], url_path='folder_counts')
     def folder_counts(self, request):
         """Счётчики по папкам замеров для дашборда СМ (Фаза 6)."""
-        base = get_measurements_queryset_for_user(request.user)
-        if request.query_params.get('mine') == 'true':
-            base = base.filter(service_manager=request.user)
-        result = []
-        for folder, label in MEASUREMENT_FOLDERS:
-            result.append({
-                'folder': folder,
-                'label': label,
-                'count': apply_measurement_folder(base, folder, request.user).count(),
-            })
-        return Response(result)
+        mine = request.query_params.get('mine') == 'true'
+
+        def compute():
+            base = get_measurements_queryset_for_user(request.user)
+            if mine:
+                base = base.filter(service_manager=request.user)
+            result = []
+            for folder, label in MEASUREMENT_FOLDERS:
+                result.append({
+                    'folder': folder,
+                    'label': label,
+                    'count': apply_measurement_folder(base, folder, request.user).count(),
+                })
+            return result
+
+        return Response(dashboard_cache.cached_counters(
+            dashboard_cache.MEASUREMENTS, request.user, compute,
+            scope=f'mine={mine}:{timezone.localdate().isoformat()}',
+        ))
 
     def list(self, request, *args, **kwargs):
         """
@@ -1044,39 +1024,46 @@ class MeasurementViewSet(viewsets.ModelViewSet):
         """
         qs = self.filter_queryset(self.get_queryset())
         ctx = self.get_serializer_context()
-        rows = MeasurementListSerializer(qs, many=True, context=ctx).data
+        paginator = MergedKeysetPagination()
 
+        # Заявки без замера — сверху (их нужно взять в работу), затем существующие замеры.
+        # Обе выборки листаются одним курсором; без ?cursor= / ?page_size= — целиком.
+        pending = None
         folder = request.query_params.get('folder')
         if folder in (None, '', 'unscheduled'):
-            pending = self._pending_requests(request)
-            pending_rows = PendingMeasurementRequestListSerializer(pending, many=True, context=ctx).data
-            # Заявки без замера — сверху (их нужно взять в работу), затем существующие замеры
-            rows = list(pending_rows) + list(rows)
-
-        return Response(rows)
+            # По номеру заказа (убывание), а не по дате создания заявки — иначе порядок
+            # выглядит хаотичным и не совпадает с видимыми в списке номерами
+            pending = self._pending_requests(request).order_by('-order_id', 'id')
+
+        if not paginator.is_requested(request):
+            # Весь список: замеры — в порядке OrderingFilter, в т.ч. по nullable
+            # measurement_date / done_at
+            rows = [] if pending is None else [
+                PendingMeasurementRequestListSerializer(obj, context=ctx).data for obj in pending
+            ]
+            return Response(rows + list(MeasurementListSerializer(qs, many=True, context=ctx).data))
+
+        # Постранично: keyset-курсор не строится по nullable-полям, поэтому
+        # ?ordering=measurement_date / done_at заменяется ordering вьюсета (-created_at, id)
+        streams = [] if pending is None else [(pending, ('-order_id', 'id'))]
+        streams.append((qs, paginator.get_ordering(request, qs, self)))
+        serializers = [PendingMeasurementRequestListSerializer, MeasurementListSerializer][-len(streams):]
+        page = paginator.paginate_streams(streams, request)
+        rows = [serializers[index](obj, context=ctx).data for index, obj in page]
+        return paginator.get_paginated_response(rows)
 
     def _pending_requests(self, request):
         """Заявки на замер по доступным заказам, у которых ещё нет объекта замера."""
-        accessible = get_orders_queryset_for_user(request.user).values_list('id', flat=True)
         qs = MeasurementRequest.objects.filter(
-            order_id__in=list(accessible),
+            order_access_q(request.user, 'order__'),
             order__status__in=[OrderStatus.MEASUREMENT_REQUESTED, OrderStatus.MEASUREMENT_NOT_PLANNED],
             measurement__isnull=True,
         ).select_related('order', 'order__manager', 'order__salon')
 
-        search = (request.query_params.get('search') or '').strip()
-        if search:
-            qs = qs.filter(
-                Q(order__id__icontains=search) |
-                Q(order__client_name__icontains=search) |
-                Q(order__address__icontains=search) |
-                Q(order__kp_number__icontains=search) |
-                Q(contact_name__icontains=search) |
-                Q(contact_phone__icontains=search)
-            )
-        # По номеру заказа (убывание), а не по дате создания заявки — иначе порядок
-        # выглядит хаотичным и не совпадает с видимыми в списке номерами
-        return qs.order_by('-order_id')
+        search = search_q('order__search_document', request.query_params.get('search'), ['order_id'])
+        if search is not None:
+            qs = qs.filter(search)
+        return qs
 
     def get_serializer_class(self):
         if self.action == 'list':
@@ -1251,6 +1238,8 @@ class MeasurementViewSet(viewsets.ModelViewSet):
         order.status = OrderStatus.MEASUREMENT_DONE
         order.touch_activity(ActivityKind.MEASUREMENT_DONE, save=False)
         order.save()
+        # Бланк рендерится заранее, чтобы ссылка из SMS открывалась из кэша
+        prewarm_blanks(m)
         # SMS клиенту: «Замер выполнен. Скачать {ссылка PDF}»
         mr = m.request
         phone = mr.contact_phone or order.contact_phone
@@ -1293,17 +1282,17 @@ class MeasurementViewSet(viewsets.ModelViewSet):
         order.status = OrderStatus.MEASUREMENT_PROCESSED
         order.touch_activity(ActivityKind.MEASUREMENT_PROCESSED, save=False)
         order.save()
+        prewarm_blanks(m)
         return Response(MeasurementSerializer(m, context={'request': request}).data)
 
     # ---- PDF-бланк замера (Фаза 4) ----
     @action(detail=True, methods=['get'], url_path='download_blank_pdf')
     def download_blank_pdf(self, request, pk=None):
-        """Генерирует и отдаёт PDF-бланк замера."""
-        from django.http import HttpResponse
-        from .pdf_blank import render_measurement_blank
+        """Отдаёт PDF-бланк замера (из кэша рендеров, с ETag/304)."""
+        from .pdf_cache import MEASUREMENT, blank_response
         m = self.get_object()
         try:
-            pdf = render_measurement_blank(m)
+            return blank_response(request, m, MEASUREMENT, f'measurement_{m.id}.pdf')
         except Exception as exc:
             import logging
             logging.getLogger(__name__).exception('Ошибка генерации PDF бланка замера #%s: %s', m.id, exc)
@@ -1311,16 +1300,12 @@ class MeasurementViewSet(viewsets.ModelViewSet):
                 {'detail': 'Не удалось сгенерировать PDF бланка замера.'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
-        resp = HttpResponse(pdf, content_type='application/pdf')
-        resp['Content-Disposition'] = f'inline; filename="measurement_{m.id}.pdf"'
-        return resp
 
     # ---- PDF «Рекомендации» — финальный бланк менеджера ----
     @action(detail=True, methods=['get'], url_path='download_recommendations_pdf')
     def download_recommendations_pdf(self, request, pk=None):
-        """Генерирует и отдаёт PDF «Рекомендации». Доступен после обработки замера."""
-        from django.http import HttpResponse
-        from .pdf_blank import render_recommendations_blank
+        """Отдаёт PDF «Рекомендации» (из кэша рендеров). Доступен после обработки замера."""
+        from .pdf_cache import RECOMMENDATIONS, blank_response
         m = self.get_object()
         if not m.is_processed:
             return Response(
@@ -1328,7 +1313,7 @@ class MeasurementViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
         try:
-            pdf = render_recommendations_blank(m)
+            return blank_response(request, m, RECOMMENDATIONS, f'recommendations_{m.id}.pdf')
         except Exception as exc:
             import logging
             logging.getLogger(__name__).exception('Ошибка генерации PDF рекомендаций #%s: %s', m.id, exc)
@@ -1336,9 +1321,6 @@ class MeasurementViewSet(viewsets.ModelViewSet):
                 {'detail': 'Не удалось сгенерировать PDF рекомендаций.'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
-        resp = HttpResponse(pdf, content_type='application/pdf')
-        resp['Content-Disposition'] = f'inline; filename="recommendations_{m.id}.pdf"'
-        return resp
 
     @action(detail=True, methods=['post'], url_path='upload_signature',
             parser_classes=[MultiPartParser, FormParser])
@@ -1353,6 +1335,7 @@ class MeasurementViewSet(viewsets.ModelViewSet):
             )
         m.signature_photo = file
         m.save(update_fields=['signature_photo', 'updated_at'])
+        prewarm_blanks(m)
         return Response(MeasurementSerializer(m, context={'request': request}).data)
 
 
@@ -1382,8 +1365,8 @@ class PublicMeasurementPdfView(APIView):
     authentication_classes = []
 
     def get(self, request, token):
-        from django.http import HttpResponse, Http404
-        from .pdf_blank import render_measurement_blank
+        from django.http import Http404
+        from .pdf_cache import MEASUREMENT, blank_response
         try:
             m = Measurement.objects.select_related(
                 'request__order', 'service_manager'
@@ -1391,7 +1374,7 @@ class PublicMeasurementPdfView(APIView):
         except Measurement.DoesNotExist:
             raise Http404('Замер не найден')
         try:
-            pdf = render_measurement_blank(m)
+            return blank_response(request, m, MEASUREMENT, f'measurement_{m.id}.pdf', allow_pending=True)
         except Exception as exc:
             import logging
             logging.getLogger(__name__).exception(
@@ -1401,9 +1384,6 @@ class PublicMeasurementPdfView(APIView):
                 {'detail': 'Не удалось сгенерировать PDF.'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
-        resp = HttpResponse(pdf, content_type='application/pdf')
-        resp['Content-Disposition'] = f'inline; filename="measurement_{m.id}.pdf"'
-        return resp
 
 
 class PublicRecommendationsPdfView(APIView):
@@ -1415,8 +1395,8 @@ class PublicRecommendationsPdfView(APIView):
     authentication_classes = []
 
     def get(self, request, token):
-        from django.http import HttpResponse, Http404
-        from .pdf_blank import render_recommendations_blank
+        from django.http import Http404
+        from .pdf_cache import RECOMMENDATIONS, blank_response
         try:
             m = Measurement.objects.select_related(
                 'request__order', 'service_manager'
@@ -1426,7 +1406,7 @@ class PublicRecommendationsPdfView(APIView):
         if not m.is_processed:
             raise Http404('Рекомендации ещё не сформированы')
         try:
-            pdf = render_recommendations_blank(m)
+            return blank_response(request, m, RECOMMENDATIONS, f'recommendations_{m.id}.pdf', allow_pending=True)
         except Exception as exc:
             import logging
             logging.getLogger(__name__).exception(
@@ -1436,9 +1416,6 @@ class PublicRecommendationsPdfView(APIView):
                 {'detail': 'Не удалось сгенерировать PDF.'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
-        resp = HttpResponse(pdf, content_type='application/pdf')
-        resp['Content-Disposition'] = f'inline; filename="recommendations_{m.id}.pdf"'
-        return resp
 
 
 class MeasurementOpeningViewSet(viewsets.ModelViewSet):
@@ -1447,8 +1424,9 @@ class MeasurementOpeningViewSet(viewsets.ModelViewSet):
     serializer_class = MeasurementOpeningSerializer
 
     def get_queryset(self):
-        accessible_measurements = get_measurements_queryset_for_user(self.request.user).values_list('id', flat=True)
-        qs = MeasurementOpening.objects.filter(measurement_id__in=list(accessible_measurements))
+        qs = MeasurementOpening.objects.filter(
+            order_access_q(self.request.user, 'measurement__request__order__')
+        )
         m_id = self.request.query_params.get('measurement')
         if m_id:
             qs = qs.filter(measurement_id=m_id)
@@ -1631,8 +1609,9 @@ class MeasurementAttachmentViewSet(viewsets.ModelViewSet):
     parser_classes = [MultiPartParser, FormParser, JSONParser]
 
     def get_queryset(self):
-        accessible_measurements = get_measurements_queryset_for_user(self.request.user).values_list('id', flat=True)
-        return MeasurementAttachment.objects.filter(measurement_id__in=list(accessible_measurements))
+        return MeasurementAttachment.objects.filter(
+            order_access_q(self.request.user, 'measurement__request__order__')
+        )
 
     def get_serializer_context(self):
         ctx = super().get_serializer_context()
@@ -1648,10 +1627,9 @@ class OrderAttachmentViewSet(viewsets.ModelViewSet):
     http_method_names = ['get', 'post', 'delete', 'head', 'options']
 
     def get_queryset(self):
-        accessible_orders = get_orders_queryset_for_user(self.request.user).values_list('id', flat=True)
+        user = self.request.user
         qs = OrderAttachment.objects.filter(
-            Q(order_id__in=list(accessible_orders))
-            | Q(order_item__order_id__in=list(accessible_orders))
+            order_access_q(user, 'order__') | order_access_q(user, 'order_item__order__')
         )
         order_id = self.request.query_params.get('order')
         if order_id:
@@ -0,0 +1,254 @@
+"""
+Импорт распарсенного КП в заказ — общий код create_from_parsed /
+replace_from_parsed / append_from_parsed (OrderViewSet).
+
+Раньше каждая позиция и сопутствующая создавалась отдельным objects.create():
+parse_kp_pdf раскрывает количество в строку на дверь, и большой КП давал
+сотни INSERT, а ошибка в середине списка (нечисловая цена) роняла запрос
+после части записей. Теперь:
+
+- все строки проверяются заранее (build_items / build_addons) — при ошибке
+  KpImportError с перечнем строк и полей, в БД ничего не пишется;
+- позиции и сопутствующие пишутся bulk_create, вызывающий оборачивает импорт
+  в один transaction.atomic();
+- при замене КП позиции сопоставляются с существующими по номеру проёма и
+  обновляются на месте (bulk_update), поэтому связки проёмов замера
+  (MeasurementOpening.order_item) и вложения позиций сохраняются; удаляются
+  только позиции, которых в новом КП нет;
+- prime_detail_cache() раскладывает записанные позиции и сопутствующие в кэш
+  prefetch заказа — OrderDetailSerializer отдаёт ответ без повторной выборки.
+"""
+from decimal import Decimal, InvalidOperation
+
+from .models import AddonKind, DoorType, OpeningType, OrderAddon, OrderItem
+
+# PositiveSmallIntegerField
+SMALL_INT_MAX = 32767
+# PositiveIntegerField
+INT_MAX = 2147483647
+
+ITEM_UPDATE_FIELDS = [
+    'room_name', 'model_name', 'quantity', 'price', 'amount', 'door_type',
+    'opening_type', 'door_height', 'door_width', 'door_width_parts',
+    'recommended_opening_height', 'recommended_opening_width', 'notes', 'position',
+]
+
+
+class KpImportError(ValueError):
+    """Строки КП не прошли проверку: errors = {'items'|'addons': {номер строки: {поле: текст}}}"""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__('Позиции КП содержат ошибки')
+
+
+class _Row:
+    """Проверка полей одной строки КП с накоплением ошибок"""
+
+    def __init__(self, data):
+        self.data = data if isinstance(data, dict) else {}
+        self.errors = {}
+
+    def text(self, name, max_length=None):
+        value = str(self.data.get(name) or '')
+        return value[:max_length] if max_length else value
+
+    def integer(self, name, default=None, maximum=INT_MAX, minimum=0):
+        value = self.data.get(name)
+        if value in (None, ''):
+            return default
+        try:
+            number = int(value)
+        except (TypeError, ValueError):
+            self.errors[name] = 'Ожидается целое число'
+            return None
+        if not minimum <= number <= maximum:
+            self.errors[name] = f'Допустимо от {minimum} до {maximum}'
+            return None
+        return number
+
+    def decimal(self, name, default=None, max_digits=12, decimal_places=2):
+        value = self.data.get(name)
+        if value in (None, ''):
+            return default
+        try:
+            number = Decimal(str(value).replace(',', '.').replace(' ', ''))
+        except InvalidOperation:
+            self.errors[name] = 'Ожидается число'
+            return None
+        if not number.is_finite() or abs(number) >= Decimal(10) ** (max_digits - decimal_places):
+            self.errors[name] = 'Слишком большое число'
+            return None
+        return number.quantize(Decimal(1).scaleb(-decimal_places))
+
+    def choice(self, name, choices, default=''):
+        value = self.data.get(name) or default
+        if value and value not in choices.values:
+            self.errors[name] = f'Недопустимое значение «{value}»'
+            return default
+        return value
+
+
+def build_items(order, rows, first_opening=None, first_position=0):
+    """
+    Несохранённые OrderItem из строк КП и ошибки по строкам.
+    first_opening — нумерация проёмов подряд с этого номера (дозагрузка КП),
+    иначе номер из строки (по умолчанию — порядковый).
+    """
+    items, errors = [], {}
+    for idx, data in enumerate(rows):
+        row = _Row(data)
+        if first_opening is not None:
+            opening_number = first_opening + idx
+        else:
+            opening_number = row.integer('opening_number', maximum=SMALL_INT_MAX, minimum=1) or (idx + 1)
+        items.append(OrderItem(
+            order=order,
+            opening_number=opening_number,
+            room_name=row.text('room_name', 255),
+            model_name=row.text('model_name', 500),
+            quantity=row.integer('quantity', maximum=SMALL_INT_MAX) or 1,
+            price=row.decimal('price'),
+            amount=row.decimal('amount'),
+            door_type=row.choice('door_type', DoorType),
+            opening_type=row.choice('opening_type', OpeningType),
+            door_height=row.integer('door_height') or None,
+            door_width=row.integer('door_width') or None,
+            door_width_parts=row.text('door_width_parts', 50),
+            recommended_opening_height=row.integer('recommended_opening_height') or None,
+            recommended_opening_width=row.integer('recommended_opening_width') or None,
+            notes=row.text('notes'),
+            position=first_position + idx,
+        ))
+        if row.errors:
+            errors[idx] = row.errors
+    return items, errors
+
+
+def build_addons(order, rows, first_position=0):
+    """Несохранённые OrderAddon из строк КП и ошибки по строкам"""
+    addons, errors = [], {}
+    for idx, data in enumerate(rows):
+        row = _Row(data)
+        addons.append(OrderAddon(
+            order=order,
+            kind=row.choice('kind', AddonKind, default=AddonKind.EXTRA),
+            name=row.text('name', 500),
+            quantity=row.decimal('quantity', max_digits=10) or 1,
+            size=row.text('size', 100),
+            opening_type=row.choice('opening_type', OpeningType),
+            price=row.decimal('price'),
+            amount=row.decimal('amount'),
+            comment=row.text('comment'),
+            position=first_position + idx,
+        ))
+        if row.errors:
+            errors[idx] = row.errors
+    return addons, errors
+
+
+def validate(items_rows, addons_rows, order=None, first_opening=None, first_position=0, first_addon_position=0):
+    """Строит позиции и сопутствующие; при ошибках — KpImportError до любой записи в БД"""
+    items, item_errors = build_items(order, items_rows, first_opening, first_position)
+    addons, addon_errors = build_addons(order, addons_rows, first_addon_position)
+    errors = {}
+    if item_errors:
+        errors['items'] = item_errors
+    if addon_errors:
+        errors['addons'] = addon_errors
+    if errors:
+        raise KpImportError(errors)
+    return items, addons
+
+
+def existing_items(order):
+    """
+    Позиции заказа с вложениями и последним проёмом замера (как в карточке заказа) —
+    одной выборкой с prefetch; нужны и для сопоставления, и для ответа.
+    """
+    from .api_views import latest_measurement_openings_prefetch
+
+    return list(
+        OrderItem.objects.filter(order=order).prefetch_related(
+            'attachments', latest_measurement_openings_prefetch('measurement_openings'),
+        )
+    )
+
+
+def _cached(queryset, objects):
+    """QuerySet с уже заполненным результатом — как его кладёт prefetch_related"""
+    queryset._result_cache = list(objects)
+    queryset._prefetch_done = True
+    return queryset
+
+
+def _mark_new(items):
+    """Свежесозданным позициям — пустые вложения и замер без запросов при сериализации"""
+    for item in items:
+        item._prefetched_objects_cache = {'attachments': _cached(item.attachments.all(), [])}
+        item.latest_measurement_openings = []
+
+
+def prime_detail_cache(order, items, addons):
+    """Кладёт позиции и сопутствующие в кэш prefetch заказа (порядок — как в Meta.ordering)"""
+    cache = order.__dict__.setdefault('_prefetched_objects_cache', {})
+    cache['items'] = _cached(
+        OrderItem.objects.filter(order=order), sorted(items, key=lambda i: (i.position, i.opening_number)),
+    )
+    cache['addons'] = _cached(
+        OrderAddon.objects.filter(order=order), sorted(addons, key=lambda a: (a.position, a.pk)),
+    )
+
+
+def create(order, items, addons):
+    """Пишет позиции и сопутствующие нового заказа (строки проверены validate() до его создания)"""
+    for obj in items + addons:
+        obj.order = order
+    OrderItem.objects.bulk_create(items)
+    OrderAddon.objects.bulk_create(addons)
+    _mark_new(items)
+    prime_detail_cache(order, items, addons)
+
+
+def replace(order, items, addons, current_items):
+    """
+    Заменяет позиции заказа позициями нового КП. Позиция с тем же номером проёма
+    обновляется на месте (её id, связки замера и вложения сохраняются), новые
+    создаются, отсутствующие в новом КП удаляются. Сопутствующие пересоздаются.
+    Возвращает счётчики {'kept', 'created', 'removed'}.
+    """
+    by_number = {}
+    for item in sorted(current_items, key=lambda i: (i.position, i.pk)):
+        by_number.setdefault(item.opening_number, []).append(item)
+
+    kept, created = [], []
+    for new in items:
+        candidates = by_number.get(new.opening_number)
+        if candidates:
+            current = candidates.pop(0)
+            for field in ITEM_UPDATE_FIELDS:
+                setattr(current, field, getattr(new, field))
+            kept.append(current)
+        else:
+            created.append(new)
+    removed = [item.pk for rest in by_number.values() for item in rest]
+
+    if removed:
+        OrderItem.objects.filter(pk__in=removed).delete()
+    if kept:
+        OrderItem.objects.bulk_update(kept, ITEM_UPDATE_FIELDS)
+    OrderItem.objects.bulk_create(created)
+    _mark_new(created)
+
+    order.addons.all().delete()
+    OrderAddon.objects.bulk_create(addons)
+    prime_detail_cache(order, kept + created, addons)
+    return {'kept': len(kept), 'created': len(created), 'removed': len(removed)}
+
+
+def append(order, items, addons, current_items, current_addons):
+    """Дописывает позиции и сопутствующие ещё одного КП к существующим"""
+    OrderItem.objects.bulk_create(items)
+    OrderAddon.objects.bulk_create(addons)
+    _mark_new(items)
+    prime_detail_cache(order, current_items + items, current_addons + addons)
@@ -0,0 +1,134 @@
+"""
+Бенчмарк ACL замеров: время выборки страницы замеров и проёмов одного замера
+для СМ по мере роста числа заказов.
+
+Сравнивает текущий фильтр (order_access_q — условие по JOIN в том же запросе)
+с прежней схемой: list(id доступных заказов) в Python и обратно в IN (...).
+Данные создаются bulk_create внутри транзакции и откатываются в конце —
+запускать на копии БД (по умолчанию рассчитан на PostgreSQL).
+
+Запуск: `python manage.py bench_measurement_acl --sizes 1000,10000,100000,500000`
+"""
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from orders.api_views import get_orders_queryset_for_user, order_access_q
+from orders.models import Measurement, MeasurementOpening, MeasurementRequest, Order, Salon
+from users.models import City, User
+
+PAGE_SIZE = 50
+BATCH_SIZE = 5000
+# Каждый MEASUREMENT_EVERY-й заказ получает заявку, замер и два проёма
+MEASUREMENT_EVERY = 10
+
+
+def _legacy_measurements(user):
+    accessible = get_orders_queryset_for_user(user).values_list('id', flat=True)
+    return Measurement.objects.filter(request__order_id__in=list(accessible))
+
+
+def _legacy_openings(user, measurement_id):
+    accessible = _legacy_measurements(user).values_list('id', flat=True)
+    return MeasurementOpening.objects.filter(measurement_id__in=list(accessible), measurement_id=measurement_id)
+
+
+def _current_measurements(user):
+    # Та же ACL, что в get_measurements_queryset_for_user, без select/prefetch —
+    # они одинаковы для обеих схем и на сравнение не влияют
+    return Measurement.objects.filter(order_access_q(user, 'request__order__'))
+
+
+def _current_openings(user, measurement_id):
+    return MeasurementOpening.objects.filter(
+        order_access_q(user, 'measurement__request__order__'), measurement_id=measurement_id,
+    )
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Замеряет время ACL-выборок замеров при росте числа заказов (данные откатываются)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            default='1000,10000,100000,500000',
+            help='Число заказов на каждом шаге, через запятую (по возрастанию)',
+        )
+        parser.add_argument('--repeat', type=int, default=7, help='Повторов на замер (берётся медиана)')
+        parser.add_argument('--no-legacy', action='store_true', help='Не замерять прежнюю схему со списком id')
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['sizes'].split(',') if size.strip())
+        try:
+            with transaction.atomic():
+                self._run(sizes, options['repeat'], not options['no_legacy'])
+                raise Rollback
+        except Rollback:
+            self.stdout.write('Тестовые данные откатены.')
+
+    def _run(self, sizes, repeat, with_legacy):
+        city = City.objects.create(name='bench-город')
+        other_city = City.objects.create(name='bench-другой')
+        salons = [
+            Salon.objects.create(name='bench-салон', city=city),
+            Salon.objects.create(name='bench-салон-2', city=other_city),
+        ]
+        manager = User.objects.create_user(username='bench-mgr', password=None, role='manager')
+        sm = User.objects.create_user(username='bench-sm', password=None, role='service_manager', city=city)
+
+        self.stdout.write(f'{"заказов":>10} | {"схема":>8} | {"страница замеров, мс":>21} | {"проёмы замера, мс":>18}')
+        created = 0
+        for size in sizes:
+            self._grow(created, size, salons, manager, sm)
+            created = size
+            sample = Measurement.objects.filter(request__order__salon=salons[0]).order_by('-id').first()
+            cases = [('join', lambda: _current_measurements(sm),
+                      lambda: _current_openings(sm, sample.id))]
+            if with_legacy:
+                cases.append(('id-list', lambda: _legacy_measurements(sm),
+                              lambda: _legacy_openings(sm, sample.id)))
+            for label, measurements, openings in cases:
+                try:
+                    page_ms = self._timeit(lambda: list(measurements().order_by('-created_at', 'id')[:PAGE_SIZE]), repeat)
+                    openings_ms = self._timeit(lambda: list(openings()), repeat)
+                except Exception as e:
+                    # Напр., SQLite не принимает IN (...) на сотни тысяч параметров
+                    self.stdout.write(f'{size:>10} | {label:>8} | ошибка: {type(e).__name__}: {e}')
+                    continue
+                self.stdout.write(f'{size:>10} | {label:>8} | {page_ms:>21.2f} | {openings_ms:>18.2f}')
+
+    @staticmethod
+    def _timeit(func, repeat):
+        func()  # прогрев
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    @staticmethod
+    def _grow(start, stop, salons, manager, sm):
+        for offset in range(start, stop, BATCH_SIZE):
+            count = min(BATCH_SIZE, stop - offset)
+            orders = Order.objects.bulk_create([
+                Order(manager=manager, salon=salons[(offset + i) // MEASUREMENT_EVERY % 2], client_name=f'bench-{offset + i}')
+                for i in range(count)
+            ])
+            requests = MeasurementRequest.objects.bulk_create([
+                MeasurementRequest(order=order, contact_name='bench', contact_phone='+70000000000')
+                for index, order in enumerate(orders) if (offset + index) % MEASUREMENT_EVERY == 0
+            ])
+            measurements = Measurement.objects.bulk_create([
+                Measurement(request=mr, service_manager=sm) for mr in requests
+            ])
+            MeasurementOpening.objects.bulk_create([
+                MeasurementOpening(measurement=m, opening_number=number)
+                for m in measurements for number in (1, 2)
+            ])
@@ -0,0 +1,116 @@
+"""
+Бенчмарк кронов просрочек замеров (orders/overdue.py): время прогона
+mark_not_planned / mark_not_done / mark_not_processed на базе из N заказов.
+
+Заказы распределяются по статусам воронки замера; доля --overdue-percent
+из них просрочена (заявка/выполнение давно, дата замера в прошлом). Замеряются
+два прогона: первый переводит просроченные заказы, второй — «холостой»
+(как ежечасный крон, когда новых просрочек нет). Данные создаются bulk_create
+внутри транзакции и откатываются в конце — запускать на копии БД.
+
+Запуск: `python manage.py bench_measurement_crons --orders 100000`
+"""
+import datetime
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from orders.models import Measurement, MeasurementRequest, Order, OrderStatus, Salon
+from orders.overdue import mark_not_done, mark_not_planned, mark_not_processed
+from users.models import City, User
+
+BATCH_SIZE = 5000
+STATUSES = [
+    OrderStatus.MEASUREMENT_REQUESTED,
+    OrderStatus.MEASUREMENT_SCHEDULED,
+    OrderStatus.MEASUREMENT_DONE,
+    OrderStatus.DRAFT,
+]
+RULES = [
+    ('not_planned', mark_not_planned),
+    ('not_done', mark_not_done),
+    ('not_processed', mark_not_processed),
+]
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Замеряет время кронов просрочек замеров на N заказах (данные откатываются)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=100000, help='Число заказов')
+        parser.add_argument('--overdue-percent', type=float, default=1.0, help='Доля просроченных, %%')
+        parser.add_argument('--service-managers', type=int, default=20, help='Число СМ (получателей push)')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options['orders'], options['overdue_percent'], options['service_managers'])
+                raise Rollback
+        except Rollback:
+            self.stdout.write('Тестовые данные откатены.')
+
+    def _run(self, total, overdue_percent, sm_count):
+        city = City.objects.create(name='bench-город')
+        salon = Salon.objects.create(name='bench-салон', city=city)
+        manager = User.objects.create_user(username='bench-mgr', password=None, role='manager')
+        sms = [
+            User.objects.create_user(username=f'bench-sm-{i}', password=None, role='service_manager', city=city)
+            for i in range(sm_count)
+        ]
+        overdue_every = max(1, round(100 / overdue_percent)) if overdue_percent > 0 else 0
+
+        started = time.perf_counter()
+        self._seed(total, overdue_every, salon, manager, sms)
+        self.stdout.write(f'Создано заказов: {total} за {time.perf_counter() - started:.1f} с')
+
+        self.stdout.write(f'{"правило":>14} | {"прогон":>7} | {"переведено":>10} | {"push":>6} | {"мс":>9}')
+        for run in ('первый', 'холостой'):
+            for label, rule in RULES:
+                started = time.perf_counter()
+                batch = rule()
+                elapsed = (time.perf_counter() - started) * 1000
+                self.stdout.write(
+                    f'{label:>14} | {run:>7} | {batch.total:>10} | {batch.notified:>6} | {elapsed:>9.1f}'
+                )
+
+    @staticmethod
+    def _seed(total, overdue_every, salon, manager, sms):
+        now = timezone.now()
+        old = now - datetime.timedelta(days=14)
+        for offset in range(0, total, BATCH_SIZE):
+            count = min(BATCH_SIZE, total - offset)
+            numbers = range(offset, offset + count)
+            orders = Order.objects.bulk_create([
+                Order(manager=manager, salon=salon, client_name=f'bench-{n}', status=STATUSES[n % len(STATUSES)])
+                for n in numbers
+            ])
+            pairs = [(n, order) for n, order in zip(numbers, orders) if order.status != OrderStatus.DRAFT]
+            requests = MeasurementRequest.objects.bulk_create([
+                MeasurementRequest(order=order, contact_name='bench', contact_phone='+70000000000')
+                for _, order in pairs
+            ])
+            overdue_ids = []
+            measurements = []
+            for (n, _), mr in zip(pairs, requests):
+                overdue = bool(overdue_every) and n // len(STATUSES) % overdue_every == 0
+                if overdue:
+                    overdue_ids.append(mr.id)
+                status = mr.order.status
+                if status == OrderStatus.MEASUREMENT_SCHEDULED:
+                    measurements.append(Measurement(
+                        request=mr, service_manager=sms[n // len(STATUSES) % len(sms)],
+                        measurement_date=old if overdue else now + datetime.timedelta(days=3),
+                    ))
+                elif status == OrderStatus.MEASUREMENT_DONE:
+                    measurements.append(Measurement(
+                        request=mr, service_manager=sms[n // len(STATUSES) % len(sms)],
+                        measurement_date=old, is_done=True, done_at=old if overdue else now,
+                    ))
+            Measurement.objects.bulk_create(measurements)
+            MeasurementRequest.objects.filter(pk__in=overdue_ids).update(created_at=old)
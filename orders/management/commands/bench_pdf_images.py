@@ -0,0 +1,117 @@
+"""
+Бенчмарк фото в PDF-бланке: размер PDF и время рендера с оригиналами фото
+и с уменьшенными копиями «под печать» (orders.pdf_images).
+
+- `python manage.py bench_pdf_images --measurement 123` — реальный бланк замера;
+- `python manage.py bench_pdf_images --photos 6` — синтетические фото с телефона
+  (4032×3024 JPEG) на отдельных страницах, как фото-схемы в бланке.
+
+Копии создаются во временном каталоге; «с копиями, холодный» включает их
+создание, «тёплый» — повторный рендер из кэша копий.
+"""
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from orders.pdf_images import print_image_path
+
+PHOTO_SIZE = (4032, 3024)
+
+
+def _synthetic_photo(path, seed):
+    """Фото «с телефона»: шум поверх градиента — сжимается как реальный снимок"""
+    from PIL import Image
+
+    width, height = PHOTO_SIZE
+    noise = Image.effect_noise((width, height), 64 + seed).convert('RGB')
+    gradient = Image.linear_gradient('L').resize((width, height)).convert('RGB')
+    Image.blend(noise, gradient, 0.5).save(path, 'JPEG', quality=92)
+
+
+def _photos_html(paths):
+    pages = ''.join(
+        f'<div style="page-break-before: always">'
+        f'<img style="display:block;width:100%;max-height:258mm;object-fit:contain" src="file://{path}">'
+        f'</div>'
+        for path in paths
+    )
+    return f'<html><head><style>@page {{ size: A4; margin: 12mm; }}</style></head><body>{pages}</body></html>'
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает размер и время рендера PDF-бланка с оригиналами фото и с копиями «под печать»'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--measurement', type=int, help='id замера для рендера реального бланка')
+        parser.add_argument('--photos', type=int, default=6, help='Число синтетических фото (без --measurement)')
+        parser.add_argument('--repeat', type=int, default=3, help='Повторов рендера (берётся медиана)')
+
+    def handle(self, *args, **options):
+        workdir = tempfile.mkdtemp(prefix='bench_pdf_images_')
+        try:
+            with override_settings(PDF_CACHE_DIR=workdir):
+                if options['measurement']:
+                    self._bench_measurement(options['measurement'], options['repeat'])
+                else:
+                    self._bench_synthetic(workdir, options['photos'], options['repeat'])
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def _report(self, label, pdf, timings):
+        self.stdout.write(
+            f'{label:<26} | {len(pdf) / 1024 / 1024:>8.2f} МБ | {statistics.median(timings):>8.2f} с'
+        )
+
+    def _measure(self, render, repeat):
+        timings, pdf = [], b''
+        for _ in range(repeat):
+            started = time.perf_counter()
+            pdf = render()
+            timings.append(time.perf_counter() - started)
+        return pdf, timings
+
+    def _bench_measurement(self, measurement_id, repeat):
+        from orders.models import Measurement
+        from orders.pdf_blank import render_measurement_blank
+
+        try:
+            measurement = Measurement.objects.select_related(
+                'request__order', 'service_manager'
+            ).get(pk=measurement_id)
+        except Measurement.DoesNotExist:
+            raise CommandError(f'Замер #{measurement_id} не найден')
+
+        self.stdout.write(f'{"вариант":<26} | {"PDF":>11} | {"рендер":>10}')
+        pdf, timings = self._measure(lambda: render_measurement_blank(measurement, print_images=False), repeat)
+        self._report('оригиналы', pdf, timings)
+        pdf, timings = self._measure(lambda: render_measurement_blank(measurement), 1)
+        self._report('с копиями, холодный', pdf, timings)
+        pdf, timings = self._measure(lambda: render_measurement_blank(measurement), repeat)
+        self._report('с копиями, тёплый', pdf, timings)
+
+    def _bench_synthetic(self, workdir, count, repeat):
+        from weasyprint import HTML
+
+        originals = []
+        for index in range(count):
+            path = os.path.join(workdir, f'photo_{index}.jpg')
+            _synthetic_photo(path, index)
+            originals.append(path)
+        source_mb = sum(os.path.getsize(path) for path in originals) / 1024 / 1024
+        self.stdout.write(f'Фото: {count} × {PHOTO_SIZE[0]}×{PHOTO_SIZE[1]}, всего {source_mb:.1f} МБ')
+
+        def render(paths):
+            return HTML(string=_photos_html(paths), base_url=workdir).write_pdf()
+
+        self.stdout.write(f'{"вариант":<26} | {"PDF":>11} | {"рендер":>10}')
+        pdf, timings = self._measure(lambda: render(originals), repeat)
+        self._report('оригиналы', pdf, timings)
+        pdf, timings = self._measure(lambda: render([print_image_path(path) for path in originals]), 1)
+        self._report('с копиями, холодный', pdf, timings)
+        pdf, timings = self._measure(lambda: render([print_image_path(path) for path in originals]), repeat)
+        self._report('с копиями, тёплый', pdf, timings)
@@ -0,0 +1,126 @@
+"""
+Бенчмарк извлечения страниц в парсерах PDF: прежняя схема (extract_text по
+странице до трёх раз + extract_tables) против однопроходного extract_pages()
+из marketingdoors.pdf_pages, плюс время полного разбора КП / рекламации.
+
+    python manage.py bench_pdf_parsers /path/to/kp_corpus [файл.pdf ...]
+
+Каталоги обходятся рекурсивно (*.pdf). Для каждого варианта берётся медиана
+из --repeat повторов и пик памяти (tracemalloc); в конце — сумма по корпусу.
+
+pdfplumber ≥ 0.11 кэширует текстовую раскладку страницы, поэтому повторные
+extract_text() по времени почти бесплатны — выигрыш однопроходной схемы в
+основном в пике памяти: прежняя держала кэши всех страниц до закрытия файла.
+"""
+import os
+import statistics
+import time
+import tracemalloc
+
+import pdfplumber
+from django.core.management.base import BaseCommand, CommandError
+
+from marketingdoors.pdf_pages import extract_pages
+
+
+def _legacy_extract(path):
+    """Схема до однопроходного слоя: projects.parse_complaint_pdf + _extract_defective_products"""
+    with pdfplumber.open(path) as pdf:
+        full_text = ''
+        for page in pdf.pages:
+            page_text = page.extract_text()
+            if page_text:
+                full_text += page_text + '\n'
+        pages = list(pdf.pages)
+        for page_idx, page in enumerate(pages):
+            page.extract_tables()
+            if page_idx + 1 < len(pages):
+                pages[page_idx + 1].extract_text()
+            page.extract_text()
+    return full_text
+
+
+def _single_pass_extract(path):
+    return extract_pages(path, tables=True)
+
+
+def _collect(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _dirs, names in os.walk(path):
+                files.extend(os.path.join(root, name) for name in sorted(names) if name.lower().endswith('.pdf'))
+        elif os.path.isfile(path):
+            files.append(path)
+        else:
+            raise CommandError(f'Не найден путь: {path}')
+    return files
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает прежнее и однопроходное извлечение страниц PDF на корпусе КП'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='PDF-файлы или каталоги с КП')
+        parser.add_argument('--repeat', type=int, default=3, help='Повторов на файл (берётся медиана)')
+        parser.add_argument('--parser', choices=['kp', 'complaint'], default='kp',
+                            help='Чей полный разбор замерять: parse_kp_pdf или parse_complaint_pdf')
+
+    def _median(self, func, path, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func(path)
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings)
+
+    def _peak_mb(self, func, path):
+        tracemalloc.start()
+        try:
+            func(path)
+            return tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        finally:
+            tracemalloc.stop()
+
+    def handle(self, *args, **options):
+        if options['parser'] == 'kp':
+            from orders.pdf_parser import parse_kp_pdf as parse
+        else:
+            from projects.pdf_parser import parse_complaint_pdf as parse
+
+        files = _collect(options['paths'])
+        if not files:
+            raise CommandError('В указанных путях нет PDF-файлов')
+        repeat = max(1, options['repeat'])
+
+        self.stdout.write(
+            f'{"файл":<32} | {"стр.":>4} | {"прежнее, с":>10} | {"1 проход, с":>11} | '
+            f'{"прежнее, МБ":>11} | {"1 проход, МБ":>12} | {"разбор, с":>9}'
+        )
+        totals = [0.0, 0.0, 0.0]
+        peaks = [0.0, 0.0]
+        for path in files:
+            with pdfplumber.open(path) as pdf:
+                page_count = len(pdf.pages)
+            legacy = self._median(_legacy_extract, path, repeat)
+            single = self._median(_single_pass_extract, path, repeat)
+            try:
+                full = self._median(parse, path, repeat)
+            except ValueError:
+                full = float('nan')
+            legacy_mb = self._peak_mb(_legacy_extract, path)
+            single_mb = self._peak_mb(_single_pass_extract, path)
+            peaks[0] = max(peaks[0], legacy_mb)
+            peaks[1] = max(peaks[1], single_mb)
+            totals[0] += legacy
+            totals[1] += single
+            totals[2] += 0 if full != full else full
+            name = os.path.basename(path)[-32:]
+            self.stdout.write(
+                f'{name:<32} | {page_count:>4} | {legacy:>10.3f} | {single:>11.3f} | '
+                f'{legacy_mb:>11.1f} | {single_mb:>12.1f} | {full:>9.3f}'
+            )
+        self.stdout.write(
+            f'{"ИТОГО / макс. (" + str(len(files)) + ")":<32} | {"":>4} | {totals[0]:>10.3f} | {totals[1]:>11.3f} | '
+            f'{peaks[0]:>11.1f} | {peaks[1]:>12.1f} | {totals[2]:>9.3f}'
+        )
@@ -8,7 +8,7 @@ Cron-команда: проверяет наступившие сроки нап
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from orders.models import OrderActionReminder
-from users.push_utils import send_push_notification
+from users.notification_outbox import enqueue_push
 
 
 class Command(BaseCommand):
@@ -28,7 +28,7 @@ class Command(BaseCommand):
             if not recipient:
                 continue
             try:
-                send_push_notification(
+                enqueue_push(
                     user=recipient,
                     title=f'Напоминание по заказу #{reminder.order_id}',
                     body=reminder.action_text,
@@ -41,4 +41,4 @@ class Command(BaseCommand):
             reminder.save(update_fields=['notified'])
             sent += 1
 
-        self.stdout.write(self.style.SUCCESS(f'Обработано: {due.count()}, отправлено push: {sent}'))
+        self.stdout.write(self.style.SUCCESS(f'Обработано: {due.count()}, поставлено push в очередь: {sent}'))
@@ -4,48 +4,25 @@ Cron: дата назначенного замера прошла, но заме
 
 Запуск: `python manage.py check_measurement_not_done`
 Рекомендуется через crontab раз в час.
+Отбор и смена статусов — пакетно, см. orders/overdue.py.
 """
 from django.core.management.base import BaseCommand
-from django.utils import timezone
 
-from orders.models import OrderStatus, Measurement
-from users.push_utils import send_push_notification
+from orders.overdue import mark_not_done
 
 
 class Command(BaseCommand):
     help = 'Помечает просроченные назначенные замеры как «Замер не выполнен» и шлёт push СМ'
 
-    def handle(self, *args, **options):
-        now = timezone.now()
-        measurements = Measurement.objects.filter(
-            is_done=False,
-            measurement_date__lt=now,
-            request__order__status=OrderStatus.MEASUREMENT_SCHEDULED,
-        ).select_related('request__order', 'service_manager')
-
-        flagged = 0
-        for m in measurements:
-            order = m.request.order
-            order.change_status(
-                OrderStatus.MEASUREMENT_NOT_DONE,
-                actor=None,
-                description='Авто: замер не выполнен (дата назначения прошла)',
-                notify=False,
-            )
-            recipient = m.service_manager
-            if recipient:
-                try:
-                    send_push_notification(
-                        user=recipient,
-                        title=f'Замер не выполнен — заказ #{order.id}',
-                        body=f'{order.client_name}: дата замера прошла',
-                        url=f'/orders/{order.id}',
-                        data={'orderId': order.id, 'measurementId': m.id},
-                    )
-                except Exception as exc:  # noqa: BLE001
-                    self.stderr.write(f'measurement #{m.id}: {exc}')
-            flagged += 1
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--no-notify',
+            action='store_true',
+            help='Только сменить статусы, уведомления не ставить в очередь',
+        )
 
+    def handle(self, *args, **options):
+        batch = mark_not_done(notify=not options['no_notify'])
         self.stdout.write(self.style.SUCCESS(
-            f'Проверено замеров: {measurements.count()}, помечено просроченных: {flagged}'
+            f'Помечено просроченных замеров: {batch.total}, push в очереди: {batch.notified}'
         ))
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0016_measurementopening_recommended_door_width_parts_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='measurementattachment',
+            name='checksum',
+            field=models.CharField(blank=True, editable=False, max_length=64, verbose_name='SHA-256'),
+        ),
+        migrations.AddField(
+            model_name='measurementattachment',
+            name='content_type',
+            field=models.CharField(blank=True, editable=False, max_length=100, verbose_name='MIME-тип'),
+        ),
+        migrations.AddField(
+            model_name='measurementattachment',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Высота, px'),
+        ),
+        migrations.AddField(
+            model_name='measurementattachment',
+            name='size',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True, verbose_name='Размер, байт'),
+        ),
+        migrations.AddField(
+            model_name='measurementattachment',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Ширина, px'),
+        ),
+        migrations.AddField(
+            model_name='orderattachment',
+            name='checksum',
+            field=models.CharField(blank=True, editable=False, max_length=64, verbose_name='SHA-256'),
+        ),
+        migrations.AddField(
+            model_name='orderattachment',
+            name='content_type',
+            field=models.CharField(blank=True, editable=False, max_length=100, verbose_name='MIME-тип'),
+        ),
+        migrations.AddField(
+            model_name='orderattachment',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Высота, px'),
+        ),
+        migrations.AddField(
+            model_name='orderattachment',
+            name='size',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True, verbose_name='Размер, байт'),
+        ),
+        migrations.AddField(
+            model_name='orderattachment',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Ширина, px'),
+        ),
+    ]
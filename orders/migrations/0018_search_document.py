@@ -0,0 +1,49 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:15
+
+from django.db import migrations, models
+
+from marketingdoors.search import create_trigram_index, drop_trigram_index, order_document
+
+INDEX_NAME = 'orders_order_search_trgm'
+
+
+def backfill_search_documents(apps, schema_editor):
+    Order = apps.get_model('orders', 'Order')
+    MeasurementRequest = apps.get_model('orders', 'MeasurementRequest')
+    requests = {request.order_id: request for request in MeasurementRequest.objects.only(
+        'order_id', 'contact_name', 'contact_phone',
+    )}
+    batch = []
+    for order in Order.objects.select_related('manager', 'salon').iterator(chunk_size=500):
+        order.search_document = order_document(order, order.manager, order.salon, requests.get(order.id))
+        batch.append(order)
+        if len(batch) >= 500:
+            Order.objects.bulk_update(batch, ['search_document'])
+            batch = []
+    Order.objects.bulk_update(batch, ['search_document'])
+
+
+def create_index(apps, schema_editor):
+    create_trigram_index(schema_editor, 'orders_order', INDEX_NAME)
+
+
+def drop_index(apps, schema_editor):
+    drop_trigram_index(schema_editor, INDEX_NAME)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0017_attachment_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Поисковый документ'),
+        ),
+        migrations.RunPython(backfill_search_documents, migrations.RunPython.noop),
+        # GIN-индекс pg_trgm — только на PostgreSQL; на SQLite поиск тем же LIKE без индекса
+        migrations.RunPython(create_index, drop_index),
+    ]
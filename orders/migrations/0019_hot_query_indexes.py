@@ -0,0 +1,52 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:21
+
+import django.db.models.functions.comparison
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0018_search_document'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='orderactionreminder',
+            name='orders_orde_order_i_aa9853_idx',
+        ),
+        migrations.AddIndex(
+            model_name='measurement',
+            index=models.Index(fields=['-created_at', 'id'], name='measurement_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='measurement',
+            index=models.Index(condition=models.Q(('is_done', False)), fields=['measurement_date'], name='measurement_open_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='measurement',
+            index=models.Index(condition=models.Q(('is_done', True), ('is_processed', False)), fields=['done_at'], name='measurement_unprocessed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['salon', 'status', '-created_at'], name='order_salon_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', '-created_at'], name='order_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(models.F('salon'), models.OrderBy(django.db.models.functions.comparison.Coalesce('last_activity_at', 'created_at'), descending=True), models.F('id'), name='order_salon_activity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orderactionreminder',
+            index=models.Index(condition=models.Q(('done', False)), fields=['order', 'due_at'], name='reminder_active_order_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orderactionreminder',
+            index=models.Index(condition=models.Q(('done', False), ('notified', False)), fields=['due_at'], name='reminder_pending_due_idx'),
+        ),
+    ]
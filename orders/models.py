@@ -2,8 +2,14 @@ import uuid
 import secrets
 import string
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.conf import settings
 
+from marketingdoors import dashboard_cache
+from marketingdoors.attachments import AttachmentMetadata
+from marketingdoors.dirty_fields import DirtyFieldsMixin
+from marketingdoors.search import order_document, refresh_search_document
+
 # base62 алфавит для коротких кодов ссылок (без похожих символов не заморачиваемся —
 # код генерится и проверяется на уникальность).
 _SHORT_ALPHABET = string.ascii_letters + string.digits
@@ -76,7 +82,7 @@ class ActivityKind(models.TextChoices):
     SMS_SENT = 'sms_sent', 'Отправлено SMS клиенту'
 
 
-class Order(models.Model):
+class Order(DirtyFieldsMixin, models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Создан')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Обновлён')
     manager = models.ForeignKey(
@@ -133,15 +139,54 @@ class Order(models.Model):
     production_deadline = models.DateField(
         null=True, blank=True, verbose_name='Дата готовности',
     )
+    # Поисковый документ (marketingdoors.search): на PostgreSQL — GIN-индекс pg_trgm
+    search_document = models.TextField(
+        blank=True, default='', editable=False, verbose_name='Поисковый документ',
+    )
 
     class Meta:
         verbose_name = 'Заказ'
         verbose_name_plural = 'Заказы'
         ordering = ['-created_at']
+        indexes = [
+            # ACL менеджера (salon_id) и СМ/руководителя (салоны города) + папка + порядок списка
+            models.Index(fields=['salon', 'status', '-created_at'], name='order_salon_status_created_idx'),
+            # Администратор: папка без ACL
+            models.Index(fields=['status', '-created_at'], name='order_status_created_idx'),
+            # Наработки: порядок activity_at = Coalesce(last_activity_at, created_at) в пределах салона
+            models.Index(
+                models.F('salon'), Coalesce('last_activity_at', 'created_at').desc(), models.F('id'),
+                name='order_salon_activity_idx',
+            ),
+        ]
 
     def __str__(self):
         return f'Заказ #{self.id} — {self.client_name}'
 
+    # Поля, не влияющие на счётчики папок: их сохранение не сбрасывает кэш дашборда
+    ACTIVITY_ONLY_FIELDS = frozenset({'last_activity_at', 'last_activity_kind', 'updated_at', 'search_document'})
+    # Поля, из которых собирается search_document
+    SEARCH_SOURCE_FIELDS = ('kp_number', 'client_name', 'address', 'comment', 'contact_phone', 'manager', 'salon')
+
+    def build_search_document(self, request=None):
+        """Поисковый документ; request — заявка на замер, если уже загружена"""
+        if request is None and not self._state.adding:
+            request = MeasurementRequest.objects.filter(order=self).only('contact_name', 'contact_phone').first()
+        return order_document(self, self.manager, self.salon, request)
+
+    def save(self, *args, **kwargs):
+        refresh_search_document(self, kwargs, self.SEARCH_SOURCE_FIELDS, self.build_search_document)
+        changed = self.changed_fields(kwargs.get('update_fields'))
+        super().save(*args, **kwargs)
+        if changed is None or not changed <= self.ACTIVITY_ONLY_FIELDS:
+            # Статус/салон заказа влияют и на папки заказов, и на ACL замеров
+            dashboard_cache.invalidate(dashboard_cache.ORDERS, dashboard_cache.MEASUREMENTS)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        dashboard_cache.invalidate(dashboard_cache.ORDERS, dashboard_cache.MEASUREMENTS)
+        return result
+
     def touch_activity(self, kind: str, save: bool = True):
         """Обновить дату/вид последней активности."""
         from django.utils import timezone
@@ -166,25 +211,21 @@ class Order(models.Model):
 
     def _notify_status_change(self, old_status, new_status, actor=None):
         """Push менеджеру (и СМ) о смене статуса заказа. Актора не уведомляем."""
-        import logging
-        from users.push_utils import send_push_notification
-        logger = logging.getLogger(__name__)
+        from users.notification_outbox import enqueue_push
         recipients = set()
         if self.manager_id:
             recipients.add(self.manager)
         for user in recipients:
             if actor is not None and user.pk == actor.pk:
                 continue
-            try:
-                send_push_notification(
-                    user=user,
-                    title=f'Заказ #{self.id}: {self.get_status_display()}',
-                    body=f'Статус изменён на «{self.get_status_display()}»',
-                    url=f'/orders/{self.id}',
-                    data={'orderId': self.id},
-                )
-            except Exception as exc:  # noqa: BLE001
-                logger.error('Ошибка push о смене статуса заказа #%s: %s', self.id, exc)
+            # В очередь, в той же транзакции, что и смена статуса
+            enqueue_push(
+                user=user,
+                title=f'Заказ #{self.id}: {self.get_status_display()}',
+                body=f'Статус изменён на «{self.get_status_display()}»',
+                url=f'/orders/{self.id}',
+                data={'orderId': self.id},
+            )
 
     def change_status(self, new_status, actor=None, description='', extra_update_fields=None, notify=True):
         """
@@ -360,7 +401,7 @@ class OrderAddon(models.Model):
         return f'{self.get_kind_display()} — {self.name}'
 
 
-class OrderAttachment(models.Model):
+class OrderAttachment(AttachmentMetadata):
     order = models.ForeignKey(
         Order,
         on_delete=models.CASCADE,
@@ -436,6 +477,17 @@ class MeasurementRequest(models.Model):
     def __str__(self):
         return f'Заявка на замер по заказу #{self.order_id}'
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'contact_name', 'contact_phone'} & set(update_fields):
+            # Контакт заявки входит в поисковый документ заказа
+            order = self.order
+            document = order.build_search_document(self)
+            if document != order.search_document:
+                order.search_document = document
+                order.save(update_fields=['search_document'])
+
 
 class OrderActionReminder(models.Model):
     """Наработка / напоминание о следующем действии по заказу."""
@@ -469,7 +521,18 @@ class OrderActionReminder(models.Model):
         ordering = ['done', 'due_at']
         indexes = [
             models.Index(fields=['done', 'due_at']),
-            models.Index(fields=['order', 'done']),
+            # Только активные: ближайшее напоминание заказа (наработки, WorkshopOrderSerializer)
+            models.Index(
+                fields=['order', 'due_at'],
+                condition=models.Q(done=False),
+                name='reminder_active_order_due_idx',
+            ),
+            # Только ещё не отправленные: cron check_action_reminders
+            models.Index(
+                fields=['due_at'],
+                condition=models.Q(done=False, notified=False),
+                name='reminder_pending_due_idx',
+            ),
         ]
 
     def __str__(self):
@@ -479,7 +542,7 @@ class OrderActionReminder(models.Model):
 # ==================== Phase 3: Замер ====================
 
 
-class Measurement(models.Model):
+class Measurement(DirtyFieldsMixin, models.Model):
     """
     Замер (один на заявку). Создаётся СМ при назначении даты.
     Привязан к MeasurementRequest 1:1.
@@ -540,6 +603,21 @@ class Measurement(models.Model):
         verbose_name = 'Замер'
         verbose_name_plural = 'Замеры'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', 'id'], name='measurement_created_idx'),
+            # Невыполненные замеры: папки «Назначить»/«Запланирован»/«Сегодня», cron mark_not_done
+            models.Index(
+                fields=['measurement_date'],
+                condition=models.Q(is_done=False),
+                name='measurement_open_date_idx',
+            ),
+            # Выполненные, но не обработанные: cron mark_not_processed
+            models.Index(
+                fields=['done_at'],
+                condition=models.Q(is_done=True, is_processed=False),
+                name='measurement_unprocessed_idx',
+            ),
+        ]
 
     def __str__(self):
         return f'Замер по заказу #{self.request.order_id}'
@@ -552,7 +630,16 @@ class Measurement(models.Model):
                 if not Measurement.objects.filter(short_code=code).exists():
                     self.short_code = code
                     break
+        changed = self.changed_fields(kwargs.get('update_fields'))
         super().save(*args, **kwargs)
+        if changed is None or changed:
+            # Дата замера влияет и на папки «Сегодня/завтра замер» у заказов
+            dashboard_cache.invalidate(dashboard_cache.MEASUREMENTS, dashboard_cache.ORDERS)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        dashboard_cache.invalidate(dashboard_cache.MEASUREMENTS, dashboard_cache.ORDERS)
+        return result
 
     @property
     def order(self):
@@ -642,7 +729,7 @@ class MeasurementOpening(models.Model):
         return f'Проём #{self.opening_number} замера #{self.measurement_id}'
 
 
-class MeasurementAttachment(models.Model):
+class MeasurementAttachment(AttachmentMetadata):
     """Фото/документы по замеру в целом или по конкретному проёму."""
     measurement = models.ForeignKey(
         Measurement,
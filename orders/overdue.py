@@ -0,0 +1,242 @@
+"""
+Пакетный пересчёт просрочек замеров (кроны check_measurement_not_*).
+
+Раньше каждый крон перебирал кандидатов в Python: workdays_between() на
+строку, затем order.change_status() по одному заказу (save + запись в журнал)
+и отдельные push каждому СМ. Теперь общий движок:
+
+- просроченные строки отбираются одним запросом: число рабочих дней заранее
+  переводится в границу по производственному календарю
+  (marketingdoors.business_days.overdue_q), и в SQL остаётся сравнение
+  `created_at/done_at < граница`;
+- смена статуса — UPDATE по списку id (повторяя исходный статус в условии),
+  записи OrderActivityLog — bulk_create, кэш дашборда сбрасывается один раз;
+- уведомления группируются по получателю: один push на СМ/менеджера со всеми
+  его новыми просрочками и ставятся в очередь (users.notification_outbox)
+  в той же транзакции.
+
+Команды идемпотентны: переводят заказ только из ожидаемого исходного статуса.
+"""
+from dataclasses import dataclass, field
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from marketingdoors import dashboard_cache
+from marketingdoors.business_days import overdue_q
+
+from .models import ActivityKind, Measurement, MeasurementRequest, Order, OrderActivityLog, OrderStatus
+
+# Порог в рабочих днях (просрочка — строго больше)
+NOT_PLANNED_WORKDAYS = 1
+NOT_PROCESSED_WORKDAYS = 2
+
+# Размер пачки id в UPDATE ... WHERE id IN (...) и bulk_create
+BATCH_SIZE = 500
+# Сколько заказов перечислять в сводном push
+PUSH_LIST_LIMIT = 5
+
+
+@dataclass
+class OverdueBatch:
+    """Итог прогона одного правила: переведённые заказы и поставленные push"""
+    target_status: str
+    order_ids: list = field(default_factory=list)
+    notified: int = 0
+
+    @property
+    def total(self):
+        return len(self.order_ids)
+
+
+def _chunks(items):
+    for start in range(0, len(items), BATCH_SIZE):
+        yield items[start:start + BATCH_SIZE]
+
+
+def transition_orders(candidates, source_status, target_status, description, now=None):
+    """
+    Переводит заказы из source_status в target_status: candidates — подзапрос id
+    заказов. Возвращает список переведённых id. Вызывать внутри transaction.atomic().
+    """
+    now = now or timezone.now()
+    ids = list(
+        Order.objects.select_for_update()
+        .filter(pk__in=candidates, status=source_status)
+        .order_by('id')
+        .values_list('id', flat=True)
+    )
+    if not ids:
+        return ids
+    for chunk in _chunks(ids):
+        Order.objects.filter(pk__in=chunk, status=source_status).update(
+            status=target_status,
+            last_activity_at=now,
+            last_activity_kind=ActivityKind.STATUS_CHANGED,
+            updated_at=now,
+        )
+    OrderActivityLog.objects.bulk_create(
+        [
+            OrderActivityLog(
+                order_id=order_id,
+                kind=ActivityKind.STATUS_CHANGED,
+                description=description,
+                old_status=source_status,
+                new_status=target_status,
+            )
+            for order_id in ids
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    dashboard_cache.invalidate(dashboard_cache.ORDERS, dashboard_cache.MEASUREMENTS)
+    return ids
+
+
+def enqueue_grouped(per_user, title, hint, target_status):
+    """
+    Один push на получателя. per_user — {user_id: [{'id', 'client_name', 'measurement_id'?}]}.
+    Одна просрочка — push по заказу, как раньше; несколько — сводный push со ссылкой на папку.
+    """
+    from users.models import User
+    from users.notification_outbox import enqueue_push_many
+
+    users = User.objects.in_bulk(list(per_user))
+    messages = []
+    for user_id, orders in per_user.items():
+        if user_id not in users:
+            continue
+        if len(orders) == 1:
+            order = orders[0]
+            data = {'orderId': order['id']}
+            if order.get('measurement_id'):
+                data['measurementId'] = order['measurement_id']
+            messages.append({
+                'user': users[user_id],
+                'title': f'{title} — заказ #{order["id"]}',
+                'body': f'{order["client_name"]}: {hint}',
+                'url': f'/orders/{order["id"]}',
+                'data': data,
+            })
+            continue
+        listed = ', '.join(f'#{o["id"]} {o["client_name"]}' for o in orders[:PUSH_LIST_LIMIT])
+        if len(orders) > PUSH_LIST_LIMIT:
+            listed += f' и ещё {len(orders) - PUSH_LIST_LIMIT}'
+        messages.append({
+            'user': users[user_id],
+            'title': f'{title} — заказов: {len(orders)}',
+            'body': listed,
+            'url': f'/orders?folder={target_status}',
+            'data': {'orderIds': [o['id'] for o in orders]},
+        })
+    enqueue_push_many(messages)
+    return len(messages)
+
+
+def _order_rows(ids, *fields):
+    rows = []
+    for chunk in _chunks(ids):
+        rows.extend(Order.objects.filter(pk__in=chunk).order_by('id').values('id', 'client_name', *fields))
+    return rows
+
+
+def mark_not_planned(now=None, notify=True):
+    """
+    Заявка в measurement_requested дольше NOT_PLANNED_WORKDAYS раб. дней без даты
+    замера → measurement_not_planned; push СМ города салона (без города — всем СМ).
+    """
+    from users.models import Role, User
+
+    now = now or timezone.now()
+    batch = OverdueBatch(OrderStatus.MEASUREMENT_NOT_PLANNED)
+    candidates = MeasurementRequest.objects.filter(
+        Q(measurement__isnull=True) | Q(measurement__measurement_date__isnull=True),
+        overdue_q('created_at', NOT_PLANNED_WORKDAYS, now),
+    ).values('order_id')
+
+    with transaction.atomic():
+        batch.order_ids = transition_orders(
+            candidates,
+            OrderStatus.MEASUREMENT_REQUESTED,
+            OrderStatus.MEASUREMENT_NOT_PLANNED,
+            'Авто: замер не запланирован (>1 раб. дня без даты)',
+            now,
+        )
+        if notify and batch.order_ids:
+            sms_by_city = {}
+            for sm_id, city_id in User.objects.filter(role=Role.SERVICE_MANAGER).values_list('id', 'city_id'):
+                sms_by_city.setdefault(city_id, []).append(sm_id)
+            all_sms = [sm_id for sm_ids in sms_by_city.values() for sm_id in sm_ids]
+
+            per_user = {}
+            for row in _order_rows(batch.order_ids, 'salon__city_id'):
+                city_id = row['salon__city_id']
+                for sm_id in (sms_by_city.get(city_id, []) if city_id else all_sms):
+                    per_user.setdefault(sm_id, []).append(row)
+            batch.notified = enqueue_grouped(
+                per_user, 'Замер не запланирован', 'нужна дата замера', batch.target_status,
+            )
+    return batch
+
+
+def mark_not_done(now=None, notify=True):
+    """
+    Дата назначенного замера прошла, замер не выполнен → measurement_not_done;
+    push СМ замера.
+    """
+    now = now or timezone.now()
+    batch = OverdueBatch(OrderStatus.MEASUREMENT_NOT_DONE)
+    candidates = Measurement.objects.filter(is_done=False, measurement_date__lt=now).values('request__order_id')
+
+    with transaction.atomic():
+        batch.order_ids = transition_orders(
+            candidates,
+            OrderStatus.MEASUREMENT_SCHEDULED,
+            OrderStatus.MEASUREMENT_NOT_DONE,
+            'Авто: замер не выполнен (дата назначения прошла)',
+            now,
+        )
+        if notify and batch.order_ids:
+            per_user = {}
+            for row in _order_rows(
+                batch.order_ids, 'measurement_request__measurement__id',
+                'measurement_request__measurement__service_manager_id',
+            ):
+                row['measurement_id'] = row['measurement_request__measurement__id']
+                per_user.setdefault(row['measurement_request__measurement__service_manager_id'], []).append(row)
+            batch.notified = enqueue_grouped(
+                per_user, 'Замер не выполнен', 'дата замера прошла', batch.target_status,
+            )
+    return batch
+
+
+def mark_not_processed(now=None, notify=True):
+    """
+    Замер выполнен дольше NOT_PROCESSED_WORKDAYS раб. дней назад и не обработан
+    → measurement_not_processed; push менеджеру заказа.
+    """
+    now = now or timezone.now()
+    batch = OverdueBatch(OrderStatus.MEASUREMENT_NOT_PROCESSED)
+    candidates = Measurement.objects.filter(
+        overdue_q('done_at', NOT_PROCESSED_WORKDAYS, now),
+        is_done=True,
+        is_processed=False,
+    ).values('request__order_id')
+
+    with transaction.atomic():
+        batch.order_ids = transition_orders(
+            candidates,
+            OrderStatus.MEASUREMENT_DONE,
+            OrderStatus.MEASUREMENT_NOT_PROCESSED,
+            'Авто: замер не обработан (>2 раб. дней)',
+            now,
+        )
+        if notify and batch.order_ids:
+            per_user = {}
+            for row in _order_rows(batch.order_ids, 'manager_id', 'measurement_request__measurement__id'):
+                row['measurement_id'] = row['measurement_request__measurement__id']
+                per_user.setdefault(row['manager_id'], []).append(row)
+            batch.notified = enqueue_grouped(
+                per_user, 'Замер не обработан', 'обработайте замер', batch.target_status,
+            )
+    return batch
@@ -4,12 +4,16 @@
 WeasyPrint импортируется лениво (внутри функции), т.к. на старте процесса
 библиотека подтягивает системные cairo/pango — это медленно и не нужно, пока
 PDF реально не запросили. Путь к libs на macOS уже выставлен в settings.py.
+
+Фото в бланке — уменьшенные копии «под печать» (pdf_images), не оригиналы.
 """
 import os
 
 from django.conf import settings
 from django.template.loader import render_to_string
 
+from .pdf_images import print_image_path
+
 IMAGE_EXTS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp', '.heic', '.heif')
 
 
@@ -26,7 +30,18 @@ def _abs_path(filefield):
     return path if path and os.path.exists(path) else None
 
 
-def render_measurement_blank(measurement) -> bytes:
+def _blank_image(filefield, print_images, checksum=''):
+    """
+    Путь к изображению для бланка: уменьшенная копия «под печать» (pdf_images)
+    либо оригинал (print_images=False — для сравнения в бенчмарке).
+    """
+    path = _abs_path(filefield)
+    if path and print_images:
+        return print_image_path(path, checksum)
+    return path
+
+
+def render_measurement_blank(measurement, print_images=True) -> bytes:
     """Рендерит PDF-бланк замера и возвращает его как bytes."""
     from weasyprint import HTML  # ленивый импорт
 
@@ -50,7 +65,7 @@ def render_measurement_blank(measurement) -> bytes:
         images = []
         for att in op.attachments.all():
             if att.file and _is_image(att.file.name):
-                path = _abs_path(att.file)
+                path = _blank_image(att.file, print_images, att.checksum)
                 if path:
                     images.append(path)
         if images:
@@ -59,12 +74,12 @@ def render_measurement_blank(measurement) -> bytes:
     # План открывания (из заявки) — только если это изображение и файл есть.
     plan_path = None
     if req and req.opening_plan and _is_image(req.opening_plan.name):
-        plan_path = _abs_path(req.opening_plan)
+        plan_path = _blank_image(req.opening_plan, print_images)
 
     # Фото подписанного бланка (для уже подписанного замера).
     signature_path = None
     if measurement.signature_photo and _is_image(measurement.signature_photo.name):
-        signature_path = _abs_path(measurement.signature_photo)
+        signature_path = _blank_image(measurement.signature_photo, print_images)
 
     sm = measurement.service_manager
     sm_name = ''
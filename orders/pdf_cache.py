@@ -0,0 +1,201 @@
+"""
+Кэш отрендеренных PDF-бланков замера (бланк замера и «Рекомендации»).
+
+Раньше каждый запрос бланка — в том числе публичная ссылка /z/{код} из SMS,
+которую клиент открывает по несколько раз, — заново собирал HTML и гонял
+WeasyPrint (секунды CPU на бланк с фото). Теперь:
+
+- blank_fingerprint() — SHA-256 от всего, что попадает в бланк: полей замера,
+  заявки и заказа, проёмов, связанных позиций КП, контрольных сумм вложений
+  проёмов, версии шаблона и параметров копий фото. Любая правка входных данных даёт новый отпечаток,
+  поэтому отдельная инвалидация не нужна — старый файл просто перестаёт
+  запрашиваться и удаляется при записи нового;
+- get_cached_blank() — PDF из PDF_CACHE_DIR/<вид>/<id замера>/<отпечаток>.pdf,
+  рендер только при промахе (запись атомарна: временный файл + os.replace);
+  в веб-запросах рендер идёт через пул процессов (orders.pdf_render_pool);
+- blank_response() — ответ с ETag (= отпечаток) и Last-Modified; повторный
+  запрос с If-None-Match / If-Modified-Since получает 304 без чтения файла.
+"""
+import hashlib
+import json
+import os
+import tempfile
+from dataclasses import dataclass
+from functools import lru_cache
+
+from django.conf import settings
+from django.http import FileResponse
+from django.template.loader import get_template
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .models import MeasurementAttachment, MeasurementOpening, OrderItem
+from .pdf_images import image_params
+
+# Увеличить при изменении кода рендера (pdf_blank.py), влияющем на результат
+RENDER_VERSION = 2
+
+MEASUREMENT = 'measurement'
+RECOMMENDATIONS = 'recommendations'
+
+TEMPLATES = {
+    MEASUREMENT: 'orders/measurement_blank.html',
+    RECOMMENDATIONS: 'orders/recommendations_blank.html',
+}
+
+# Поля, которые попадают в бланки (служебные updated_at/last_activity_* не влияют на PDF)
+MEASUREMENT_FIELDS = ('id', 'measurement_date', 'signature_photo')
+REQUEST_FIELDS = ('contact_name', 'contact_position', 'contact_phone', 'opening_plan')
+ORDER_FIELDS = (
+    'kp_number', 'kp_date', 'client_name', 'contact_phone', 'address',
+    'lift_available', 'stairs_available', 'carry_to_entrance',
+    'floor_number', 'floor_readiness',
+)
+ORDER_ITEM_FIELDS = (
+    'id', 'model_name', 'door_height', 'door_width', 'door_width_parts',
+    'recommended_opening_height', 'recommended_opening_width',
+)
+SERVICE_MANAGER_FIELDS = ('first_name', 'last_name', 'username')
+
+
+@dataclass
+class CachedPdf:
+    fingerprint: str
+    path: str
+
+    @property
+    def etag(self):
+        return quote_etag(self.fingerprint)
+
+    @property
+    def last_modified(self):
+        return int(os.path.getmtime(self.path))
+
+
+@lru_cache(maxsize=None)
+def _template_version(kind):
+    """Хэш исходника шаблона: правка шаблона меняет отпечатки всех бланков"""
+    template = get_template(TEMPLATES[kind])
+    source = getattr(getattr(template, 'template', None), 'source', '')
+    return hashlib.sha256(f'{RENDER_VERSION}:{source}'.encode('utf-8')).hexdigest()
+
+
+def _fields(obj, names):
+    if obj is None:
+        return None
+    values = {}
+    for name in names:
+        value = getattr(obj, name)
+        # FileField — по имени файла в хранилище (у несохранённого объекта пустое имя — None)
+        values[name] = (value.name or '') if hasattr(value, 'storage') else value
+    return values
+
+
+def blank_fingerprint(measurement, kind):
+    """Отпечаток входных данных бланка (три лёгких запроса вместо рендера)"""
+    req = getattr(measurement, 'request', None)
+    order = getattr(req, 'order', None) if req else None
+    openings = list(MeasurementOpening.objects.filter(measurement=measurement).order_by('id').values())
+    item_ids = [row['order_item_id'] for row in openings if row['order_item_id']]
+    items = list(OrderItem.objects.filter(id__in=item_ids).order_by('id').values(*ORDER_ITEM_FIELDS))
+    attachments = list(
+        MeasurementAttachment.objects.filter(opening__measurement=measurement)
+        .order_by('id')
+        .values('id', 'opening_id', 'file', 'size', 'checksum')
+    )
+    payload = {
+        'kind': kind,
+        'template': _template_version(kind),
+        'images': image_params(),
+        'measurement': _fields(measurement, MEASUREMENT_FIELDS),
+        'service_manager': _fields(measurement.service_manager, SERVICE_MANAGER_FIELDS),
+        'request': _fields(req, REQUEST_FIELDS),
+        'order': _fields(order, ORDER_FIELDS),
+        'openings': openings,
+        'items': items,
+        'attachments': attachments,
+    }
+    raw = json.dumps(payload, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def _cache_dir(kind, measurement_id):
+    root = getattr(settings, 'PDF_CACHE_DIR', None) or os.path.join(settings.MEDIA_ROOT, 'pdf_cache')
+    return os.path.join(str(root), kind, str(measurement_id))
+
+
+def render_blank(measurement, kind):
+    """Рендер PDF-бланка вида kind (WeasyPrint, без кэша)"""
+    from .pdf_blank import render_measurement_blank, render_recommendations_blank
+    if kind == RECOMMENDATIONS:
+        return render_recommendations_blank(measurement)
+    return render_measurement_blank(measurement)
+
+
+def cached_entry(measurement, kind, fingerprint=None):
+    """CachedPdf для текущих данных (файл может ещё не существовать)"""
+    fingerprint = fingerprint or blank_fingerprint(measurement, kind)
+    return CachedPdf(fingerprint, os.path.join(_cache_dir(kind, measurement.id), f'{fingerprint}.pdf'))
+
+
+def store_blank(entry, pdf):
+    """Атомарно записывает PDF и удаляет устаревшие рендеры того же бланка"""
+    directory = os.path.dirname(entry.path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            tmp.write(pdf)
+        os.replace(tmp_path, entry.path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if path != entry.path and name.endswith('.pdf'):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+    return entry
+
+
+def get_cached_blank(measurement, kind, fingerprint=None):
+    """PDF-бланк из кэша; при промахе рендерит и сохраняет"""
+    entry = cached_entry(measurement, kind, fingerprint)
+    if not os.path.exists(entry.path):
+        store_blank(entry, render_blank(measurement, kind))
+    return entry
+
+
+def blank_response(request, measurement, kind, filename, allow_pending=False):
+    """
+    HTTP-ответ с PDF-бланком: 304 при совпадении ETag/Last-Modified, иначе файл
+    из кэша. При промахе рендер идёт в пуле (orders.pdf_render_pool) и ответ ждёт
+    его окончания. allow_pending=True (публичные ссылки, их открывает браузер) —
+    не уложился в PDF_RENDER_WAIT_SECONDS: 202 «формируется». Ошибки рендера
+    пробрасываются.
+    """
+    from .pdf_render_pool import rendering_response, wait_for_render
+
+    fingerprint = blank_fingerprint(measurement, kind)
+    entry = cached_entry(measurement, kind, fingerprint)
+    last_modified = entry.last_modified if os.path.exists(entry.path) else None
+    not_modified = get_conditional_response(request, etag=entry.etag, last_modified=last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    try:
+        handle = open(entry.path, 'rb')
+    except FileNotFoundError:
+        if not wait_for_render(measurement, kind, entry, allow_pending=allow_pending):
+            return rendering_response()
+        handle = open(entry.path, 'rb')
+    response = FileResponse(handle, content_type='application/pdf')
+    response['Content-Disposition'] = f'inline; filename="{filename}"'
+    response['ETag'] = entry.etag
+    response['Last-Modified'] = http_date(entry.last_modified)
+    # Клиент хранит копию, но каждый раз сверяется — правки замера видны сразу
+    response['Cache-Control'] = 'private, no-cache'
+    return response
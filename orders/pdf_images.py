@@ -0,0 +1,110 @@
+"""
+Уменьшенные копии фото для PDF-бланков замера.
+
+Раньше в WeasyPrint уходили оригиналы фото с телефона (4–12 МБ, до 4000 px):
+PDF получался десятки мегабайт, вёрстка и скачивание по мобильной сети были
+медленными. Теперь фото проёмов, план открывания и фото подписи перед рендером
+заменяются производной JPEG-копией «под печать»:
+
+- длинная сторона не больше PDF_IMAGE_MAX_PX (A4 с полями при ~200 dpi),
+  качество PDF_IMAGE_QUALITY, ориентация по EXIF применяется к пикселям;
+- HEIC/HEIF конвертируются, если установлен pillow-heif (без него такие фото
+  в бланк не попадают — WeasyPrint их всё равно не показывает);
+- производные кэшируются в PDF_CACHE_DIR/images под ключом от содержимого
+  источника (SHA-256 вложения, иначе путь + размер + mtime) и параметров,
+  поэтому повторный рендер бланка их не пересчитывает.
+
+JPEG выбран вместо WebP намеренно: WeasyPrint встраивает JPEG в PDF как есть
+(DCT-поток), а остальные форматы перекодирует без потерь — WebP вышел бы больше.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+HEIF_EXTS = ('.heic', '.heif')
+
+try:
+    from pillow_heif import register_heif_opener
+except ImportError:  # pillow-heif не установлен — HEIC не конвертируем
+    HEIF_SUPPORTED = False
+else:
+    register_heif_opener()
+    HEIF_SUPPORTED = True
+
+
+def image_params():
+    """(макс. сторона, качество JPEG) — входят в ключ копий и в отпечаток бланка"""
+    return (
+        int(getattr(settings, 'PDF_IMAGE_MAX_PX', 1600)),
+        int(getattr(settings, 'PDF_IMAGE_QUALITY', 82)),
+    )
+
+
+def _cache_dir():
+    root = getattr(settings, 'PDF_CACHE_DIR', None) or os.path.join(settings.MEDIA_ROOT, 'pdf_cache')
+    return os.path.join(str(root), 'images')
+
+
+def _derivative_path(source_path, checksum=''):
+    max_px, quality = image_params()
+    if checksum:
+        source_key = checksum
+    else:
+        stat = os.stat(source_path)
+        source_key = f'{source_path}:{stat.st_size}:{stat.st_mtime_ns}'
+    key = hashlib.sha256(f'{source_key}:{max_px}:{quality}'.encode('utf-8')).hexdigest()
+    return os.path.join(_cache_dir(), key[:2], f'{key}.jpg')
+
+
+def _write_derivative(source_path, target_path):
+    from PIL import Image, ImageOps
+
+    max_px, quality = image_params()
+    with Image.open(source_path) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_px, max_px), Image.Resampling.LANCZOS)
+        if image.mode in ('RGBA', 'LA', 'P'):
+            # Прозрачность (PNG-схемы) — на белый фон, как на бумаге
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, 'white')
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        directory = os.path.dirname(target_path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                image.save(tmp, 'JPEG', quality=quality, optimize=True, progressive=True)
+            os.replace(tmp_path, target_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+
+def print_image_path(source_path, checksum=''):
+    """
+    Путь к копии изображения «под печать» (создаётся при первом обращении).
+    Не удалось обработать: HEIC без pillow-heif — None, остальное — исходный путь.
+    """
+    if not source_path:
+        return None
+    is_heif = source_path.lower().endswith(HEIF_EXTS)
+    if is_heif and not HEIF_SUPPORTED:
+        return None
+    try:
+        target_path = _derivative_path(source_path, checksum)
+        if not os.path.exists(target_path):
+            _write_derivative(source_path, target_path)
+        return target_path
+    except Exception as exc:
+        logger.warning('Не удалось уменьшить изображение %s для PDF: %s', source_path, exc)
+        return None if is_heif else source_path
@@ -22,8 +22,7 @@ from datetime import datetime
 from decimal import Decimal, InvalidOperation
 from typing import Any, Dict, List, Optional, Tuple
 
-import pdfplumber
-
+from marketingdoors.pdf_pages import extract_pages, joined_text
 from projects.pdf_parser import (
     _extract_address,
     _extract_client_name as _extract_client_name_legacy,
@@ -570,103 +569,103 @@ def parse_kp_pdf(pdf_file) -> Dict[str, Any]:
     }
 
     try:
-        with pdfplumber.open(pdf_file) as pdf:
-            full_text = '\n'.join((p.extract_text() or '') for p in pdf.pages)
-            if not full_text.strip():
-                logger.warning('parse_kp_pdf: пустой текст')
-                return result
-
-            # Шапка
-            normalized = re.sub(r'\s+', ' ', full_text)
-            result['kp_number'] = _extract_order_number(normalized)
-            result['client_name'] = _extract_client_name(normalized)
-            result['contact_phone'] = _extract_contact_phone(normalized)
-            result['address'] = _extract_address(normalized)
-            result['manager_name'] = _extract_manager_name(normalized)
-            result['kp_date'] = _extract_kp_date(full_text)
-
-            # Секции
-            sections = _split_into_sections(full_text)
-
-            # Двери / стеновые панели
-            door_items: List[Dict[str, Any]] = []
-            for anchor, cont in _split_section_into_rows(sections.get('doors', '')):
+        # Один проход по страницам (общий слой с парсером рекламаций)
+        full_text = joined_text(extract_pages(pdf_file))
+        if not full_text.strip():
+            logger.warning('parse_kp_pdf: пустой текст')
+            return result
+
+        # Шапка
+        normalized = re.sub(r'\s+', ' ', full_text)
+        result['kp_number'] = _extract_order_number(normalized)
+        result['client_name'] = _extract_client_name(normalized)
+        result['contact_phone'] = _extract_contact_phone(normalized)
+        result['address'] = _extract_address(normalized)
+        result['manager_name'] = _extract_manager_name(normalized)
+        result['kp_date'] = _extract_kp_date(full_text)
+
+        # Секции
+        sections = _split_into_sections(full_text)
+
+        # Двери / стеновые панели
+        door_items: List[Dict[str, Any]] = []
+        for anchor, cont in _split_section_into_rows(sections.get('doors', '')):
+            anchor_fixed = _fix_split_size(anchor, cont)
+            parsed = _parse_door_row(anchor_fixed)
+            if not parsed:
+                continue
+            # Открывание — учитываем continuation (там может быть «ИНВЕРСО»)
+            opening_full_text = anchor_fixed + ' ' + cont
+            # Берём текст вокруг последнего размера для open type
+            m_size = list(SIZE_RE.finditer(anchor_fixed))
+            opening_text_part = ''
+            if m_size:
+                opening_text_part = anchor_fixed[m_size[-1].end():]
+            opening_text_part += ' ' + cont
+            parsed['opening_type'] = _normalize_opening_token(opening_text_part) or parsed['opening_type']
+            # Полное описание = anchor description + continuation
+            full_desc = (parsed['description'] + ' ' + cont).strip()
+            # Срезаем номер позиции из КП («1 ...», «2 ...») если он в самом начале
+            full_desc = re.sub(r'^\d{1,3}\s+', '', full_desc).strip()
+            base = {
+                'room_name': _extract_room_from_description(full_desc),
+                'model_name': full_desc[:500],
+                'price': str(parsed['price']) if parsed['price'] is not None else None,
+                'door_type': _detect_door_type(full_desc),
+                'opening_type': parsed['opening_type'],
+                'door_height': parsed['door_height'],
+                'door_width': parsed['door_width'],
+                'recommended_opening_height': parsed.get('rec_opening_height'),
+                'recommended_opening_width': parsed.get('rec_opening_width'),
+            }
+            # Раскрываем количество в отдельные строки: qty=3 → 3 строки по qty=1
+            qty = max(1, int(parsed['qty'] or 1))
+            # Страховка от мисраспознавания: Кол-во в реальных КП — единицы,
+            # десятки максимум. Если распозналось больше — это почти наверняка
+            # кусок размера, попавший в qty; не размножаем КП в сотни позиций.
+            if qty > 50:
+                logger.warning('parse_kp_pdf: подозрительное qty=%d в строке %r — считаем 1', qty, anchor[:120])
+                qty = 1
+            # amount на одну штуку = price; если qty=1, оставляем исходную сумму
+            per_unit_amount = (
+                str(parsed['price']) if qty > 1 and parsed['price'] is not None
+                else (str(parsed['sum']) if parsed['sum'] is not None else None)
+            )
+            for _ in range(qty):
+                door_items.append({
+                    **base,
+                    'opening_number': len(door_items) + 1,
+                    'quantity': 1,
+                    'amount': per_unit_amount,
+                })
+
+        # Аддоны идут отдельным списком на уровне заказа
+        all_addons: List[Dict[str, Any]] = []
+        for sec_key, kind in ADDON_KIND_BY_SECTION.items():
+            section_text = sections.get(sec_key, '')
+            for anchor, cont in _split_section_into_rows(section_text):
                 anchor_fixed = _fix_split_size(anchor, cont)
-                parsed = _parse_door_row(anchor_fixed)
+                parsed = _parse_addon_row(anchor_fixed)
                 if not parsed:
                     continue
-                # Открывание — учитываем continuation (там может быть «ИНВЕРСО»)
-                opening_full_text = anchor_fixed + ' ' + cont
-                # Берём текст вокруг последнего размера для open type
-                m_size = list(SIZE_RE.finditer(anchor_fixed))
-                opening_text_part = ''
-                if m_size:
-                    opening_text_part = anchor_fixed[m_size[-1].end():]
-                opening_text_part += ' ' + cont
-                parsed['opening_type'] = _normalize_opening_token(opening_text_part) or parsed['opening_type']
-                # Полное описание = anchor description + continuation
+                # Учитываем INVERSO в continuation для коробов
+                if kind == 'box':
+                    m_size = list(SIZE_RE.finditer(anchor_fixed))
+                    opening_text_part = anchor_fixed[m_size[-1].end():] if m_size else ''
+                    opening_text_part += ' ' + cont
+                    parsed['opening_type'] = _normalize_opening_token(opening_text_part) or parsed['opening_type']
                 full_desc = (parsed['description'] + ' ' + cont).strip()
-                # Срезаем номер позиции из КП («1 ...», «2 ...») если он в самом начале
                 full_desc = re.sub(r'^\d{1,3}\s+', '', full_desc).strip()
-                base = {
-                    'room_name': _extract_room_from_description(full_desc),
-                    'model_name': full_desc[:500],
-                    'price': str(parsed['price']) if parsed['price'] is not None else None,
-                    'door_type': _detect_door_type(full_desc),
-                    'opening_type': parsed['opening_type'],
-                    'door_height': parsed['door_height'],
-                    'door_width': parsed['door_width'],
-                    'recommended_opening_height': parsed.get('rec_opening_height'),
-                    'recommended_opening_width': parsed.get('rec_opening_width'),
-                }
-                # Раскрываем количество в отдельные строки: qty=3 → 3 строки по qty=1
-                qty = max(1, int(parsed['qty'] or 1))
-                # Страховка от мисраспознавания: Кол-во в реальных КП — единицы,
-                # десятки максимум. Если распозналось больше — это почти наверняка
-                # кусок размера, попавший в qty; не размножаем КП в сотни позиций.
-                if qty > 50:
-                    logger.warning('parse_kp_pdf: подозрительное qty=%d в строке %r — считаем 1', qty, anchor[:120])
-                    qty = 1
-                # amount на одну штуку = price; если qty=1, оставляем исходную сумму
-                per_unit_amount = (
-                    str(parsed['price']) if qty > 1 and parsed['price'] is not None
-                    else (str(parsed['sum']) if parsed['sum'] is not None else None)
-                )
-                for _ in range(qty):
-                    door_items.append({
-                        **base,
-                        'opening_number': len(door_items) + 1,
-                        'quantity': 1,
-                        'amount': per_unit_amount,
-                    })
-
-            # Аддоны идут отдельным списком на уровне заказа
-            all_addons: List[Dict[str, Any]] = []
-            for sec_key, kind in ADDON_KIND_BY_SECTION.items():
-                section_text = sections.get(sec_key, '')
-                for anchor, cont in _split_section_into_rows(section_text):
-                    anchor_fixed = _fix_split_size(anchor, cont)
-                    parsed = _parse_addon_row(anchor_fixed)
-                    if not parsed:
-                        continue
-                    # Учитываем INVERSO в continuation для коробов
-                    if kind == 'box':
-                        m_size = list(SIZE_RE.finditer(anchor_fixed))
-                        opening_text_part = anchor_fixed[m_size[-1].end():] if m_size else ''
-                        opening_text_part += ' ' + cont
-                        parsed['opening_type'] = _normalize_opening_token(opening_text_part) or parsed['opening_type']
-                    full_desc = (parsed['description'] + ' ' + cont).strip()
-                    full_desc = re.sub(r'^\d{1,3}\s+', '', full_desc).strip()
-                    parsed['description'] = full_desc
-                    all_addons.append(_build_addon_dict(parsed, kind))
-
-            result['items'] = door_items
-            result['addons'] = all_addons
-
-            logger.info(
-                'parse_kp_pdf: клиент=%s, дверей=%d, аддонов=%d',
-                result['client_name'], len(door_items), len(all_addons),
-            )
+                parsed['description'] = full_desc
+                all_addons.append(_build_addon_dict(parsed, kind))
+
+        result['items'] = door_items
+        result['addons'] = all_addons
+
+        logger.info(
+            'parse_kp_pdf: клиент=%s, дверей=%d, аддонов=%d',
+            result['client_name'], len(door_items), len(all_addons),
+        )
 
     except Exception as exc:
         logger.error('parse_kp_pdf: ошибка %s', exc, exc_info=True)
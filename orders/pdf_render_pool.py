@@ -0,0 +1,179 @@
+"""
+Фоновый рендер PDF-бланков замера в пуле процессов.
+
+WeasyPrint нагружает CPU и держит GIL: рендер в потоке веб-воркера при всплеске
+переходов по SMS-ссылкам блокировал воркеры gunicorn на секунды. Теперь рендер
+уходит в ProcessPoolExecutor (PDF_RENDER_WORKERS процессов на веб-процесс,
+запуск через spawn — дочерний процесс сам поднимает Django и соединение с БД):
+
+- wait_for_render() — публичная ссылка ждёт готовый файл не дольше
+  PDF_RENDER_WAIT_SECONDS; не успел — вьюха отвечает 202 «формируется»
+  (rendering_response), браузер повторяет запрос. Скачивание бланка из SPA
+  ждёт окончания рендера: SPA сохраняет ответ как файл и 202 не разбирает;
+- одинаковые задания (замер, вид бланка, отпечаток данных) не дублируются;
+- prewarm_blanks() после фиксации транзакции ставит рендер в пул заранее —
+  вызывается из mark_done / mark_processed / upload_signature, чтобы ссылка
+  из SMS открывалась уже из кэша (orders.pdf_cache).
+
+PDF_RENDER_WORKERS=0 — без пула: рендер синхронно в запросе, прогрева нет.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.db import transaction
+from django.http import JsonResponse
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_in_flight = {}
+_lock = threading.Lock()
+
+
+def _worker_count():
+    return int(getattr(settings, 'PDF_RENDER_WORKERS', 2))
+
+
+def _worker_init():
+    """Инициализация процесса пула: модели импортируются только после django.setup()"""
+    import django
+    django.setup()
+
+
+def _render_job(measurement_id, kind):
+    """Выполняется в процессе пула: рендер по актуальным данным замера в кэш"""
+    from django.db import close_old_connections
+
+    from .models import Measurement
+    from .pdf_cache import get_cached_blank
+
+    close_old_connections()
+    try:
+        measurement = Measurement.objects.select_related(
+            'request__order', 'service_manager'
+        ).get(pk=measurement_id)
+        return get_cached_blank(measurement, kind).fingerprint
+    finally:
+        close_old_connections()
+
+
+def get_executor():
+    """Пул процесса (создаётся при первом рендере)"""
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=_worker_count(),
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_worker_init,
+                # WeasyPrint накапливает память — процессы периодически перезапускаются
+                max_tasks_per_child=int(getattr(settings, 'PDF_RENDER_MAX_TASKS_PER_CHILD', 50)),
+            )
+        return _executor
+
+
+def shutdown_executor(wait=True):
+    """Останавливает пул (после смены настроек, в тестах, при падении пула)"""
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+        _in_flight.clear()
+    if executor is not None:
+        executor.shutdown(wait=wait, cancel_futures=True)
+
+
+def submit_render(measurement, kind, fingerprint=None):
+    """
+    Ставит рендер бланка в пул. Возвращает Future или None, если файл уже в кэше.
+    Повторная постановка того же задания возвращает уже идущий Future.
+    """
+    from .pdf_cache import cached_entry
+
+    entry = cached_entry(measurement, kind, fingerprint)
+    if os.path.exists(entry.path):
+        return None
+    key = (measurement.id, kind, entry.fingerprint)
+    with _lock:
+        future = _in_flight.get(key)
+        if future is not None:
+            return future
+    try:
+        future = get_executor().submit(_render_job, measurement.id, kind)
+    except BrokenProcessPool:
+        logger.warning('Пул рендера PDF упал, пересоздаём')
+        shutdown_executor(wait=False)
+        future = get_executor().submit(_render_job, measurement.id, kind)
+    with _lock:
+        future = _in_flight.setdefault(key, future)
+    future.add_done_callback(lambda done, key=key: _forget(key, done))
+    return future
+
+
+def _forget(key, future):
+    with _lock:
+        if _in_flight.get(key) is future:
+            del _in_flight[key]
+
+
+def wait_for_render(measurement, kind, entry, allow_pending=True):
+    """
+    Готовит файл entry (CachedPdf из orders.pdf_cache). True — файл на месте,
+    False — рендер ещё идёт (ответить 202). Ошибка рендера пробрасывается.
+    allow_pending=False — ждать рендер сколько потребуется (всегда True).
+    """
+    from .pdf_cache import render_blank, store_blank
+
+    if _worker_count() <= 0:
+        store_blank(entry, render_blank(measurement, kind))
+        return True
+    future = submit_render(measurement, kind, entry.fingerprint)
+    if future is not None:
+        timeout = float(getattr(settings, 'PDF_RENDER_WAIT_SECONDS', 8)) if allow_pending else None
+        try:
+            future.result(timeout=timeout)
+        except FutureTimeoutError:
+            return False
+    # Пока шёл рендер, данные могли измениться — тогда файла с этим отпечатком нет
+    if not os.path.exists(entry.path) and not allow_pending:
+        store_blank(entry, render_blank(measurement, kind))
+    return os.path.exists(entry.path)
+
+
+def rendering_response():
+    """Ответ «PDF ещё формируется»: клиенту — повторить запрос, браузеру — обновить страницу"""
+    retry_after = int(getattr(settings, 'PDF_RENDER_RETRY_AFTER', 3))
+    response = JsonResponse(
+        {'status': 'rendering', 'detail': 'PDF формируется, обновите страницу через несколько секунд.'},
+        status=202,
+        json_dumps_params={'ensure_ascii': False},
+    )
+    response['Retry-After'] = str(retry_after)
+    response['Refresh'] = str(retry_after)
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+def prewarm_blanks(measurement):
+    """
+    После фиксации текущей транзакции ставит в пул рендер бланка замера
+    (и «Рекомендаций», если замер обработан). Без пула ничего не делает.
+    """
+    if _worker_count() <= 0:
+        return
+    from .pdf_cache import MEASUREMENT, RECOMMENDATIONS
+
+    kinds = [MEASUREMENT] + ([RECOMMENDATIONS] if measurement.is_processed else [])
+
+    def submit():
+        for kind in kinds:
+            try:
+                submit_render(measurement, kind)
+            except Exception:
+                logger.exception('Не удалось поставить прогрев PDF замера #%s (%s)', measurement.id, kind)
+
+    transaction.on_commit(submit)
@@ -41,6 +41,7 @@ class OrderAttachmentSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'order', 'order_item', 'file', 'file_url',
             'file_size', 'attachment_type', 'name', 'created_at',
+            'size', 'content_type', 'width', 'height', 'checksum',
         ]
         read_only_fields = ['id', 'created_at', 'file_url', 'file_size', 'attachment_type']
         extra_kwargs = {'file': {'write_only': True}}
@@ -54,10 +55,8 @@ class OrderAttachmentSerializer(serializers.ModelSerializer):
         return None
 
     def get_file_size(self, obj):
-        try:
-            return format_file_size(obj.file.size)
-        except (OSError, ValueError):
-            return ''
+        # Размер снят при загрузке — хранилище не трогаем
+        return format_file_size(obj.size)
 
     def get_attachment_type(self, obj):
         return infer_attachment_type(obj.name or obj.file.name)
@@ -125,8 +124,14 @@ class OrderItemSerializer(serializers.ModelSerializer):
         Снимок из связанного MeasurementOpening (если менеджер привязал замер).
         Используется в OrderDetail для столбцов «из Замера» и столбца «Рекомендации».
         Берём самый свежий связанный проём — на случай нескольких замеров по заказу.
+        Детальная карточка заказа подгружает его заранее для всех позиций
+        (with_latest_measurement_openings → latest_measurement_openings).
         """
-        op = obj.measurement_openings.order_by('-id').first()
+        prefetched = getattr(obj, 'latest_measurement_openings', None)
+        if prefetched is not None:
+            op = prefetched[0] if prefetched else None
+        else:
+            op = obj.measurement_openings.order_by('-id').first()
         if op is None:
             return None
         from .recommendations import build_recommendation_text
@@ -481,7 +486,10 @@ class MeasurementAttachmentSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = MeasurementAttachment
-        fields = ['id', 'measurement', 'opening', 'file', 'file_url', 'name', 'created_at']
+        fields = [
+            'id', 'measurement', 'opening', 'file', 'file_url', 'name', 'created_at',
+            'size', 'content_type', 'width', 'height', 'checksum',
+        ]
         read_only_fields = ['id', 'created_at', 'file_url']
         extra_kwargs = {'file': {'write_only': True}}
 
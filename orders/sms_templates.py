@@ -2,7 +2,7 @@
 SMS-шаблоны для уведомлений клиента/контактного лица по замеру (Фаза 5).
 
 Каждая функция возвращает готовый текст сообщения. Отправка — через
-`users.push_utils.send_sms_to_phone`. Помощник `public_pdf_url` собирает
+`orders.api_views.send_client_sms` (очередь уведомлений). Помощник `public_pdf_url` собирает
 публичную ссылку на PDF-бланк замера (доступен без авторизации по токену).
 """
 from django.conf import settings
@@ -0,0 +1,63 @@
+"""
+ACL замеров, проёмов и вложений: условие доступа в том же SQL-запросе.
+Запуск: venv/bin/python manage.py test orders.tests_acl --settings=marketingdoors.test_settings
+"""
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from users.models import City
+from orders.models import (
+    Salon, Order, OrderItem, MeasurementRequest, Measurement, MeasurementOpening,
+)
+
+User = get_user_model()
+
+
+class MeasurementAclTest(TestCase):
+    def setUp(self):
+        self.city = City.objects.create(name='Тест-город')
+        other_city = City.objects.create(name='Другой город')
+        self.salon = Salon.objects.create(name='Тест-салон', city=self.city)
+        other_salon = Salon.objects.create(name='Чужой салон', city=other_city)
+        self.manager = User.objects.create_user(
+            username='mgr', password='x', role='manager', city=self.city, salon=self.salon,
+        )
+        self.sm = User.objects.create_user(
+            username='sm', password='x', role='service_manager', city=self.city,
+        )
+        self.other_sm = User.objects.create_user(
+            username='sm2', password='x', role='service_manager', city=other_city,
+        )
+        self.openings = {}
+        for salon in (self.salon, other_salon):
+            order = Order.objects.create(manager=self.manager, salon=salon, client_name=salon.name)
+            OrderItem.objects.create(order=order, opening_number=1)
+            mr = MeasurementRequest.objects.create(order=order, contact_name='К')
+            measurement = Measurement.objects.create(request=mr, service_manager=self.sm)
+            self.openings[salon.id] = MeasurementOpening.objects.create(measurement=measurement, opening_number=1)
+
+    def test_openings_and_items_scoped_in_one_query(self):
+        client = APIClient()
+        client.force_authenticate(self.sm)
+
+        # Один запрос на список: без отдельной выборки id доступных заказов/замеров
+        with self.assertNumQueries(1):
+            r = client.get('/api/v1/order-items/')
+        self.assertEqual([row['id'] for row in r.data], list(
+            OrderItem.objects.filter(order__salon=self.salon).values_list('id', flat=True)
+        ))
+
+        r = client.get('/api/v1/measurement-openings/')
+        self.assertEqual([row['id'] for row in r.data], [self.openings[self.salon.id].id])
+
+        client.force_authenticate(self.other_sm)
+        r = client.get('/api/v1/measurement-openings/')
+        self.assertEqual([row['id'] for row in r.data], [
+            opening.id for salon_id, opening in self.openings.items() if salon_id != self.salon.id
+        ])
+
+        # Роль без доступа — пустой список
+        client.force_authenticate(User.objects.create_user(username='inst', password='x', role='installer'))
+        r = client.get('/api/v1/measurement-openings/')
+        self.assertEqual(r.data, [])
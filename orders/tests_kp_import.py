@@ -0,0 +1,124 @@
+"""
+Импорт распарсенного КП: bulk-запись, проверка строк до записи, сохранение
+связок замера при замене КП.
+Запуск: venv/bin/python manage.py test orders.tests_kp_import --settings=marketingdoors.test_settings
+"""
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from users.models import City
+from orders.models import (
+    Salon, Order, OrderItem, OrderAddon, OrderActivityLog, OrderStatus,
+    MeasurementRequest, Measurement, MeasurementOpening,
+)
+
+User = get_user_model()
+
+
+def door(number, model='Дверь', price='15000.00', **extra):
+    return {
+        'opening_number': number, 'model_name': f'{model} {number}', 'room_name': 'Комната',
+        'quantity': 1, 'price': price, 'amount': price, 'door_type': 'interior',
+        'opening_type': 'A', 'door_height': 2000, 'door_width': 800, **extra,
+    }
+
+
+ADDONS = [
+    {'kind': 'box', 'name': 'Короб', 'quantity': '2.5', 'price': '1000', 'amount': '2500'},
+    {'kind': 'service', 'name': 'Доставка', 'quantity': 1},
+]
+
+
+class KpImportTest(TestCase):
+    def setUp(self):
+        self.city = City.objects.create(name='Тест-город')
+        self.salon = Salon.objects.create(name='Тест-салон', city=self.city)
+        self.manager = User.objects.create_user(
+            username='mgr', password='x', role='manager', city=self.city, salon=self.salon,
+        )
+        self.sm = User.objects.create_user(
+            username='sm', password='x', role='service_manager', city=self.city,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def create_order(self, doors, addons=ADDONS):
+        return self.client.post('/api/v1/orders/create_from_parsed/', {
+            'salon': self.salon.id, 'client_name': 'Иванов', 'kp_number': 'КП-1',
+            'next_action_text': 'Позвонить', 'next_action_due_at': '2030-01-01T10:00:00',
+            'items': [door(n) for n in range(1, doors + 1)], 'addons': addons,
+        }, format='json')
+
+    def test_create_query_count_independent_of_rows(self):
+        with CaptureQueriesContext(connection) as small:
+            r = self.create_order(doors=2)
+        self.assertEqual(r.status_code, 201, r.content)
+        with CaptureQueriesContext(connection) as large:
+            r = self.create_order(doors=60)
+        self.assertEqual(r.status_code, 201, r.content)
+
+        self.assertEqual(len(large), len(small))
+        self.assertEqual(len(r.data['items']), 60)
+        self.assertEqual([a['name'] for a in r.data['addons']], ['Короб', 'Доставка'])
+        self.assertEqual(OrderItem.objects.filter(order_id=r.data['id']).count(), 60)
+
+    def test_invalid_row_rejected_before_any_write(self):
+        items = [door(1), door(2, price='дорого'), door(3, opening_type='Z')]
+        r = self.client.post('/api/v1/orders/create_from_parsed/', {
+            'salon': self.salon.id, 'client_name': 'Иванов',
+            'next_action_text': 'Позвонить', 'next_action_due_at': '2030-01-01T10:00:00',
+            'items': items, 'addons': [],
+        }, format='json')
+
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual(set(r.data['errors']['items']), {1, 2})
+        self.assertIn('price', r.data['errors']['items'][1])
+        self.assertFalse(Order.objects.exists())
+
+    def test_replace_keeps_measurement_links(self):
+        order_id = self.create_order(doors=3).data['id']
+        order = Order.objects.get(pk=order_id)
+        Order.objects.filter(pk=order_id).update(status=OrderStatus.MEASUREMENT_DONE)
+        mr = MeasurementRequest.objects.create(order=order, contact_name='Иванов', created_by=self.manager)
+        measurement = Measurement.objects.create(request=mr, service_manager=self.sm)
+        items = {item.opening_number: item for item in order.items.all()}
+        for number, item in items.items():
+            MeasurementOpening.objects.create(
+                measurement=measurement, order_item=item, opening_number=number, actual_height=2050,
+            )
+
+        # Новый КП: проёмы 1 и 2 другой модели, проёма 3 больше нет, добавился 4
+        r = self.client.post(f'/api/v1/orders/{order_id}/replace_from_parsed/', {
+            'kp_number': 'КП-2',
+            'items': [door(1, model='Новая'), door(2, model='Новая'), door(4, model='Новая')],
+            'addons': [ADDONS[0]],
+        }, format='json')
+        self.assertEqual(r.status_code, 200, r.content)
+
+        links = dict(MeasurementOpening.objects.values_list('opening_number', 'order_item_id'))
+        self.assertEqual(links[1], items[1].id)
+        self.assertEqual(links[2], items[2].id)
+        self.assertIsNone(links[3])
+        self.assertEqual(
+            [(i['opening_number'], i['model_name']) for i in r.data['items']],
+            [(1, 'Новая 1'), (2, 'Новая 2'), (4, 'Новая 4')],
+        )
+        self.assertEqual(r.data['items'][0]['measurement_data']['actual_height'], 2050)
+        self.assertIsNone(r.data['items'][2]['measurement_data'])
+        self.assertEqual(OrderAddon.objects.filter(order=order).count(), 1)
+        log = OrderActivityLog.objects.filter(order=order).latest('id')
+        self.assertEqual(log.meta, {'kept': 2, 'created': 1, 'removed': 1})
+
+    def test_append_continues_numbering(self):
+        order_id = self.create_order(doors=2).data['id']
+        r = self.client.post(f'/api/v1/orders/{order_id}/append_from_parsed/', {
+            'kp_number': 'КП-9', 'items': [door(1), door(2)], 'addons': [ADDONS[1]],
+        }, format='json')
+        self.assertEqual(r.status_code, 200, r.content)
+
+        self.assertEqual([i['opening_number'] for i in r.data['items']], [1, 2, 3, 4])
+        self.assertEqual([a['position'] for a in r.data['addons']], [0, 1, 2])
+        self.assertEqual(r.data['kp_number'], 'КП-1, КП-9')
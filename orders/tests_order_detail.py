@@ -0,0 +1,67 @@
+"""
+Число запросов карточки заказа не зависит от числа позиций.
+Запуск: venv/bin/python manage.py test orders.tests_order_detail --settings=marketingdoors.test_settings
+"""
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from users.models import City
+from orders.models import (
+    Salon, Order, OrderItem, OrderStatus,
+    MeasurementRequest, Measurement, MeasurementOpening,
+)
+
+User = get_user_model()
+
+
+class OrderDetailQueriesTest(TestCase):
+    def setUp(self):
+        self.city = City.objects.create(name='Тест-город')
+        self.salon = Salon.objects.create(name='Тест-салон', city=self.city)
+        self.manager = User.objects.create_user(
+            username='mgr', password='x', role='manager', city=self.city, salon=self.salon,
+        )
+        self.sm = User.objects.create_user(
+            username='sm', password='x', role='service_manager', city=self.city,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def make_order(self, doors):
+        order = Order.objects.create(
+            manager=self.manager, salon=self.salon, client_name='Иванов',
+            status=OrderStatus.MEASUREMENT_DONE,
+        )
+        mr = MeasurementRequest.objects.create(order=order, contact_name='Иванов', created_by=self.manager)
+        measurement = Measurement.objects.create(request=mr, service_manager=self.sm)
+        for number in range(1, doors + 1):
+            item = OrderItem.objects.create(order=order, opening_number=number, position=number)
+            # Два замера одной позиции — в карточку идёт более свежий
+            for height in (2000, 2000 + number):
+                MeasurementOpening.objects.create(
+                    measurement=measurement, order_item=item, opening_number=number,
+                    actual_height=height, actual_width=900, door_type='interior',
+                )
+        return order
+
+    def detail_queries(self, order):
+        with CaptureQueriesContext(connection) as ctx:
+            r = self.client.get(f'/api/v1/orders/{order.id}/')
+        self.assertEqual(r.status_code, 200, r.content)
+        return len(ctx), r.data
+
+    def test_query_count_independent_of_items(self):
+        small, _ = self.detail_queries(self.make_order(doors=2))
+        large, data = self.detail_queries(self.make_order(doors=30))
+
+        self.assertEqual(large, small)
+        items = {item['opening_number']: item for item in data['items']}
+        self.assertEqual(len(items), 30)
+        self.assertEqual(items[7]['measurement_data']['actual_height'], 2007)
+        self.assertEqual(
+            items[7]['measurement_data']['opening_id'],
+            MeasurementOpening.objects.filter(order_item_id=items[7]['id']).latest('id').id,
+        )
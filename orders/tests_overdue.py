@@ -0,0 +1,147 @@
+"""
+Производственный календарь и кроны просрочек замеров: пакетный отбор по границе рабочих дней, смена
+статусов одним UPDATE, журнал через bulk_create, push по получателям.
+Запуск: venv/bin/python manage.py test orders.tests_overdue --settings=marketingdoors.test_settings
+"""
+import datetime
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from marketingdoors.business_days import add_workdays, is_workday, workdays_between, workdays_cutoff
+from users.models import City, NotificationOutbox
+from orders.models import (
+    Salon, Order, OrderActivityLog, OrderStatus, MeasurementRequest, Measurement,
+)
+from orders.overdue import mark_not_done, mark_not_planned, mark_not_processed
+
+User = get_user_model()
+
+
+class BusinessCalendarTest(TestCase):
+    def brute_between(self, start, end):
+        day, count = start + datetime.timedelta(days=1), 0
+        while day <= end:
+            count += is_workday(day)
+            day += datetime.timedelta(days=1)
+        return count
+
+    def test_holidays_and_transfers(self):
+        # 1–8 января — праздники, 9 января 2026 — пятница
+        self.assertEqual(workdays_between(datetime.date(2025, 12, 30), datetime.date(2026, 1, 12)), 3)
+        self.assertFalse(is_workday(datetime.date(2026, 6, 12)))
+        with override_settings(
+            BUSINESS_CALENDAR_HOLIDAYS=['2025-12-31'], BUSINESS_CALENDAR_WORKING_DAYS=['2026-01-10'],
+        ):
+            self.assertEqual(workdays_between(datetime.date(2025, 12, 30), datetime.date(2026, 1, 12)), 3)
+            self.assertTrue(is_workday(datetime.date(2026, 1, 10)))
+            self.assertEqual(add_workdays(datetime.date(2025, 12, 30), 2), datetime.date(2026, 1, 10))
+        self.assertEqual(add_workdays(datetime.date(2025, 12, 30), 2), datetime.date(2026, 1, 9))
+        moment = timezone.make_aware(datetime.datetime(2026, 3, 6, 15, 30))
+        self.assertEqual(add_workdays(moment, 1), moment + datetime.timedelta(days=4))
+
+    def test_prefix_sums_match_day_by_day(self):
+        start = datetime.date(2025, 12, 20)
+        for end_offset in range(14):
+            end = start + datetime.timedelta(days=end_offset + 20)
+            for workdays in range(4):
+                cutoff = workdays_cutoff(end, workdays)
+                for day_offset in range(25):
+                    day = start + datetime.timedelta(days=day_offset)
+                    passed = self.brute_between(day, end)
+                    self.assertEqual(workdays_between(day, end), passed, (day, end))
+                    self.assertEqual(day < cutoff, passed > workdays, (day, end, workdays))
+                    if workdays:
+                        target = add_workdays(day, workdays)
+                        self.assertTrue(is_workday(target))
+                        self.assertEqual(self.brute_between(day, target), workdays)
+
+
+class MeasurementOverdueTest(TestCase):
+    def setUp(self):
+        self.city = City.objects.create(name='Тест-город')
+        self.other_city = City.objects.create(name='Другой город')
+        self.salon = Salon.objects.create(name='Тест-салон', city=self.city)
+        self.manager = User.objects.create_user(username='mgr', password='x', role='manager', city=self.city)
+        self.sms = [
+            User.objects.create_user(username=f'sm{i}', password='x', role='service_manager', city=self.city)
+            for i in range(2)
+        ]
+        self.far_sm = User.objects.create_user(
+            username='far-sm', password='x', role='service_manager', city=self.other_city,
+        )
+        self.old = timezone.now() - datetime.timedelta(days=30)
+
+    def make_order(self, status, created_at=None, **measurement):
+        order = Order.objects.create(manager=self.manager, salon=self.salon, client_name='Иванов', status=status)
+        mr = MeasurementRequest.objects.create(order=order, contact_name='Иванов', created_by=self.manager)
+        MeasurementRequest.objects.filter(pk=mr.pk).update(created_at=created_at or self.old)
+        if measurement:
+            Measurement.objects.create(request=mr, service_manager=self.sms[0], **measurement)
+        return order
+
+    def statuses(self, orders):
+        return list(Order.objects.filter(pk__in=[o.pk for o in orders]).order_by('id').values_list('status', flat=True))
+
+    def test_not_planned_groups_push_per_service_manager(self):
+        requested = OrderStatus.MEASUREMENT_REQUESTED
+        overdue = [self.make_order(requested) for _ in range(3)]
+        with_date = self.make_order(requested, measurement_date=timezone.now() + datetime.timedelta(days=1))
+        fresh = self.make_order(requested, created_at=timezone.now())
+
+        out = StringIO()
+        call_command('check_measurement_not_planned', stdout=out)
+
+        self.assertIn('Помечено просроченных заявок: 3, push в очереди: 2', out.getvalue())
+        self.assertEqual(self.statuses(overdue), [OrderStatus.MEASUREMENT_NOT_PLANNED] * 3)
+        self.assertEqual(self.statuses([with_date, fresh]), [requested, requested])
+        logs = OrderActivityLog.objects.filter(new_status=OrderStatus.MEASUREMENT_NOT_PLANNED)
+        self.assertEqual(sorted(logs.values_list('order_id', flat=True)), [o.id for o in overdue])
+        self.assertEqual({log.old_status for log in logs}, {requested})
+
+        pushes = NotificationOutbox.objects.filter(channel=NotificationOutbox.Channel.PUSH)
+        self.assertEqual(sorted(pushes.values_list('user_id', flat=True)), [sm.id for sm in self.sms])
+        payload = pushes.first().payload
+        self.assertEqual(payload['title'], 'Замер не запланирован — заказов: 3')
+        self.assertEqual(payload['data'], {'orderIds': [o.id for o in overdue]})
+
+        # Повторный прогон ничего не меняет
+        call_command('check_measurement_not_planned', stdout=StringIO())
+        self.assertEqual(logs.count(), 3)
+        self.assertEqual(pushes.count(), 2)
+
+    def test_not_done_and_not_processed(self):
+        past = timezone.now() - datetime.timedelta(hours=2)
+        not_done = self.make_order(OrderStatus.MEASUREMENT_SCHEDULED, measurement_date=past)
+        upcoming = self.make_order(
+            OrderStatus.MEASUREMENT_SCHEDULED, measurement_date=timezone.now() + datetime.timedelta(hours=2),
+        )
+        not_processed = self.make_order(OrderStatus.MEASUREMENT_DONE, is_done=True, done_at=self.old)
+        just_done = self.make_order(OrderStatus.MEASUREMENT_DONE, is_done=True, done_at=timezone.now())
+
+        self.assertEqual(mark_not_done().order_ids, [not_done.id])
+        self.assertEqual(mark_not_processed().order_ids, [not_processed.id])
+        self.assertEqual(
+            self.statuses([not_done, upcoming, not_processed, just_done]),
+            [OrderStatus.MEASUREMENT_NOT_DONE, OrderStatus.MEASUREMENT_SCHEDULED,
+             OrderStatus.MEASUREMENT_NOT_PROCESSED, OrderStatus.MEASUREMENT_DONE],
+        )
+        pushes = {job.user_id: job.payload for job in NotificationOutbox.objects.all()}
+        self.assertEqual(pushes[self.sms[0].id]['url'], f'/orders/{not_done.id}')
+        self.assertEqual(pushes[self.sms[0].id]['data']['measurementId'], not_done.measurement_request.measurement.id)
+        self.assertEqual(pushes[self.manager.id]['title'], f'Замер не обработан — заказ #{not_processed.id}')
+
+    def test_query_count_independent_of_rows(self):
+        self.make_order(OrderStatus.MEASUREMENT_REQUESTED)
+        with CaptureQueriesContext(connection) as small:
+            self.assertEqual(mark_not_planned().total, 1)
+        for _ in range(20):
+            self.make_order(OrderStatus.MEASUREMENT_REQUESTED)
+        with CaptureQueriesContext(connection) as large:
+            self.assertEqual(mark_not_planned().total, 20)
+        self.assertEqual(len(large), len(small))
@@ -0,0 +1,101 @@
+"""
+Пагинация списков: заявки без замера + замеры одним курсором; без ?cursor= /
+?page_size= списки отдаются целиком.
+Запуск: venv/bin/python manage.py test orders.tests_pagination --settings=marketingdoors.test_settings
+"""
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from users.models import City
+from orders.models import Salon, Order, OrderStatus, MeasurementRequest, Measurement
+
+User = get_user_model()
+
+
+class MeasurementListPaginationTest(TestCase):
+    def setUp(self):
+        self.city = City.objects.create(name='Тест-город')
+        self.salon = Salon.objects.create(name='Тест-салон', city=self.city)
+        self.manager = User.objects.create_user(
+            username='mgr', password='x', role='manager', city=self.city, salon=self.salon,
+        )
+        self.sm = User.objects.create_user(
+            username='sm', password='x', role='service_manager', city=self.city,
+        )
+        self.pending_orders = []
+        for index in range(3):
+            order = Order.objects.create(
+                manager=self.manager, salon=self.salon, client_name=f'Заявка {index}',
+                status=OrderStatus.MEASUREMENT_REQUESTED,
+            )
+            MeasurementRequest.objects.create(order=order, contact_name='К', created_by=self.manager)
+            self.pending_orders.append(order.id)
+        self.measurements = []
+        for index in range(4):
+            order = Order.objects.create(
+                manager=self.manager, salon=self.salon, client_name=f'Замер {index}',
+                status=OrderStatus.MEASUREMENT_SCHEDULED,
+            )
+            mr = MeasurementRequest.objects.create(order=order, contact_name='К', created_by=self.manager)
+            self.measurements.append(Measurement.objects.create(request=mr, service_manager=self.sm).id)
+
+    def test_merged_cursor(self):
+        client = APIClient()
+        client.force_authenticate(self.sm)
+
+        pages = []
+        url = '/api/v1/measurements/?page_size=2'
+        while url:
+            r = client.get(url)
+            self.assertEqual(r.status_code, 200, r.content)
+            self.assertEqual(r.data['count'], 7)
+            pages.append(r.data['results'])
+            url = r.data['next']
+
+        self.assertEqual([len(page) for page in pages], [2, 2, 2, 1])
+        rows = [row for page in pages for row in page]
+        pending = [row for row in rows if row.get('is_request_only')]
+        # Сначала все заявки без замера (по убыванию номера заказа), затем замеры
+        self.assertEqual([row['order_id'] for row in pending], sorted(self.pending_orders, reverse=True))
+        self.assertTrue(all(row.get('is_request_only') for row in rows[:3]))
+        self.assertEqual(
+            [row['id'] for row in rows[3:]],
+            list(Measurement.objects.order_by('-created_at', 'id').values_list('id', flat=True)),
+        )
+
+    def test_full_list_without_page_params(self):
+        client = APIClient()
+        client.force_authenticate(self.sm)
+
+        r = client.get('/api/v1/measurements/')
+        self.assertEqual(r.status_code, 200, r.content)
+        self.assertEqual(len(r.data), 7)
+        self.assertTrue(all(row.get('is_request_only') for row in r.data[:3]))
+
+        client.force_authenticate(self.manager)
+        for url in ['/api/v1/orders/', '/api/v1/workshop/']:
+            r = client.get(url)
+            self.assertEqual(r.status_code, 200, r.content)
+            self.assertEqual(len(r.data), 7)
+            r = client.get(url, {'page_size': 5})
+            self.assertEqual(len(r.data['results']), 5)
+            self.assertIsNotNone(r.data['next'])
+
+    def test_unpaginated_list_keeps_requested_ordering(self):
+        from datetime import timedelta
+        from django.utils import timezone
+
+        now = timezone.now()
+        # measurement_date — в порядке, обратном созданию
+        for offset, measurement_id in enumerate(self.measurements):
+            Measurement.objects.filter(pk=measurement_id).update(
+                measurement_date=now + timedelta(days=len(self.measurements) - offset),
+            )
+        client = APIClient()
+        client.force_authenticate(self.sm)
+
+        r = client.get('/api/v1/measurements/', {'folder': 'scheduled', 'ordering': 'measurement_date'})
+        self.assertEqual([row['id'] for row in r.data], list(reversed(self.measurements)))
+        r = client.get('/api/v1/measurements/', {'folder': 'scheduled', 'ordering': '-measurement_date'})
+        self.assertEqual([row['id'] for row in r.data], self.measurements)
@@ -0,0 +1,204 @@
+"""
+Кэш PDF-бланков замера: рендер один раз на версию данных, ETag/304;
+пул рендера: ответ 202 «формируется» по публичной ссылке, ожидание рендера
+при скачивании из SPA и прогрев после действий с замером;
+уменьшенные копии фото для бланка.
+Запуск: venv/bin/python manage.py test orders.tests_pdf_cache --settings=marketingdoors.test_settings
+"""
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import Future
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from users.models import City
+from orders.models import Salon, Order, MeasurementRequest, Measurement, MeasurementOpening
+from orders import pdf_render_pool
+from orders.pdf_cache import MEASUREMENT, cached_entry, store_blank
+from orders.pdf_images import print_image_path
+
+User = get_user_model()
+
+
+class PdfFixturesMixin:
+    def setUp(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir, ignore_errors=True)
+        pdf_cache = override_settings(PDF_CACHE_DIR=cache_dir, MEDIA_ROOT=cache_dir)
+        pdf_cache.enable()
+        self.addCleanup(pdf_cache.disable)
+
+        city = City.objects.create(name='Тест-город')
+        salon = Salon.objects.create(name='Тест-салон', city=city)
+        manager = User.objects.create_user(username='mgr', password='x', role='manager', salon=salon)
+        self.sm = sm = User.objects.create_user(username='sm', password='x', role='service_manager', city=city)
+        order = Order.objects.create(manager=manager, salon=salon, client_name='Клиент')
+        mr = MeasurementRequest.objects.create(order=order, contact_name='К')
+        self.measurement = Measurement.objects.create(request=mr, service_manager=sm)
+        self.opening = MeasurementOpening.objects.create(measurement=self.measurement, opening_number=1)
+        self.url = f'/api/v1/public/measurements/{self.measurement.client_access_token}/pdf/'
+
+        renders = []
+
+        def fake_render(measurement, kind):
+            renders.append(kind)
+            return f'%PDF-{len(renders)}'.encode()
+
+        patcher = mock.patch('orders.pdf_cache.render_blank', side_effect=fake_render)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.renders = renders
+        self.cache_dir = cache_dir
+
+
+class PdfCacheTest(PdfFixturesMixin, TestCase):
+    def test_rendered_once_per_version(self):
+        client = APIClient()
+
+        r = client.get(self.url)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(b''.join(r.streaming_content), b'%PDF-1')
+        etag = r['ETag']
+
+        r = client.get(self.url)
+        self.assertEqual(b''.join(r.streaming_content), b'%PDF-1')
+        self.assertEqual(len(self.renders), 1)
+
+        r = client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 304)
+
+        # Правка проёма — новый отпечаток, новый рендер, старый файл удалён
+        self.opening.actual_height = 2050
+        self.opening.save()
+        r = client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 200)
+        self.assertNotEqual(r['ETag'], etag)
+        self.assertEqual(b''.join(r.streaming_content), b'%PDF-2')
+        directory = os.path.join(self.cache_dir, 'measurement', str(self.measurement.id))
+        self.assertEqual(len(os.listdir(directory)), 1)
+
+
+class FakeExecutor:
+    """Пул, задания которого завершаются только вручную"""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, fn, *args):
+        future = Future()
+        self.submitted.append((args, future))
+        return future
+
+
+@override_settings(PDF_RENDER_WORKERS=2, PDF_RENDER_WAIT_SECONDS=0.01)
+class PdfRenderPoolTest(PdfFixturesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.executor = FakeExecutor()
+        patcher = mock.patch('orders.pdf_render_pool.get_executor', return_value=self.executor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(pdf_render_pool._in_flight.clear)
+
+    def test_rendering_response_while_pool_busy(self):
+        client = APIClient()
+
+        r = client.get(self.url)
+        self.assertEqual(r.status_code, 202)
+        self.assertEqual(r['Retry-After'], '3')
+        client.get(self.url)
+        # Повторный запрос не ставит второе задание на тот же бланк
+        self.assertEqual(len(self.executor.submitted), 1)
+        (measurement_id, kind), future = self.executor.submitted[0]
+        self.assertEqual((measurement_id, kind), (self.measurement.id, MEASUREMENT))
+
+        store_blank(cached_entry(self.measurement, MEASUREMENT), b'%PDF-pool')
+        future.set_result(None)
+        r = client.get(self.url)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(b''.join(r.streaming_content), b'%PDF-pool')
+        self.assertEqual(self.renders, [])
+
+    def test_staff_download_waits_for_render(self):
+        entry = cached_entry(self.measurement, MEASUREMENT)
+
+        def submit(fn, *args):
+            # Рендер дольше PDF_RENDER_WAIT_SECONDS
+            future = Future()
+
+            def finish():
+                store_blank(entry, b'%PDF-pool')
+                future.set_result(None)
+
+            threading.Timer(0.2, finish).start()
+            return future
+
+        self.executor.submit = submit
+        client = APIClient()
+        client.force_authenticate(self.sm)
+        r = client.get(f'/api/v1/measurements/{self.measurement.id}/download_blank_pdf/')
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r['Content-Type'], 'application/pdf')
+        self.assertEqual(b''.join(r.streaming_content), b'%PDF-pool')
+
+    def test_prewarm_after_signature_upload(self):
+        client = APIClient()
+        client.force_authenticate(self.sm)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            r = client.post(
+                f'/api/v1/measurements/{self.measurement.id}/upload_signature/',
+                {'signature': SimpleUploadedFile('sign.jpg', b'jpeg', content_type='image/jpeg')},
+            )
+        self.assertEqual(r.status_code, 200, r.content)
+        self.assertEqual(
+            [args for args, _ in self.executor.submitted],
+            [(self.measurement.id, MEASUREMENT)],
+        )
+
+
+class PrintImageTest(TestCase):
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.workdir, ignore_errors=True)
+        media = override_settings(PDF_CACHE_DIR=self.workdir, PDF_IMAGE_MAX_PX=800)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def test_downscaled_copy_is_cached(self):
+        from PIL import Image
+
+        source = os.path.join(self.workdir, 'photo.jpg')
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Orientation: повернуть на 90° — снимок «портретом»
+        Image.effect_noise((3000, 2000), 64).convert('RGB').save(source, 'JPEG', quality=95, exif=exif)
+
+        path = print_image_path(source)
+        self.assertNotEqual(path, source)
+        with Image.open(path) as copy:
+            self.assertEqual((copy.format, copy.size), ('JPEG', (533, 800)))
+        self.assertLess(os.path.getsize(path), os.path.getsize(source))
+
+        mtime = os.path.getmtime(path)
+        self.assertEqual(print_image_path(source), path)
+        self.assertEqual(os.path.getmtime(path), mtime)
+
+    def test_transparent_plan_and_broken_file(self):
+        from PIL import Image
+
+        plan = os.path.join(self.workdir, 'plan.png')
+        Image.new('RGBA', (1200, 900), (0, 0, 0, 0)).save(plan)
+        with Image.open(print_image_path(plan)) as copy:
+            self.assertEqual((copy.mode, copy.getpixel((0, 0))), ('RGB', (255, 255, 255)))
+
+        broken = os.path.join(self.workdir, 'broken.jpg')
+        with open(broken, 'wb') as f:
+            f.write(b'not an image')
+        with self.assertLogs('orders.pdf_images', 'WARNING'):
+            self.assertEqual(print_image_path(broken), broken)
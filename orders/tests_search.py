@@ -0,0 +1,98 @@
+"""
+Поиск по денормализованному документу: нормализация телефонов, пересборка документа в save(),
+?search= списков заказов, наработок и замеров.
+Запуск: venv/bin/python manage.py test orders.tests_search --settings=marketingdoors.test_settings
+"""
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from marketingdoors.search import build_document, search_term_variants, search_terms
+from users.models import City
+from orders.models import Salon, Order, OrderStatus, MeasurementRequest, Measurement
+
+User = get_user_model()
+
+
+class SearchDocumentTest(TestCase):
+    def setUp(self):
+        self.city = City.objects.create(name='Тест-город')
+        self.salon = Salon.objects.create(name='Салон Дверной', city=self.city)
+        self.manager = User.objects.create_user(
+            username='mgr', password='x', role='manager', city=self.city, salon=self.salon,
+            first_name='Пётр', last_name='Сидоров',
+        )
+        self.sm = User.objects.create_user(username='sm', password='x', role='service_manager', city=self.city)
+        self.order = Order.objects.create(
+            manager=self.manager, salon=self.salon, client_name='Ёлкин Артём', kp_number='КП-2024/17',
+            contact_phone='+7 (999) 123-45-67', address='ул. Ленина, 5',
+            status=OrderStatus.MEASUREMENT_REQUESTED,
+        )
+        self.other = Order.objects.create(
+            manager=self.manager, salon=self.salon, client_name='Петров', contact_phone='8 912 000-11-22',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def found(self, url, query, key='id'):
+        r = self.client.get(url, {'search': query})
+        self.assertEqual(r.status_code, 200, r.content)
+        return sorted(row[key] for row in r.data)
+
+    def test_phone_normalization(self):
+        self.assertEqual(search_terms('+7 (999)'), ['7999'])
+        self.assertEqual(search_terms('Ёлкин  8-999'), ['елкин', '8999'])
+        self.assertEqual(search_term_variants('Ёлкин 8-999'), [('елкин',), ('8999', '8-999')])
+        document = build_document(['Иванов'], ['+7 (999) 123-45-67'])
+        self.assertEqual(document, 'иванов | 79991234567 | 89991234567 | 9991234567')
+
+    def test_order_and_workshop_search(self):
+        for url in ['/api/v1/orders/', '/api/v1/workshop/']:
+            self.assertEqual(self.found(url, '+7 (999)'), [self.order.id])
+            self.assertEqual(self.found(url, '8999123'), [self.order.id])
+            self.assertEqual(self.found(url, '912 000'), [self.other.id])
+            self.assertEqual(self.found(url, 'елкин КП-2024'), [self.order.id])
+            self.assertEqual(self.found(url, 'сидоров'), sorted([self.order.id, self.other.id]))
+            self.assertEqual(self.found(url, 'дверной'), sorted([self.order.id, self.other.id]))
+            # Число ищется и как номер заказа (плюс вхождение в документ, например в телефон)
+            self.assertIn(self.other.id, self.found(url, str(self.other.id)))
+            self.assertEqual(self.found(url, 'нет такого'), [])
+
+    def test_dashed_numbers(self):
+        dashed = Order.objects.create(
+            manager=self.manager, salon=self.salon, client_name='Смирнов', kp_number='2024-17',
+            address='ул. Мира, 5-7',
+        )
+        for url in ['/api/v1/orders/', '/api/v1/workshop/']:
+            self.assertEqual(self.found(url, '2024-17'), [dashed.id])
+            self.assertEqual(self.found(url, 'мира 5-7'), [dashed.id])
+
+    def test_document_follows_saves(self):
+        self.order.client_name = 'Новиков'
+        self.order.save()
+        self.assertIn('новиков', Order.objects.get(pk=self.order.pk).search_document)
+
+        # Сохранение без исходных полей документ не пересобирает
+        self.order.status = OrderStatus.MEASUREMENT_SCHEDULED
+        self.order.save(update_fields=['status'])
+
+        request = MeasurementRequest.objects.create(
+            order=self.order, contact_name='Смирнова Ольга', contact_phone='89161112233', created_by=self.manager,
+        )
+        Measurement.objects.create(request=request, service_manager=self.sm)
+        self.client.force_authenticate(self.sm)
+        measurement_url = '/api/v1/measurements/'
+        self.assertEqual(self.found(measurement_url, '+7 916 111', 'order_id'), [self.order.id])
+        self.assertEqual(self.found(measurement_url, 'смирнова', 'order_id'), [self.order.id])
+
+        # Массовое обновление мимо save() догоняет команда
+        Order.objects.filter(pk=self.other.pk).update(client_name='Кузнецов')
+        User.objects.filter(pk=self.manager.pk).update(last_name='Орлов')
+        out = StringIO()
+        call_command('rebuild_search_documents', '--model', 'order', stdout=out)
+        self.assertIn('проверено 2, обновлено 2', out.getvalue())
+        self.assertIn('кузнецов', Order.objects.get(pk=self.other.pk).search_document)
+        self.assertIn('смирнова ольга', Order.objects.get(pk=self.order.pk).search_document)
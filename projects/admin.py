@@ -6,9 +6,12 @@ from .models import (
     DefectiveProduct,
     ComplaintAttachment,
     ComplaintComment,
+    ComplaintEvent,
     ShippingRegistry,
     ReturnRegistry,
-    Notification
+    Notification,
+    ParsedPdf,
+    PdfParseJob,
 )
 
 
@@ -182,7 +185,7 @@ class ComplaintAttachmentAdmin(admin.ModelAdmin):
     )
     list_filter = ('attachment_type', 'uploaded_at')
     search_fields = ('description', 'complaint__order_number')
-    readonly_fields = ('uploaded_at', 'file_size')
+    readonly_fields = ('uploaded_at', 'file_size', 'content_type', 'width', 'height', 'checksum')
     ordering = ('-uploaded_at',)
 
 
@@ -200,6 +203,16 @@ class ComplaintCommentAdmin(admin.ModelAdmin):
     text_preview.short_description = 'Текст'
 
 
+@admin.register(ComplaintEvent)
+class ComplaintEventAdmin(admin.ModelAdmin):
+    list_display = ('id', 'complaint', 'kind', 'actor', 'old_status', 'new_status', 'created_at')
+    list_filter = ('kind',)
+    search_fields = ('complaint__order_number', 'description')
+    raw_id_fields = ('complaint', 'actor')
+    date_hierarchy = 'created_at'
+    readonly_fields = ('created_at',)
+
+
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
     list_display = (
@@ -302,3 +315,24 @@ class ReturnRegistryAdmin(admin.ModelAdmin):
     )
 
 
+
+
+@admin.register(ParsedPdf)
+class ParsedPdfAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'checksum', 'size', 'hits', 'created_at', 'last_used_at')
+    list_filter = ('kind',)
+    search_fields = ('checksum',)
+    readonly_fields = ('kind', 'checksum', 'parser_version', 'result', 'size', 'hits', 'created_at', 'last_used_at')
+    ordering = ('-last_used_at',)
+
+
+@admin.register(PdfParseJob)
+class PdfParseJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'file_name', 'created_by', 'created_at', 'finished_at')
+    list_filter = ('kind', 'status')
+    search_fields = ('file_name', 'checksum', 'created_by__username')
+    readonly_fields = (
+        'kind', 'status', 'file_name', 'checksum', 'size', 'result', 'error',
+        'created_by', 'created_at', 'started_at', 'finished_at',
+    )
+    ordering = ('-created_at',)
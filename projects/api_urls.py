@@ -11,6 +11,8 @@ from .api_views import (
     ComplaintAttachmentViewSet,
     ComplaintCommentViewSet,
     DashboardStatsView,
+    DashboardCacheStatsView,
+    PdfParseJobViewSet,
 )
 
 router = DefaultRouter()
@@ -23,11 +25,13 @@ router.register(r'complaint-reasons', ComplaintReasonViewSet, basename='complain
 router.register(r'defective-products', DefectiveProductViewSet, basename='defective-product')
 router.register(r'attachments', ComplaintAttachmentViewSet, basename='attachment')
 router.register(r'comments', ComplaintCommentViewSet, basename='comment')
+router.register(r'pdf-parse-jobs', PdfParseJobViewSet, basename='pdf-parse-job')
 
 app_name = 'projects_api'
 
 urlpatterns = [
     path('', include(router.urls)),
     path('dashboard/stats/', DashboardStatsView.as_view(), name='dashboard-stats'),
+    path('dashboard/cache-stats/', DashboardCacheStatsView.as_view(), name='dashboard-cache-stats'),
 ]
 
@@ -2,6 +2,7 @@ from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework.parsers import FormParser, MultiPartParser
 from rest_framework.filters import SearchFilter, OrderingFilter
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db.models import Q, Count
@@ -11,10 +12,12 @@ from django.urls import reverse
 from datetime import datetime
 
 from .models import (
+    CLOSED_STATUSES,
     Complaint,
     DefectiveProduct,
     ComplaintAttachment,
     ComplaintComment,
+    ComplaintEvent,
     ShippingRegistry,
     ReturnRegistry,
     Notification,
@@ -22,6 +25,8 @@ from .models import (
     ComplaintReason,
     ComplaintStatus,
     ComplaintType,
+    ParsedPdf,
+    PdfParseJob,
 )
 from .serializers import (
     ComplaintListSerializer,
@@ -30,14 +35,22 @@ from .serializers import (
     DefectiveProductSerializer,
     ComplaintAttachmentSerializer,
     ComplaintCommentSerializer,
+    ComplaintEventSerializer,
     ShippingRegistrySerializer,
     ReturnRegistrySerializer,
     NotificationSerializer,
     ProductionSiteSerializer,
     ComplaintReasonSerializer,
+    PdfParseJobSerializer,
 )
 from users.models import User
-from users.push_utils import send_email_notification
+from users.notification_outbox import enqueue_email
+from marketingdoors import dashboard_cache
+from marketingdoors.pagination import CountedKeysetPagination
+from marketingdoors.search import SearchDocumentFilter
+from .overdue import run_overdue_engine
+from .dashboard import dashboard_counts, task_filter
+from .projections import requested_projection
 
 
 def _manager_has_complaint_access(user, complaint):
@@ -68,8 +81,9 @@ class IsAuthenticated(permissions.IsAuthenticated):
     pass
 
 
-# Завершённые статусы: по умолчанию скрыты в списке рекламаций
-CLOSED_STATUSES = ['closed', 'completed', 'resolved']
+class ComplaintHistoryPagination(CountedKeysetPagination):
+    """История рекламации: от новых событий к старым (при равном времени — позже записанные выше)"""
+    ordering = ('-created_at', '-id')
 
 
 class ComplaintViewSet(viewsets.ModelViewSet):
@@ -83,10 +97,13 @@ class ComplaintViewSet(viewsets.ModelViewSet):
     partial_update: Частичное обновление рекламации
     """
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    search_fields = ['order_number', 'client_name', 'address', 'contact_person', 'contact_phone']
+    filter_backends = [DjangoFilterBackend, SearchDocumentFilter, OrderingFilter]
+    # ?search= — по поисковому документу (номер заказа, клиент, адрес, контакт, телефон, менеджер)
+    search_document_field = 'search_document'
+    search_id_fields = ['id']
     ordering_fields = ['created_at', 'updated_at', 'status', 'order_number']
     ordering = ['-created_at']
+    pagination_class = CountedKeysetPagination
     filterset_fields = ['status', 'complaint_type', 'production_site', 'reason']
     
     def get_queryset(self):
@@ -99,11 +116,22 @@ class ComplaintViewSet(viewsets.ModelViewSet):
             'production_site',
             'reason',
             'installer_assigned'
-        ).prefetch_related(
-            'defective_products',
-            'attachments',
-            'comments__author'
         )
+        if self.action == 'list':
+            # Список не показывает изделия, файлы и комментарии; UserSerializer
+            # вкладывает город и салон — подтягиваем их тем же запросом
+            queryset = queryset.select_related(*(
+                f'{relation}__{nested}'
+                for relation in ('initiator', 'recipient', 'manager', 'installer_assigned')
+                for nested in ('city', 'salon')
+            ))
+        elif self.action != 'history':
+            # История читает только журнал событий — изделия, файлы и комментарии ей не нужны
+            queryset = queryset.prefetch_related(
+                'defective_products',
+                'attachments',
+                'comments__author'
+            )
         
         # Фильтрация по ролям
         # Администратор видит все рекламации. Django superuser (is_staff) тоже получает полный доступ
@@ -158,74 +186,11 @@ class ComplaintViewSet(viewsets.ModelViewSet):
                 # Не перезаписываем базовый фильтр
                 pass
         
-        # Обработка my_tasks (как в Django views)
+        # Обработка my_tasks: условия плиток берём из общего реестра дашборда
         if my_tasks:
-            completed_statuses = {
-                ComplaintStatus.COMPLETED,
-                ComplaintStatus.RESOLVED,
-                ComplaintStatus.CLOSED,
-            }
-            active_statuses = [status for status, _ in ComplaintStatus.choices if status not in completed_statuses]
-            sm_overdue_filter = (
-                Q(status='sm_response_overdue') |
-                Q(status='factory_approved', sm_response_deadline__lt=timezone.now())
-            )
-            
-            role_task_filters = {
-                'installer': {
-                    'in_work': (Q(installer_assigned=user) | Q(initiator=user)) & Q(status__in=active_statuses),
-                    'needs_planning': Q(installer_assigned=user, status__in=[
-                        'waiting_installer_date', 'needs_planning', 'installer_not_planned', 'installer_overdue'
-                    ]),
-                    'planned': Q(installer_assigned=user, status__in=[
-                        'installation_planned', 'both_planned'
-                    ]),
-                    'completed': Q(installer_assigned=user, status__in=[
-                        'under_sm_review', 'completed'
-                    ]),
-                },
-                'manager': {
-                    'in_work': (Q(manager=user) | Q(initiator=user) | Q(recipient=user)) & Q(status__in=active_statuses),
-                    'new': Q(status='new'),
-                    'in_progress': Q(manager=user, status='in_progress'),
-                    'on_warehouse': Q(manager=user, status='on_warehouse'),
-                    'shipping_overdue': Q(status='shipping_overdue'),
-                    'return_required': Q(manager=user, return_required=True, return_planned_date__isnull=True),
-                },
-                'service_manager': {
-                    'in_work': Q(status__in=active_statuses),
-                    'new': Q(status='new'),
-                    'review': Q(status__in=['under_sm_review', 'factory_approved', 'factory_rejected']),
-                    'overdue': sm_overdue_filter,
-                    'plan_installation': Q(status='shipping_planned'),
-                },
-                'complaint_department': {
-                    'in_work': Q(complaint_type='factory', status__in=active_statuses),
-                    'pending': Q(complaint_type='factory', status='sent'),
-                    'overdue': Q(complaint_type='factory', status='factory_response_overdue'),
-                    'moscow_service_overdue': Q(complaint_type='factory') & (
-                        Q(status='moscow_service_overdue') |
-                        Q(status='moscow_service', moscow_service_deadline__lt=timezone.now())
-                    ),
-                },
-                'admin': {
-                    'new': Q(status='new'),
-                    'factory_overdue': Q(status='factory_response_overdue'),
-                    'shipping_overdue': Q(status='shipping_overdue'),
-                    'sm_overdue': sm_overdue_filter,
-                },
-                'leader': {
-                    'new': Q(status='new'),
-                    'factory_overdue': Q(status='factory_response_overdue'),
-                    'shipping_overdue': Q(status='shipping_overdue'),
-                    'sm_overdue': sm_overdue_filter,
-                },
-            }
-            
-            role_filters = role_task_filters.get(user.role, {})
-            task_filter = role_filters.get(my_tasks)
-            if task_filter:
-                queryset = queryset.filter(task_filter)
+            my_tasks_filter = task_filter(user, my_tasks)
+            if my_tasks_filter is not None:
+                queryset = queryset.filter(my_tasks_filter)
         
         if needs_planning and user.role == 'installer':
             # Для монтажника дополняем базовый фильтр статусами, не перезаписываем
@@ -252,56 +217,6 @@ class ComplaintViewSet(viewsets.ModelViewSet):
         
         return queryset
     
-    def list(self, request, *args, **kwargs):
-        """Переопределяем list для проверки просрочки монтажника"""
-        # Получаем queryset
-        queryset = self.filter_queryset(self.get_queryset())
-        
-        # Проверяем просрочку для рекламаций с монтажником
-        installer_complaints = queryset.filter(
-            installer_assigned__isnull=False,
-            installer_assigned_at__isnull=False
-        ).exclude(
-            status__in=['completed', 'resolved', 'closed']
-        )
-        
-        for complaint in installer_complaints:
-            complaint.check_installer_overdue()
-
-        # Проверяем просрочку сервисных заявок Москва
-        moscow_service_complaints = queryset.filter(
-            status__in=['moscow_service', 'moscow_service_overdue'],
-            moscow_service_deadline__isnull=False
-        )
-        for complaint in moscow_service_complaints:
-            complaint.check_moscow_service_overdue()
-
-        # Возвращаем обновленный queryset через стандартный list
-        response = super().list(request, *args, **kwargs)
-        return response
-
-    def retrieve(self, request, *args, **kwargs):
-        """
-        При открытии рекламации пересчитываем просрочку монтажа, чтобы статус был
-        актуален независимо от того, как и где меняли дату монтажа (перенос с фронта,
-        правка через админку и т.п.). Раньше пересчёт делал только list(), поэтому на
-        детальной висел старый статус «Просрочена монтажником», даже если новая дата
-        монтажа уже в будущем.
-        """
-        complaint = self.get_object()
-        if (
-            complaint.installer_assigned_id
-            and complaint.installer_assigned_at
-            and complaint.status not in ('completed', 'resolved', 'closed')
-        ):
-            complaint.check_installer_overdue()
-            complaint.refresh_from_db()
-        if complaint.status in ('moscow_service', 'moscow_service_overdue'):
-            complaint.check_moscow_service_overdue()
-            complaint.refresh_from_db()
-        serializer = self.get_serializer(complaint)
-        return Response(serializer.data)
-
     def get_object(self):
         """Переопределяем для проверки доступа ОР к фабричным рекламациям"""
         user = self.request.user
@@ -315,13 +230,33 @@ class ComplaintViewSet(viewsets.ModelViewSet):
                 if obj.complaint_type != 'factory':
                     from rest_framework.exceptions import PermissionDenied
                     raise PermissionDenied('У вас нет доступа к этой рекламации')
-                return obj
             except Complaint.DoesNotExist:
                 from rest_framework.exceptions import NotFound
                 raise NotFound('Рекламация не найдена')
-        
-        # Для остальных ролей используем стандартную логику
-        return super().get_object()
+        else:
+            # Для остальных ролей используем стандартную логику
+            obj = super().get_object()
+
+        # Действия пользователя попадают в журнал ComplaintEvent с его именем
+        obj.event_actor = user
+        return obj
+    
+    def list(self, request, *args, **kwargs):
+        """
+        Список рекламаций. ?view=compact или ?fields=... — плоская проекция
+        (только нужные колонки через .values(), без сериализаторов DRF).
+        """
+        projection = requested_projection(request)
+        if projection is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        ordering = self.paginator.get_ordering(request, queryset, self)
+        records = projection.values(queryset, [field.lstrip('-') for field in ordering])
+        page = self.paginator.paginate_queryset(records, request, view=self)
+        if page is None:
+            return Response(projection.rows(records.order_by(*ordering)))
+        return self.paginator.get_paginated_response(projection.rows(page))
     
     def get_serializer_class(self):
         """Выбор сериализатора в зависимости от действия"""
@@ -342,6 +277,7 @@ class ComplaintViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         complaint = serializer.save()
+        complaint.event_actor = request.user
         
         # Обрабатываем вложения (файлы)
         files = request.FILES.getlist('attachments')
@@ -415,6 +351,7 @@ class ComplaintViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(instance, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
         complaint = serializer.save()
+        complaint.event_actor = request.user
 
         # Если СМ (или admin) при редактировании сменил тип рекламации (маршрут) —
         # запускаем соответствующий сценарий: смену статуса и уведомления получателю.
@@ -505,7 +442,8 @@ class ComplaintViewSet(viewsets.ModelViewSet):
         Принимает PDF файл через FormData (ключ 'pdf_file')
         Возвращает JSON с извлеченными данными
         """
-        from .pdf_parser import parse_complaint_pdf
+        from .pdf_parse_cache import cached_parse
+        from .pdf_parse_service import ParseBusy
         
         # Проверяем наличие файла
         if 'pdf_file' not in request.FILES:
@@ -524,8 +462,8 @@ class ComplaintViewSet(viewsets.ModelViewSet):
             )
         
         try:
-            # Парсим PDF
-            parsed_data = parse_complaint_pdf(pdf_file)
+            # Парсим PDF (повторная загрузка того же файла — из кэша разбора)
+            parsed_data = cached_parse(ParsedPdf.KIND_COMPLAINT, pdf_file)
             
             return Response(parsed_data, status=status.HTTP_200_OK)
             
@@ -535,6 +473,9 @@ class ComplaintViewSet(viewsets.ModelViewSet):
                 {'error': str(e)},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        except ParseBusy:
+            # Все слоты разбора заняты — 503 с Retry-After
+            raise
         except Exception as e:
             # Неожиданная ошибка
             import logging
@@ -1159,7 +1100,7 @@ class ComplaintViewSet(viewsets.ModelViewSet):
 
         # Сразу пересчитываем просрочку: если новая дата в будущем — снимаем
         # статус «Просрочена монтажником», не дожидаясь следующего открытия списка.
-        complaint.check_installer_overdue()
+        run_overdue_engine(Complaint.objects.filter(pk=complaint.pk))
         complaint.refresh_from_db()
 
         # Создаем комментарий о переносе
@@ -1235,7 +1176,7 @@ class ComplaintViewSet(viewsets.ModelViewSet):
 <p style="margin-top: 16px; color: #718096; font-size: 13px;">Это автоматическое уведомление системы рекламаций.</p>
 </body></html>
 """
-            send_email_notification(
+            enqueue_email(
                 to_email=city_email,
                 subject=f'Товар на складе — Рекламация #{complaint.id} (заказ {complaint.order_number})',
                 message=f'Товар по рекламации #{complaint.id} (заказ {complaint.order_number}) на складе. Клиент: {complaint.client_name}, Адрес: {complaint.address}',
@@ -1448,9 +1389,7 @@ class ComplaintViewSet(viewsets.ModelViewSet):
         closure_reason = request.data.get('closure_reason', '').strip()
         
         # Устанавливаем статус закрыта
-        complaint.status = ComplaintStatus.CLOSED
-        complaint.completion_date = timezone.now()
-        complaint.save()
+        complaint.change_status(ComplaintStatus.CLOSED, completion_date=timezone.now())
         
         # Создаем комментарий о завершении
         if closure_reason:
@@ -1515,129 +1454,24 @@ class ComplaintViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['get'])
     def history(self, request, pk=None):
-        """История изменений и событий рекламации"""
+        """
+        История рекламации из журнала ComplaintEvent: события от новых к старым
+        одним запросом по индексу (complaint, -created_at).
+        По умолчанию — весь журнал (страница истории в SPA показывает его целиком);
+        ?cursor= / ?page_size= — постранично, как в остальных списках API.
+        """
         complaint = self.get_object()
-
-        def _user_dict(user):
-            if not user:
-                return None
-            return {
-                'id': user.id,
-                'username': user.username,
-                'first_name': getattr(user, 'first_name', '') or '',
-                'last_name': getattr(user, 'last_name', '') or '',
-                'role': getattr(user, 'role', '') or '',
-            }
-
-        history_events = []
-
-        # 1. Создание рекламации (всегда есть)
-        history_events.append({
-            'type': 'created',
-            'date': complaint.created_at.isoformat() if complaint.created_at else None,
-            'user': _user_dict(complaint.initiator),
-            'title': 'Рекламация создана',
-            'description': f"Инициатор: {complaint.initiator.get_full_name() or complaint.initiator.username}",
-            'icon': 'create',
-            'color': 'blue',
-        })
-
-        # 2. Комментарии
-        comments = complaint.comments.all().select_related('author')
-        for comment in comments:
-            history_events.append({
-                'type': 'comment',
-                'date': comment.created_at.isoformat() if comment.created_at else None,
-                'user': _user_dict(comment.author),
-                'title': 'Комментарий добавлен',
-                'description': comment.text,
-                'icon': 'comment',
-                'color': 'gray',
-            })
-
-        # 3. Отправленные уведомления
-        notifications = complaint.notifications.filter(is_sent=True).select_related('recipient')
-        for notification in notifications:
-            date = notification.sent_at or notification.created_at
-            history_events.append({
-                'type': 'notification',
-                'date': date.isoformat() if date else None,
-                'user': _user_dict(notification.recipient),
-                'title': f'Уведомление: {notification.title}',
-                'description': f'{notification.get_notification_type_display()} → {notification.recipient.get_full_name() or notification.recipient.username}',
-                'icon': 'notification',
-                'color': 'yellow',
-            })
-
-        # 4. Обновление рекламации
-        if complaint.updated_at and complaint.created_at and complaint.updated_at != complaint.created_at:
-            history_events.append({
-                'type': 'updated',
-                'date': complaint.updated_at.isoformat(),
-                'user': None,
-                'title': 'Рекламация обновлена',
-                'description': f'Текущий статус: {complaint.get_status_display()}',
-                'icon': 'update',
-                'color': 'purple',
-            })
-
-        # 5. Назначение монтажника
-        if complaint.installer_assigned:
-            installer_comment = comments.filter(text__icontains='монтажник').first()
-            date = installer_comment.created_at if installer_comment else (complaint.installer_assigned_at or complaint.updated_at)
-            if date:
-                history_events.append({
-                    'type': 'installer_assigned',
-                    'date': date.isoformat(),
-                    'user': _user_dict(installer_comment.author) if installer_comment else _user_dict(complaint.installer_assigned),
-                    'title': 'Назначен монтажник',
-                    'description': f"Монтажник: {complaint.installer_assigned.get_full_name() or complaint.installer_assigned.username}",
-                    'icon': 'user',
-                    'color': 'green',
-                })
-
-        # 6. Планирование монтажа
-        if complaint.planned_installation_date:
-            history_events.append({
-                'type': 'installation_planned',
-                'date': complaint.planned_installation_date.isoformat(),
-                'user': _user_dict(complaint.installer_assigned),
-                'title': 'Монтаж запланирован',
-                'description': f"Дата: {complaint.planned_installation_date.strftime('%d.%m.%Y')}",
-                'icon': 'calendar',
-                'color': 'indigo',
-            })
-
-        # 7. Планирование отгрузки
-        if complaint.planned_shipping_date:
-            history_events.append({
-                'type': 'shipping_planned',
-                'date': complaint.planned_shipping_date.isoformat(),
-                'user': _user_dict(complaint.manager),
-                'title': 'Отгрузка запланирована',
-                'description': f"Дата: {complaint.planned_shipping_date.strftime('%d.%m.%Y')}",
-                'icon': 'truck',
-                'color': 'orange',
-            })
-
-        # 8. Завершение
-        if complaint.completion_date:
-            history_events.append({
-                'type': 'completed',
-                'date': complaint.completion_date.isoformat(),
-                'user': None,
-                'title': 'Рекламация завершена',
-                'description': f"Дата завершения: {complaint.completion_date.strftime('%d.%m.%Y %H:%M')}",
-                'icon': 'check',
-                'color': 'green',
-            })
-
-        # Сортируем по дате (от новых к старым)
-        history_events.sort(key=lambda x: x['date'] or '', reverse=True)
-
+        paginator = ComplaintHistoryPagination()
+        events = ComplaintEvent.objects.filter(complaint=complaint).select_related('actor')
+        page = paginator.paginate_queryset(events, request)
+        if page is None:
+            data = ComplaintEventSerializer(events.order_by(*paginator.ordering), many=True).data
+            return Response({'events': data, 'total': len(data), 'next': None})
         return Response({
-            'events': history_events,
-            'total': len(history_events),
+            'events': ComplaintEventSerializer(page, many=True).data,
+            'total': paginator.count,
+            'next': paginator.get_next_link(),
+            'first': paginator.get_first_link(),
         })
 
 
@@ -1649,6 +1483,7 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_fields = ['is_read', 'notification_type', 'complaint']
     ordering_fields = ['created_at']
     ordering = ['-created_at']
+    pagination_class = CountedKeysetPagination
     
     def get_queryset(self):
         """Только уведомления текущего пользователя"""
@@ -1677,6 +1512,62 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
         return Response({'updated_count': updated})
 
 
+class PdfParseJobViewSet(viewsets.GenericViewSet):
+    """
+    Асинхронный разбор PDF КП и рекламаций (projects/pdf_parse_service.py)
+
+    create: отправить файл (FormData: file, kind=kp|complaint) — 202 и id задания
+            (200, если этот файл уже разбирался — результат сразу в ответе)
+    retrieve: статус задания и результат, когда готов
+    cancel: отменить незавершённое задание
+    """
+    serializer_class = PdfParseJobSerializer
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser, FormParser]
+
+    def get_queryset(self):
+        """Только задания текущего пользователя"""
+        return PdfParseJob.objects.filter(created_by=self.request.user)
+
+    def create(self, request):
+        from .pdf_parse_service import submit_job
+
+        pdf_file = request.FILES.get('file')
+        kind = request.data.get('kind') or ParsedPdf.KIND_KP
+        if not pdf_file:
+            return Response({'detail': 'Файл не передан (поле "file")'}, status=status.HTTP_400_BAD_REQUEST)
+        if kind not in dict(ParsedPdf.KIND_CHOICES):
+            return Response({'detail': f'Неизвестный вид разбора: {kind}'}, status=status.HTTP_400_BAD_REQUEST)
+        if not pdf_file.name.lower().endswith('.pdf'):
+            return Response({'detail': 'Файл должен быть в формате PDF'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            job = submit_job(kind, pdf_file, request.user)
+        except ValueError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        response = Response(
+            self.get_serializer(job).data,
+            status=status.HTTP_200_OK if job.is_finished else status.HTTP_202_ACCEPTED,
+        )
+        response['Location'] = reverse('projects_api:pdf-parse-job-detail', args=[job.pk])
+        return response
+
+    def retrieve(self, request, pk=None):
+        from .pdf_parse_service import expire_stale
+
+        job = expire_stale(self.get_object())
+        return Response(self.get_serializer(job).data)
+
+    @action(detail=True, methods=['post'])
+    def cancel(self, request, pk=None):
+        from .pdf_parse_service import cancel_job
+
+        job = self.get_object()
+        if not cancel_job(job):
+            return Response({'detail': 'Задание уже завершено'}, status=status.HTTP_409_CONFLICT)
+        job.refresh_from_db()
+        return Response(self.get_serializer(job).data)
+
+
 class ShippingRegistryViewSet(viewsets.ModelViewSet):
     """
     ViewSet для реестра отгрузки
@@ -1694,6 +1585,7 @@ class ShippingRegistryViewSet(viewsets.ModelViewSet):
     search_fields = ['order_number', 'client_name', 'address', 'contact_person', 'contact_phone']
     ordering_fields = ['created_at', 'planned_shipping_date', 'delivery_status']
     ordering = ['-created_at']
+    pagination_class = CountedKeysetPagination
     filterset_fields = ['order_type', 'delivery_status', 'manager', 'delivery_destination']
     
     def get_queryset(self):
@@ -1753,16 +1645,20 @@ class ShippingRegistryViewSet(viewsets.ModelViewSet):
         - delivered: Доставлено
         - complaints: Рекламации
         """
-        queryset = self.filter_queryset(self.get_queryset())
-        
-        stats = {
-            'total': queryset.count(),
-            'pending': queryset.filter(delivery_status='pending').count(),
-            'in_transit': queryset.filter(delivery_status='in_transit').count(),
-            'delivered': queryset.filter(delivery_status='delivered').count(),
-            'complaints': queryset.filter(order_type='complaint').count(),
-        }
-        
+        def compute():
+            queryset = self.filter_queryset(self.get_queryset())
+            return queryset.aggregate(
+                total=Count('pk'),
+                pending=Count('pk', filter=Q(delivery_status='pending')),
+                in_transit=Count('pk', filter=Q(delivery_status='in_transit')),
+                delivered=Count('pk', filter=Q(delivery_status='delivered')),
+                complaints=Count('pk', filter=Q(order_type='complaint')),
+            )
+        
+        stats = dashboard_cache.cached_counters(
+            dashboard_cache.REGISTRIES, request.user, compute,
+            scope=f'shipping:{request.query_params.urlencode()}',
+        )
         return Response(stats)
 
 
@@ -1781,6 +1677,7 @@ class ReturnRegistryViewSet(viewsets.ModelViewSet):
     search_fields = ['order_number', 'client_name', 'product_name']
     ordering_fields = ['created_at', 'planned_return_date', 'return_status']
     ordering = ['-created_at']
+    pagination_class = CountedKeysetPagination
     filterset_fields = ['return_status', 'manager']
 
     def get_queryset(self):
@@ -1818,14 +1715,18 @@ class ReturnRegistryViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def stats(self, request):
         """Статистика по реестру на возврат"""
-        queryset = self.filter_queryset(self.get_queryset())
-
-        stats = {
-            'total': queryset.count(),
-            'pending': queryset.filter(return_status='pending').count(),
-            'sent': queryset.filter(return_status='sent').count(),
-        }
+        def compute():
+            queryset = self.filter_queryset(self.get_queryset())
+            return queryset.aggregate(
+                total=Count('pk'),
+                pending=Count('pk', filter=Q(return_status='pending')),
+                sent=Count('pk', filter=Q(return_status='sent')),
+            )
 
+        stats = dashboard_cache.cached_counters(
+            dashboard_cache.REGISTRIES, request.user, compute,
+            scope=f'return:{request.query_params.urlencode()}',
+        )
         return Response(stats)
 
 
@@ -1956,237 +1857,51 @@ class DashboardStatsView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        """Получение статистики по задачам для текущего пользователя"""
+        """
+        Получение статистики по задачам для текущего пользователя.
+        Плитки роли описаны в projects.dashboard, все счётчики — одним запросом.
+        """
         user = request.user
-        stats = []
-        
-        completed_statuses = {
-            ComplaintStatus.COMPLETED,
-            ComplaintStatus.RESOLVED,
-            ComplaintStatus.CLOSED,
-        }
-        active_statuses = [choice[0] for choice in ComplaintStatus.choices if choice[0] not in completed_statuses]
-        sm_overdue_filter = (
-            Q(status='sm_response_overdue') |
-            Q(status='factory_approved', sm_response_deadline__lt=timezone.now())
+        stats = dashboard_cache.cached_counters(
+            dashboard_cache.COMPLAINTS, user, lambda: self._build_stats(user), scope='api',
         )
+        return Response({'stats': stats})
+    
+    def _build_stats(self, user):
+        stats = []
         
-        def add_stat(key, label, query, url_param=None):
-            count = Complaint.objects.filter(query).count()
+        for tile, count in dashboard_counts(user):
             # Формируем URL для фронтенда
             if user.role == 'installer':
                 # Для монтажника используем страницу задач с параметром filter
-                if url_param:
-                    url = f'/installer/planning?filter={url_param}'
+                if tile.url_param:
+                    url = f'/installer/planning?filter={tile.url_param}'
                 else:
                     url = '/installer/planning'  # Для "В работе" без фильтра
             else:
                 # Для остальных ролей используем my_tasks
-                url = f'/complaints?my_tasks={key}'
+                url = f'/complaints?my_tasks={tile.key}'
             
             stats.append({
-                'key': key,
-                'label': label,
+                'key': tile.key,
+                'label': tile.label,
                 'count': count,
-                'url_param': url_param,
+                'url_param': tile.url_param,
                 'url': url,
             })
         
-        if user.role == 'installer':
-            # Базовый фильтр для монтажника
-            installer_base_filter = Q(installer_assigned=user) | Q(initiator=user)
-            
-            add_stat(
-                'in_work',
-                'В работе',
-                installer_base_filter & Q(status__in=active_statuses),
-                url_param=None
-            )
-            add_stat(
-                'needs_planning',
-                'Требуют планирования',
-                installer_base_filter & Q(status__in=['waiting_installer_date', 'needs_planning', 'installer_not_planned', 'installer_overdue']),
-                url_param='needs_planning'
-            )
-            add_stat(
-                'planned',
-                'Запланированные работы',
-                installer_base_filter & Q(status__in=['installation_planned', 'both_planned']),
-                url_param='planned'
-            )
-            add_stat(
-                'completed',
-                'Завершено',
-                installer_base_filter & Q(status__in=['under_sm_review', 'completed']),
-                url_param='completed'
-            )
-        elif user.role == 'manager':
-            # Для менеджера применяем фильтр по городу
-            user_city = getattr(user, 'city', None)
-            if user_city:
-                city_filter = Q(initiator__city=user_city)
-            else:
-                city_filter = Q()
-            
-            base_filter = city_filter & ~Q(status__in=['closed', 'completed', 'resolved'])
-            
-            add_stat(
-                'total',
-                'Всего',
-                base_filter,
-                url_param=None
-            )
-            add_stat(
-                'new',
-                'Новые',
-                base_filter & Q(status='new'),
-                url_param=None
-            )
-            add_stat(
-                'in_work',
-                'В работе',
-                ((Q(manager=user) | Q(initiator=user) | Q(recipient=user)) & Q(status__in=active_statuses)) & city_filter
-            )
-            add_stat(
-                'in_progress',
-                'Нужно запустить в производство',
-                Q(manager=user, status='in_progress') & city_filter
-            )
-            add_stat(
-                'on_warehouse',
-                'Готово к отгрузке',
-                Q(manager=user, status='on_warehouse') & city_filter
-            )
-            add_stat(
-                'shipping_overdue',
-                'Отгрузка просрочена',
-                Q(status='shipping_overdue') & city_filter
-            )
-            add_stat(
-                'return_required',
-                'Отправить товар на фабрику',
-                Q(manager=user, return_required=True, return_planned_date__isnull=True)
-                & ~Q(status__in=['closed', 'completed', 'resolved'])
-            )
-        elif user.role == 'service_manager':
-            # Для СМ применяем фильтр: рекламации из его города ИЛИ созданные им
-            user_city = getattr(user, 'city', None)
-            if user_city:
-                city_filter = Q(initiator__city=user_city)
-                personal_filter = Q(initiator=user)
-                base_filter = city_filter | personal_filter
-            else:
-                base_filter = Q(initiator=user)
-            
-            base_filter_active = base_filter & ~Q(status__in=['closed', 'completed', 'resolved'])
-            
-            add_stat(
-                'in_work',
-                'В работе',
-                base_filter_active & Q(status__in=active_statuses)
-            )
-            add_stat(
-                'new',
-                'Новые рекламации',
-                base_filter_active & Q(status='new')
-            )
-            add_stat(
-                'review',
-                'Ожидают проверки',
-                base_filter_active & Q(status__in=['under_sm_review', 'factory_approved', 'factory_rejected'])
-            )
-            add_stat(
-                'overdue',
-                'Просроченные ответы',
-                base_filter_active & sm_overdue_filter
-            )
-            add_stat(
-                'plan_installation',
-                'Запланировать монтаж',
-                base_filter_active & Q(status='shipping_planned')
-            )
-        elif user.role == 'complaint_department':
-            add_stat(
-                'in_work',
-                'В работе',
-                Q(complaint_type='factory', status__in=active_statuses)
-            )
-            add_stat(
-                'pending',
-                'Ожидают ответа',
-                Q(complaint_type='factory', status='sent')
-            )
-            add_stat(
-                'overdue',
-                'Просрочен ответ',
-                Q(complaint_type='factory', status='factory_response_overdue')
-            )
-            add_stat(
-                'moscow_service_overdue',
-                'Просрочка сервиса Москва',
-                Q(complaint_type='factory') & (
-                    Q(status='moscow_service_overdue') |
-                    Q(status='moscow_service', moscow_service_deadline__lt=timezone.now())
-                )
+        return stats
+
+
+class DashboardCacheStatsView(APIView):
+    """Метрики кэша счётчиков дашбордов (попадания/промахи) — для администратора"""
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        user = request.user
+        if user.role != 'admin' and not getattr(user, 'is_staff', False):
+            return Response(
+                {'error': 'Недостаточно прав'},
+                status=status.HTTP_403_FORBIDDEN
             )
-        elif user.role == 'leader':
-            user_city = getattr(user, 'city', None)
-            if user_city:
-                leader_city_filter = Q(initiator__city=user_city)
-            else:
-                # Если у руководителя не задан город, не показываем чужие города
-                leader_city_filter = Q(pk__in=[])
-
-            add_stat(
-                'in_work',
-                'Все в работе',
-                Q(status__in=active_statuses) & leader_city_filter
-            )
-            add_stat(
-                'new',
-                'Новые рекламации',
-                Q(status='new') & leader_city_filter
-            )
-            add_stat(
-                'factory_overdue',
-                'Ответ фабрики просрочен',
-                Q(status='factory_response_overdue') & leader_city_filter
-            )
-            add_stat(
-                'shipping_overdue',
-                'Отгрузка просрочена',
-                Q(status='shipping_overdue') & leader_city_filter
-            )
-            add_stat(
-                'sm_overdue',
-                'Ответ СМ просрочен',
-                sm_overdue_filter & leader_city_filter
-            )
-        elif user.role == 'admin':
-            add_stat(
-                'in_work',
-                'Все в работе',
-                Q(status__in=active_statuses)
-            )
-            add_stat(
-                'new',
-                'Новые рекламации',
-                Q(status='new')
-            )
-            add_stat(
-                'factory_overdue',
-                'Ответ фабрики просрочен',
-                Q(status='factory_response_overdue')
-            )
-            add_stat(
-                'shipping_overdue',
-                'Отгрузка просрочена',
-                Q(status='shipping_overdue')
-            )
-            add_stat(
-                'sm_overdue',
-                'Ответ СМ просрочен',
-                sm_overdue_filter
-            )
-        
-        return Response({'stats': stats})
\ No newline at end of file
+        return Response(dashboard_cache.get_metrics())
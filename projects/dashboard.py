@@ -0,0 +1,184 @@
+"""
+Единый реестр плиток «Мои задачи» для дашбордов.
+
+Описание плиток (ключ, подпись, условие) раньше было скопировано в трёх местах:
+ComplaintViewSet.get_queryset (фильтр my_tasks), DashboardStatsView (API для SPA)
+и WebDashboardView._get_task_summary (веб-дашборд). Теперь все три читают
+отсюда, а счётчики всех плиток роли считаются одним запросом через условную
+агрегацию Count(filter=Q(...)).
+"""
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .models import CLOSED_STATUSES, Complaint, ComplaintStatus
+
+ACTIVE_STATUSES = [
+    status for status, _ in ComplaintStatus.choices
+    if status not in {ComplaintStatus.COMPLETED, ComplaintStatus.RESOLVED, ComplaintStatus.CLOSED}
+]
+
+
+@dataclass(frozen=True)
+class DashboardTile:
+    """
+    Плитка дашборда.
+
+    condition(user, now) -> Q — условие задачи без учёта области видимости роли
+    (область видимости добавляет dashboard_scope). url_param — параметр filter
+    для страницы планирования монтажника. web=False — плитка только в SPA.
+    """
+    key: str
+    label: str
+    condition: Callable
+    url_param: Optional[str] = None
+    web: bool = True
+
+
+def _sm_overdue(user, now):
+    return Q(status='sm_response_overdue') | Q(status='factory_approved', sm_response_deadline__lt=now)
+
+
+def _status(*statuses):
+    if len(statuses) == 1:
+        return lambda user, now: Q(status=statuses[0])
+    return lambda user, now: Q(status__in=list(statuses))
+
+
+DASHBOARD_TILES = {
+    'installer': [
+        DashboardTile(
+            'in_work', 'В работе',
+            lambda user, now: (Q(installer_assigned=user) | Q(initiator=user)) & Q(status__in=ACTIVE_STATUSES),
+        ),
+        DashboardTile(
+            'needs_planning', 'Требуют планирования',
+            lambda user, now: Q(installer_assigned=user, status__in=[
+                'waiting_installer_date', 'needs_planning', 'installer_not_planned', 'installer_overdue'
+            ]),
+            url_param='needs_planning',
+        ),
+        DashboardTile(
+            'planned', 'Запланированные работы',
+            lambda user, now: Q(installer_assigned=user, status__in=['installation_planned', 'both_planned']),
+            url_param='planned',
+        ),
+        DashboardTile(
+            'completed', 'Завершено',
+            lambda user, now: Q(installer_assigned=user, status__in=['under_sm_review', 'completed']),
+            url_param='completed',
+        ),
+    ],
+    'manager': [
+        DashboardTile('total', 'Всего', lambda user, now: ~Q(status__in=CLOSED_STATUSES), web=False),
+        DashboardTile('new', 'Новые', _status('new'), web=False),
+        DashboardTile(
+            'in_work', 'В работе',
+            lambda user, now: (Q(manager=user) | Q(initiator=user) | Q(recipient=user)) & Q(status__in=ACTIVE_STATUSES),
+        ),
+        DashboardTile(
+            'in_progress', 'Нужно запустить в производство',
+            lambda user, now: Q(manager=user, status='in_progress'),
+        ),
+        DashboardTile(
+            'on_warehouse', 'Готово к отгрузке',
+            lambda user, now: Q(manager=user, status='on_warehouse'),
+        ),
+        DashboardTile('shipping_overdue', 'Отгрузка просрочена', _status('shipping_overdue')),
+        DashboardTile(
+            'return_required', 'Отправить товар на фабрику',
+            lambda user, now: Q(manager=user, return_required=True, return_planned_date__isnull=True)
+            & ~Q(status__in=CLOSED_STATUSES),
+            web=False,
+        ),
+    ],
+    'service_manager': [
+        DashboardTile('in_work', 'В работе', lambda user, now: Q(status__in=ACTIVE_STATUSES)),
+        DashboardTile('new', 'Новые рекламации', _status('new')),
+        DashboardTile(
+            'review', 'Ожидают проверки',
+            _status('under_sm_review', 'factory_approved', 'factory_rejected'),
+        ),
+        DashboardTile('overdue', 'Просроченные ответы', _sm_overdue),
+        DashboardTile('plan_installation', 'Запланировать монтаж', _status('shipping_planned'), web=False),
+    ],
+    'complaint_department': [
+        DashboardTile(
+            'in_work', 'В работе',
+            lambda user, now: Q(complaint_type='factory', status__in=ACTIVE_STATUSES),
+        ),
+        DashboardTile('pending', 'Ожидают ответа', lambda user, now: Q(complaint_type='factory', status='sent')),
+        DashboardTile(
+            'overdue', 'Просрочен ответ',
+            lambda user, now: Q(complaint_type='factory', status='factory_response_overdue'),
+        ),
+        DashboardTile(
+            'moscow_service_overdue', 'Просрочка сервиса Москва',
+            lambda user, now: Q(complaint_type='factory') & (
+                Q(status='moscow_service_overdue')
+                | Q(status='moscow_service', moscow_service_deadline__lt=now)
+            ),
+            web=False,
+        ),
+    ],
+}
+
+# Руководитель и администратор видят одинаковый набор плиток (различается только область видимости)
+DASHBOARD_TILES['admin'] = DASHBOARD_TILES['leader'] = [
+    DashboardTile('in_work', 'Все в работе', lambda user, now: Q(status__in=ACTIVE_STATUSES), web=False),
+    DashboardTile('new', 'Новые рекламации', _status('new')),
+    DashboardTile('factory_overdue', 'Ответ фабрики просрочен', _status('factory_response_overdue')),
+    DashboardTile('shipping_overdue', 'Отгрузка просрочена', _status('shipping_overdue')),
+    DashboardTile('sm_overdue', 'Ответ СМ просрочен', _sm_overdue),
+]
+
+
+def get_tiles(user, web=False):
+    tiles = DASHBOARD_TILES.get(getattr(user, 'role', None), [])
+    if web:
+        return [tile for tile in tiles if tile.web]
+    return list(tiles)
+
+
+def task_filter(user, key, now=None):
+    """Q для фильтра my_tasks=<key> списка рекламаций (None — нет такой плитки у роли)"""
+    now = now or timezone.now()
+    for tile in get_tiles(user):
+        if tile.key == key:
+            return tile.condition(user, now)
+    return None
+
+
+def dashboard_scope(user):
+    """Область видимости рекламаций для счётчиков дашборда"""
+    role = getattr(user, 'role', None)
+    city = getattr(user, 'city', None)
+    if role == 'installer':
+        return Q(installer_assigned=user) | Q(initiator=user)
+    if role == 'manager':
+        return Q(initiator__city=city) if city else Q()
+    if role == 'service_manager':
+        return (Q(initiator__city=city) | Q(initiator=user)) if city else Q(initiator=user)
+    if role == 'leader':
+        # Если у руководителя не задан город, не показываем чужие города
+        return Q(initiator__city=city) if city else Q(pk__in=[])
+    return Q()
+
+
+def dashboard_counts(user, web=False, now=None):
+    """
+    Счётчики всех плиток роли одним запросом.
+    Возвращает список (tile, count) в порядке реестра.
+    """
+    tiles = get_tiles(user, web=web)
+    if not tiles:
+        return []
+    now = now or timezone.now()
+    aggregates = {
+        tile.key: Count('pk', filter=tile.condition(user, now))
+        for tile in tiles
+    }
+    counts = Complaint.objects.filter(dashboard_scope(user)).aggregate(**aggregates)
+    return [(tile, counts[tile.key]) for tile in tiles]
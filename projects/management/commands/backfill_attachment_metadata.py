@@ -0,0 +1,64 @@
+"""
+Management команда заполнения метаданных файлов (размер, MIME-тип, размеры
+изображения, SHA-256) у вложений, загруженных до появления этих колонок.
+Каждый файл читается из хранилища один раз; повторный запуск обрабатывает
+только строки без метаданных (size IS NULL).
+"""
+from django.core.management.base import BaseCommand
+
+from marketingdoors.attachments import METADATA_FIELDS
+from orders.models import MeasurementAttachment, OrderAttachment
+from projects.models import ComplaintAttachment
+
+MODELS = {
+    'complaint': ComplaintAttachment,
+    'order': OrderAttachment,
+    'measurement': MeasurementAttachment,
+}
+
+
+class Command(BaseCommand):
+    help = 'Заполняет размер, тип, размеры изображения и контрольную сумму у старых вложений'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model',
+            choices=sorted(MODELS),
+            action='append',
+            help='Какие вложения обрабатывать (по умолчанию — все)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Сколько строк сохранять одним bulk_update',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        for key in options['model'] or sorted(MODELS):
+            model = MODELS[key]
+            updated = missing = 0
+            batch = []
+            queryset = model.objects.filter(size__isnull=True).exclude(file='').only('id', 'file')
+            for attachment in queryset.iterator(chunk_size=batch_size):
+                try:
+                    attachment.capture_file_metadata()
+                except (OSError, ValueError) as e:
+                    missing += 1
+                    self.stdout.write(self.style.WARNING(
+                        f'  {model.__name__} #{attachment.id}: файл недоступен ({e})'
+                    ))
+                    continue
+                batch.append(attachment)
+                if len(batch) >= batch_size:
+                    model.objects.bulk_update(batch, METADATA_FIELDS)
+                    updated += len(batch)
+                    batch = []
+            if batch:
+                model.objects.bulk_update(batch, METADATA_FIELDS)
+                updated += len(batch)
+
+            self.stdout.write(self.style.SUCCESS(
+                f'{model._meta.verbose_name_plural}: заполнено {updated}, недоступно файлов {missing}'
+            ))
@@ -0,0 +1,169 @@
+"""
+Management команда: восстанавливает журнал ComplaintEvent для рекламаций,
+созданных до его появления. События синтезируются из того, что сохранилось
+в самой рекламации (как раньше собиралась история на лету): создание,
+комментарии, отправленные уведомления, назначение монтажника, даты
+монтажа/отгрузки/производства/возврата/сервиса Москва и текущий статус.
+
+Рекламации, у которых уже есть событие «создана», пропускаются, поэтому
+повторный запуск ничего не дублирует. Если после выкладки у старой
+рекламации уже успели появиться события, восстанавливаются только более
+ранние. Точное время планирования дат не хранилось — такие события
+ставятся на дату обновления рекламации (или на саму дату, если она раньше).
+Все синтезированные события помечены meta.backfilled.
+"""
+from django.core.management.base import BaseCommand
+from django.db.models import Exists, Min, OuterRef, Prefetch
+
+from projects.models import (
+    Complaint,
+    ComplaintComment,
+    ComplaintEvent,
+    ComplaintStatus,
+    Notification,
+    format_event_date,
+)
+
+# Дата рекламации → вид события (время записи — не позже updated_at)
+DATE_FIELDS = [
+    ('production_deadline', ComplaintEvent.Kind.PRODUCTION_DEADLINE),
+    ('planned_shipping_date', ComplaintEvent.Kind.SHIPPING_PLANNED),
+    ('planned_installation_date', ComplaintEvent.Kind.INSTALLATION_PLANNED),
+    ('return_planned_date', ComplaintEvent.Kind.RETURN_PLANNED),
+    ('moscow_service_deadline', ComplaintEvent.Kind.MOSCOW_SERVICE),
+]
+
+
+def _name(user):
+    return user.get_full_name() or user.username
+
+
+def synthesize_events(complaint):
+    """Список несохранённых ComplaintEvent по текущему состоянию рекламации"""
+    meta = {'backfilled': True}
+    statuses = dict(ComplaintStatus.choices)
+    notification_types = dict(Notification.NOTIFICATION_TYPES)
+    events = [ComplaintEvent(
+        complaint=complaint,
+        kind=ComplaintEvent.Kind.CREATED,
+        actor=complaint.initiator,
+        new_status=ComplaintStatus.NEW,
+        description=f'Инициатор: {_name(complaint.initiator)}',
+        created_at=complaint.created_at,
+        meta=meta,
+    )]
+    for comment in complaint.comments.all():
+        events.append(ComplaintEvent(
+            complaint=complaint,
+            kind=ComplaintEvent.Kind.COMMENT,
+            actor=comment.author,
+            description=comment.text,
+            created_at=comment.created_at,
+            meta={**meta, 'comment': comment.id},
+        ))
+    for notification in complaint.notifications.all():
+        events.append(ComplaintEvent(
+            complaint=complaint,
+            kind=ComplaintEvent.Kind.NOTIFICATION,
+            description=(
+                f'{notification_types.get(notification.notification_type, notification.notification_type)}'
+                f' → {_name(notification.recipient)}'
+            ),
+            created_at=notification.sent_at or notification.created_at,
+            meta={**meta, 'title': notification.title, 'recipients': [notification.recipient_id]},
+        ))
+    if complaint.installer_assigned:
+        events.append(ComplaintEvent(
+            complaint=complaint,
+            kind=ComplaintEvent.Kind.INSTALLER_ASSIGNED,
+            description=f'Монтажник: {_name(complaint.installer_assigned)}',
+            created_at=complaint.installer_assigned_at or complaint.updated_at,
+            meta={**meta, 'installer': complaint.installer_assigned_id},
+        ))
+    if complaint.return_required:
+        events.append(ComplaintEvent(
+            complaint=complaint,
+            kind=ComplaintEvent.Kind.RETURN_REQUESTED,
+            description=f'Товар: {complaint.return_product_name}',
+            created_at=complaint.return_requested_at or complaint.updated_at,
+            meta=meta,
+        ))
+    for field, kind in DATE_FIELDS:
+        value = getattr(complaint, field)
+        if value:
+            events.append(ComplaintEvent(
+                complaint=complaint,
+                kind=kind,
+                description=f'Дата: {format_event_date(value)}',
+                created_at=min(value, complaint.updated_at),
+                meta=meta,
+            ))
+    if complaint.status != ComplaintStatus.NEW:
+        events.append(ComplaintEvent(
+            complaint=complaint,
+            kind=ComplaintEvent.Kind.STATUS_CHANGED,
+            new_status=complaint.status,
+            description=f'Текущий статус: {statuses.get(complaint.status, complaint.status)}',
+            created_at=complaint.completion_date or complaint.updated_at,
+            meta=meta,
+        ))
+    return events
+
+
+class Command(BaseCommand):
+    help = 'Восстанавливает журнал событий (ComplaintEvent) для рекламаций, созданных до его появления'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Сколько рекламаций обрабатывать за один проход',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только посчитать события, ничего не записывать',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+        ids = list(
+            Complaint.objects.exclude(
+                Exists(ComplaintEvent.objects.filter(
+                    complaint=OuterRef('pk'), kind=ComplaintEvent.Kind.CREATED,
+                ))
+            ).order_by('id').values_list('id', flat=True)
+        )
+
+        complaints_done = events_done = 0
+        for start in range(0, len(ids), batch_size):
+            chunk = (
+                Complaint.objects.filter(pk__in=ids[start:start + batch_size])
+                .select_related('initiator', 'installer_assigned')
+                .annotate(first_event_at=Min('events__created_at'))
+                .prefetch_related(
+                    Prefetch('comments', queryset=ComplaintComment.objects.select_related('author')),
+                    Prefetch(
+                        'notifications',
+                        queryset=Notification.objects.filter(is_sent=True).select_related('recipient'),
+                    ),
+                )
+                .order_by('id')
+            )
+            events = []
+            for complaint in chunk:
+                synthesized = synthesize_events(complaint)
+                if complaint.first_event_at:
+                    synthesized = [e for e in synthesized if e.created_at < complaint.first_event_at]
+                events.extend(synthesized)
+                complaints_done += 1
+            if not dry_run:
+                ComplaintEvent.objects.bulk_create(events, batch_size=500)
+            events_done += len(events)
+
+        verb = 'будет создано' if dry_run else 'создано'
+        self.stdout.write(self.style.SUCCESS(
+            f'Рекламаций: {complaints_done}, событий {verb}: {events_done}'
+        ))
@@ -4,7 +4,8 @@ Management команда для проверки просроченных от
 """
 from django.core.management.base import BaseCommand
 from django.utils import timezone
-from datetime import timedelta
+
+from marketingdoors.business_days import overdue_q, workdays_between
 from projects.models import Complaint, ComplaintStatus
 from users.models import User
 
@@ -21,16 +22,15 @@ class Command(BaseCommand):
         sent_complaints = Complaint.objects.filter(
             complaint_type='factory',
             status=ComplaintStatus.SENT
-        )
+        ).filter(overdue_q('updated_at', 1, now))
         
         for complaint in sent_complaints:
             # Вычисляем рабочие дни с момента создания
-            days_passed = self.count_business_days(complaint.updated_at, now)
+            days_passed = workdays_between(complaint.updated_at, now)
             
             if days_passed >= 2:
                 # Меняем статус на просроченный
-                complaint.status = ComplaintStatus.FACTORY_RESPONSE_OVERDUE
-                complaint.save()
+                complaint.change_status(ComplaintStatus.FACTORY_RESPONSE_OVERDUE)
                 
                 # Отправляем уведомления СМ и ОР
                 self.send_overdue_notifications(complaint)
@@ -48,7 +48,7 @@ class Command(BaseCommand):
         )
         
         for complaint in overdue_complaints:
-            days_overdue = self.count_business_days(complaint.updated_at, now)
+            days_overdue = workdays_between(complaint.updated_at, now)
             self.send_daily_reminder(complaint, days_overdue)
             
             self.stdout.write(
@@ -63,19 +63,6 @@ class Command(BaseCommand):
             )
         )
     
-    def count_business_days(self, start_date, end_date):
-        """Подсчет рабочих дней между двумя датами"""
-        current = start_date
-        business_days = 0
-        
-        while current.date() < end_date.date():
-            # Понедельник = 0, Воскресенье = 6
-            if current.weekday() < 5:  # Пн-Пт
-                business_days += 1
-            current += timedelta(days=1)
-        
-        return business_days
-    
     def send_overdue_notifications(self, complaint):
         """Отправка уведомлений о просрочке (при первой просрочке)"""
         # Уведомление СМ в личный кабинет
@@ -87,14 +74,12 @@ class Command(BaseCommand):
         )
         
         # Уведомления всем ОР в личный кабинет
-        or_users = User.objects.filter(role='complaint_department')
-        for or_user in or_users:
-            complaint._create_notification(
-                recipient=or_user,
-                notification_type='pc',
-                title='⚠️ Просрочен ответ фабрики',
-                message=f'Рекламация #{complaint.id} (заказ {complaint.order_number}) требует срочного ответа! Просрочка более 2 рабочих дней. Клиент: {complaint.client_name}'
-            )
+        complaint._create_notifications(
+            recipients=User.objects.filter(role='complaint_department'),
+            notification_type='pc',
+            title='⚠️ Просрочен ответ фабрики',
+            message=f'Рекламация #{complaint.id} (заказ {complaint.order_number}) требует срочного ответа! Просрочка более 2 рабочих дней. Клиент: {complaint.client_name}'
+        )
     
     def send_daily_reminder(self, complaint, days_overdue):
         """Ежедневные напоминания о просроченных рекламациях"""
@@ -107,12 +92,10 @@ class Command(BaseCommand):
         )
         
         # Уведомления всем ОР в личный кабинет
-        or_users = User.objects.filter(role='complaint_department')
-        for or_user in or_users:
-            complaint._create_notification(
-                recipient=or_user,
-                notification_type='pc',
-                title=f'🔴 Напоминание: просрочка {days_overdue} р.д.',
-                message=f'Рекламация #{complaint.id} (заказ {complaint.order_number}) всё ещё ожидает ответ от фабрики! Клиент: {complaint.client_name}'
-            )
+        complaint._create_notifications(
+            recipients=User.objects.filter(role='complaint_department'),
+            notification_type='pc',
+            title=f'🔴 Напоминание: просрочка {days_overdue} р.д.',
+            message=f'Рекламация #{complaint.id} (заказ {complaint.order_number}) всё ещё ожидает ответ от фабрики! Клиент: {complaint.client_name}'
+        )
 
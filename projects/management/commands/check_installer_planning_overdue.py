@@ -4,7 +4,8 @@ Management команда для проверки просроченного п
 """
 from django.core.management.base import BaseCommand
 from django.utils import timezone
-from datetime import timedelta
+
+from marketingdoors.business_days import overdue_q, workdays_between
 from projects.models import Complaint, ComplaintStatus, ComplaintComment
 from users.models import User
 
@@ -20,18 +21,17 @@ class Command(BaseCommand):
         waiting_complaints = Complaint.objects.filter(
             complaint_type='installer',
             status=ComplaintStatus.WAITING_INSTALLER_DATE
-        ).select_related('installer_assigned', 'recipient', 'manager')
+        ).filter(overdue_q('updated_at', 1, now)).select_related('installer_assigned', 'recipient', 'manager')
         
         overdue_count = 0
         
         for complaint in waiting_complaints:
             # Вычисляем рабочие дни с момента обновления (назначения монтажника)
-            days_passed = self.count_business_days(complaint.updated_at, now)
+            days_passed = workdays_between(complaint.updated_at, now)
             
             if days_passed >= 2:
                 # Меняем статус на просроченный
-                complaint.status = ComplaintStatus.INSTALLER_NOT_PLANNED
-                complaint.save()
+                complaint.change_status(ComplaintStatus.INSTALLER_NOT_PLANNED)
                 
                 # Создаем комментарий о просрочке
                 ComplaintComment.objects.create(
@@ -60,7 +60,7 @@ class Command(BaseCommand):
         reminder_count = 0
         
         for complaint in overdue_complaints:
-            days_overdue = self.count_business_days(complaint.updated_at, now)
+            days_overdue = workdays_between(complaint.updated_at, now)
             self.send_daily_reminder(complaint, days_overdue)
             reminder_count += 1
             
@@ -76,19 +76,6 @@ class Command(BaseCommand):
             )
         )
     
-    def count_business_days(self, start_date, end_date):
-        """Подсчет рабочих дней между двумя датами"""
-        current = start_date
-        business_days = 0
-        
-        while current.date() < end_date.date():
-            # Понедельник = 0, Воскресенье = 6
-            if current.weekday() < 5:  # Пн-Пт
-                business_days += 1
-            current += timedelta(days=1)
-        
-        return business_days
-    
     def send_overdue_notifications(self, complaint, days_passed):
         """Отправка уведомлений о просрочке планирования"""
         # Уведомление монтажнику
@@ -5,6 +5,7 @@ Management команда для проверки просроченных се
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from projects.models import Complaint, ComplaintStatus
+from projects.overdue import evaluate_overdue, dispatch_overdue_notifications
 from users.models import User
 
 
@@ -14,23 +15,24 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         now = timezone.now()
 
-        # Переводим активные заявки с истёкшим сроком в просрочку
-        # (check_moscow_service_overdue сам отправляет уведомления ОР при первой просрочке)
-        active_complaints = Complaint.objects.filter(
-            status=ComplaintStatus.MOSCOW_SERVICE,
-            moscow_service_deadline__lt=now
+        # Переводим активные заявки с истёкшим сроком в просрочку одним UPDATE
+        # (уведомления ОР о первой просрочке ставит в очередь dispatch_overdue_notifications)
+        result = evaluate_overdue(
+            queryset=Complaint.objects.filter(
+                status__in=[ComplaintStatus.MOSCOW_SERVICE, ComplaintStatus.MOSCOW_SERVICE_OVERDUE],
+            ),
+            now=now,
         )
-
-        overdue_count = 0
-        for complaint in active_complaints:
-            if complaint.check_moscow_service_overdue():
-                overdue_count += 1
-                self.stdout.write(
-                    self.style.WARNING(
-                        f'Рекламация #{complaint.id}: сервисная заявка Москва просрочена '
-                        f'(срок был {complaint.moscow_service_deadline.strftime("%d.%m.%Y")})'
-                    )
+        newly_overdue = result.ids(ComplaintStatus.MOSCOW_SERVICE_OVERDUE)
+        overdue_count = len(newly_overdue)
+        dispatch_overdue_notifications(result)
+        for complaint in Complaint.objects.filter(pk__in=newly_overdue):
+            self.stdout.write(
+                self.style.WARNING(
+                    f'Рекламация #{complaint.id}: сервисная заявка Москва просрочена '
+                    f'(срок был {complaint.moscow_service_deadline.strftime("%d.%m.%Y")})'
                 )
+            )
 
         # Ежедневные напоминания по уже просроченным заявкам
         overdue_complaints = Complaint.objects.filter(
@@ -55,11 +57,9 @@ class Command(BaseCommand):
 
     def send_daily_reminder(self, complaint, days_overdue):
         """Ежедневные напоминания о просроченных сервисных заявках"""
-        or_users = User.objects.filter(role='complaint_department')
-        for or_user in or_users:
-            complaint._create_notification(
-                recipient=or_user,
-                notification_type='pc',
-                title=f'🔴 Просрочка сервиса Москва: {days_overdue} дн.',
-                message=f'Рекламация #{complaint.id} (заказ {complaint.order_number}): сервисная заявка Москва всё ещё не решена! Клиент: {complaint.client_name}'
-            )
+        complaint._create_notifications(
+            recipients=User.objects.filter(role='complaint_department'),
+            notification_type='pc',
+            title=f'🔴 Просрочка сервиса Москва: {days_overdue} дн.',
+            message=f'Рекламация #{complaint.id} (заказ {complaint.order_number}): сервисная заявка Москва всё ещё не решена! Клиент: {complaint.client_name}'
+        )
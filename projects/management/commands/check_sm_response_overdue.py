@@ -5,7 +5,8 @@ Management команда для проверки просроченных от
 """
 from django.core.management.base import BaseCommand
 from django.utils import timezone
-from datetime import timedelta
+
+from marketingdoors.business_days import overdue_q, workdays_between
 from projects.models import Complaint, ComplaintStatus, Notification
 from users.models import User
 
@@ -23,17 +24,16 @@ class Command(BaseCommand):
         waiting_complaints = Complaint.objects.filter(
             complaint_type='factory',
             status=ComplaintStatus.FACTORY_APPROVED
-        )
+        ).filter(overdue_q('factory_response_date', 1, now))
         
         for complaint in waiting_complaints:
             # Вычисляем рабочие дни с момента ответа фабрики
             if complaint.factory_response_date:
-                days_passed = self.count_business_days(complaint.factory_response_date, now)
+                days_passed = workdays_between(complaint.factory_response_date, now)
                 
                 if days_passed >= 2:
                     # Меняем статус на просроченный
-                    complaint.status = ComplaintStatus.SM_RESPONSE_OVERDUE
-                    complaint.save()
+                    complaint.change_status(ComplaintStatus.SM_RESPONSE_OVERDUE)
                     
                     # Отправляем уведомления СМ (в т.ч. push на телефон) и ОР
                     self.send_overdue_notifications(complaint)
@@ -53,7 +53,7 @@ class Command(BaseCommand):
         
         for complaint in overdue_complaints:
             if complaint.factory_response_date:
-                days_overdue = self.count_business_days(complaint.factory_response_date, now)
+                days_overdue = workdays_between(complaint.factory_response_date, now)
                 if self.send_daily_reminder(complaint, days_overdue, now):
                     reminder_count += 1
                     self.stdout.write(
@@ -68,19 +68,6 @@ class Command(BaseCommand):
             )
         )
     
-    def count_business_days(self, start_date, end_date):
-        """Подсчет рабочих дней между двумя датами"""
-        current = start_date
-        business_days = 0
-        
-        while current.date() < end_date.date():
-            # Понедельник = 0, Воскресенье = 6
-            if current.weekday() < 5:  # Пн-Пт
-                business_days += 1
-            current += timedelta(days=1)
-        
-        return business_days
-    
     def send_overdue_notifications(self, complaint):
         """Отправка уведомлений о просрочке (при первой просрочке)"""
         # Push-уведомление СМ на телефон
@@ -92,14 +79,12 @@ class Command(BaseCommand):
         )
         
         # Уведомления всем ОР
-        or_users = User.objects.filter(role='complaint_department')
-        for or_user in or_users:
-            complaint._create_notification(
-                recipient=or_user,
-                notification_type='pc',
-                title='⚠️ СМ просрочил информирование клиента',
-                message=f'СМ не озвучил решение фабрики по рекламации #{complaint.id} (заказ {complaint.order_number}) клиенту в течение 2 рабочих дней.'
-            )
+        complaint._create_notifications(
+            recipients=User.objects.filter(role='complaint_department'),
+            notification_type='pc',
+            title='⚠️ СМ просрочил информирование клиента',
+            message=f'СМ не озвучил решение фабрики по рекламации #{complaint.id} (заказ {complaint.order_number}) клиенту в течение 2 рабочих дней.'
+        )
     
     def send_daily_reminder(self, complaint, days_overdue, now):
         """Ежедневные напоминания о просроченных рекламациях (только 1 раз в день)"""
@@ -122,14 +107,12 @@ class Command(BaseCommand):
         )
         
         # Уведомления всем ОР
-        or_users = User.objects.filter(role='complaint_department')
-        for or_user in or_users:
-            complaint._create_notification(
-                recipient=or_user,
-                notification_type='pc',
-                title=f'🔴 Напоминание: просрочка СМ {days_overdue} р.д.',
-                message=f'СМ всё ещё не назначил дату по рекламации #{complaint.id} (заказ {complaint.order_number}).'
-            )
+        complaint._create_notifications(
+            recipients=User.objects.filter(role='complaint_department'),
+            notification_type='pc',
+            title=f'🔴 Напоминание: просрочка СМ {days_overdue} р.д.',
+            message=f'СМ всё ещё не назначил дату по рекламации #{complaint.id} (заказ {complaint.order_number}).'
+        )
         return True
 
 
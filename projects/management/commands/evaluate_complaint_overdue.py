@@ -0,0 +1,41 @@
+"""
+Management команда пакетного пересчёта просрочек рекламаций
+(просрочка монтажа и сервиса Москва).
+Должна запускаться по расписанию (например, через cron каждые 10–15 минут).
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from projects.models import ComplaintStatus
+from projects.overdue import evaluate_overdue, dispatch_overdue_notifications
+
+
+class Command(BaseCommand):
+    help = 'Пакетно пересчитывает статусы просрочек рекламаций и ставит уведомления в очередь'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--no-notify',
+            action='store_true',
+            help='Только пересчитать статусы, уведомления не ставить в очередь',
+        )
+
+    def handle(self, *args, **options):
+        # Переходы и постановка уведомлений в очередь — одной транзакцией
+        with transaction.atomic():
+            result = evaluate_overdue()
+            sent = 0
+            if not options['no_notify']:
+                sent = dispatch_overdue_notifications(result)
+
+        for target_status, ids in result.transitions.items():
+            label = ComplaintStatus(target_status).label
+            self.stdout.write(
+                self.style.WARNING(f'→ {label}: {len(ids)} (#{", #".join(map(str, ids))})')
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Пересчёт завершён. Переходов: {result.total}, уведомлено рекламаций: {sent}'
+            )
+        )
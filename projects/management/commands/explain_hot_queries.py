@@ -0,0 +1,284 @@
+"""
+Management команда: EXPLAIN горячих запросов — списков рекламаций, заказов,
+наработок и замеров для каждой роли и папки, счётчиков дашборда и выборок
+кронов — с отметкой последовательных сканирований больших таблиц.
+
+Запросы строятся тем же кодом, что и в API (get_queryset/filter_queryset
+вьюсетов, dashboard_scope, фильтры кронов), с порядком и LIMIT страницы
+keyset-пагинации. Пользователь каждой роли берётся из БД; с --seed N команда
+сама создаёт N заказов и N рекламаций (с заявками, замерами и напоминаниями),
+делает ANALYZE и откатывает всё в конце — запускать на копии БД.
+
+Последовательное сканирование (PostgreSQL: «Seq Scan on», SQLite: «SCAN»
+без индекса) справочников (города, салоны, пользователи, площадки, причины)
+не считается проблемой. --fail-on-seq-scan — код ошибки для CI.
+
+Запуск: `python manage.py explain_hot_queries --seed 20000`
+"""
+import random
+import re
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from marketingdoors.pagination import KeysetPagination
+from orders.api_views import ORDER_FOLDERS, MEASUREMENT_FOLDERS, MeasurementViewSet, OrderViewSet, WorkshopViewSet
+from orders.models import (
+    Measurement, MeasurementRequest, Order, OrderActionReminder, OrderStatus, Salon,
+)
+from projects.api_views import ComplaintViewSet
+from projects.dashboard import dashboard_scope
+from projects.models import Complaint, ComplaintReason, ComplaintStatus, ComplaintType, ProductionSite
+from users.models import City, User
+
+PAGE_SIZE = 50
+BATCH_SIZE = 5000
+
+# Справочники: полный проход по ним дешёвый и нормален для планировщика
+SMALL_TABLES = {
+    'users_city', 'users_user', 'orders_salon', 'projects_productionsite', 'projects_complaintreason',
+}
+
+SEQ_SCAN_PATTERNS = {
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+    'sqlite': re.compile(r'\bSCAN (\w+)\s*$', re.MULTILINE),
+}
+
+ROLES = ['admin', 'leader', 'service_manager', 'manager', 'installer', 'complaint_department']
+ORDER_ROLES = ['admin', 'leader', 'service_manager', 'manager']
+
+
+class Rollback(Exception):
+    pass
+
+
+def list_queryset(viewset, user, params=None):
+    """Первая страница списка вьюсета для user — как её выбирает API (без prefetch)"""
+    request = Request(APIRequestFactory().get('/', params or {}))
+    request.user = user
+    view = viewset(request=request, args=(), kwargs={}, format_kwarg=None, action='list')
+    queryset = view.filter_queryset(view.get_queryset())
+    ordering = KeysetPagination().get_ordering(request, queryset, view)
+    return queryset.order_by(*ordering)[:PAGE_SIZE + 1]
+
+
+def hot_queries(users, now=None):
+    """Список (подпись, queryset) горячих запросов для пользователей {роль: user}"""
+    now = now or timezone.now()
+    queries = []
+    for role in ROLES:
+        user = users.get(role)
+        if not user:
+            continue
+        queries.append((f'рекламации: {role}', list_queryset(ComplaintViewSet, user)))
+        queries.append((f'дашборд рекламаций: {role}', Complaint.objects.filter(dashboard_scope(user)).values('id')))
+    for role in ORDER_ROLES:
+        user = users.get(role)
+        if not user:
+            continue
+        queries.append((f'заказы: {role}', list_queryset(OrderViewSet, user)))
+        for folder, _label, _overdue in ORDER_FOLDERS:
+            queries.append((f'заказы: {role} / {folder}', list_queryset(OrderViewSet, user, {'folder': folder})))
+        queries.append((f'наработки: {role}', list_queryset(WorkshopViewSet, user)))
+        queries.append((f'замеры: {role}', list_queryset(MeasurementViewSet, user)))
+        for folder, _label in MEASUREMENT_FOLDERS:
+            queries.append((
+                f'замеры: {role} / {folder}', list_queryset(MeasurementViewSet, user, {'folder': folder}),
+            ))
+    queries += [
+        ('cron: check_action_reminders', OrderActionReminder.objects.filter(
+            done=False, notified=False, due_at__lte=now,
+        ).values('id')),
+        ('cron: mark_not_done', Measurement.objects.filter(
+            is_done=False, measurement_date__lt=now,
+        ).values('request__order_id')),
+        ('cron: mark_not_processed', Measurement.objects.filter(
+            is_done=True, is_processed=False, done_at__lt=now - timedelta(days=2),
+        ).values('request__order_id')),
+    ]
+    return queries
+
+
+def seq_scans(plan):
+    """Большие таблицы, которые план читает последовательным сканированием"""
+    pattern = SEQ_SCAN_PATTERNS.get(connection.vendor)
+    if pattern is None:
+        return []
+    return sorted({table for table in pattern.findall(plan) if table not in SMALL_TABLES})
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN запросов списков, папок и кронов по ролям с отметкой последовательных сканирований'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Создать столько заказов и рекламаций (откатываются в конце); 0 — текущие данные',
+        )
+        parser.add_argument(
+            '--fail-on-seq-scan',
+            action='store_true',
+            help='Завершиться с ошибкой, если найдено последовательное сканирование',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                if options['seed']:
+                    users = self._seed(options['seed'])
+                    self._analyze()
+                else:
+                    users = self._existing_users()
+                flagged = self._explain(users, options['verbosity'])
+                raise Rollback
+        except Rollback:
+            pass
+
+        if flagged:
+            message = f'Последовательное сканирование в запросах: {len(flagged)}'
+            if options['fail_on_seq_scan']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS('Последовательных сканирований больших таблиц нет'))
+
+    def _explain(self, users, verbosity):
+        flagged = []
+        for label, queryset in hot_queries(users):
+            plan = queryset.explain()
+            tables = seq_scans(plan)
+            if tables:
+                flagged.append(label)
+                self.stdout.write(self.style.WARNING(f'SEQ SCAN  {label}: {", ".join(tables)}'))
+            else:
+                self.stdout.write(f'ok        {label}')
+            if tables or verbosity >= 2:
+                self.stdout.write('\n'.join(f'          {line}' for line in plan.splitlines()))
+        return flagged
+
+    def _existing_users(self):
+        users = {}
+        for role in ROLES:
+            queryset = User.objects.filter(role=role, is_active=True)
+            if role in ('leader', 'service_manager', 'manager'):
+                queryset = queryset.exclude(city=None)
+            if role == 'manager':
+                queryset = queryset.exclude(salon=None)
+            user = queryset.order_by('id').first()
+            if user:
+                users[role] = user
+            else:
+                self.stdout.write(self.style.WARNING(f'Нет пользователя с ролью {role} — запросы роли пропущены'))
+        return users
+
+    def _analyze(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def _seed(self, size):
+        rng = random.Random(size)
+        now = timezone.now()
+        cities = [City.objects.create(name=f'explain-город-{index}') for index in range(5)]
+        salons = [
+            Salon.objects.create(name=f'explain-салон-{city.id}-{index}', city=city)
+            for city in cities for index in range(4)
+        ]
+        managers = [
+            User.objects.create_user(
+                username=f'explain-mgr-{salon.id}', password=None, role='manager', city=salon.city, salon=salon,
+            )
+            for salon in salons
+        ]
+        staff = [
+            User.objects.create_user(username=f'explain-{role}-{city.id}', password=None, role=role, city=city)
+            for city in cities for role in ('service_manager', 'leader', 'installer')
+        ]
+        users = {
+            'admin': User.objects.create_user(username='explain-admin', password=None, role='admin'),
+            'complaint_department': User.objects.create_user(
+                username='explain-or', password=None, role='complaint_department',
+            ),
+            'manager': managers[0],
+        }
+        for user in staff:
+            users.setdefault(user.role, user)
+        service_managers = [user for user in staff if user.role == 'service_manager']
+        installers = [user for user in staff if user.role == 'installer']
+        initiators = managers + service_managers + installers
+        site = ProductionSite.objects.create(name='explain-площадка')
+        reason = ComplaintReason.objects.create(name='explain-причина')
+
+        order_statuses = OrderStatus.values
+        complaint_statuses = ComplaintStatus.values
+        complaint_types = ComplaintType.values
+        for offset in range(0, size, BATCH_SIZE):
+            count = min(BATCH_SIZE, size - offset)
+            orders, order_dates = [], []
+            for index in range(count):
+                manager = rng.choice(managers)
+                created = now - timedelta(minutes=rng.randrange(0, 60 * 24 * 720))
+                order_dates.append(created)
+                orders.append(Order(
+                    manager=manager, salon=manager.salon, client_name=f'explain-{offset + index}',
+                    status=rng.choice(order_statuses),
+                    last_activity_at=created + timedelta(hours=rng.randrange(0, 96)) if rng.random() < 0.7 else None,
+                ))
+            orders = Order.objects.bulk_create(orders)
+            requests = MeasurementRequest.objects.bulk_create([
+                MeasurementRequest(order=order, contact_name='explain', contact_phone='+70000000000')
+                for order in orders if rng.random() < 0.3
+            ])
+            measurements = []
+            for request in requests:
+                done = rng.random() < 0.6
+                measurements.append(Measurement(
+                    request=request,
+                    service_manager=rng.choice(service_managers),
+                    measurement_date=now + timedelta(hours=rng.randrange(-2000, 200)) if rng.random() < 0.8 else None,
+                    is_done=done,
+                    done_at=now - timedelta(hours=rng.randrange(0, 2000)) if done else None,
+                    is_processed=done and rng.random() < 0.8,
+                    is_draft=rng.random() < 0.05,
+                ))
+            Measurement.objects.bulk_create(measurements)
+            OrderActionReminder.objects.bulk_create([
+                OrderActionReminder(
+                    order=order, action_text='explain', due_at=now + timedelta(hours=rng.randrange(-500, 500)),
+                    done=rng.random() < 0.7, notified=rng.random() < 0.5,
+                )
+                for order in orders if rng.random() < 0.4
+            ])
+            complaints = []
+            for index in range(count):
+                initiator = rng.choice(initiators)
+                complaints.append(Complaint(
+                    initiator=initiator,
+                    recipient=rng.choice(service_managers),
+                    manager=rng.choice(managers),
+                    installer_assigned=rng.choice(installers) if rng.random() < 0.4 else None,
+                    production_site=site,
+                    reason=reason,
+                    order_number=f'EX-{offset + index}',
+                    client_name='explain',
+                    address='explain',
+                    contact_person='explain',
+                    contact_phone='+70000000000',
+                    complaint_type=rng.choice(complaint_types),
+                    status=rng.choice(complaint_statuses),
+                ))
+            complaints = Complaint.objects.bulk_create(complaints)
+            # auto_now_add ставит created_at = сейчас и при bulk_create — разносим даты отдельно
+            for order, created in zip(orders, order_dates):
+                order.created_at = created
+            for complaint in complaints:
+                complaint.created_at = now - timedelta(minutes=rng.randrange(0, 60 * 24 * 720))
+            Order.objects.bulk_update(orders, ['created_at'], batch_size=1000)
+            Complaint.objects.bulk_update(complaints, ['created_at'], batch_size=1000)
+        self.stdout.write(f'Создано заказов и рекламаций: {size}')
+        return users
@@ -0,0 +1,40 @@
+"""
+Management команда для очистки кэша разбора PDF (таблица ParsedPdf).
+Должна запускаться по расписанию (например, через cron раз в сутки)
+
+Удаляются записи устаревших версий парсеров (после правки парсера они больше
+не совпадают по ключу) и записи, к которым не обращались дольше --days дней.
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from projects.models import ParsedPdf
+from projects.pdf_parse_cache import PARSERS, parser_version
+
+
+class Command(BaseCommand):
+    help = 'Удаляет из кэша разбора PDF записи старых версий парсеров и давно не используемые'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=180, help='Удалять записи без обращений дольше N дней')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Показать, что будет удалено, без фактического удаления',
+        )
+
+    def handle(self, *args, **options):
+        current = Q()
+        for kind in PARSERS:
+            current |= Q(kind=kind, parser_version=parser_version(kind))
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        stale = ParsedPdf.objects.filter(~current | Q(last_used_at__lt=cutoff))
+
+        if options['dry_run']:
+            self.stdout.write(f'[dry-run] К удалению записей кэша разбора PDF: {stale.count()}')
+            return
+        deleted, _ = stale.delete()
+        self.stdout.write(self.style.SUCCESS(f'Удалено записей кэша разбора PDF: {deleted}'))
@@ -0,0 +1,77 @@
+"""
+Management команда пересборки поисковых документов (search_document) заказов
+и рекламаций. save() моделей пересобирает документ сам; команда нужна после
+того, что идёт мимо save(): queryset.update()/bulk_update исходных полей,
+переименование менеджера или салона. Записываются только изменившиеся строки.
+"""
+from django.core.management.base import BaseCommand
+from django.db.models import Prefetch
+
+from marketingdoors.search import complaint_document, order_document
+from orders.models import MeasurementRequest, Order
+from projects.models import Complaint
+
+
+def _order_documents(batch_size):
+    queryset = Order.objects.select_related('manager', 'salon').prefetch_related(
+        Prefetch('measurement_request', queryset=MeasurementRequest.objects.only(
+            'id', 'order_id', 'contact_name', 'contact_phone',
+        )),
+    ).order_by('id')
+    for order in queryset.iterator(chunk_size=batch_size):
+        # Без заявки на замер обращение к measurement_request — AttributeError (DoesNotExist)
+        request = getattr(order, 'measurement_request', None)
+        yield order, order_document(order, order.manager, order.salon, request)
+
+
+def _complaint_documents(batch_size):
+    queryset = Complaint.objects.select_related('manager').order_by('id')
+    for complaint in queryset.iterator(chunk_size=batch_size):
+        yield complaint, complaint_document(complaint, complaint.manager)
+
+
+MODELS = {
+    'order': (Order, _order_documents),
+    'complaint': (Complaint, _complaint_documents),
+}
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает поисковые документы заказов и рекламаций'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model',
+            choices=sorted(MODELS),
+            action='append',
+            help='Какие документы пересобирать (по умолчанию — все)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Сколько строк читать и сохранять за один проход',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        for key in options['model'] or sorted(MODELS):
+            model, documents = MODELS[key]
+            checked = updated = 0
+            batch = []
+            for obj, document in documents(batch_size):
+                checked += 1
+                if document == obj.search_document:
+                    continue
+                obj.search_document = document
+                batch.append(obj)
+                if len(batch) >= batch_size:
+                    model.objects.bulk_update(batch, ['search_document'])
+                    updated += len(batch)
+                    batch = []
+            if batch:
+                model.objects.bulk_update(batch, ['search_document'])
+                updated += len(batch)
+            self.stdout.write(self.style.SUCCESS(
+                f'{model._meta.verbose_name_plural}: проверено {checked}, обновлено {updated}'
+            ))
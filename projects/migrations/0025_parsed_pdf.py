@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:35
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0024_attachment_metadata'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ParsedPdf',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('kp', 'КП'), ('complaint', 'Рекламация')], max_length=20, verbose_name='Парсер')),
+                ('checksum', models.CharField(max_length=64, verbose_name='SHA-256 файла')),
+                ('parser_version', models.CharField(max_length=64, verbose_name='Версия парсера')),
+                ('result', models.JSONField(verbose_name='Результат разбора')),
+                ('size', models.PositiveBigIntegerField(default=0, verbose_name='Размер файла (байт)')),
+                ('hits', models.PositiveIntegerField(default=0, verbose_name='Повторных загрузок')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Разобран')),
+                ('last_used_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Последнее обращение')),
+            ],
+            options={
+                'verbose_name': 'Разобранный PDF',
+                'verbose_name_plural': 'Разобранные PDF',
+                'indexes': [models.Index(fields=['last_used_at'], name='projects_pa_last_us_0e4c10_idx')],
+                'constraints': [models.UniqueConstraint(fields=('kind', 'checksum', 'parser_version'), name='uniq_parsed_pdf_key')],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:40
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0025_parsed_pdf'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PdfParseJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('kp', 'КП'), ('complaint', 'Рекламация')], max_length=20, verbose_name='Парсер')),
+                ('status', models.CharField(choices=[('queued', 'В очереди'), ('running', 'Разбирается'), ('done', 'Готово'), ('failed', 'Ошибка'), ('cancelled', 'Отменено')], default='queued', max_length=20, verbose_name='Статус')),
+                ('file_name', models.CharField(blank=True, max_length=255, verbose_name='Имя файла')),
+                ('checksum', models.CharField(max_length=64, verbose_name='SHA-256 файла')),
+                ('size', models.PositiveBigIntegerField(default=0, verbose_name='Размер файла (байт)')),
+                ('result', models.JSONField(blank=True, null=True, verbose_name='Результат разбора')),
+                ('error', models.TextField(blank=True, verbose_name='Ошибка')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Начат разбор')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Завершено')),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pdf_parse_jobs', to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+            ],
+            options={
+                'verbose_name': 'Задание разбора PDF',
+                'verbose_name_plural': 'Задания разбора PDF',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['created_by', '-created_at'], name='projects_pd_created_a0e506_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:00
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0026_pdf_parse_job'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ComplaintEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('created', 'Рекламация создана'), ('status_changed', 'Смена статуса'), ('comment', 'Комментарий добавлен'), ('notification', 'Уведомление'), ('installer_assigned', 'Назначен монтажник'), ('installation_planned', 'Монтаж запланирован'), ('shipping_planned', 'Отгрузка запланирована'), ('production_deadline', 'Срок производства'), ('return_requested', 'Запрошен возврат товара'), ('return_planned', 'Запланирована отгрузка возврата'), ('moscow_service', 'Срок сервиса Москва')], max_length=30, verbose_name='Вид события')),
+                ('description', models.TextField(blank=True, verbose_name='Описание')),
+                ('old_status', models.CharField(blank=True, max_length=30, verbose_name='Старый статус')),
+                ('new_status', models.CharField(blank=True, max_length=30, verbose_name='Новый статус')),
+                ('meta', models.JSONField(blank=True, default=dict, verbose_name='Доп. данные')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Когда')),
+                ('actor', models.ForeignKey(blank=True, help_text='Пусто = системное событие (cron)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='complaint_events', to=settings.AUTH_USER_MODEL, verbose_name='Кто')),
+                ('complaint', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='projects.complaint', verbose_name='Рекламация')),
+            ],
+            options={
+                'verbose_name': 'Событие рекламации',
+                'verbose_name_plural': 'Журнал событий рекламации',
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['complaint', '-created_at'], name='projects_co_complai_427bad_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:15
+
+from django.db import migrations, models
+
+from marketingdoors.search import complaint_document, create_trigram_index, drop_trigram_index
+
+INDEX_NAME = 'projects_complaint_search_trgm'
+
+
+def backfill_search_documents(apps, schema_editor):
+    Complaint = apps.get_model('projects', 'Complaint')
+    batch = []
+    for complaint in Complaint.objects.select_related('manager').iterator(chunk_size=500):
+        complaint.search_document = complaint_document(complaint, complaint.manager)
+        batch.append(complaint)
+        if len(batch) >= 500:
+            Complaint.objects.bulk_update(batch, ['search_document'])
+            batch = []
+    Complaint.objects.bulk_update(batch, ['search_document'])
+
+
+def create_index(apps, schema_editor):
+    create_trigram_index(schema_editor, 'projects_complaint', INDEX_NAME)
+
+
+def drop_index(apps, schema_editor):
+    drop_trigram_index(schema_editor, INDEX_NAME)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0027_complaint_event'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='complaint',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Поисковый документ'),
+        ),
+        migrations.RunPython(backfill_search_documents, migrations.RunPython.noop),
+        # GIN-индекс pg_trgm — только на PostgreSQL; на SQLite поиск тем же LIKE без индекса
+        migrations.RunPython(create_index, drop_index),
+    ]
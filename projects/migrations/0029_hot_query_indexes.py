@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0019_hot_query_indexes'),
+        ('projects', '0028_search_document'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='complaint',
+            index=models.Index(fields=['initiator', 'status'], name='complaint_initiator_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='complaint',
+            index=models.Index(fields=['installer_assigned', 'status'], name='complaint_installer_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='complaint',
+            index=models.Index(fields=['manager', 'status'], name='complaint_manager_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='complaint',
+            index=models.Index(fields=['recipient', 'status'], name='complaint_recipient_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='complaint',
+            index=models.Index(condition=models.Q(('complaint_type', 'factory')), fields=['status', '-created_at'], name='complaint_factory_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='complaint',
+            index=models.Index(condition=models.Q(('status__in', ['closed', 'completed', 'resolved']), _negated=True), fields=['-created_at', 'id'], name='complaint_open_created_idx'),
+        ),
+    ]
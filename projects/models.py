@@ -1,10 +1,17 @@
+import functools
 import logging
+import uuid
 
 from django.conf import settings
 from django.db import models
 from django.utils import timezone
-from datetime import timedelta
-from users.push_utils import send_sms_notification, send_sms_to_phone
+from datetime import date, datetime, timedelta
+from marketingdoors import dashboard_cache
+from marketingdoors.business_days import add_workdays
+from marketingdoors.dirty_fields import DirtyFieldsMixin
+from marketingdoors.search import complaint_document, refresh_search_document
+from marketingdoors.attachments import AttachmentMetadata
+from users.notification_outbox import enqueue_push, enqueue_push_many, enqueue_sms, enqueue_email
 
 logger = logging.getLogger(__name__)
 
@@ -83,7 +90,61 @@ class ComplaintType(models.TextChoices):
     FACTORY = 'factory', 'Фабрика'
 
 
-class Complaint(models.Model):
+# Завершённые статусы: по умолчанию скрыты в списке рекламаций. Тот же список —
+# в условии частичного индекса открытых рекламаций: запрос
+# exclude(status__in=CLOSED_STATUSES) совпадает с ним дословно и идёт по индексу
+CLOSED_STATUSES = [ComplaintStatus.CLOSED, ComplaintStatus.COMPLETED, ComplaintStatus.RESOLVED]
+
+
+# Поля рекламации, изменения которых методы пишут в журнал ComplaintEvent
+EVENT_FIELDS = (
+    'status',
+    'installer_assigned_id',
+    'planned_installation_date',
+    'planned_shipping_date',
+    'production_deadline',
+    'return_required',
+    'return_planned_date',
+    'moscow_service_deadline',
+)
+
+
+def format_event_date(value):
+    """Дата для описания события (aware-даты — в локальном времени)"""
+    if isinstance(value, datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        return value.strftime('%d.%m.%Y %H:%M')
+    if isinstance(value, date):
+        return value.strftime('%d.%m.%Y')
+    return str(value)
+
+
+def records_events(method):
+    """
+    Метод рекламации, меняющий её состояние: изменения EVENT_FIELDS и
+    уведомления, созданные внутри метода, пишутся в ComplaintEvent одним
+    bulk_create после его завершения. Вложенные вызовы (plan_shipping →
+    add_to_shipping_registry) пишут в журнал внешнего метода.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self._pending_events is not None:
+            return method(self, *args, **kwargs)
+        before = {name: getattr(self, name) for name in EVENT_FIELDS}
+        self._pending_events = []
+        try:
+            result = method(self, *args, **kwargs)
+            events = self._changes_since(before, method.__name__) + self._pending_events
+        finally:
+            self._pending_events = None
+        if events:
+            ComplaintEvent.objects.bulk_create(events)
+        return result
+    return wrapper
+
+
+class Complaint(DirtyFieldsMixin, models.Model):
     """Рекламация (заявка)"""
     
     # Автоматические поля
@@ -284,6 +345,14 @@ class Complaint(models.Model):
         verbose_name='Запланированная дата отгрузки возврата'
     )
 
+    # Поисковый документ (marketingdoors.search): на PostgreSQL — GIN-индекс pg_trgm
+    search_document = models.TextField(
+        blank=True,
+        default='',
+        editable=False,
+        verbose_name='Поисковый документ'
+    )
+
     class Meta:
         verbose_name = 'Рекламация'
         verbose_name_plural = 'Рекламации'
@@ -292,59 +361,144 @@ class Complaint(models.Model):
             models.Index(fields=['-created_at']),
             models.Index(fields=['status']),
             models.Index(fields=['order_number']),
+            # Области видимости ролей (ComplaintViewSet.get_queryset, dashboard_scope) + статус.
+            # Город СМ/менеджера/руководителя — initiator__city: пользователи города → их рекламации
+            models.Index(fields=['initiator', 'status'], name='complaint_initiator_status_idx'),
+            models.Index(fields=['installer_assigned', 'status'], name='complaint_installer_status_idx'),
+            models.Index(fields=['manager', 'status'], name='complaint_manager_status_idx'),
+            models.Index(fields=['recipient', 'status'], name='complaint_recipient_status_idx'),
+            # ОР видит только фабричные рекламации
+            models.Index(
+                fields=['status', '-created_at'],
+                condition=models.Q(complaint_type=ComplaintType.FACTORY),
+                name='complaint_factory_status_idx',
+            ),
+            # Список по умолчанию: открытые рекламации по убыванию даты (порядок keyset-пагинации)
+            models.Index(
+                fields=['-created_at', 'id'],
+                condition=~models.Q(status__in=CLOSED_STATUSES),
+                name='complaint_open_created_idx',
+            ),
         ]
-    
+
+    # Поля, из которых собирается search_document
+    SEARCH_SOURCE_FIELDS = ('order_number', 'client_name', 'address', 'contact_person', 'contact_phone', 'manager')
+
+    # Кто выполняет действие — попадает в ComplaintEvent.actor (проставляют вьюхи)
+    event_actor = None
+    # События, накопленные внутри метода с @records_events
+    _pending_events = None
+
     def __str__(self):
         return f"Рекламация #{self.id} - {self.order_number}"
 
-    @staticmethod
-    def _add_business_days(start_date, days):
-        """Добавляет указанное количество рабочих дней (пн-пт)."""
-        result = start_date
-        added = 0
-        while added < days:
-            result += timedelta(days=1)
-            if result.weekday() < 5:
-                added += 1
-        return result
-    
+    def _event(self, kind, action='', **fields):
+        meta = fields.pop('meta', {})
+        if action:
+            meta['action'] = action
+        return ComplaintEvent(
+            complaint=self,
+            kind=kind,
+            actor=fields.pop('actor', self.event_actor),
+            meta=meta,
+            **fields,
+        )
+
+    def log_event(self, kind, **fields):
+        """Запись в журнал рекламации (внутри метода с @records_events — вместе с его событиями)"""
+        event = self._event(kind, **fields)
+        if self._pending_events is not None:
+            self._pending_events.append(event)
+        else:
+            event.save()
+        return event
+
+    def _changes_since(self, before, action):
+        """События по изменившимся EVENT_FIELDS относительно снимка before"""
+        events = []
+        for name in EVENT_FIELDS:
+            old, new = before[name], getattr(self, name)
+            if old == new:
+                continue
+            if name == 'status':
+                statuses = dict(ComplaintStatus.choices)
+                events.append(self._event(
+                    ComplaintEvent.Kind.STATUS_CHANGED, action,
+                    old_status=old or '', new_status=new,
+                    description=f'{statuses.get(old, old or "—")} → {statuses.get(new, new)}',
+                ))
+            elif name == 'installer_assigned_id':
+                if new:
+                    installer = self.installer_assigned
+                    events.append(self._event(
+                        ComplaintEvent.Kind.INSTALLER_ASSIGNED, action,
+                        description=f'Монтажник: {installer.get_full_name() or installer.username}',
+                        meta={'installer': new},
+                    ))
+            elif name == 'return_required':
+                if new:
+                    events.append(self._event(
+                        ComplaintEvent.Kind.RETURN_REQUESTED, action,
+                        description=f'Товар: {self.return_product_name}',
+                    ))
+            elif new:
+                events.append(self._event(
+                    ComplaintEvent.FIELD_KINDS[name], action,
+                    description=f'Дата: {format_event_date(new)}',
+                ))
+        return events
+
+    @records_events
+    def change_status(self, new_status, **fields):
+        """Смена статуса вне сценарных методов (закрытие, кроны просрочек)"""
+        self.status = new_status
+        for name, value in fields.items():
+            setattr(self, name, value)
+        self.save()
+
     def save(self, *args, **kwargs):
         """Автоматическая установка получателя и статуса"""
         is_new = self.pk is None
-        
-        # Отслеживаем назначение монтажника
-        if self.installer_assigned_id:
-            # Проверяем, был ли монтажник назначен ранее
-            if self.pk:
-                try:
-                    old_complaint = Complaint.objects.get(pk=self.pk)
-                    # Если монтажник изменился или был назначен впервые
-                    if not old_complaint.installer_assigned_id or old_complaint.installer_assigned_id != self.installer_assigned_id:
-                        self.installer_assigned_at = timezone.now()
-                except Complaint.DoesNotExist:
-                    self.installer_assigned_at = timezone.now()
-            else:
-                # Новая рекламация с монтажником
-                self.installer_assigned_at = timezone.now()
+
+        # Назначение или смена монтажника — сравниваем со значением при загрузке (без SELECT)
+        if self.installer_assigned_id and (is_new or self.is_dirty('installer_assigned_id')):
+            self.installer_assigned_at = timezone.now()
 
         if is_new and not self.recipient_id:
-            # Если инициатор - менеджер или монтажник, получатель - сервис-менеджер
+            # API и веб-форма подбирают получателя сами; здесь — запасной вариант для
+            # рекламаций, созданных из кода: СМ города инициатора, иначе любой СМ
             if self.initiator.role in ['manager', 'installer']:
-                from users.models import User
-                # Найти первого доступного сервис-менеджера
-                service_manager = User.objects.filter(role='service_manager').first()
+                service_manager = self._default_service_manager()
                 if service_manager:
                     self.recipient = service_manager
         
         # Автоматически устанавливаем статус "Новая" при создании
         if is_new:
             self.status = ComplaintStatus.NEW
-            
+
+        refresh_search_document(
+            self, kwargs, self.SEARCH_SOURCE_FIELDS, lambda: complaint_document(self, self.manager),
+        )
+        changed = self.changed_fields(kwargs.get('update_fields'))
         super().save(*args, **kwargs)
+        if changed is None or changed:
+            dashboard_cache.invalidate(dashboard_cache.COMPLAINTS)
 
         if is_new:
+            self.log_event(
+                ComplaintEvent.Kind.CREATED,
+                actor=self.initiator,
+                new_status=self.status,
+                description=f"Инициатор: {self.initiator.get_full_name() or self.initiator.username}",
+            )
             self._notify_recipient_on_creation()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        dashboard_cache.invalidate(dashboard_cache.COMPLAINTS, dashboard_cache.REGISTRIES)
+        return result
     
+    @records_events
     def set_type_installer(self, installer=None):
         """СМ выбирает тип 'Монтажник'"""
         self.complaint_type = ComplaintType.INSTALLER
@@ -381,12 +535,12 @@ class Complaint(models.Model):
                 # Формируем текст SMS
                 sms_text = f"Нужно запланировать работы по рекламации #{self.id} {complaint_url}"
                 
-                sms_sent = send_sms_notification(
+                sms_sent = enqueue_sms(
                     user=installer_for_sms,
                     message=sms_text,
                 )
                 if sms_sent:
-                    logger.info('SMS отправлено монтажнику %s для рекламации #%s', installer_for_sms.username, self.id)
+                    logger.info('SMS поставлено в очередь монтажнику %s для рекламации #%s', installer_for_sms.username, self.id)
             except Exception as exc:
                 logger.error(
                     'Ошибка отправки SMS монтажнику %s: %s',
@@ -395,6 +549,7 @@ class Complaint(models.Model):
                     exc_info=True,
                 )
     
+    @records_events
     def set_type_manager(self):
         """СМ выбирает тип 'Менеджер'"""
         if not self.manager:
@@ -410,6 +565,7 @@ class Complaint(models.Model):
             message=f'Рекламация #{self.id} требует оформления заказа на производство'
         )
     
+    @records_events
     def set_type_factory(self):
         """СМ выбирает тип 'Фабрика'"""
         self.complaint_type = ComplaintType.FACTORY
@@ -441,8 +597,6 @@ class Complaint(models.Model):
             return
             
         try:
-            from users.push_utils import send_email_notification
-            
             # Формируем ссылку на рекламацию
             frontend_url = getattr(settings, 'FRONTEND_URL', '')
             if frontend_url:
@@ -577,14 +731,14 @@ class Complaint(models.Model):
             </html>
             '''
             
-            email_sent = send_email_notification(
+            email_sent = enqueue_email(
                 to_email=or_email,
                 subject=subject,
                 message=message,
                 html_message=html_message,
             )
             if email_sent:
-                logger.info('Email отправлен на адрес %s для рекламации #%s', or_email, self.id)
+                logger.info('Email поставлен в очередь на адрес %s для рекламации #%s', or_email, self.id)
         except Exception as exc:
             logger.error(
                 'Ошибка отправки email на адрес %s для рекламации #%s: %s',
@@ -607,8 +761,6 @@ class Complaint(models.Model):
             return
 
         try:
-            from users.push_utils import send_email_notification
-
             frontend_url = getattr(settings, 'FRONTEND_URL', '')
             if frontend_url:
                 complaint_url = f"{frontend_url.rstrip('/')}/complaints/{self.id}"
@@ -745,14 +897,14 @@ class Complaint(models.Model):
             </html>
             '''
 
-            email_sent = send_email_notification(
+            email_sent = enqueue_email(
                 to_email=or_email,
                 subject=subject,
                 message=message,
                 html_message=html_message,
             )
             if email_sent:
-                logger.info('Email о споре отправлен на адрес %s для рекламации #%s', or_email, self.id)
+                logger.info('Email о споре поставлен в очередь на адрес %s для рекламации #%s', or_email, self.id)
         except Exception as exc:
             logger.error(
                 'Ошибка отправки email о споре на адрес %s для рекламации #%s: %s',
@@ -762,12 +914,13 @@ class Complaint(models.Model):
                 exc_info=True,
             )
 
+    @records_events
     def factory_approve(self, approve_comment=None):
         """ОР одобряет рекламацию - ответ получен"""
         response_dt = timezone.now()
         self.status = ComplaintStatus.FACTORY_APPROVED
         self.factory_response_date = response_dt
-        self.sm_response_deadline = self._add_business_days(response_dt, 2)
+        self.sm_response_deadline = add_workdays(response_dt, 2)
         if approve_comment:
             self.factory_approve_comment = approve_comment
         self.save()
@@ -796,6 +949,7 @@ class Complaint(models.Model):
             )
             print(f"[DEBUG] Уведомление создано успешно")
     
+    @records_events
     def factory_reject(self, reject_reason):
         """ОР отказывает в рекламации"""
         self.status = ComplaintStatus.FACTORY_REJECTED
@@ -819,6 +973,7 @@ class Complaint(models.Model):
                 message=f'Рекламация #{self.id} отклонена фабрикой'
             )
     
+    @records_events
     def sm_agree_with_client(self, production_deadline):
         """СМ назначает дату готовности — клиенту отправляется SMS, статус → в производстве"""
         self.status = ComplaintStatus.IN_PRODUCTION
@@ -844,12 +999,12 @@ class Complaint(models.Model):
                 production_date_str = production_deadline.strftime("%d.%m.%Y")
                 sms_text = f"Приносим извинения! Срок пр-ва по Вашей рекламации {production_date_str}."
                 
-                sms_sent = send_sms_to_phone(
+                sms_sent = enqueue_sms(
                     phone_number=self.contact_phone,
                     message=sms_text,
                 )
                 if sms_sent:
-                    logger.info('SMS отправлено клиенту на номер %s для рекламации #%s', self.contact_phone, self.id)
+                    logger.info('SMS поставлено в очередь клиенту на номер %s для рекламации #%s', self.contact_phone, self.id)
             except Exception as exc:
                 logger.error(
                     'Ошибка отправки SMS клиенту на номер %s для рекламации #%s: %s',
@@ -859,6 +1014,7 @@ class Complaint(models.Model):
                     exc_info=True,
                 )
     
+    @records_events
     def sm_dispute_factory_decision(self, arguments):
         """СМ оспаривает решение фабрики"""
         # Если рекламация была отклонена, при повторной отправке ставим статус "отправлена" (ожидает ответа)
@@ -893,6 +1049,7 @@ class Complaint(models.Model):
             import logging
             logging.getLogger(__name__).exception('Ошибка отправки email в ОР при оспаривании СМ: %s', e)
 
+    @records_events
     def plan_installation(self, installer, installation_date):
         """Монтажник планирует дату монтажа"""
         self.installer_assigned = installer
@@ -925,12 +1082,12 @@ class Complaint(models.Model):
                 installation_date_str = installation_date.strftime("%d.%m.%Y %H:%M")
                 sms_text = f"По Вашей рекламации запланирован монтаж на {installation_date_str}."
                 
-                sms_sent = send_sms_to_phone(
+                sms_sent = enqueue_sms(
                     phone_number=self.contact_phone,
                     message=sms_text,
                 )
                 if sms_sent:
-                    logger.info('SMS отправлено клиенту на номер %s для рекламации #%s', self.contact_phone, self.id)
+                    logger.info('SMS поставлено в очередь клиенту на номер %s для рекламации #%s', self.contact_phone, self.id)
             except Exception as exc:
                 logger.error(
                     'Ошибка отправки SMS клиенту на номер %s для рекламации #%s: %s',
@@ -940,6 +1097,7 @@ class Complaint(models.Model):
                     exc_info=True,
             )
     
+    @records_events
     def mark_completed(self):
         """Монтажник отмечает работу выполненной"""
         self.status = ComplaintStatus.UNDER_SM_REVIEW
@@ -961,6 +1119,7 @@ class Complaint(models.Model):
                 message=f'Рекламация #{self.id} (заказ {self.order_number}) выполнена монтажником. Клиент: {self.client_name}. Требуется проверка качества работы.'
             )
 
+    @records_events
     def request_reorder(self, requested_by, comment_text=''):
         """Монтажник запрашивает перезаказ товара — рекламация возвращается СМ для повторной обработки."""
         # Сбрасываем тип и статус, чтобы СМ заново выбрал направление (как новая рекламация)
@@ -994,6 +1153,7 @@ class Complaint(models.Model):
                 message=f'Рекламация #{self.id} требует перезаказа — обработайте заново.'
             )
 
+    @records_events
     def check_installer_overdue(self):
         """
         Проверяет просрочку монтажа.
@@ -1060,8 +1220,7 @@ class Complaint(models.Model):
                     message_text = f"Рекламация не завершена! Просрочена! {complaint_url}"
                     
                     # Push-уведомление
-                    from users.push_utils import send_push_notification
-                    send_push_notification(
+                    enqueue_push(
                         user=self.installer_assigned,
                         title='Рекламация просрочена',
                         body=message_text,
@@ -1069,7 +1228,7 @@ class Complaint(models.Model):
                     )
                     
                     # SMS-уведомление
-                    send_sms_notification(
+                    enqueue_sms(
                         user=self.installer_assigned,
                         message=message_text,
                     )
@@ -1093,6 +1252,7 @@ class Complaint(models.Model):
         self._restore_status_from_overdue()
         return False
 
+    @records_events
     def _restore_status_from_overdue(self):
         """
         Снимает статус «Просрочена монтажником» и возвращает корректный статус
@@ -1111,6 +1271,7 @@ class Complaint(models.Model):
             self.status = ComplaintStatus.WAITING_INSTALLER_DATE
         self.save(update_fields=['status'])
 
+    @records_events
     def approve_by_sm(self):
         """СМ проверяет и одобряет выполнение"""
         self.status = ComplaintStatus.COMPLETED
@@ -1124,6 +1285,7 @@ class Complaint(models.Model):
             message=f'Рекламация #{self.id} выполнена. Пожалуйста, оцените качество работы.'
         )
     
+    @records_events
     def start_production(self, deadline):
         """Менеджер запускает производство"""
         self.status = ComplaintStatus.IN_PRODUCTION
@@ -1155,6 +1317,7 @@ class Complaint(models.Model):
                 message=f'Рекламация #{self.id} запущена в производство'
             )
     
+    @records_events
     def mark_on_warehouse(self):
         """Товар готов на складе"""
         self.status = ComplaintStatus.ON_WAREHOUSE
@@ -1195,6 +1358,7 @@ class Complaint(models.Model):
                 message=f'Рекламация #{self.id} - товар на складе, запланируйте монтаж'
             )
 
+    @records_events
     def add_to_shipping_registry(self, doors_count=1, lift_type='our', lift_method='elevator',
                                   payment_status='', delivery_destination='client', comments=''):
         """Добавляет рекламацию в реестр на отгрузку"""
@@ -1229,6 +1393,7 @@ class Complaint(models.Model):
 
         return entry
     
+    @records_events
     def plan_shipping(self, shipping_date):
         """Менеджер планирует отгрузку"""
         self.planned_shipping_date = shipping_date
@@ -1247,12 +1412,12 @@ class Complaint(models.Model):
                 # Формируем текст SMS
                 sms_text = "По рекламации планируется доставка. В теч. 5 р.д. с Вами свяжутся."
                 
-                sms_sent = send_sms_to_phone(
+                sms_sent = enqueue_sms(
                     phone_number=self.contact_phone,
                     message=sms_text,
                 )
                 if sms_sent:
-                    logger.info('SMS отправлено клиенту на номер %s для рекламации #%s', self.contact_phone, self.id)
+                    logger.info('SMS поставлено в очередь клиенту на номер %s для рекламации #%s', self.contact_phone, self.id)
             except Exception as exc:
                 logger.error(
                     'Ошибка отправки SMS клиенту на номер %s для рекламации #%s: %s',
@@ -1262,6 +1427,7 @@ class Complaint(models.Model):
                     exc_info=True,
                 )
     
+    @records_events
     def set_moscow_service(self, deadline=None):
         """ОР переводит рекламацию в сервисную заявку Москва (без производства и отгрузки)"""
         is_new_request = self.status not in (
@@ -1294,6 +1460,7 @@ class Complaint(models.Model):
                         message=f'По рекламации #{self.id} (заказ {self.order_number}) оформлена сервисная заявка Москва. Срок решения: {deadline_str}. Производство и отгрузка не требуются.'
                     )
 
+    @records_events
     def check_moscow_service_overdue(self):
         """Проверка просрочки сервисной заявки Москва (вызывается из API и cron)"""
         if not self.moscow_service_deadline:
@@ -1324,6 +1491,7 @@ class Complaint(models.Model):
 
         return False
 
+    @records_events
     def resolve_moscow_service(self):
         """ОР отмечает сервисную заявку Москва решённой"""
         self.status = ComplaintStatus.COMPLETED
@@ -1339,6 +1507,7 @@ class Complaint(models.Model):
                     message=f'По рекламации #{self.id} (заказ {self.order_number}) проблема решена сервисом Москва'
                 )
 
+    @records_events
     def request_return(self, product_name):
         """ОР отмечает, что требуется возврат товара на фабрику"""
         self.return_required = True
@@ -1361,6 +1530,7 @@ class Complaint(models.Model):
                 message=f'Рекламация #{self.id}: отправьте товар на фабрику ({product_name})'
             )
 
+    @records_events
     def plan_return_shipping(self, return_date):
         """Менеджер планирует отгрузку возврата — рекламация попадает в реестр на возврат"""
         self.return_planned_date = return_date
@@ -1379,6 +1549,7 @@ class Complaint(models.Model):
 
         return entry
 
+    @records_events
     def add_to_return_registry(self):
         """Добавляет рекламацию в реестр на возврат"""
         from .models import ReturnRegistry
@@ -1403,6 +1574,7 @@ class Complaint(models.Model):
             planned_return_date=self.return_planned_date,
         )
 
+    @records_events
     def plan_installation_by_sm(self, installer, installation_date):
         """СМ планирует монтаж"""
         self.installer_assigned = installer
@@ -1428,12 +1600,12 @@ class Complaint(models.Model):
                 installation_date_str = installation_date.strftime("%d.%m.%Y %H:%M")
                 sms_text = f"По Вашей рекламации запланирован монтаж на {installation_date_str}."
                 
-                sms_sent = send_sms_to_phone(
+                sms_sent = enqueue_sms(
                     phone_number=self.contact_phone,
                     message=sms_text,
                 )
                 if sms_sent:
-                    logger.info('SMS отправлено клиенту на номер %s для рекламации #%s', self.contact_phone, self.id)
+                    logger.info('SMS поставлено в очередь клиенту на номер %s для рекламации #%s', self.contact_phone, self.id)
             except Exception as exc:
                 logger.error(
                     'Ошибка отправки SMS клиенту на номер %s для рекламации #%s: %s',
@@ -1443,6 +1615,7 @@ class Complaint(models.Model):
                     exc_info=True,
         )
 
+    @records_events
     def plan_installation_assign_only(self, installer):
         """
         СМ назначает монтажника, но дату и время монтажа определит сам монтажник
@@ -1473,7 +1646,7 @@ class Complaint(models.Model):
                 f"{frontend_url.rstrip('/')}/complaints/{self.id}" if frontend_url
                 else f"/complaints/{self.id}"
             )
-            send_sms_notification(
+            enqueue_sms(
                 user=installer,
                 message=f"Нужно запланировать монтаж по рекламации #{self.id} {complaint_url}",
             )
@@ -1483,6 +1656,17 @@ class Complaint(models.Model):
                 self.id, exc, exc_info=True,
             )
 
+    def _default_service_manager(self):
+        """СМ для новой рекламации без получателя: из города инициатора, иначе первый (один запрос)"""
+        from django.db.models import Case, Value, When
+        from users.models import User
+        service_managers = User.objects.filter(role='service_manager')
+        if self.initiator.city_id:
+            service_managers = service_managers.order_by(
+                Case(When(city_id=self.initiator.city_id, then=Value(0)), default=Value(1)), 'id',
+            )
+        return service_managers.first()
+
     def _get_service_manager(self):
         """Определяет СМ для этой рекламации"""
         # Если получатель - СМ, возвращаем его
@@ -1500,50 +1684,56 @@ class Complaint(models.Model):
         return User.objects.filter(role='service_manager').first()
     
     def _create_notification(self, recipient, notification_type, title, message):
-        """Создание уведомления и отправка push"""
-        if not recipient:
-            return
+        """Создание уведомления и постановка push в очередь отправки"""
+        self._create_notifications([recipient], notification_type, title, message)
 
-        logger = logging.getLogger(__name__)
+    def _create_notifications(self, recipients, notification_type, title, message):
+        """
+        Одно уведомление нескольким получателям (например, всем сотрудникам ОР):
+        Notification и задания очереди вставляются пачкой (bulk_create), а push
+        уходит через пакетную рассылку диспетчера.
+        """
+        recipients = [recipient for recipient in recipients if recipient]
+        if not recipients:
+            return []
 
         # Вся логика "pc" переводится в push-канал
         notify_type = notification_type or 'push'
         if notify_type == 'pc':
             notify_type = 'push'
 
-        notification = Notification.objects.create(
-            complaint=self,
-            recipient=recipient,
-            notification_type=notify_type,
-            title=title,
-            message=message,
-            is_sent=False,
-        )
-
-        push_sent = False
-        try:
-            from users.push_utils import send_push_notification
-
-            push_sent = send_push_notification(
-                user=recipient,
+        notifications = Notification.objects.bulk_create([
+            Notification(
+                complaint=self,
+                recipient=recipient,
+                notification_type=notify_type,
                 title=title,
-                body=message,
-                url=f'/complaints/{self.id}' if self.id else '/notifications',
-            )
-            logger.info('Push отправлен пользователю %s для рекламации #%s', recipient.username, self.id)
-        except Exception as exc:
-            logger.error(
-                'Ошибка отправки push-уведомления пользователю %s: %s',
-                recipient.username,
-                exc,
-                exc_info=True,
+                message=message,
+                is_sent=False,
             )
+            for recipient in recipients
+        ])
+
+        names = ', '.join(recipient.get_full_name() or recipient.username for recipient in recipients)
+        self.log_event(
+            ComplaintEvent.Kind.NOTIFICATION,
+            description=f'{dict(Notification.NOTIFICATION_TYPES).get(notify_type, notify_type)} → {names}',
+            meta={'title': title, 'recipients': [recipient.id for recipient in recipients]},
+        )
 
-        # Помечаем уведомление как отправленное, если push отправлен
-        if push_sent:
-            notification.is_sent = True
-            notification.sent_at = timezone.now()
-        notification.save(update_fields=['is_sent', 'sent_at'])
+        # Push уходит через очередь уведомлений; is_sent проставит диспетчер после доставки
+        url = f'/complaints/{self.id}' if self.id else '/notifications'
+        enqueue_push_many([
+            {
+                'user': notification.recipient,
+                'title': title,
+                'body': message,
+                'url': url,
+                'notification': notification,
+            }
+            for notification in notifications
+        ])
+        return notifications
 
     def _notify_recipient_on_creation(self):
         """Уведомление первичного получателя о создании рекламации"""
@@ -1602,7 +1792,7 @@ class DefectiveProduct(models.Model):
         return f"{self.product_name}"
 
 
-class ComplaintAttachment(models.Model):
+class ComplaintAttachment(AttachmentMetadata):
     """Вложение к рекламации (фото/видео/документы)"""
     
     ATTACHMENT_TYPE_CHOICES = [
@@ -1645,9 +1835,9 @@ class ComplaintAttachment(models.Model):
     
     @property
     def file_size(self):
-        """Размер файла в читаемом формате"""
-        if self.file:
-            size = self.file.size
+        """Размер файла в читаемом формате (из колонки size, без обращения к хранилищу)"""
+        if self.size is not None:
+            size = float(self.size)
             for unit in ['B', 'KB', 'MB', 'GB']:
                 if size < 1024.0:
                     return f"{size:.1f} {unit}"
@@ -1702,6 +1892,119 @@ class ComplaintComment(models.Model):
     def __str__(self):
         return f"Комментарий от {self.author.username} - {self.created_at.strftime('%d.%m.%Y %H:%M')}"
 
+    def save(self, *args, **kwargs):
+        is_new = self.pk is None
+        super().save(*args, **kwargs)
+        if is_new:
+            self.complaint.log_event(
+                ComplaintEvent.Kind.COMMENT,
+                actor=self.author,
+                description=self.text,
+                meta={'comment': self.pk},
+            )
+
+
+class ComplaintEvent(models.Model):
+    """
+    Журнал событий рекламации (только добавление): создание, смена статуса,
+    назначения и даты, комментарии, уведомления. Пишется методами Complaint
+    (@records_events), ComplaintComment.save и пакетным движком просрочек;
+    для рекламаций до появления журнала события восстанавливает
+    backfill_complaint_events. Из него одним запросом строится история.
+    """
+
+    class Kind(models.TextChoices):
+        CREATED = 'created', 'Рекламация создана'
+        STATUS_CHANGED = 'status_changed', 'Смена статуса'
+        COMMENT = 'comment', 'Комментарий добавлен'
+        NOTIFICATION = 'notification', 'Уведомление'
+        INSTALLER_ASSIGNED = 'installer_assigned', 'Назначен монтажник'
+        INSTALLATION_PLANNED = 'installation_planned', 'Монтаж запланирован'
+        SHIPPING_PLANNED = 'shipping_planned', 'Отгрузка запланирована'
+        PRODUCTION_DEADLINE = 'production_deadline', 'Срок производства'
+        RETURN_REQUESTED = 'return_requested', 'Запрошен возврат товара'
+        RETURN_PLANNED = 'return_planned', 'Запланирована отгрузка возврата'
+        MOSCOW_SERVICE = 'moscow_service', 'Срок сервиса Москва'
+
+    # Поле даты рекламации → вид события при его изменении
+    FIELD_KINDS = {
+        'planned_installation_date': Kind.INSTALLATION_PLANNED,
+        'planned_shipping_date': Kind.SHIPPING_PLANNED,
+        'production_deadline': Kind.PRODUCTION_DEADLINE,
+        'return_planned_date': Kind.RETURN_PLANNED,
+        'moscow_service_deadline': Kind.MOSCOW_SERVICE,
+    }
+
+    # Вид события → (иконка, цвет) в истории
+    APPEARANCE = {
+        Kind.CREATED: ('create', 'blue'),
+        Kind.STATUS_CHANGED: ('update', 'purple'),
+        Kind.COMMENT: ('comment', 'gray'),
+        Kind.NOTIFICATION: ('notification', 'yellow'),
+        Kind.INSTALLER_ASSIGNED: ('user', 'green'),
+        Kind.INSTALLATION_PLANNED: ('calendar', 'indigo'),
+        Kind.SHIPPING_PLANNED: ('truck', 'orange'),
+        Kind.PRODUCTION_DEADLINE: ('calendar', 'indigo'),
+        Kind.RETURN_REQUESTED: ('truck', 'orange'),
+        Kind.RETURN_PLANNED: ('truck', 'orange'),
+        Kind.MOSCOW_SERVICE: ('calendar', 'indigo'),
+    }
+    FINAL_STATUSES = (ComplaintStatus.COMPLETED, ComplaintStatus.RESOLVED, ComplaintStatus.CLOSED)
+
+    complaint = models.ForeignKey(
+        Complaint,
+        on_delete=models.CASCADE,
+        related_name='events',
+        verbose_name='Рекламация',
+    )
+    kind = models.CharField(max_length=30, choices=Kind.choices, verbose_name='Вид события')
+    actor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='complaint_events',
+        verbose_name='Кто',
+        help_text='Пусто = системное событие (cron)',
+    )
+    description = models.TextField(blank=True, verbose_name='Описание')
+    old_status = models.CharField(max_length=30, blank=True, verbose_name='Старый статус')
+    new_status = models.CharField(max_length=30, blank=True, verbose_name='Новый статус')
+    meta = models.JSONField(default=dict, blank=True, verbose_name='Доп. данные')
+    # Не auto_now_add: backfill_complaint_events восстанавливает исторические даты
+    created_at = models.DateTimeField(default=timezone.now, verbose_name='Когда')
+
+    class Meta:
+        verbose_name = 'Событие рекламации'
+        verbose_name_plural = 'Журнал событий рекламации'
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['complaint', '-created_at']),
+        ]
+
+    def __str__(self):
+        return f'#{self.complaint_id} {self.get_kind_display()} ({self.created_at:%d.%m.%Y %H:%M})'
+
+    @property
+    def title(self):
+        if self.kind == self.Kind.STATUS_CHANGED:
+            return f'Статус: {dict(ComplaintStatus.choices).get(self.new_status, self.new_status)}'
+        if self.kind == self.Kind.NOTIFICATION and self.meta.get('title'):
+            return f'Уведомление: {self.meta["title"]}'
+        return self.get_kind_display()
+
+    @property
+    def icon(self):
+        if self.kind == self.Kind.STATUS_CHANGED and self.new_status in self.FINAL_STATUSES:
+            return 'check'
+        return self.APPEARANCE[self.kind][0]
+
+    @property
+    def color(self):
+        if self.kind == self.Kind.STATUS_CHANGED and self.new_status in self.FINAL_STATUSES:
+            return 'green'
+        return self.APPEARANCE[self.kind][1]
+
 
 class ShippingRegistry(models.Model):
     """Реестр на отгрузку"""
@@ -1830,6 +2133,12 @@ class ShippingRegistry(models.Model):
         if self.complaint and not self.pk:
             self.order_type = self.OrderType.COMPLAINT
         super().save(*args, **kwargs)
+        dashboard_cache.invalidate(dashboard_cache.REGISTRIES)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        dashboard_cache.invalidate(dashboard_cache.REGISTRIES)
+        return result
 
 
 class ReturnRegistry(models.Model):
@@ -1891,6 +2200,15 @@ class ReturnRegistry(models.Model):
     def __str__(self):
         return f"Возврат {self.order_number} - {self.product_name}"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        dashboard_cache.invalidate(dashboard_cache.REGISTRIES)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        dashboard_cache.invalidate(dashboard_cache.REGISTRIES)
+        return result
+
 
 class Notification(models.Model):
     """Уведомления"""
@@ -1947,3 +2265,94 @@ class Notification(models.Model):
             self.save()
 
 
+class ParsedPdf(models.Model):
+    """
+    Сохранённый результат разбора PDF (КП или рекламации) — см. projects/pdf_parse_cache.py.
+    Ключ — вид парсера, SHA-256 содержимого файла и версия парсера: после правки
+    парсера старые записи перестают совпадать и удаляются командой prune_parsed_pdfs.
+    """
+
+    KIND_KP = 'kp'
+    KIND_COMPLAINT = 'complaint'
+    KIND_CHOICES = [
+        (KIND_KP, 'КП'),
+        (KIND_COMPLAINT, 'Рекламация'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, verbose_name='Парсер')
+    checksum = models.CharField(max_length=64, verbose_name='SHA-256 файла')
+    parser_version = models.CharField(max_length=64, verbose_name='Версия парсера')
+    result = models.JSONField(verbose_name='Результат разбора')
+    size = models.PositiveBigIntegerField(default=0, verbose_name='Размер файла (байт)')
+    hits = models.PositiveIntegerField(default=0, verbose_name='Повторных загрузок')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Разобран')
+    last_used_at = models.DateTimeField(default=timezone.now, verbose_name='Последнее обращение')
+
+    class Meta:
+        verbose_name = 'Разобранный PDF'
+        verbose_name_plural = 'Разобранные PDF'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'checksum', 'parser_version'], name='uniq_parsed_pdf_key',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['last_used_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.get_kind_display()} {self.checksum[:12]}'
+
+
+class PdfParseJob(models.Model):
+    """
+    Асинхронное задание разбора PDF (projects/pdf_parse_service.py): клиент
+    отправляет файл, получает id и опрашивает статус, пока не придёт результат.
+    """
+
+    class Status(models.TextChoices):
+        QUEUED = 'queued', 'В очереди'
+        RUNNING = 'running', 'Разбирается'
+        DONE = 'done', 'Готово'
+        FAILED = 'failed', 'Ошибка'
+        CANCELLED = 'cancelled', 'Отменено'
+
+    ACTIVE_STATUSES = (Status.QUEUED, Status.RUNNING)
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=20, choices=ParsedPdf.KIND_CHOICES, verbose_name='Парсер')
+    status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        default=Status.QUEUED,
+        verbose_name='Статус',
+    )
+    file_name = models.CharField(max_length=255, blank=True, verbose_name='Имя файла')
+    checksum = models.CharField(max_length=64, verbose_name='SHA-256 файла')
+    size = models.PositiveBigIntegerField(default=0, verbose_name='Размер файла (байт)')
+    result = models.JSONField(null=True, blank=True, verbose_name='Результат разбора')
+    error = models.TextField(blank=True, verbose_name='Ошибка')
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='pdf_parse_jobs',
+        verbose_name='Автор',
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Создано')
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='Начат разбор')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='Завершено')
+
+    class Meta:
+        verbose_name = 'Задание разбора PDF'
+        verbose_name_plural = 'Задания разбора PDF'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_by', '-created_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.get_kind_display()} {self.id} ({self.get_status_display()})'
+
+    @property
+    def is_finished(self):
+        return self.status not in self.ACTIVE_STATUSES
@@ -0,0 +1,221 @@
+"""
+Пакетный пересчёт просрочек рекламаций.
+
+Раньше просрочки пересчитывались построчно прямо в ComplaintViewSet.list()/retrieve():
+на каждый GET для каждой видимой рекламации вызывались check_installer_overdue() /
+check_moscow_service_overdue(), каждая из которых могла сделать save() и синхронно
+отправить push и SMS. Теперь переходы считаются набором запросов
+(один UPDATE ... WHERE на каждый целевой статус), а уведомления ставятся в очередь
+(users.notification_outbox) и отправляются воркером run_notification_dispatcher.
+
+Запуск: `python manage.py evaluate_complaint_overdue` (cron) или evaluate_overdue()
+из кода для узкого queryset (например, после переноса даты монтажа).
+"""
+import logging
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from marketingdoors import dashboard_cache
+
+from .models import Complaint, ComplaintEvent, ComplaintStatus, ComplaintType
+
+logger = logging.getLogger(__name__)
+
+# Без назначенной даты монтажа просрочка считается через столько дней после назначения монтажника
+INSTALLER_FALLBACK_DAYS = 30
+
+# Статусы, в которых просрочку монтажа не считаем (см. Complaint.check_installer_overdue)
+INSTALLER_FINAL_STATUSES = [
+    ComplaintStatus.COMPLETED,
+    ComplaintStatus.RESOLVED,
+    ComplaintStatus.CLOSED,
+    ComplaintStatus.UNDER_SM_REVIEW,
+]
+
+# Куда возвращаем рекламацию при снятии «Просрочена монтажником»
+# (та же логика, что в Complaint._restore_status_from_overdue)
+INSTALLER_RESTORE_TARGETS = [
+    (ComplaintStatus.BOTH_PLANNED,
+     Q(planned_installation_date__isnull=False, planned_shipping_date__isnull=False)),
+    (ComplaintStatus.INSTALLATION_PLANNED,
+     Q(planned_installation_date__isnull=False, planned_shipping_date__isnull=True)),
+    (ComplaintStatus.SHIPPING_PLANNED,
+     Q(planned_installation_date__isnull=True, planned_shipping_date__isnull=False)),
+    (ComplaintStatus.WAITING_INSTALLER_DATE,
+     Q(planned_installation_date__isnull=True, planned_shipping_date__isnull=True)),
+]
+
+
+@dataclass
+class OverdueResult:
+    """Итог прогона: id рекламаций по каждому целевому статусу"""
+    transitions: dict = field(default_factory=dict)
+
+    def add(self, target_status, ids):
+        if ids:
+            self.transitions.setdefault(str(target_status), []).extend(ids)
+
+    def ids(self, target_status):
+        return self.transitions.get(str(target_status), [])
+
+    @property
+    def total(self):
+        return sum(len(ids) for ids in self.transitions.values())
+
+
+def _installer_candidates(queryset):
+    return queryset.filter(
+        installer_assigned__isnull=False,
+        installer_assigned_at__isnull=False,
+        complaint_type=ComplaintType.INSTALLER,
+    ).exclude(status__in=INSTALLER_FINAL_STATUSES)
+
+
+def _apply(queryset, target_status, now, result):
+    """
+    Один UPDATE на целевой статус; id и прежние статусы фиксируем до обновления
+    для очереди уведомлений и журнала ComplaintEvent (bulk_create).
+    """
+    rows = list(queryset.values_list('id', 'status'))
+    if not rows:
+        return
+    ids = [complaint_id for complaint_id, _ in rows]
+    # Повторяем условие в UPDATE, чтобы не перезаписать строку, изменённую параллельно
+    queryset.filter(pk__in=ids).update(status=target_status, updated_at=now)
+    statuses = dict(ComplaintStatus.choices)
+    ComplaintEvent.objects.bulk_create([
+        ComplaintEvent(
+            complaint_id=complaint_id,
+            kind=ComplaintEvent.Kind.STATUS_CHANGED,
+            old_status=old_status,
+            new_status=target_status,
+            description=f'{statuses.get(old_status, old_status)} → {statuses[target_status]}',
+            meta={'action': 'evaluate_overdue'},
+            created_at=now,
+        )
+        for complaint_id, old_status in rows
+    ], batch_size=500)
+    result.add(target_status, ids)
+    dashboard_cache.invalidate(dashboard_cache.COMPLAINTS)
+
+
+def evaluate_overdue(queryset=None, now=None):
+    """
+    Пересчитывает просрочки монтажа и сервиса Москва для всех рекламаций queryset
+    (по умолчанию — для всех). Возвращает OverdueResult; уведомления не отправляет —
+    для этого есть dispatch_overdue_notifications().
+    """
+    if queryset is None:
+        queryset = Complaint.objects.all()
+    now = now or timezone.now()
+    result = OverdueResult()
+
+    overdue_q = (
+        Q(planned_installation_date__lte=now)
+        | Q(planned_installation_date__isnull=True,
+            installer_assigned_at__lte=now - timedelta(days=INSTALLER_FALLBACK_DAYS))
+    )
+
+    with transaction.atomic():
+        installer = _installer_candidates(queryset)
+
+        # Просрочка монтажа
+        _apply(
+            installer.filter(overdue_q).exclude(status=ComplaintStatus.INSTALLER_OVERDUE),
+            ComplaintStatus.INSTALLER_OVERDUE, now, result,
+        )
+
+        # Снятие просрочки монтажа — только когда дату монтажа перенесли вперёд.
+        # Без даты (например, после смены монтажника) просрочка остаётся, как
+        # в Complaint.check_installer_overdue
+        restorable = installer.filter(
+            planned_installation_date__gt=now, status=ComplaintStatus.INSTALLER_OVERDUE,
+        )
+        for target_status, condition in INSTALLER_RESTORE_TARGETS:
+            _apply(restorable.filter(condition), target_status, now, result)
+
+        # Сервис Москва: срок истёк / срок перенесли в будущее
+        _apply(
+            queryset.filter(
+                status=ComplaintStatus.MOSCOW_SERVICE,
+                moscow_service_deadline__lt=now,
+            ),
+            ComplaintStatus.MOSCOW_SERVICE_OVERDUE, now, result,
+        )
+        _apply(
+            queryset.filter(
+                status=ComplaintStatus.MOSCOW_SERVICE_OVERDUE,
+                moscow_service_deadline__gte=now,
+            ),
+            ComplaintStatus.MOSCOW_SERVICE, now, result,
+        )
+
+    return result
+
+
+def _complaint_url(complaint_id):
+    frontend_url = getattr(settings, 'FRONTEND_URL', '')
+    if frontend_url:
+        return f"{frontend_url.rstrip('/')}/complaints/{complaint_id}"
+    return f"/complaints/{complaint_id}"
+
+
+def dispatch_overdue_notifications(result):
+    """
+    Ставит в очередь уведомлений (users.notification_outbox) сообщения по результатам
+    evaluate_overdue():
+    - монтажнику — push и SMS о новой просрочке монтажа;
+    - всем сотрудникам ОР — уведомление о просрочке сервиса Москва.
+    """
+    from users.models import User
+    from users.notification_outbox import enqueue_push, enqueue_sms
+
+    sent = 0
+
+    installer_ids = result.ids(ComplaintStatus.INSTALLER_OVERDUE)
+    for complaint in Complaint.objects.filter(pk__in=installer_ids).select_related('installer_assigned'):
+        complaint_url = _complaint_url(complaint.id)
+        message_text = f"Рекламация не завершена! Просрочена! {complaint_url}"
+        enqueue_push(
+            user=complaint.installer_assigned,
+            title='Рекламация просрочена',
+            body=message_text,
+            url=complaint_url,
+        )
+        enqueue_sms(
+            user=complaint.installer_assigned,
+            message=message_text,
+        )
+        sent += 1
+        logger.info(
+            'Рекламация #%s помечена как просроченная монтажником %s',
+            complaint.id,
+            complaint.installer_assigned.username,
+        )
+
+    moscow_ids = result.ids(ComplaintStatus.MOSCOW_SERVICE_OVERDUE)
+    if moscow_ids:
+        or_users = list(User.objects.filter(role='complaint_department'))
+        for complaint in Complaint.objects.filter(pk__in=moscow_ids):
+            complaint._create_notifications(
+                recipients=or_users,
+                notification_type='pc',
+                title='⚠️ Просрочка сервиса Москва',
+                message=f'Рекламация #{complaint.id} (заказ {complaint.order_number}): сервисная заявка Москва не решена в срок ({complaint.moscow_service_deadline.strftime("%d.%m.%Y")}). Клиент: {complaint.client_name}'
+            )
+            sent += 1
+
+    return sent
+
+
+def run_overdue_engine(queryset=None, now=None):
+    """Пересчёт просрочек и постановка уведомлений в очередь одной транзакцией"""
+    with transaction.atomic():
+        result = evaluate_overdue(queryset=queryset, now=now)
+        dispatch_overdue_notifications(result)
+    return result
@@ -0,0 +1,166 @@
+"""
+Кэш результатов разбора PDF (КП — orders.pdf_parser.parse_kp_pdf, рекламации —
+projects.pdf_parser.parse_complaint_pdf).
+
+Менеджеры загружают один и тот же КП по нескольку раз (parse_kp → создание
+заказа → замена/дозагрузка КП, parse-pdf рекламации по тому же заказу), и
+каждый раз pdfplumber разбирал файл заново. Теперь результат ищется по ключу
+(вид парсера, SHA-256 содержимого файла, версия парсера) — до запуска
+разбора в воркере (projects.pdf_parse_service):
+
+- в памяти процесса — LRU на PDF_PARSE_CACHE_SIZE записей (0 — выключен);
+- в таблице ParsedPdf — общей для всех воркеров и переживающей рестарт.
+
+Версия парсера — хэш исходников модулей разбора, версии pdfplumber и
+PARSER_VERSION, поэтому любая правка парсера автоматически даёт новый ключ;
+записи старых версий удаляет `manage.py prune_parsed_pdfs`.
+
+Результат хранится и возвращается в JSON-виде (даты — ISO-строки, Decimal —
+строки), как его и так отдаёт API; вызывающий получает собственную копию.
+"""
+import copy
+import hashlib
+import importlib
+import inspect
+import logging
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ParsedPdf
+
+logger = logging.getLogger(__name__)
+
+# Увеличить при изменении формата результата, не видном по исходникам парсеров
+PARSER_VERSION = 1
+
+# Вид → (функция разбора, модули, от которых зависит результат)
+PARSERS = {
+    ParsedPdf.KIND_KP: (
+        'orders.pdf_parser.parse_kp_pdf',
+        ('orders.pdf_parser', 'projects.pdf_parser', 'marketingdoors.pdf_pages'),
+    ),
+    ParsedPdf.KIND_COMPLAINT: (
+        'projects.pdf_parser.parse_complaint_pdf',
+        ('projects.pdf_parser', 'marketingdoors.pdf_pages'),
+    ),
+}
+
+CHUNK_SIZE = 64 * 1024
+
+_memory = OrderedDict()
+_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def parser_version(kind):
+    """Версия парсера kind: меняется с любой правкой его исходников"""
+    import pdfplumber
+
+    digest = hashlib.sha256(f'{PARSER_VERSION}:{pdfplumber.__version__}'.encode('utf-8'))
+    for module_name in PARSERS[kind][1]:
+        digest.update(inspect.getsource(importlib.import_module(module_name)).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def file_checksum(pdf_file):
+    """SHA-256 и размер содержимого; позиция файла возвращается в начало"""
+    digest = hashlib.sha256()
+    size = 0
+    if hasattr(pdf_file, 'seek'):
+        pdf_file.seek(0)
+    chunks = pdf_file.chunks(CHUNK_SIZE) if hasattr(pdf_file, 'chunks') else iter(
+        lambda: pdf_file.read(CHUNK_SIZE), b''
+    )
+    for chunk in chunks:
+        digest.update(chunk)
+        size += len(chunk)
+    pdf_file.seek(0)
+    return digest.hexdigest(), size
+
+
+def _memory_size():
+    return int(getattr(settings, 'PDF_PARSE_CACHE_SIZE', 64))
+
+
+def _memory_get(key):
+    with _lock:
+        result = _memory.get(key)
+        if result is not None:
+            _memory.move_to_end(key)
+        return result
+
+
+def _memory_put(key, result):
+    limit = _memory_size()
+    if limit <= 0:
+        return
+    with _lock:
+        _memory[key] = result
+        _memory.move_to_end(key)
+        while len(_memory) > limit:
+            _memory.popitem(last=False)
+
+
+def clear_memory():
+    """Сбрасывает LRU процесса (тесты, смена настроек)"""
+    with _lock:
+        _memory.clear()
+
+
+def lookup(kind, checksum):
+    """Сохранённый результат разбора файла checksum текущей версией парсера (копия) или None"""
+    version = parser_version(kind)
+    key = (kind, checksum, version)
+
+    result = _memory_get(key)
+    if result is not None:
+        return copy.deepcopy(result)
+
+    stored = ParsedPdf.objects.filter(kind=kind, checksum=checksum, parser_version=version).values_list(
+        'id', 'result'
+    ).first()
+    if stored is None:
+        return None
+    ParsedPdf.objects.filter(pk=stored[0]).update(hits=F('hits') + 1, last_used_at=timezone.now())
+    _memory_put(key, stored[1])
+    return copy.deepcopy(stored[1])
+
+
+def store(kind, checksum, size, result):
+    """Сохраняет результат разбора (JSON-вид) в LRU и в таблицу ParsedPdf"""
+    version = parser_version(kind)
+    try:
+        with transaction.atomic():
+            ParsedPdf.objects.create(
+                kind=kind, checksum=checksum, parser_version=version, result=result, size=size,
+            )
+    except IntegrityError:
+        # Тот же файл параллельно разобрал другой воркер — его запись равноценна
+        logger.debug('ParsedPdf %s/%s уже сохранён', kind, checksum[:12])
+    _memory_put((kind, checksum, version), result)
+
+
+def cached_parse(kind, pdf_file):
+    """
+    Результат разбора pdf_file парсером kind (ParsedPdf.KIND_*): из LRU, из
+    таблицы ParsedPdf или свежий разбор в воркере (projects.pdf_parse_service).
+    Ошибки разбора (ValueError) не кэшируются. Вызывается из веб-запроса: слота
+    разбора ждёт не дольше PDF_PARSE_SLOT_WAIT_SECONDS, иначе ParseBusy (503).
+    """
+    from .pdf_parse_service import check_upload_size, run_parse, slot_wait_seconds
+
+    check_upload_size(pdf_file)
+    checksum, size = file_checksum(pdf_file)
+    result = lookup(kind, checksum)
+    if result is not None:
+        return result
+
+    result = run_parse(kind, pdf_file.read(), slot_timeout=slot_wait_seconds())
+    store(kind, checksum, size, result)
+    return copy.deepcopy(result)
@@ -0,0 +1,348 @@
+"""
+Разбор PDF КП и рекламаций вне процесса веб-воркера.
+
+Раньше parse_kp / parse-pdf гоняли pdfplumber прямо в потоке запроса без
+ограничений: битый или 200-страничный PDF занимал воркер gunicorn на минуту
+и раздувал его память. Теперь каждый разбор идёт в отдельном дочернем
+процессе (контекст PDF_PARSE_START_METHOD, по умолчанию forkserver — чистый
+процесс без потоков и соединений веб-воркера):
+
+- одновременно не больше PDF_PARSE_WORKERS разборов на веб-процесс. Задания
+  ждут свободного слота в фоновом потоке; синхронный запрос ждёт его не дольше
+  PDF_PARSE_SLOT_WAIT_SECONDS, иначе 503 с Retry-After (ParseBusy) — клиент
+  повторяет запрос или ставит задание;
+- в дочернем процессе ставятся лимиты ОС: процессорное время
+  (PDF_PARSE_TIMEOUT_SECONDS) и адресное пространство (PDF_PARSE_MEMORY_MB);
+  родитель дополнительно следит за временем по часам и убивает процесс;
+- файл больше PDF_PARSE_MAX_MB отклоняется до разбора, больше
+  PDF_PARSE_MAX_PAGES страниц — до извлечения текста (marketingdoors.pdf_pages);
+- асинхронные задания (PdfParseJob): submit_job() сразу возвращает задание,
+  разбор идёт в фоновом потоке, клиент опрашивает /api/v1/pdf-parse-jobs/<id>/;
+  cancel_job() отменяет задание — процесс разбора завершается.
+
+Синхронные эндпоинты тоже идут через run_parse(): они ждут слота не дольше
+PDF_PARSE_SLOT_WAIT_SECONDS и сам разбор — не дольше лимита времени. Результаты
+кэшируются (projects.pdf_parse_cache).
+
+PDF_PARSE_WORKERS=0 — разбор в текущем процессе без лимитов (тесты, отладка).
+"""
+import io
+import importlib
+import json
+import logging
+import math
+import multiprocessing
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from marketingdoors.pdf_pages import max_pages
+
+logger = logging.getLogger(__name__)
+
+# Модули, которые forkserver импортирует заранее: дочерний процесс стартует уже с ними
+PRELOAD = ['pdfplumber', 'projects.pdf_parser', 'orders.pdf_parser']
+
+POLL_INTERVAL = 0.1
+CANCEL_CHECK_INTERVAL = 1.0
+# Сколько ждать после лимита времени, прежде чем считать задание зависшим
+STALE_GRACE_SECONDS = 60
+
+_slots = None
+_slots_size = None
+_slots_lock = threading.Lock()
+
+
+class ParseTimeout(ValueError):
+    pass
+
+
+class ParseCancelled(ValueError):
+    pass
+
+
+class ParseBusy(APIException):
+    """Все слоты разбора заняты: 503, Retry-After — через wait секунд (DRF exception_handler)"""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = (
+        'Сервер занят разбором других PDF. Повторите через несколько секунд '
+        'или загрузите файл через /api/v1/pdf-parse-jobs/.'
+    )
+    default_code = 'pdf_parse_busy'
+
+    def __init__(self, wait):
+        super().__init__()
+        self.wait = wait
+
+
+def _workers():
+    return int(getattr(settings, 'PDF_PARSE_WORKERS', 2))
+
+
+def timeout_seconds():
+    return float(getattr(settings, 'PDF_PARSE_TIMEOUT_SECONDS', 30))
+
+
+def slot_wait_seconds():
+    return float(getattr(settings, 'PDF_PARSE_SLOT_WAIT_SECONDS', 5))
+
+
+def _memory_mb():
+    return int(getattr(settings, 'PDF_PARSE_MEMORY_MB', 768))
+
+
+def _max_bytes():
+    return int(float(getattr(settings, 'PDF_PARSE_MAX_MB', 20)) * 1024 * 1024)
+
+
+def check_upload_size(pdf_file):
+    """ValueError, если файл больше PDF_PARSE_MAX_MB"""
+    size = getattr(pdf_file, 'size', None)
+    limit = _max_bytes()
+    if size is not None and limit and size > limit:
+        raise ValueError(
+            f'Файл слишком большой для разбора: {size / 1024 / 1024:.1f} МБ, '
+            f'допускается не больше {limit / 1024 / 1024:.0f} МБ'
+        )
+
+
+def to_json(result):
+    """Результат разбора в JSON-виде (даты — ISO-строки, Decimal — строки)"""
+    return json.loads(json.dumps(result, cls=DjangoJSONEncoder, ensure_ascii=False))
+
+
+def _parser_path(kind):
+    from .pdf_parse_cache import PARSERS
+
+    return PARSERS[kind][0]
+
+
+def _parse(parser_path, content):
+    module_name, _, attr = parser_path.rpartition('.')
+    parse = getattr(importlib.import_module(module_name), attr)
+    return to_json(parse(io.BytesIO(content)))
+
+
+def _child(parser_path, content, conn, cpu_seconds, memory_mb, max_pages):
+    """
+    Выполняется в дочернем процессе: лимиты ОС, разбор, результат в pipe.
+    Парсерам нужны только настройки (не модели), поэтому django.setup() не нужен.
+    """
+    import resource
+
+    # Предел страниц — из родителя (у дочернего процесса свои, непереопределённые настройки)
+    settings.PDF_PARSE_MAX_PAGES = max_pages
+
+    cpu = max(1, int(cpu_seconds + 0.999))
+    # Мягкий лимит — SIGXCPU (процесс завершается), жёсткий — SIGKILL секундой позже
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+    if memory_mb > 0:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    try:
+        conn.send(('ok', _parse(parser_path, content)))
+    except MemoryError:
+        conn.send(('error', 'Недостаточно памяти для разбора PDF'))
+    except Exception as exc:
+        conn.send(('error', str(exc) or exc.__class__.__name__))
+    finally:
+        conn.close()
+
+
+def _slot():
+    """Семафор слотов разбора (пересоздаётся при смене PDF_PARSE_WORKERS)"""
+    global _slots, _slots_size
+    with _slots_lock:
+        size = max(1, _workers())
+        if _slots is None or _slots_size != size:
+            _slots, _slots_size = threading.BoundedSemaphore(size), size
+        return _slots
+
+
+def _run_in_child(kind, content, is_cancelled=None):
+    method = getattr(settings, 'PDF_PARSE_START_METHOD', 'forkserver')
+    ctx = multiprocessing.get_context(method)
+    if method == 'forkserver':
+        ctx.set_forkserver_preload(PRELOAD)
+    timeout = timeout_seconds()
+    receiver, sender = ctx.Pipe(duplex=False)
+    process = ctx.Process(
+        target=_child,
+        args=(_parser_path(kind), content, sender, timeout, _memory_mb(), max_pages()),
+        daemon=True,
+    )
+    process.start()
+    sender.close()
+    deadline = time.monotonic() + timeout
+    next_cancel_check = time.monotonic() + CANCEL_CHECK_INTERVAL
+    try:
+        while True:
+            if receiver.poll(POLL_INTERVAL):
+                try:
+                    status, payload = receiver.recv()
+                except EOFError:
+                    # Процесс завершён лимитом ОС (SIGXCPU/SIGKILL) до отправки результата
+                    raise ValueError('Разбор PDF прерван: превышен лимит времени или памяти')
+                break
+            if not process.is_alive() and not receiver.poll(0):
+                raise ValueError('Разбор PDF прерван: превышен лимит времени или памяти')
+            now = time.monotonic()
+            if now > deadline:
+                raise ParseTimeout(f'Разбор PDF не уложился в {timeout:g} с')
+            if is_cancelled is not None and now > next_cancel_check:
+                next_cancel_check = now + CANCEL_CHECK_INTERVAL
+                if is_cancelled():
+                    raise ParseCancelled('Разбор PDF отменён')
+    finally:
+        if process.is_alive():
+            process.kill()
+        process.join()
+        receiver.close()
+    if status != 'ok':
+        raise ValueError(payload)
+    return payload
+
+
+def run_parse(kind, content, is_cancelled=None, slot_timeout=None):
+    """
+    Разбирает content (байты PDF) парсером kind в дочернем процессе и возвращает
+    результат в JSON-виде. Ошибки разбора, превышение лимитов и отмена — ValueError.
+    slot_timeout — сколько ждать свободного слота (None — сколько потребуется);
+    не дождались — ParseBusy.
+    """
+    if _workers() <= 0:
+        return _parse(_parser_path(kind), content)
+    slots = _slot()
+    if not slots.acquire(timeout=slot_timeout):
+        raise ParseBusy(wait=max(1, math.ceil(slot_wait_seconds())))
+    try:
+        if is_cancelled is not None and is_cancelled():
+            raise ParseCancelled('Разбор PDF отменён')
+        return _run_in_child(kind, content, is_cancelled)
+    finally:
+        slots.release()
+
+
+# ---------- асинхронные задания ----------
+
+def _job_cancelled(job_id):
+    from .models import PdfParseJob
+
+    return PdfParseJob.objects.filter(pk=job_id, status=PdfParseJob.Status.CANCELLED).exists()
+
+
+def _finish(job_id, **fields):
+    """Финальный статус задания, если его не успели отменить"""
+    from .models import PdfParseJob
+
+    PdfParseJob.objects.filter(pk=job_id, status__in=PdfParseJob.ACTIVE_STATUSES).update(
+        finished_at=timezone.now(), **fields
+    )
+
+
+def _run_job(job_id, kind, checksum, size, content):
+    """Выполняет задание (в фоновом потоке или сразу при PDF_PARSE_WORKERS=0)"""
+    from .models import PdfParseJob
+    from .pdf_parse_cache import store
+
+    started = PdfParseJob.objects.filter(pk=job_id, status=PdfParseJob.Status.QUEUED).update(
+        status=PdfParseJob.Status.RUNNING, started_at=timezone.now(),
+    )
+    if not started:
+        return
+    try:
+        result = run_parse(kind, content, is_cancelled=lambda: _job_cancelled(job_id))
+    except ParseCancelled:
+        return
+    except ValueError as exc:
+        _finish(job_id, status=PdfParseJob.Status.FAILED, error=str(exc))
+        return
+    except Exception as exc:
+        logger.exception('Задание разбора PDF %s упало', job_id)
+        _finish(job_id, status=PdfParseJob.Status.FAILED, error=f'Ошибка при обработке PDF файла: {exc}')
+        return
+    store(kind, checksum, size, result)
+    _finish(job_id, status=PdfParseJob.Status.DONE, result=result)
+
+
+def _run_job_in_thread(*args):
+    """Фоновый поток задания: своё соединение с БД, закрывается по завершении"""
+    close_old_connections()
+    try:
+        _run_job(*args)
+    finally:
+        connection.close()
+
+
+def submit_job(kind, pdf_file, user):
+    """
+    Создаёт задание разбора pdf_file. Файл, уже разобранный этой версией
+    парсера, сразу даёт готовое задание. Превышение размера — ValueError.
+    """
+    from .models import PdfParseJob
+    from .pdf_parse_cache import file_checksum, lookup
+
+    check_upload_size(pdf_file)
+    checksum, size = file_checksum(pdf_file)
+    job = PdfParseJob(
+        kind=kind, checksum=checksum, size=size, created_by=user,
+        file_name=(getattr(pdf_file, 'name', '') or '')[:255],
+    )
+    cached = lookup(kind, checksum)
+    if cached is not None:
+        job.status = PdfParseJob.Status.DONE
+        job.result = cached
+        job.finished_at = timezone.now()
+        job.save()
+        return job
+
+    job.save()
+    content = pdf_file.read()
+    if _workers() <= 0:
+        _run_job(job.id, kind, checksum, size, content)
+        job.refresh_from_db()
+        return job
+
+    def start():
+        threading.Thread(
+            target=_run_job_in_thread, args=(job.id, kind, checksum, size, content),
+            name=f'pdf-parse-{job.id}', daemon=True,
+        ).start()
+
+    # Поток читает задание из БД — запускаем после фиксации транзакции
+    transaction.on_commit(start)
+    return job
+
+
+def cancel_job(job):
+    """Отменяет незавершённое задание; False — задание уже завершено"""
+    from .models import PdfParseJob
+
+    return bool(PdfParseJob.objects.filter(pk=job.pk, status__in=PdfParseJob.ACTIVE_STATUSES).update(
+        status=PdfParseJob.Status.CANCELLED, finished_at=timezone.now(),
+    ))
+
+
+def expire_stale(job):
+    """
+    Задание, чей веб-процесс перезапустился посреди разбора, навсегда осталось бы
+    «в работе» — по истечении лимита времени с запасом помечаем его ошибкой.
+    """
+    from .models import PdfParseJob
+
+    if job.is_finished:
+        return job
+    started = job.started_at or job.created_at
+    # В очереди задание может ждать слота — на это отводим ещё несколько лимитов
+    allowance = timeout_seconds() * (1 if job.started_at else 4) + STALE_GRACE_SECONDS
+    if timezone.now() - started > timedelta(seconds=allowance):
+        _finish(job.pk, status=PdfParseJob.Status.FAILED, error='Разбор PDF прерван (перезапуск сервера)')
+        job.refresh_from_db()
+    return job
@@ -4,7 +4,8 @@
 import re
 import logging
 from typing import Dict, List, Optional, Any
-import pdfplumber
+
+from marketingdoors.pdf_pages import PageContent, extract_pages, joined_text
 
 logger = logging.getLogger(__name__)
 
@@ -38,48 +39,43 @@ def parse_complaint_pdf(pdf_file) -> Dict[str, Any]:
     }
     
     try:
-        # Открываем PDF файл
-        with pdfplumber.open(pdf_file) as pdf:
-            # Извлекаем весь текст из всех страниц
-            full_text = ''
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    full_text += page_text + '\n'
-            
-            if not full_text:
-                logger.warning('Не удалось извлечь текст из PDF')
-                return result
-            
-            # Нормализуем текст (убираем лишние пробелы, переносы)
-            full_text = re.sub(r'\s+', ' ', full_text)
-            
-            # Извлекаем номер заказа
-            result['order_number'] = _extract_order_number(full_text)
-            
-            # Извлекаем наименование клиента (покупателя)
-            result['client_name'] = _extract_client_name(full_text)
-            
-            # Извлекаем контактное лицо (если не найдено, используем имя покупателя)
-            result['contact_person'] = _extract_contact_person(full_text)
-            if not result['contact_person'] and result['client_name']:
-                result['contact_person'] = result['client_name']
-                logger.info(f'Контактное лицо не найдено, используем имя покупателя: {result["client_name"]}')
-            
-            # Извлекаем телефон
-            result['contact_phone'] = _extract_contact_phone(full_text)
-            
-            # Извлекаем адрес
-            result['address'] = _extract_address(full_text)
-            
-            # Извлекаем имя менеджера
-            result['manager_name'] = _extract_manager_name(full_text)
-            
-            # Извлекаем бракованные изделия
-            result['defective_products'] = _extract_defective_products(pdf, full_text)
-            
-            logger.info(f'Успешно распарсен PDF. Найдено изделий: {len(result["defective_products"])}')
-            
+        # Один проход по страницам: текст и таблицы извлекаются один раз
+        pages = extract_pages(pdf_file, tables=True)
+        full_text = joined_text(pages, skip_empty=True)
+        
+        if not full_text:
+            logger.warning('Не удалось извлечь текст из PDF')
+            return result
+        
+        # Нормализуем текст (убираем лишние пробелы, переносы)
+        full_text = re.sub(r'\s+', ' ', full_text)
+        
+        # Извлекаем номер заказа
+        result['order_number'] = _extract_order_number(full_text)
+        
+        # Извлекаем наименование клиента (покупателя)
+        result['client_name'] = _extract_client_name(full_text)
+        
+        # Извлекаем контактное лицо (если не найдено, используем имя покупателя)
+        result['contact_person'] = _extract_contact_person(full_text)
+        if not result['contact_person'] and result['client_name']:
+            result['contact_person'] = result['client_name']
+            logger.info(f'Контактное лицо не найдено, используем имя покупателя: {result["client_name"]}')
+        
+        # Извлекаем телефон
+        result['contact_phone'] = _extract_contact_phone(full_text)
+        
+        # Извлекаем адрес
+        result['address'] = _extract_address(full_text)
+        
+        # Извлекаем имя менеджера
+        result['manager_name'] = _extract_manager_name(full_text)
+        
+        # Извлекаем бракованные изделия
+        result['defective_products'] = _extract_defective_products(pages, full_text)
+        
+        logger.info(f'Успешно распарсен PDF. Найдено изделий: {len(result["defective_products"])}')
+        
     except Exception as e:
         logger.error(f'Ошибка при парсинге PDF: {str(e)}', exc_info=True)
         raise ValueError(f'Ошибка при парсинге PDF файла: {str(e)}')
@@ -454,15 +450,14 @@ def _merge_product_candidates(products: List[Dict[str, str]], candidates: List[D
         products.append(candidate)
 
 
-def _extract_defective_products(pdf, full_text: str) -> List[Dict[str, str]]:
-    """Извлекает список бракованных изделий"""
+def _extract_defective_products(pages: List[PageContent], full_text: str) -> List[Dict[str, str]]:
+    """Извлекает список бракованных изделий из страниц, извлечённых extract_pages()"""
     products = []
     supplemental_candidates: List[Dict[str, str]] = []
     
     try:
-        pages = list(pdf.pages)
         for page_idx, page in enumerate(pages):
-            tables = page.extract_tables()
+            tables = page.tables
             if tables:
                 for table in tables:
                     if len(table) < 1:
@@ -549,13 +544,9 @@ def _extract_defective_products(pdf, full_text: str) -> List[Dict[str, str]]:
 
             # Дополнительный проход по "сырому" тексту страницы для строк,
             # которые разорваны на стыке страниц и теряются в extract_tables().
-            next_page_first_line = ''
-            if page_idx + 1 < len(pages):
-                next_text = pages[page_idx + 1].extract_text() or ''
-                next_lines = [line.strip() for line in next_text.split('\n') if line.strip()]
-                next_page_first_line = next_lines[0] if next_lines else ''
+            next_page_first_line = pages[page_idx + 1].first_line if page_idx + 1 < len(pages) else ''
 
-            page_text_candidates = _extract_products_from_page_text(page.extract_text() or '', next_page_first_line)
+            page_text_candidates = _extract_products_from_page_text(page.text, next_page_first_line)
             supplemental_candidates.extend(page_text_candidates)
 
         if supplemental_candidates:
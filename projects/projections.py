@@ -0,0 +1,147 @@
+"""
+Облегчённые проекции списка рекламаций (?fields= / ?view=compact).
+
+ComplaintListSerializer отдаёт вложенные UserSerializer (с городом и салоном) для
+четырёх пользователей, площадку и причину целиком. Спискам в SPA часто достаточно
+нескольких колонок, поэтому:
+
+- ?view=compact — набор COMPACT_FIELDS;
+- ?fields=id,order_number,manager_name,... — произвольное подмножество FIELDS.
+
+Из БД читаются только нужные колонки одним .values() (связанные пользователи —
+плоско: <роль>_id и <роль>_name), строки собираются заранее подготовленными
+функциями без сериализаторов DRF.
+"""
+from django.utils.functional import cached_property
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+from .models import ComplaintStatus, ComplaintType
+
+STATUS_LABELS = dict(ComplaintStatus.choices)
+TYPE_LABELS = dict(ComplaintType.choices)
+
+# Связанные пользователи рекламации: префикс в ответе -> поле модели
+USER_RELATIONS = {
+    'initiator': 'initiator',
+    'recipient': 'recipient',
+    'manager': 'manager',
+    'installer': 'installer_assigned',
+}
+
+PLAIN_FIELDS = [
+    'id', 'order_number', 'client_name', 'address', 'contact_person', 'contact_phone',
+    'status', 'complaint_type',
+]
+DATETIME_FIELDS = [
+    'created_at', 'updated_at', 'planned_installation_date', 'planned_shipping_date',
+    'production_deadline', 'moscow_service_deadline',
+]
+
+COMPACT_FIELDS = [
+    'id', 'order_number', 'client_name', 'status', 'status_display',
+    'complaint_type', 'created_at', 'planned_installation_date',
+    'manager_id', 'manager_name', 'installer_id', 'installer_name',
+]
+
+_datetime_field = serializers.DateTimeField()
+
+
+def _datetime(column):
+    def build(row):
+        value = row[column]
+        return _datetime_field.to_representation(value) if value is not None else None
+    return build
+
+
+def _column(column):
+    return lambda row: row[column]
+
+
+def _user_name(relation):
+    first, last, username = (f'{relation}__{suffix}' for suffix in ('first_name', 'last_name', 'username'))
+
+    def build(row):
+        if row[username] is None:
+            return None
+        full_name = f'{row[first] or ""} {row[last] or ""}'.strip()
+        return full_name or row[username]
+    return build
+
+
+def _build_catalog():
+    """Поле ответа -> (колонки для .values(), функция строки)"""
+    catalog = {}
+    for name in PLAIN_FIELDS:
+        catalog[name] = ([name], _column(name))
+    for name in DATETIME_FIELDS:
+        catalog[name] = ([name], _datetime(name))
+    catalog['status_display'] = (['status'], lambda row: STATUS_LABELS.get(row['status'], row['status']))
+    catalog['complaint_type_display'] = (
+        ['complaint_type'],
+        lambda row: TYPE_LABELS.get(row['complaint_type'], row['complaint_type']),
+    )
+    for prefix, relation in USER_RELATIONS.items():
+        catalog[f'{prefix}_id'] = ([f'{relation}_id'], _column(f'{relation}_id'))
+        catalog[f'{prefix}_name'] = (
+            [f'{relation}__first_name', f'{relation}__last_name', f'{relation}__username'],
+            _user_name(relation),
+        )
+    for relation in ('production_site', 'reason'):
+        catalog[f'{relation}_id'] = ([f'{relation}_id'], _column(f'{relation}_id'))
+        catalog[f'{relation}_name'] = ([f'{relation}__name'], _column(f'{relation}__name'))
+    return catalog
+
+
+FIELDS = _build_catalog()
+
+
+class ComplaintProjection:
+    """Выбранный набор полей: колонки для запроса и сборка строк"""
+
+    def __init__(self, fields):
+        self.fields = fields
+        self.builders = [(name, FIELDS[name][1]) for name in fields]
+
+    @cached_property
+    def columns(self):
+        columns = []
+        for name in self.fields:
+            for column in FIELDS[name][0]:
+                if column not in columns:
+                    columns.append(column)
+        return columns
+
+    def values(self, queryset, extra_columns=()):
+        """
+        .values() по нужным колонкам; extra_columns — то, что нужно пагинации
+        (поля сортировки для позиции курсора).
+        """
+        columns = list(self.columns)
+        columns += [column for column in extra_columns if column not in columns]
+        return queryset.values(*columns)
+
+    def rows(self, records):
+        builders = self.builders
+        return [{name: build(record) for name, build in builders} for record in records]
+
+
+def requested_projection(request):
+    """
+    ComplaintProjection по ?fields= / ?view=compact или None (полный сериализатор).
+    Неизвестные поля — 400 со списком допустимых.
+    """
+    raw_fields = (request.query_params.get('fields') or '').strip()
+    if raw_fields:
+        fields = [name.strip() for name in raw_fields.split(',') if name.strip()]
+        unknown = [name for name in fields if name not in FIELDS]
+        if unknown:
+            raise ValidationError({
+                'fields': f'Неизвестные поля: {", ".join(unknown)}. Допустимые: {", ".join(FIELDS)}',
+            })
+        if 'id' not in fields:
+            fields.insert(0, 'id')
+        return ComplaintProjection(list(dict.fromkeys(fields)))
+    if request.query_params.get('view') == 'compact':
+        return ComplaintProjection(COMPACT_FIELDS)
+    return None
@@ -5,6 +5,7 @@ from .models import (
     DefectiveProduct,
     ComplaintAttachment,
     ComplaintComment,
+    ComplaintEvent,
     ShippingRegistry,
     ReturnRegistry,
     Notification,
@@ -12,6 +13,7 @@ from .models import (
     ComplaintReason,
     ComplaintStatus,
     ComplaintType,
+    PdfParseJob,
 )
 from users.serializers import UserSerializer, CitySerializer
 from orders.models import Order
@@ -93,6 +95,11 @@ class ComplaintAttachmentSerializer(serializers.ModelSerializer):
             'attachment_type',
             'description',
             'uploaded_at',
+            'size',
+            'content_type',
+            'width',
+            'height',
+            'checksum',
         ]
         read_only_fields = ['id', 'uploaded_at']
     
@@ -106,7 +113,7 @@ class ComplaintAttachmentSerializer(serializers.ModelSerializer):
         return None
     
     def get_file_size(self, obj):
-        """Возвращает размер файла"""
+        """Возвращает размер файла (из метаданных, снятых при загрузке)"""
         return obj.file_size
 
 
@@ -132,6 +139,43 @@ class ComplaintCommentSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
+class ComplaintEventSerializer(serializers.ModelSerializer):
+    """Событие истории рекламации (формат прежнего ответа /history/)"""
+    type = serializers.CharField(source='kind', read_only=True)
+    date = serializers.DateTimeField(source='created_at', read_only=True)
+    user = serializers.SerializerMethodField()
+    title = serializers.CharField(read_only=True)
+    icon = serializers.CharField(read_only=True)
+    color = serializers.CharField(read_only=True)
+
+    class Meta:
+        model = ComplaintEvent
+        fields = [
+            'id',
+            'type',
+            'date',
+            'user',
+            'title',
+            'description',
+            'icon',
+            'color',
+            'old_status',
+            'new_status',
+        ]
+        read_only_fields = fields
+
+    def get_user(self, obj):
+        if not obj.actor:
+            return None
+        return {
+            'id': obj.actor.id,
+            'username': obj.actor.username,
+            'first_name': obj.actor.first_name or '',
+            'last_name': obj.actor.last_name or '',
+            'role': obj.actor.role or '',
+        }
+
+
 class ComplaintListSerializer(serializers.ModelSerializer):
     """Упрощенный сериализатор для списка рекламаций"""
     initiator = UserSerializer(read_only=True)
@@ -602,3 +646,24 @@ class NotificationSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at', 'sent_at', 'read_at']
 
+
+class PdfParseJobSerializer(serializers.ModelSerializer):
+    """Сериализатор заданий разбора PDF (результат — только у готовых)"""
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+
+    class Meta:
+        model = PdfParseJob
+        fields = [
+            'id',
+            'kind',
+            'status',
+            'status_display',
+            'file_name',
+            'size',
+            'result',
+            'error',
+            'created_at',
+            'started_at',
+            'finished_at',
+        ]
+        read_only_fields = fields
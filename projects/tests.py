@@ -1,3 +1,808 @@
-from django.test import TestCase
+"""
+Тесты рекламаций.
+Запуск: venv/bin/python manage.py test projects --settings=marketingdoors.test_settings
+"""
+import hashlib
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from marketingdoors import dashboard_cache
+from users.models import City, NotificationOutbox
+from .models import (
+    Complaint, ComplaintAttachment, ComplaintComment, ComplaintEvent, ComplaintReason, ComplaintStatus,
+    ComplaintType, ProductionSite,
+)
+from .overdue import evaluate_overdue, dispatch_overdue_notifications
+from .serializers import ComplaintAttachmentSerializer
+
+User = get_user_model()
+
+
+class ComplaintFixturesMixin:
+    def setUp(self):
+        cache.clear()
+        self.city = City.objects.create(name='Тест-город')
+        self.sm = User.objects.create_user(
+            username='sm', password='x', role='service_manager', city=self.city,
+        )
+        self.manager = User.objects.create_user(
+            username='mgr', password='x', role='manager', city=self.city,
+        )
+        self.installer = User.objects.create_user(
+            username='inst', password='x', role='installer', city=self.city,
+            phone_number='+79990000001',
+        )
+        self.or_user = User.objects.create_user(
+            username='or', password='x', role='complaint_department', city=self.city,
+        )
+        self.site = ProductionSite.objects.create(name='Площадка')
+        self.reason = ComplaintReason.objects.create(name='Брак')
+
+    def make_complaint(self, **fields):
+        defaults = dict(
+            initiator=self.sm,
+            recipient=self.sm,
+            manager=self.manager,
+            production_site=self.site,
+            reason=self.reason,
+            order_number='A-1',
+            client_name='Иванов',
+            address='ул. Тестовая, 1',
+            contact_person='Иванов',
+            contact_phone='+79990000000',
+        )
+        defaults.update(fields)
+        complaint = Complaint.objects.create(**defaults)
+        # Статусы и даты выставляем напрямую, минуя бизнес-логику save()
+        Complaint.objects.filter(pk=complaint.pk).update(**fields)
+        complaint.refresh_from_db()
+        return complaint
+
+
+class OverdueEngineTest(ComplaintFixturesMixin, TestCase):
+    def test_installer_transitions(self):
+        now = timezone.now()
+        installer_fields = dict(
+            complaint_type=ComplaintType.INSTALLER,
+            installer_assigned=self.installer,
+            installer_assigned_at=now - timedelta(days=3),
+        )
+        overdue = self.make_complaint(
+            status=ComplaintStatus.INSTALLATION_PLANNED,
+            planned_installation_date=now - timedelta(hours=1),
+            **installer_fields,
+        )
+        rescheduled = self.make_complaint(
+            status=ComplaintStatus.INSTALLER_OVERDUE,
+            planned_installation_date=now + timedelta(days=2),
+            **installer_fields,
+        )
+        fresh = self.make_complaint(
+            status=ComplaintStatus.WAITING_INSTALLER_DATE,
+            **installer_fields,
+        )
+        # Просрочка без даты монтажа (монтажника сменили) не снимается
+        undated = self.make_complaint(
+            status=ComplaintStatus.INSTALLER_OVERDUE,
+            **installer_fields,
+        )
+
+        result = evaluate_overdue(now=now)
+
+        self.assertEqual(result.ids(ComplaintStatus.INSTALLER_OVERDUE), [overdue.id])
+        self.assertEqual(result.ids(ComplaintStatus.INSTALLATION_PLANNED), [rescheduled.id])
+        self.assertEqual(result.total, 2)
+        fresh.refresh_from_db()
+        self.assertEqual(fresh.status, ComplaintStatus.WAITING_INSTALLER_DATE)
+        undated.refresh_from_db()
+        self.assertEqual(undated.status, ComplaintStatus.INSTALLER_OVERDUE)
+
+        NotificationOutbox.objects.all().delete()
+        dispatch_overdue_notifications(result)
+        self.assertEqual(
+            sorted(NotificationOutbox.objects.filter(user=self.installer).values_list('channel', flat=True)),
+            ['push', 'sms'],
+        )
+
+        # Повторный прогон ничего не меняет
+        self.assertEqual(evaluate_overdue(now=now).total, 0)
+
+    def test_moscow_service_transitions(self):
+        now = timezone.now()
+        expired = self.make_complaint(
+            status=ComplaintStatus.MOSCOW_SERVICE,
+            moscow_service_deadline=now - timedelta(days=1),
+        )
+        extended = self.make_complaint(
+            status=ComplaintStatus.MOSCOW_SERVICE_OVERDUE,
+            moscow_service_deadline=now + timedelta(days=1),
+        )
+
+        result = evaluate_overdue(now=now)
+
+        self.assertEqual(result.ids(ComplaintStatus.MOSCOW_SERVICE_OVERDUE), [expired.id])
+        self.assertEqual(result.ids(ComplaintStatus.MOSCOW_SERVICE), [extended.id])
+        dispatch_overdue_notifications(result)
+        self.assertTrue(expired.notifications.filter(recipient=self.or_user).exists())
+
+    def test_list_is_read_only(self):
+        now = timezone.now()
+        complaint = self.make_complaint(
+            status=ComplaintStatus.INSTALLATION_PLANNED,
+            complaint_type=ComplaintType.INSTALLER,
+            installer_assigned=self.installer,
+            installer_assigned_at=now - timedelta(days=3),
+            planned_installation_date=now - timedelta(hours=1),
+        )
+        NotificationOutbox.objects.all().delete()
+        client = APIClient()
+        client.force_authenticate(self.sm)
+
+        r = client.get('/api/v1/complaints/')
+        self.assertEqual(r.status_code, 200, r.content)
+        r = client.get(f'/api/v1/complaints/{complaint.id}/')
+        self.assertEqual(r.status_code, 200, r.content)
+
+        complaint.refresh_from_db()
+        self.assertEqual(complaint.status, ComplaintStatus.INSTALLATION_PLANNED)
+        self.assertFalse(NotificationOutbox.objects.exists())
+
+
+class DashboardStatsTest(ComplaintFixturesMixin, TestCase):
+    def test_stats_single_query(self):
+        self.make_complaint(status=ComplaintStatus.NEW)
+        self.make_complaint(status=ComplaintStatus.SHIPPING_PLANNED)
+        self.make_complaint(status=ComplaintStatus.CLOSED)
+        client = APIClient()
+        client.force_authenticate(self.sm)
+
+        with self.assertNumQueries(1):
+            r = client.get('/api/v1/dashboard/stats/')
+        self.assertEqual(r.status_code, 200, r.content)
+
+        counts = {s['key']: s['count'] for s in r.data['stats']}
+        self.assertEqual(counts['in_work'], 2)
+        self.assertEqual(counts['new'], 1)
+        self.assertEqual(counts['plan_installation'], 1)
+
+        # Счётчик плитки совпадает со списком по my_tasks
+        r = client.get('/api/v1/complaints/', {'my_tasks': 'plan_installation'})
+        self.assertEqual(len(r.data), 1)
+
+    def test_stats_cached_until_complaint_saved(self):
+        self.make_complaint(status=ComplaintStatus.NEW)
+        client = APIClient()
+        client.force_authenticate(self.sm)
+
+        client.get('/api/v1/dashboard/stats/')
+        with self.assertNumQueries(0):
+            r = client.get('/api/v1/dashboard/stats/')
+        self.assertEqual({s['key']: s['count'] for s in r.data['stats']}['new'], 1)
+
+        self.make_complaint(status=ComplaintStatus.NEW)
+        r = client.get('/api/v1/dashboard/stats/')
+        self.assertEqual({s['key']: s['count'] for s in r.data['stats']}['new'], 2)
+
+        metrics = dashboard_cache.get_metrics()['complaints']
+        self.assertEqual((metrics['hits'], metrics['misses']), (1, 2))
+
+
+class ComplaintPaginationTest(ComplaintFixturesMixin, TestCase):
+    def test_keyset_pages(self):
+        same_moment = timezone.now()
+        ids = [self.make_complaint(status=ComplaintStatus.NEW).id for _ in range(5)]
+        # Одинаковый created_at у части строк — порядок добирается по id
+        Complaint.objects.filter(pk__in=ids[:3]).update(created_at=same_moment)
+        client = APIClient()
+        client.force_authenticate(self.sm)
+
+        seen = []
+        url = '/api/v1/complaints/?page_size=2'
+        while url:
+            r = client.get(url)
+            self.assertEqual(r.status_code, 200, r.content)
+            self.assertEqual(r.data['count'], 5)
+            self.assertLessEqual(len(r.data['results']), 2)
+            seen += [row['id'] for row in r.data['results']]
+            url = r.data['next']
+
+        self.assertEqual(sorted(seen), sorted(ids))
+        self.assertEqual(len(seen), len(set(seen)))
+        expected = list(Complaint.objects.order_by('-created_at', 'id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+        r = client.get('/api/v1/complaints/', {'cursor': 'мусор'})
+        self.assertEqual(r.status_code, 404)
+
+        # Без ?cursor= / ?page_size= — весь список, как ждёт SPA
+        r = client.get('/api/v1/complaints/')
+        self.assertEqual([row['id'] for row in r.data], expected)
+
+
+class ComplaintEventLogTest(ComplaintFixturesMixin, TestCase):
+    def kinds(self, complaint):
+        return list(complaint.events.order_by('id').values_list('kind', flat=True))
+
+    def test_methods_write_events(self):
+        Kind = ComplaintEvent.Kind
+        complaint = self.make_complaint()
+        complaint.event_actor = self.sm
+        self.assertEqual(self.kinds(complaint), [Kind.CREATED])
+
+        complaint.set_type_installer(installer=self.installer)
+        complaint.plan_installation_by_sm(self.installer, timezone.now() + timedelta(days=2))
+        ComplaintComment.objects.create(complaint=complaint, author=self.manager, text='Клиент ждёт')
+        complaint.change_status(ComplaintStatus.CLOSED, completion_date=timezone.now())
+
+        self.assertEqual(self.kinds(complaint), [
+            Kind.CREATED,
+            Kind.STATUS_CHANGED, Kind.INSTALLER_ASSIGNED, Kind.NOTIFICATION,
+            Kind.STATUS_CHANGED, Kind.INSTALLATION_PLANNED, Kind.NOTIFICATION,
+            Kind.COMMENT,
+            Kind.STATUS_CHANGED,
+        ])
+        first_change = complaint.events.filter(kind=Kind.STATUS_CHANGED).order_by('id').first()
+        self.assertEqual(
+            (first_change.old_status, first_change.new_status, first_change.actor, first_change.meta['action']),
+            (ComplaintStatus.NEW, ComplaintStatus.WAITING_INSTALLER_DATE, self.sm, 'set_type_installer'),
+        )
+        self.assertEqual(complaint.events.get(kind=Kind.COMMENT).actor, self.manager)
+
+        # Пакетный движок просрочек пишет смену статуса без автора
+        Complaint.objects.filter(pk=complaint.pk).update(
+            status=ComplaintStatus.INSTALLATION_PLANNED,
+            complaint_type=ComplaintType.INSTALLER,
+            installer_assigned_at=timezone.now() - timedelta(days=3),
+            planned_installation_date=timezone.now() - timedelta(hours=1),
+        )
+        evaluate_overdue()
+        event = complaint.events.order_by('id').last()
+        self.assertEqual((event.new_status, event.actor), (ComplaintStatus.INSTALLER_OVERDUE, None))
+
+    def test_history_is_paginated_log(self):
+        complaint = self.make_complaint()
+        client = APIClient()
+        client.force_authenticate(self.sm)
+        url = f'/api/v1/complaints/{complaint.id}/history/'
+
+        with CaptureQueriesContext(connection) as small:
+            r = client.get(url)
+        self.assertEqual(r.data['total'], 1)
+        self.assertEqual(r.data['events'][0]['type'], 'created')
+        self.assertEqual(r.data['events'][0]['user']['username'], 'sm')
+
+        for n in range(30):
+            ComplaintComment.objects.create(complaint=complaint, author=self.manager, text=f'Комментарий {n}')
+        # Без курсора — весь журнал, тем же числом запросов
+        with CaptureQueriesContext(connection) as large:
+            r = client.get(url)
+        self.assertEqual(len(large), len(small))
+        self.assertEqual((r.data['total'], len(r.data['events']), r.data['next']), (31, 31, None))
+        full = [e['id'] for e in r.data['events']]
+
+        r = client.get(url, {'page_size': 20})
+        self.assertEqual(r.data['total'], 31)
+        self.assertEqual(r.data['events'][0]['description'], 'Комментарий 29')
+
+        seen = [e['id'] for e in r.data['events']]
+        r = client.get(r.data['next'])
+        seen += [e['id'] for e in r.data['events']]
+        self.assertIsNone(r.data['next'])
+        self.assertEqual(seen, list(complaint.events.order_by('-created_at', '-id').values_list('id', flat=True)))
+        self.assertEqual(seen, full)
+
+        self.client.force_login(self.sm)
+        r = self.client.get(f'/complaints/{complaint.id}/history/', {'page': 1})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.context['total_events'], 31)
+        self.assertContains(r, 'Комментарий 29')
+
+    def test_backfill_command(self):
+        now = timezone.now()
+        legacy = self.make_complaint(
+            status=ComplaintStatus.INSTALLATION_PLANNED,
+            installer_assigned=self.installer,
+            installer_assigned_at=now - timedelta(days=2),
+            planned_installation_date=now + timedelta(days=1),
+        )
+        ComplaintComment.objects.create(complaint=legacy, author=self.manager, text='Старый комментарий')
+        ComplaintEvent.objects.all().delete()
+        logged = self.make_complaint()
+
+        out = io.StringIO()
+        call_command('backfill_complaint_events', stdout=out)
+        self.assertIn('Рекламаций: 1, событий создано: 5', out.getvalue())
+        self.assertEqual(sorted(self.kinds(legacy)), sorted([
+            ComplaintEvent.Kind.CREATED, ComplaintEvent.Kind.COMMENT, ComplaintEvent.Kind.INSTALLER_ASSIGNED,
+            ComplaintEvent.Kind.INSTALLATION_PLANNED, ComplaintEvent.Kind.STATUS_CHANGED,
+        ]))
+        # Дата планирования не позже последнего обновления рекламации
+        planned = legacy.events.get(kind=ComplaintEvent.Kind.INSTALLATION_PLANNED)
+        self.assertLessEqual(planned.created_at, legacy.updated_at)
+        self.assertEqual(self.kinds(logged), [ComplaintEvent.Kind.CREATED])
+
+        # Повторный запуск ничего не дублирует
+        call_command('backfill_complaint_events', stdout=io.StringIO())
+        self.assertEqual(ComplaintEvent.objects.count(), 6)
+
+
+class ComplaintLifecycleQueryTest(ComplaintFixturesMixin, TestCase):
+    """Число запросов по шагам жизненного цикла: save() не перечитывает рекламацию и пишет только изменённое"""
+
+    def capture(self, action):
+        with CaptureQueriesContext(connection) as ctx:
+            action()
+        return [q['sql'] for q in ctx.captured_queries]
+
+    def step(self, expected_queries, action):
+        sqls = self.capture(action)
+        self.assertFalse([sql for sql in sqls if sql.startswith('SELECT') and 'FROM "projects_complaint"' in sql])
+        self.assertEqual(len(sqls), expected_queries, sqls)
+        return [sql for sql in sqls if sql.startswith('UPDATE "projects_complaint"')]
+
+    def load(self, pk):
+        complaint = Complaint.objects.select_related('initiator', 'recipient', 'manager', 'installer_assigned').get(pk=pk)
+        complaint.event_actor = self.sm
+        return complaint
+
+    def test_installer_route(self):
+        created = []
+        # INSERT рекламации, события «создана», уведомление получателю (+ событие и очередь push)
+        self.step(5, lambda: created.append(Complaint.objects.create(
+            initiator=self.manager, recipient=self.sm, manager=self.manager, production_site=self.site,
+            reason=self.reason, order_number='A-1', client_name='Иванов', contact_phone='+79990000000',
+        )))
+        complaint = self.load(created[0].pk)
+        before = complaint.updated_at
+
+        updates = self.step(5, lambda: complaint.set_type_installer(installer=self.installer))
+        self.assertIn('"installer_assigned_at"', updates[0])
+        self.assertNotIn('"client_name"', updates[0])
+        self.step(7, lambda: complaint.plan_installation(self.installer, timezone.now() + timedelta(days=2)))
+        updates = self.step(6, lambda: complaint.mark_completed())
+        self.assertNotIn('"installer_assigned_at"', updates[0])
+        self.step(2, lambda: complaint.approve_by_sm())
+
+        complaint.refresh_from_db()
+        self.assertEqual(complaint.status, ComplaintStatus.COMPLETED)
+        self.assertGreater(complaint.updated_at, before)
+        self.assertEqual(complaint.get_dirty_fields(), {})
+
+    def test_factory_route(self):
+        complaint = self.load(self.make_complaint().pk)
+        self.step(5, lambda: complaint.set_type_factory())
+        self.step(6, lambda: complaint.factory_approve('Согласовано'))
+        self.step(8, lambda: complaint.start_production(timezone.now() + timedelta(days=5)))
+        self.step(11, lambda: complaint.mark_on_warehouse())
+        self.step(3, lambda: complaint.plan_shipping(timezone.now() + timedelta(days=6)))
+
+        # Без изменений save() трогает только updated_at и не сбрасывает кэш дашборда
+        with mock.patch.object(dashboard_cache, 'invalidate') as invalidate:
+            updates = self.step(1, complaint.save)
+        self.assertIn('SET "updated_at"', updates[0])
+        self.assertNotIn('"status"', updates[0])
+        invalidate.assert_not_called()
+
+    def test_installer_change_detected_without_select(self):
+        other = User.objects.create_user(username='inst2', password='x', role='installer', city=self.city)
+        complaint = self.load(self.make_complaint(installer_assigned=self.installer).pk)
+        Complaint.objects.filter(pk=complaint.pk).update(installer_assigned_at=timezone.now() - timedelta(days=5))
+        complaint.refresh_from_db()
+        assigned_at = complaint.installer_assigned_at
+
+        complaint.client_name = 'Петров'
+        complaint.save()
+        self.assertEqual(complaint.installer_assigned_at, assigned_at)
+
+        complaint.installer_assigned = other
+        self.assertTrue(complaint.is_dirty('installer_assigned_id'))
+        self.assertEqual(complaint.loaded_value('installer_assigned_id'), self.installer.id)
+        self.step(1, complaint.save)
+        self.assertGreater(complaint.installer_assigned_at, assigned_at)
+        self.assertFalse(complaint.is_dirty('installer_assigned_id'))
+
+    def test_orders_and_measurements_save_dirty_columns(self):
+        from orders.models import Measurement, MeasurementRequest, Order, OrderStatus, Salon
+
+        salon = Salon.objects.create(name='Салон', city=self.city)
+        order = Order.objects.create(manager=self.manager, salon=salon, client_name='Иванов')
+        mr = MeasurementRequest.objects.create(order=order, contact_name='Иванов', created_by=self.manager)
+        Measurement.objects.create(request=mr, service_manager=self.sm)
+
+        order = Order.objects.get(pk=order.pk)
+        order.status = OrderStatus.PAID
+        updates = [sql for sql in self.capture(order.save) if sql.startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"status"', updates[0])
+        self.assertNotIn('"client_name"', updates[0])
+
+        # Только активность — кэш папок заказов не сбрасывается
+        with mock.patch.object(dashboard_cache, 'invalidate') as invalidate:
+            order.touch_activity('comment')
+        invalidate.assert_not_called()
+
+        measurement = Measurement.objects.get(request=mr)
+        measurement.measurement_date = timezone.now() + timedelta(days=1)
+        updates = [sql for sql in self.capture(measurement.save) if sql.startswith('UPDATE')]
+        self.assertIn('"measurement_date"', updates[0])
+        self.assertNotIn('"short_code"', updates[0])
+
+    def test_assigned_deferred_field_is_saved(self):
+        from orders.models import Order, Salon
+
+        salon = Salon.objects.create(name='Салон', city=self.city)
+        order = Order.objects.create(manager=self.manager, salon=salon, client_name='Иванов')
+
+        # Поле не загружено (.only()), но ему присвоили значение — оно изменено
+        order = Order.objects.only('id', 'client_name').get(pk=order.pk)
+        order.comment = 'Новый комментарий'
+        self.assertTrue(order.is_dirty('comment'))
+        updates = [sql for sql in self.capture(order.save) if sql.startswith('UPDATE')]
+        self.assertIn('"comment"', updates[0])
+        self.assertNotIn('"client_name"', updates[0])
+        self.assertEqual(Order.objects.get(pk=order.pk).comment, 'Новый комментарий')
+        self.assertFalse(order.is_dirty('comment'))
+
+        complaint = Complaint.objects.defer('client_name').get(pk=self.make_complaint().pk)
+        complaint.client_name = 'Петров'
+        self.assertEqual(complaint.get_dirty_fields(), {'client_name': None})
+        complaint.save()
+        self.assertEqual(Complaint.objects.get(pk=complaint.pk).client_name, 'Петров')
+
+
+class ComplaintProjectionTest(ComplaintFixturesMixin, TestCase):
+    def test_compact_view(self):
+        now = timezone.now()
+        for _ in range(3):
+            self.make_complaint(
+                status=ComplaintStatus.NEW,
+                installer_assigned=self.installer,
+                planned_installation_date=now,
+            )
+        self.manager.first_name, self.manager.last_name = 'Пётр', 'Петров'
+        self.manager.save()
+        client = APIClient()
+        client.force_authenticate(self.sm)
+
+        # Одна выборка колонок
+        with self.assertNumQueries(1):
+            r = client.get('/api/v1/complaints/', {'view': 'compact'})
+        self.assertEqual(r.status_code, 200, r.content)
+        row = r.data[0]
+        self.assertEqual(list(row), [
+            'id', 'order_number', 'client_name', 'status', 'status_display',
+            'complaint_type', 'created_at', 'planned_installation_date',
+            'manager_id', 'manager_name', 'installer_id', 'installer_name',
+        ])
+        self.assertEqual((row['manager_id'], row['manager_name']), (self.manager.id, 'Пётр Петров'))
+        self.assertEqual(row['installer_name'], 'inst')
+        self.assertEqual(row['status_display'], ComplaintStatus.NEW.label)
+
+        # Даты — в том же формате, что и у полного сериализатора
+        full = client.get('/api/v1/complaints/').data[0]
+        self.assertEqual(row['created_at'], full['created_at'])
+        self.assertEqual(row['planned_installation_date'], full['planned_installation_date'])
+
+    def test_fields_param(self):
+        self.make_complaint(status=ComplaintStatus.NEW)
+        client = APIClient()
+        client.force_authenticate(self.sm)
+
+        r = client.get('/api/v1/complaints/', {'fields': 'order_number,reason_name'})
+        self.assertEqual(r.data, [{'id': r.data[0]['id'], 'order_number': 'A-1', 'reason_name': 'Брак'}])
+
+        r = client.get('/api/v1/complaints/', {'fields': 'order_number,password'})
+        self.assertEqual(r.status_code, 400)
+
+
+class AttachmentMetadataTest(ComplaintFixturesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def make_png(self, width, height):
+        from PIL import Image
+        buffer = io.BytesIO()
+        Image.new('RGB', (width, height), 'white').save(buffer, 'PNG')
+        return buffer.getvalue()
+
+    def test_metadata_captured_on_upload(self):
+        content = self.make_png(40, 30)
+        attachment = ComplaintAttachment.objects.create(
+            complaint=self.make_complaint(),
+            attachment_type='photo',
+            file=SimpleUploadedFile('door.png', content, content_type='image/png'),
+        )
+        attachment = ComplaintAttachment.objects.get(pk=attachment.pk)
+        self.assertEqual(attachment.size, len(content))
+        self.assertEqual(attachment.content_type, 'image/png')
+        self.assertEqual((attachment.width, attachment.height), (40, 30))
+        self.assertEqual(attachment.checksum, hashlib.sha256(content).hexdigest())
+
+        # Вывод размера и сериализация не обращаются к хранилищу
+        with mock.patch.object(FileSystemStorage, 'size', side_effect=AssertionError('storage')), \
+                mock.patch.object(FileSystemStorage, 'open', side_effect=AssertionError('storage')):
+            data = ComplaintAttachmentSerializer(attachment).data
+        self.assertEqual(data['file_size'], attachment.file_size)
+        self.assertEqual((data['size'], data['width'], data['height']), (len(content), 40, 30))
+
+    def test_backfill_command(self):
+        content = b'%PDF-1.4 test'
+        attachment = ComplaintAttachment.objects.create(
+            complaint=self.make_complaint(),
+            attachment_type='document',
+            file=SimpleUploadedFile('act.pdf', content),
+        )
+        ComplaintAttachment.objects.filter(pk=attachment.pk).update(size=None, content_type='', checksum='')
+
+        call_command('backfill_attachment_metadata', '--model', 'complaint', stdout=io.StringIO())
+
+        attachment.refresh_from_db()
+        self.assertEqual(attachment.size, len(content))
+        self.assertEqual(attachment.content_type, 'application/pdf')
+        self.assertIsNone(attachment.width)
+        self.assertEqual(attachment.checksum, hashlib.sha256(content).hexdigest())
+
+
+class _FakePage:
+    def __init__(self, text, tables=None):
+        self.text = text
+        self.tables = tables or []
+        self.calls = {'extract_text': 0, 'extract_tables': 0}
+        self.closed = False
+
+    def extract_text(self):
+        self.calls['extract_text'] += 1
+        return self.text
+
+    def extract_tables(self):
+        self.calls['extract_tables'] += 1
+        return self.tables
+
+    def close(self):
+        self.closed = True
+
+
+class _FakePdf:
+    def __init__(self, pages):
+        self.pages = pages
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class SinglePassPdfParserTest(TestCase):
+    """Парсер рекламаций обходит каждую страницу PDF один раз"""
+
+    def test_each_page_extracted_once_and_continuation_kept(self):
+        from .pdf_parser import parse_complaint_pdf
+
+        pages = [
+            _FakePage(
+                'Заказ покупателя № 123 от 01.01.2025\nПокупатель: Иванов Иван\n',
+                tables=[[
+                    ['Модель полотна', 'Кол-во', 'Размер', 'Цена', 'Открывание'],
+                    ['OPERA Дверь межкомнатная', '2', '2000x800', '15000', 'левое'],
+                ]],
+            ),
+            _FakePage('Наличник телескопический 2150\nИтого'),
+            _FakePage(''),
+        ]
+        with mock.patch('marketingdoors.pdf_pages.pdfplumber.open', return_value=_FakePdf(pages)):
+            result = parse_complaint_pdf(io.BytesIO(b'%PDF'))
+
+        for page in pages:
+            self.assertEqual(page.calls, {'extract_text': 1, 'extract_tables': 1})
+            self.assertTrue(page.closed)
+        names = [product['product_name'] for product in result['defective_products']]
+        self.assertIn('OPERA Дверь межкомнатная', names)
+
+
+class ParsedPdfCacheTest(TestCase):
+    """Кэш разбора PDF: LRU процесса, таблица ParsedPdf, смена версии парсера"""
+
+    def setUp(self):
+        from . import pdf_parse_cache
+        self.cache = pdf_parse_cache
+        pdf_parse_cache.clear_memory()
+        pdf_parse_cache.parser_version.cache_clear()
+        self.addCleanup(pdf_parse_cache.clear_memory)
+        self.addCleanup(pdf_parse_cache.parser_version.cache_clear)
+
+    def _upload(self, content=b'%PDF-1.4 kp'):
+        return SimpleUploadedFile('kp.pdf', content, content_type='application/pdf')
+
+    def test_identical_upload_parsed_once(self):
+        from datetime import date
+        from .models import ParsedPdf
+
+        parsed = {'order_number': '123', 'kp_date': date(2025, 1, 2), 'defective_products': []}
+        with mock.patch('projects.pdf_parser.parse_complaint_pdf', return_value=parsed) as parse:
+            first = self.cache.cached_parse(ParsedPdf.KIND_COMPLAINT, self._upload())
+            first['order_number'] = 'изменено вызывающим'
+            second = self.cache.cached_parse(ParsedPdf.KIND_COMPLAINT, self._upload())
+            self.cache.clear_memory()
+            with self.assertNumQueries(2):
+                third = self.cache.cached_parse(ParsedPdf.KIND_COMPLAINT, self._upload())
+            self.cache.cached_parse(ParsedPdf.KIND_COMPLAINT, self._upload(b'%PDF-1.4 other'))
+
+        self.assertEqual(parse.call_count, 2)
+        self.assertEqual(second, {'order_number': '123', 'kp_date': '2025-01-02', 'defective_products': []})
+        self.assertEqual(third, second)
+        entry = ParsedPdf.objects.get(checksum=hashlib.sha256(b'%PDF-1.4 kp').hexdigest())
+        self.assertEqual(entry.hits, 1)
+        self.assertEqual(entry.size, len(b'%PDF-1.4 kp'))
+
+    def test_parser_upgrade_invalidates_and_prune_removes_old(self):
+        from .models import ParsedPdf
+
+        with mock.patch('projects.pdf_parser.parse_complaint_pdf', return_value={'v': 1}):
+            self.cache.cached_parse(ParsedPdf.KIND_COMPLAINT, self._upload())
+
+        self.cache.clear_memory()
+        self.cache.parser_version.cache_clear()
+        with mock.patch.object(self.cache, 'PARSER_VERSION', self.cache.PARSER_VERSION + 1), \
+                mock.patch('projects.pdf_parser.parse_complaint_pdf', return_value={'v': 2}) as parse:
+            result = self.cache.cached_parse(ParsedPdf.KIND_COMPLAINT, self._upload())
+            self.assertEqual(parse.call_count, 1)
+            self.assertEqual(result, {'v': 2})
+            self.assertEqual(ParsedPdf.objects.count(), 2)
+
+            call_command('prune_parsed_pdfs', stdout=io.StringIO())
+            self.assertEqual(list(ParsedPdf.objects.values_list('result', flat=True)), [{'v': 2}])
+
+
+class PdfParseJobApiTest(ComplaintFixturesMixin, TestCase):
+    """Асинхронные задания разбора PDF и лимиты разбора"""
+
+    def setUp(self):
+        super().setUp()
+        from . import pdf_parse_cache
+        pdf_parse_cache.clear_memory()
+        self.addCleanup(pdf_parse_cache.clear_memory)
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def _post(self, content=b'%PDF-1.4 kp', kind='kp'):
+        upload = SimpleUploadedFile('kp.pdf', content, content_type='application/pdf')
+        return self.client.post('/api/v1/pdf-parse-jobs/', {'file': upload, 'kind': kind}, format='multipart')
+
+    def test_submit_poll_and_owner_only(self):
+        with mock.patch('orders.pdf_parser.parse_kp_pdf', return_value={'kp_number': '77'}) as parse:
+            response = self._post()
+            again = self._post()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(parse.call_count, 1)
+        self.assertEqual(again.data['result'], {'kp_number': '77'})
+
+        job_url = response['Location']
+        polled = self.client.get(job_url)
+        self.assertEqual(polled.data['status'], 'done')
+        self.assertEqual(polled.data['result'], {'kp_number': '77'})
+        self.assertEqual(self.client.post(f'{job_url}cancel/').status_code, 409)
+
+        other = APIClient()
+        other.force_authenticate(self.sm)
+        self.assertEqual(other.get(job_url).status_code, 404)
+
+    def test_parse_error_and_size_limit(self):
+        with mock.patch('orders.pdf_parser.parse_kp_pdf', side_effect=ValueError('битый PDF')):
+            response = self._post()
+        self.assertEqual(response.data['status'], 'failed')
+        self.assertEqual(response.data['error'], 'битый PDF')
+
+        with override_settings(PDF_PARSE_MAX_MB=0.00001):
+            response = self._post(b'%PDF' + b'0' * 100)
+        self.assertEqual(response.status_code, 400)
+
+    def test_cancel_and_stale_jobs(self):
+        from .models import PdfParseJob
+        from .pdf_parse_service import expire_stale
+
+        queued = PdfParseJob.objects.create(kind='kp', checksum='a' * 64, created_by=self.manager)
+        response = self.client.post(f'/api/v1/pdf-parse-jobs/{queued.pk}/cancel/')
+        self.assertEqual(response.data['status'], 'cancelled')
+
+        running = PdfParseJob.objects.create(
+            kind='kp', checksum='b' * 64, created_by=self.manager, status=PdfParseJob.Status.RUNNING,
+            started_at=timezone.now() - timedelta(hours=1),
+        )
+        self.assertEqual(expire_stale(running).status, PdfParseJob.Status.FAILED)
+
+    def test_page_limit(self):
+        from marketingdoors.pdf_pages import extract_pages
+
+        pages = [_FakePage('стр.') for _ in range(3)]
+        with override_settings(PDF_PARSE_MAX_PAGES=2), \
+                mock.patch('marketingdoors.pdf_pages.pdfplumber.open', return_value=_FakePdf(pages)):
+            with self.assertRaisesMessage(ValueError, 'В PDF 3 стр., допускается не больше 2'):
+                extract_pages(io.BytesIO(b'%PDF'))
+        self.assertEqual(pages[0].calls['extract_text'], 0)
+
+    @override_settings(PDF_PARSE_WORKERS=1, PDF_PARSE_SLOT_WAIT_SECONDS=0.05)
+    def test_sync_parse_busy_when_slots_taken(self):
+        from .pdf_parse_service import _slot
+
+        slots = _slot()
+        slots.acquire()
+        self.addCleanup(slots.release)
+        with mock.patch('orders.pdf_parser.parse_kp_pdf') as parse:
+            for url, field in [('/api/v1/orders/parse_kp/', 'file'), ('/api/v1/complaints/parse-pdf/', 'pdf_file')]:
+                upload = SimpleUploadedFile('kp.pdf', b'%PDF-1.4 busy', content_type='application/pdf')
+                response = self.client.post(url, {field: upload}, format='multipart')
+                self.assertEqual(response.status_code, 503, response.content)
+                self.assertEqual(response['Retry-After'], '1')
+                self.assertIn('/api/v1/pdf-parse-jobs/', response.data['detail'])
+        parse.assert_not_called()
+
+    @override_settings(PDF_PARSE_WORKERS=1, PDF_PARSE_TIMEOUT_SECONDS=20)
+    def test_subprocess_reports_parse_errors(self):
+        from .pdf_parse_service import run_parse
+
+        with self.assertRaisesMessage(ValueError, 'Не удалось распарсить PDF'):
+            run_parse('kp', b'not a pdf')
+
+
+class ComplaintSearchTest(ComplaintFixturesMixin, TestCase):
+    def test_search_by_document(self):
+        first = self.make_complaint(order_number='ZK-501', client_name='ООО Ромашка', contact_phone='+7 (999) 555-01-02')
+        second = self.make_complaint(order_number='ZK-777', contact_phone='8-912-000-00-00')
+        client = APIClient()
+        client.force_authenticate(self.sm)
+
+        def found(query):
+            r = client.get('/api/v1/complaints/', {'search': query})
+            self.assertEqual(r.status_code, 200, r.content)
+            return sorted(row['id'] for row in r.data)
+
+        self.assertEqual(found('+7 (999)'), [first.id])
+        self.assertEqual(found('89995550102'), [first.id])
+        self.assertEqual(found('ромашка zk-501'), [first.id])
+        self.assertEqual(found('mgr'), sorted([first.id, second.id]))
+        self.assertEqual(found('zk-501 912'), [])
+
+        # Номер заказа с дефисом похож на телефон, но хранится в документе как есть
+        dashed = self.make_complaint(order_number='12-345')
+        self.assertEqual(found('12-345'), [dashed.id])
+
+        second.client_name = 'Лютиков'
+        second.save()
+        self.assertEqual(found('лютиков'), [second.id])
+
+
+class ExplainHotQueriesTest(TestCase):
+    def test_runs_on_seeded_data(self):
+        from .management.commands.explain_hot_queries import seq_scans
+
+        out = io.StringIO()
+        call_command('explain_hot_queries', '--seed', '300', stdout=out)
+        output = out.getvalue()
+        self.assertIn('рекламации: complaint_department', output)
+        self.assertIn('заказы: manager / measurement_requested', output)
+        self.assertIn('cron: check_action_reminders', output)
+        # Сид откатывается
+        self.assertFalse(Complaint.objects.exists())
+
+        plan = '3 0 0 SCAN projects_complaint\n5 0 0 SCAN users_city\n7 0 0 SCAN orders_order USING INDEX x'
+        self.assertEqual(seq_scans(plan), ['projects_complaint'])
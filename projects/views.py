@@ -1,9 +1,11 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.core.paginator import Paginator
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db.models import Q, Count
 from django.db import transaction
 from django.utils import timezone
+from marketingdoors.search import search_q
 from users.models import User, City
 from .forms import ComplaintEditForm
 from .models import (
@@ -13,11 +15,16 @@ from .models import (
     DefectiveProduct,
     ComplaintAttachment,
     ComplaintComment,
+    ComplaintEvent,
     ShippingRegistry,
     Notification,
     ComplaintStatus,
 )
 from .decorators import role_required, complaint_access_required
+from .dashboard import task_filter
+
+# Событий на странице истории рекламации
+HISTORY_PAGE_SIZE = 50
 
 
 @login_required(login_url='/api/v1/login/')
@@ -54,67 +61,12 @@ def complaint_list(request):
             status__in=['waiting_installer_date', 'needs_planning', 'installer_not_planned', 'installer_overdue']
         )
     
-    # Фильтр "Мои задачи" для быстрого доступа из дашборда
+    # Фильтр "Мои задачи" для быстрого доступа из дашборда (плитки — projects.dashboard)
     my_tasks_key = request.GET.get('my_tasks')
-    completed_statuses = {
-        ComplaintStatus.COMPLETED,
-        ComplaintStatus.RESOLVED,
-        ComplaintStatus.CLOSED,
-    }
-    active_statuses = [status for status, _ in ComplaintStatus.choices if status not in completed_statuses]
-    sm_overdue_filter = (
-        Q(status='sm_response_overdue') |
-        Q(status='factory_approved', sm_response_deadline__lt=timezone.now())
-    )
     if my_tasks_key:
-        role_task_filters = {
-            'installer': {
-                'in_work': (Q(installer_assigned=request.user) | Q(initiator=request.user)) & Q(status__in=active_statuses),
-                'needs_planning': Q(installer_assigned=request.user, status__in=[
-                    'waiting_installer_date', 'needs_planning', 'installer_not_planned', 'installer_overdue'
-                ]),
-                'planned': Q(installer_assigned=request.user, status__in=[
-                    'installation_planned', 'both_planned'
-                ]),
-                'completed': Q(installer_assigned=request.user, status__in=[
-                    'under_sm_review', 'completed'
-                ]),
-            },
-            'manager': {
-                'in_work': (Q(manager=request.user) | Q(initiator=request.user) | Q(recipient=request.user)) & Q(status__in=active_statuses),
-                'in_progress': Q(manager=request.user, status='in_progress'),
-                'on_warehouse': Q(manager=request.user, status='on_warehouse'),
-                'shipping_overdue': Q(status='shipping_overdue'),
-            },
-            'service_manager': {
-                'in_work': Q(status__in=active_statuses),
-                'new': Q(status='new'),
-                'review': Q(status__in=['under_sm_review', 'factory_approved', 'factory_rejected']),
-                'overdue': sm_overdue_filter,
-            },
-            'complaint_department': {
-                'in_work': Q(complaint_type='factory', status__in=active_statuses),
-                'pending': Q(complaint_type='factory', status='sent'),
-                'overdue': Q(complaint_type='factory', status='factory_response_overdue'),
-            },
-            'admin': {
-                'new': Q(status='new'),
-                'factory_overdue': Q(status='factory_response_overdue'),
-                'shipping_overdue': Q(status='shipping_overdue'),
-                'sm_overdue': sm_overdue_filter,
-            },
-            'leader': {
-                'new': Q(status='new'),
-                'factory_overdue': Q(status='factory_response_overdue'),
-                'shipping_overdue': Q(status='shipping_overdue'),
-                'sm_overdue': sm_overdue_filter,
-            },
-        }
-        
-        role_filters = role_task_filters.get(request.user.role, {})
-        task_filter = role_filters.get(my_tasks_key)
-        if task_filter:
-            complaints = complaints.filter(task_filter)
+        my_tasks_filter = task_filter(request.user, my_tasks_key)
+        if my_tasks_filter is not None:
+            complaints = complaints.filter(my_tasks_filter)
     
     # Фильтрация по статусу
     status_filter = request.GET.get('status')
@@ -188,35 +140,17 @@ def complaint_list(request):
 
     # Поиск
     search_query = request.GET.get('search', '').strip()
-    if search_query:
-        search_conditions = (
-            Q(order_number__icontains=search_query) |
-            Q(client_name__icontains=search_query) |
-            Q(contact_person__icontains=search_query) |
-            Q(address__icontains=search_query)
-        )
-        
-        normalized_phone_query = ''.join(ch for ch in search_query if ch.isdigit())
-        phone_conditions = Q(contact_phone__icontains=search_query)
-        if normalized_phone_query:
-            regex_pattern = '[^0-9]*'.join(normalized_phone_query)
-            phone_conditions |= Q(contact_phone__iregex=regex_pattern)
-        
-        complaints = complaints.filter(search_conditions | phone_conditions)
+    search_condition = search_q('search_document', search_query, ['id'])
+    if search_condition is not None:
+        # Поисковый документ: телефоны нормализованы, «+7 (999)» находит «8999…»
+        complaints = complaints.filter(search_condition)
     
     # Сортировка
     sort_by = request.GET.get('sort', '-created_at')
     complaints = complaints.order_by(sort_by)
     
-    # Проверяем просрочку для рекламаций с монтажником
-    installer_complaints = complaints.filter(
-        installer_assigned__isnull=False,
-        installer_assigned_at__isnull=False
-    ).exclude(
-        status__in=['completed', 'resolved', 'closed']
-    )
-    for complaint in installer_complaints:
-        complaint.check_installer_overdue()
+    # Просрочки монтажа пересчитывает пакетный движок projects.overdue (cron),
+    # список — чистое чтение.
     
     # Получаем данные для фильтров
     reasons = ComplaintReason.objects.filter(is_active=True)
@@ -284,6 +218,7 @@ def complaint_detail(request, pk):
         ),
         pk=pk
     )
+    complaint.event_actor = request.user
     
     # Обработка POST-запросов
     if request.method == 'POST':
@@ -576,6 +511,7 @@ def complaint_create(request):
                     assignee_comment=request.POST.get('assignee_comment', '').strip(),
                     document_package_link=request.POST.get('document_package_link', ''),
                 )
+                complaint.event_actor = request.user
                 
                 # Добавляем бракованные изделия
                 product_names = request.POST.getlist('product_name[]')
@@ -814,6 +750,7 @@ def shipping_detail(request, pk):
 def complaint_process(request, pk):
     """Обработка рекламации СМ"""
     complaint = get_object_or_404(Complaint, pk=pk)
+    complaint.event_actor = request.user
     
     if request.method == 'POST':
         action = request.POST.get('action')
@@ -893,9 +830,7 @@ def complaint_process(request, pk):
         
         elif action == 'close':
             # СМ может завершить рекламацию напрямую
-            complaint.status = 'closed'
-            complaint.completion_date = timezone.now()
-            complaint.save()
+            complaint.change_status(ComplaintStatus.CLOSED, completion_date=timezone.now())
             
             closure_reason = request.POST.get('closure_reason', '').strip()
             
@@ -1056,6 +991,7 @@ def installer_planning(request):
             try:
                 from datetime import datetime
                 complaint = Complaint.objects.get(id=complaint_id, installer_assigned=request.user)
+                complaint.event_actor = request.user
                 new_installation_date = datetime.fromisoformat(installation_date)
                 
                 if action == 'reschedule' and complaint.planned_installation_date:
@@ -1134,6 +1070,7 @@ def installer_planning(request):
 def installer_complete(request, pk):
     """Монтажник отмечает работу выполненной"""
     complaint = get_object_or_404(Complaint, pk=pk)
+    complaint.event_actor = request.user
     
     if request.method == 'POST':
         complaint.mark_completed()
@@ -1172,6 +1109,7 @@ def manager_production(request):
         
         try:
             complaint = Complaint.objects.get(id=complaint_id)
+            complaint.event_actor = request.user
             
             if action == 'start_production':
                 deadline = request.POST.get('production_deadline')
@@ -1236,6 +1174,7 @@ def or_factory_complaints(request):
         
         try:
             complaint = Complaint.objects.get(id=complaint_id)
+            complaint.event_actor = request.user
             
             if action == 'factory_approve':
                 # ОР одобряет рекламацию - запуск в производство
@@ -1298,116 +1237,18 @@ def complaint_history(request, pk):
         messages.error(request, 'У вас нет доступа к истории рекламаций')
         return redirect('projects:complaint_detail', pk=complaint.id)
     
-    # Собираем всю историю событий
-    history_events = []
-    
-    # 1. Создание рекламации
-    history_events.append({
-        'type': 'created',
-        'date': complaint.created_at,
-        'user': complaint.initiator,
-        'title': 'Рекламация создана',
-        'description': f'Инициатор: {complaint.initiator.get_full_name() or complaint.initiator.username} ({complaint.initiator.get_role_display()})',
-        'icon': 'create',
-        'color': 'blue'
-    })
-    
-    # 2. Комментарии
-    comments = complaint.comments.all().select_related('author')
-    for comment in comments:
-        history_events.append({
-            'type': 'comment',
-            'date': comment.created_at,
-            'user': comment.author,
-            'title': 'Комментарий добавлен',
-            'description': comment.text,
-            'icon': 'comment',
-            'color': 'gray'
-        })
-    
-    # 3. Уведомления (отправленные)
-    notifications = complaint.notifications.filter(is_sent=True).select_related('recipient')
-    for notification in notifications:
-        history_events.append({
-            'type': 'notification',
-            'date': notification.sent_at or notification.created_at,
-            'user': notification.recipient,
-            'title': f'Уведомление: {notification.title}',
-            'description': f'{notification.get_notification_type_display()} → {notification.recipient.get_full_name() or notification.recipient.username}',
-            'icon': 'notification',
-            'color': 'yellow'
-        })
-    
-    # 4. Изменение статуса (из обновлений)
-    if complaint.updated_at != complaint.created_at:
-        history_events.append({
-            'type': 'updated',
-            'date': complaint.updated_at,
-            'user': None,
-            'title': 'Рекламация обновлена',
-            'description': f'Текущий статус: {complaint.get_status_display()}',
-            'icon': 'update',
-            'color': 'purple'
-        })
-    
-    # 5. Назначение монтажника
-    if complaint.installer_assigned:
-        # Ищем комментарий о назначении
-        installer_comment = comments.filter(text__icontains='монтажник').first()
-        if installer_comment:
-            history_events.append({
-                'type': 'installer_assigned',
-                'date': installer_comment.created_at,
-                'user': installer_comment.author,
-                'title': 'Назначен монтажник',
-                'description': f'Монтажник: {complaint.installer_assigned.get_full_name() or complaint.installer_assigned.username}',
-                'icon': 'user',
-                'color': 'green'
-            })
-    
-    # 6. Планирование монтажа
-    if complaint.planned_installation_date:
-        history_events.append({
-            'type': 'installation_planned',
-            'date': complaint.planned_installation_date,
-            'user': complaint.installer_assigned,
-            'title': 'Монтаж запланирован',
-            'description': f'Дата: {complaint.planned_installation_date.strftime("%d.%m.%Y")}',
-            'icon': 'calendar',
-            'color': 'indigo'
-        })
-    
-    # 7. Планирование отгрузки
-    if complaint.planned_shipping_date:
-        history_events.append({
-            'type': 'shipping_planned',
-            'date': complaint.planned_shipping_date,
-            'user': complaint.manager,
-            'title': 'Отгрузка запланирована',
-            'description': f'Дата: {complaint.planned_shipping_date.strftime("%d.%m.%Y")}',
-            'icon': 'truck',
-            'color': 'orange'
-        })
-    
-    # 8. Завершение
-    if complaint.completion_date:
-        history_events.append({
-            'type': 'completed',
-            'date': complaint.completion_date,
-            'user': None,
-            'title': 'Рекламация завершена',
-            'description': f'Дата завершения: {complaint.completion_date.strftime("%d.%m.%Y %H:%M")}',
-            'icon': 'check',
-            'color': 'green'
-        })
-    
-    # Сортируем по дате (от новых к старым)
-    history_events.sort(key=lambda x: x['date'], reverse=True)
-    
+    # Журнал ComplaintEvent: страница событий от новых к старым
+    paginator = Paginator(
+        ComplaintEvent.objects.filter(complaint=complaint).select_related('actor').order_by('-created_at', '-id'),
+        HISTORY_PAGE_SIZE,
+    )
+    page = paginator.get_page(request.GET.get('page'))
+
     context = {
         'complaint': complaint,
-        'history_events': history_events,
-        'total_events': len(history_events),
+        'history_events': page.object_list,
+        'page_obj': page,
+        'total_events': paginator.count,
     }
     
     return render(request, 'projects/complaint_history.html', context)
@@ -1518,6 +1359,7 @@ def update_client_contact(request, pk):
 def sm_agree_client(request, pk):
     """СМ согласовывает решение фабрики с клиентом"""
     complaint = get_object_or_404(Complaint, pk=pk)
+    complaint.event_actor = request.user
     
     # Проверка, что рекламация в правильном статусе
     if complaint.status not in ['factory_approved', 'sm_response_overdue']:
@@ -1553,6 +1395,7 @@ def sm_agree_client(request, pk):
 def sm_dispute_decision(request, pk):
     """СМ оспаривает решение фабрики"""
     complaint = get_object_or_404(Complaint, pk=pk)
+    complaint.event_actor = request.user
     
     # Проверка, что рекламация в правильном статусе
     if complaint.status not in ['factory_approved', 'sm_response_overdue', 'factory_rejected']:
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import City, User
+from .models import City, User, NotificationOutbox
 from orders.models import Salon
 
 
@@ -20,3 +20,12 @@ class UserAdmin(BaseUserAdmin):
     fieldsets = BaseUserAdmin.fieldsets + (
         ('Дополнительная информация', {'fields': ('role', 'city', 'phone_number', 'salon')}),
     )
+
+
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    list_display = ('id', 'channel', 'status', 'user', 'phone_number', 'email', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    list_filter = ('channel', 'status')
+    search_fields = ('user__username', 'phone_number', 'email', 'last_error')
+    readonly_fields = ('created_at', 'sent_at', 'locked_at')
+    raw_id_fields = ('user', 'notification')
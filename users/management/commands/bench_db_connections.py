@@ -0,0 +1,171 @@
+"""
+Бенчмарк соединений с БД: запросов в секунду на типичной смеси API-запросов
+при разных настройках соединений.
+
+Режимы:
+- no-persist — прежнее поведение (CONN_MAX_AGE = 0): новое соединение на каждый запрос;
+- persistent — постоянные соединения (CONN_MAX_AGE, CONN_HEALTH_CHECKS);
+- pool — пул psycopg 3 (OPTIONS['pool'], только PostgreSQL с psycopg_pool).
+
+Запросы проходят через WSGIHandler — как под gunicorn, с сигналами
+request_started/request_finished, на которых Django закрывает или возвращает
+в пул соединения, — в --threads потоках (как потоки воркера). Аутентификация —
+JWT-токен пользователя --user (по умолчанию первый admin). Данные не меняются:
+в смеси только GET. Эффект постоянных соединений заметен на PostgreSQL по сети
+(TCP + TLS + аутентификация на каждое соединение); на SQLite разницы почти нет.
+
+Запуск: `python manage.py bench_db_connections --requests 2000 --threads 4`
+"""
+import importlib.util
+import io
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from rest_framework_simplejwt.tokens import AccessToken
+
+from users.models import User
+
+# Смесь запросов SPA: списки, счётчики папок и дашборд
+ENDPOINTS = [
+    '/api/v1/complaints/',
+    '/api/v1/dashboard/stats/',
+    '/api/v1/orders/',
+    '/api/v1/orders/folder_counts/',
+    '/api/v1/workshop/',
+    '/api/v1/measurements/',
+    '/api/v1/notifications/',
+    '/api/v1/auth/me/',
+]
+
+MODES = ['no-persist', 'persistent', 'pool']
+
+
+def _host():
+    for host in settings.ALLOWED_HOSTS:
+        if host and host != '*' and not host.startswith('.'):
+            return host
+    return 'localhost'
+
+
+def _environ(path, token, host):
+    return {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'QUERY_STRING': '',
+        'SERVER_NAME': host,
+        'SERVER_PORT': '443',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': host,
+        'HTTP_AUTHORIZATION': f'Bearer {token}',
+        'wsgi.input': io.BytesIO(b''),
+        'wsgi.errors': io.StringIO(),
+        'wsgi.url_scheme': 'https',
+        'wsgi.version': (1, 0),
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+
+
+class Command(BaseCommand):
+    help = 'Запросов в секунду на смеси API-запросов: без постоянных соединений, с ними и с пулом psycopg'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000, help='Запросов на режим')
+        parser.add_argument('--threads', type=int, default=4, help='Параллельных потоков')
+        parser.add_argument('--user', help='Логин пользователя, от имени которого идут запросы')
+        parser.add_argument('--conn-max-age', type=int, default=600, help='CONN_MAX_AGE для режима persistent')
+        parser.add_argument(
+            '--mode',
+            choices=MODES,
+            action='append',
+            help='Какие режимы замерять (по умолчанию — все доступные)',
+        )
+
+    def handle(self, *args, **options):
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+        else:
+            user = User.objects.filter(role='admin', is_active=True).order_by('id').first()
+        if user is None:
+            raise CommandError('Нет пользователя для запросов: укажите --user')
+        token = str(AccessToken.for_user(user))
+        connections['default'].close()
+
+        handler = WSGIHandler()
+        original = dict(connections.settings['default'])
+        modes = options['mode'] or MODES
+        self.stdout.write(f'Пользователь: {user.username}, запросов: {options["requests"]}, потоков: {options["threads"]}')
+        self.stdout.write(f'{"режим":>12} | {"RPS":>8} | {"p50, мс":>8} | {"p95, мс":>8} | {"ошибок":>6}')
+        try:
+            for mode in modes:
+                if not self._configure(mode, original, options['conn_max_age']):
+                    self.stdout.write(f'{mode:>12} | пропущен: нужен PostgreSQL и psycopg_pool')
+                    continue
+                self._run(mode, handler, token, options['requests'], options['threads'])
+        finally:
+            self._reset(original)
+
+    def _configure(self, mode, original, conn_max_age):
+        db = dict(original)
+        options = {key: value for key, value in db.get('OPTIONS', {}).items() if key != 'pool'}
+        if mode == 'no-persist':
+            db.update(CONN_MAX_AGE=0, CONN_HEALTH_CHECKS=False)
+        elif mode == 'persistent':
+            db.update(CONN_MAX_AGE=conn_max_age, CONN_HEALTH_CHECKS=True)
+        else:
+            if connections['default'].vendor != 'postgresql' or importlib.util.find_spec('psycopg_pool') is None:
+                return False
+            db.update(CONN_MAX_AGE=0, CONN_HEALTH_CHECKS=False)
+            options['pool'] = original.get('OPTIONS', {}).get('pool') or True
+        db['OPTIONS'] = options
+        self._reset(db)
+        return True
+
+    @staticmethod
+    def _reset(db):
+        """Новые настройки соединения: потоки создадут обёртки соединений заново"""
+        connection = connections['default']
+        connection.close()
+        if hasattr(connection, 'close_pool'):
+            connection.close_pool()
+        connections.settings['default'] = db
+        connection.settings_dict = db
+
+    def _run(self, mode, handler, token, total, threads):
+        host = _host()
+        paths = [ENDPOINTS[index % len(ENDPOINTS)] for index in range(total)]
+
+        def request(path):
+            started = time.perf_counter()
+            body = handler(_environ(path, token, host), lambda status, headers: None)
+            ok = body.status_code == 200
+            body.close()  # request_finished: закрытие/возврат соединения, как в WSGI-сервере
+            return (time.perf_counter() - started) * 1000, ok
+
+        def worker(chunk):
+            try:
+                return [request(path) for path in chunk]
+            finally:
+                connections.close_all()
+
+        # Прогрев: импорты, кэши URL-резолвера и дашборда
+        worker(ENDPOINTS)
+        chunks = [paths[index::threads] for index in range(threads)]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            results = [item for chunk in executor.map(worker, chunks) for item in chunk]
+        elapsed = time.perf_counter() - started
+
+        timings = sorted(ms for ms, _ in results)
+        errors = sum(1 for _, ok in results if not ok)
+        p95 = timings[int(len(timings) * 0.95) - 1] if len(timings) >= 20 else timings[-1]
+        self.stdout.write(
+            f'{mode:>12} | {len(results) / elapsed:>8.1f} | {statistics.median(timings):>8.2f} | '
+            f'{p95:>8.2f} | {errors:>6}'
+        )
@@ -0,0 +1,133 @@
+"""
+Планировщик периодических команд в одном процессе.
+
+Раньше каждая cron-команда (просрочки рекламаций и замеров, напоминания, очистка
+кэшей) была отдельной строкой crontab: на каждый запуск — новый процесс Python,
+загрузка Django и новое соединение с PostgreSQL (с TLS-рукопожатием). run_crons
+заменяет этот блок crontab (orders/CRON.md): запускает команды по расписанию
+CRON_JOBS в одном процессе через call_command, одно соединение переиспользуется
+между задачами (CONN_MAX_AGE / пул), а граница каждой задачи —
+marketingdoors.db.db_task(), как у HTTP-запроса. Ошибка одной задачи пишется
+в лог и не останавливает остальные.
+
+Кроны замеров и напоминаний, как и в crontab, работают только в рабочее время
+(9–19 ч, пн–пт) — без ночных push. --once запускает задачи сразу, без учёта
+расписания.
+
+Запуск:
+    python manage.py run_crons                 # постоянно (systemd/supervisor)
+    python manage.py run_crons --once          # все задачи по одному разу и выход
+    python manage.py run_crons --once --only check_action_reminders
+"""
+import datetime
+import logging
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from marketingdoors.db import db_task
+
+logger = logging.getLogger(__name__)
+
+
+# Рабочее окно кронов с push (orders/CRON.md): часы «9-19» crontab — с 9:00 до 19:59, пн–пт
+WORK_HOURS = range(9, 20)
+WORK_WEEKDAYS = range(0, 5)
+
+
+@dataclass(frozen=True)
+class CronJob:
+    """
+    Команда по расписанию: каждые every секунд или раз в сутки не раньше daily_at;
+    hours / weekdays (локальное время, пн = 0) — только в эти часы и дни недели.
+    """
+    command: str
+    every: int = 0
+    daily_at: Optional[datetime.time] = None
+    hours: Optional[range] = None
+    weekdays: Optional[range] = None
+
+    def in_window(self, now):
+        local = timezone.localtime(now)
+        return (
+            (self.hours is None or local.hour in self.hours)
+            and (self.weekdays is None or local.weekday() in self.weekdays)
+        )
+
+    def is_due(self, last_run, now):
+        if not self.in_window(now):
+            return False
+        if self.daily_at is not None:
+            local = timezone.localtime(now)
+            if local.time() < self.daily_at:
+                return False
+            return last_run is None or timezone.localtime(last_run).date() < local.date()
+        return last_run is None or (now - last_run).total_seconds() >= self.every
+
+
+MINUTE = 60
+HOUR = 60 * MINUTE
+WORKING_TIME = {'hours': WORK_HOURS, 'weekdays': WORK_WEEKDAYS}
+
+CRON_JOBS = [
+    CronJob('check_action_reminders', every=10 * MINUTE, **WORKING_TIME),
+    CronJob('evaluate_complaint_overdue', every=10 * MINUTE),
+    CronJob('check_measurement_not_planned', every=HOUR, **WORKING_TIME),
+    CronJob('check_measurement_not_done', every=HOUR, **WORKING_TIME),
+    CronJob('check_measurement_not_processed', every=HOUR, **WORKING_TIME),
+    CronJob('check_factory_overdue', every=HOUR),
+    CronJob('check_moscow_service_overdue', every=HOUR),
+    CronJob('check_sm_response_overdue', every=HOUR),
+    CronJob('check_installer_planning_overdue', daily_at=datetime.time(9, 0)),
+    CronJob('cleanup_old_complaint_files', daily_at=datetime.time(3, 0)),
+    CronJob('prune_parsed_pdfs', daily_at=datetime.time(3, 30)),
+]
+
+
+class Command(BaseCommand):
+    help = 'Запускает периодические команды по расписанию в одном процессе с общим соединением с БД'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true', help='Выполнить задачи по одному разу (без учёта расписания) и выйти',
+        )
+        parser.add_argument(
+            '--only',
+            action='append',
+            choices=[job.command for job in CRON_JOBS],
+            help='Только эти команды (можно несколько раз)',
+        )
+        parser.add_argument('--interval', type=float, default=30.0, help='Как часто проверять расписание (сек)')
+
+    def handle(self, *args, **options):
+        jobs = [job for job in CRON_JOBS if not options['only'] or job.command in options['only']]
+        if options['once']:
+            failed = [job.command for job in jobs if not self._run(job)]
+            if failed:
+                raise CommandError(f'Завершились с ошибкой: {", ".join(failed)}')
+            return
+
+        last_run = {}
+        while True:
+            for job in jobs:
+                now = timezone.now()
+                if job.is_due(last_run.get(job.command), now):
+                    self._run(job)
+                    last_run[job.command] = now
+            time.sleep(options['interval'])
+
+    def _run(self, job):
+        started = time.monotonic()
+        try:
+            with db_task():
+                call_command(job.command, stdout=self.stdout, stderr=self.stderr)
+        except Exception:  # noqa: BLE001 — одна задача не должна останавливать остальные
+            logger.exception('Cron-задача %s упала', job.command)
+            self.stderr.write(f'{job.command}: ошибка, см. лог')
+            return False
+        self.stdout.write(f'{job.command}: {time.monotonic() - started:.1f} с')
+        return True
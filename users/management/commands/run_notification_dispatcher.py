@@ -0,0 +1,41 @@
+"""
+Воркер очереди уведомлений: отправляет push / SMS / email из NotificationOutbox.
+
+Запуск:
+    python manage.py run_notification_dispatcher            # постоянно (systemd/supervisor)
+    python manage.py run_notification_dispatcher --once     # один проход (cron каждую минуту)
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from marketingdoors.db import db_task
+from users.notification_outbox import dispatch_pending
+
+
+class Command(BaseCommand):
+    help = 'Отправляет уведомления из очереди (повторы с экспоненциальной задержкой, dead-letter)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Один проход и выход')
+        parser.add_argument('--batch-size', type=int, default=100, help='Заданий за один проход')
+        parser.add_argument('--interval', type=float, default=2.0,
+                            help='Пауза между проходами, если очередь пуста (сек)')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        while True:
+            # Каждый проход — граница соединения: устаревшее/оборванное соединение закрывается
+            with db_task():
+                stats = dispatch_pending(batch_size=batch_size)
+            processed = sum(stats.values())
+            if processed:
+                self.stdout.write(
+                    ', '.join(f'{status}: {count}' for status, count in sorted(stats.items()))
+                )
+            if options['once']:
+                self.stdout.write(self.style.SUCCESS(f'Обработано заданий: {processed}'))
+                return
+            # Полная пачка — вероятно, в очереди есть ещё, не ждём
+            if processed < batch_size:
+                time.sleep(options['interval'])
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser
 
 
@@ -81,4 +82,72 @@ class PushSubscription(models.Model):
         ]
     
     def __str__(self):
-        return f'Push подписка для {self.user.username}'
\ No newline at end of file
+        return f'Push подписка для {self.user.username}'
+
+
+class NotificationOutbox(models.Model):
+    """
+    Очередь исходящих уведомлений (transactional outbox).
+
+    Запись создаётся в той же транзакции, что и изменение состояния (смена статуса
+    рекламации/заказа), поэтому уведомление не потеряется и не уйдёт, если
+    транзакция откатилась. Отправку выполняет `manage.py run_notification_dispatcher`
+    (см. users/notification_outbox.py): повторы с экспоненциальной задержкой,
+    после max_attempts — статус «dead».
+    """
+
+    class Channel(models.TextChoices):
+        PUSH = 'push', 'Push'
+        SMS = 'sms', 'SMS'
+        EMAIL = 'email', 'Email'
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Ожидает отправки'
+        PROCESSING = 'processing', 'Отправляется'
+        SENT = 'sent', 'Отправлено'
+        DEAD = 'dead', 'Не доставлено'
+
+    channel = models.CharField(max_length=10, choices=Channel.choices, verbose_name='Канал')
+    status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        default=Status.PENDING,
+        verbose_name='Статус',
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='outbox_notifications',
+        verbose_name='Получатель',
+    )
+    phone_number = models.CharField(max_length=20, blank=True, verbose_name='Телефон')
+    email = models.CharField(max_length=255, blank=True, verbose_name='Email')
+    payload = models.JSONField(default=dict, blank=True, verbose_name='Содержимое')
+    notification = models.ForeignKey(
+        'projects.Notification',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='outbox_jobs',
+        verbose_name='Уведомление рекламации',
+    )
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name='Попыток')
+    max_attempts = models.PositiveSmallIntegerField(default=6, verbose_name='Макс. попыток')
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name='Следующая попытка')
+    locked_at = models.DateTimeField(null=True, blank=True, verbose_name='Взято в работу')
+    last_error = models.TextField(blank=True, verbose_name='Последняя ошибка')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Создано')
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name='Отправлено')
+
+    class Meta:
+        verbose_name = 'Исходящее уведомление'
+        verbose_name_plural = 'Очередь уведомлений'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.get_channel_display()} #{self.id} ({self.get_status_display()})'
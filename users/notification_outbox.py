@@ -0,0 +1,335 @@
+"""
+Очередь исходящих уведомлений (push / SMS / email).
+
+Бизнес-код (методы Complaint, Order, кроны) не ходит в сеть сам, а ставит задание
+в NotificationOutbox в текущей транзакции — enqueue_push / enqueue_sms / enqueue_email.
+Воркер `python manage.py run_notification_dispatcher` забирает готовые задания и
+отправляет их через отправителя из настройки NOTIFICATION_SENDER:
+
+- NetworkSender (по умолчанию) — реальные VAPID push, SMTP через users.push_utils
+  и sms.ru через users.sms_client;
+- LocalSender — ничего не отправляет, складывает сообщения в LocalSender.outbox
+  (для тестов и локальной разработки).
+
+Ошибка отправки → повтор через NOTIFICATION_RETRY_BASE_SECONDS * 2**(попытка-1)
+(не больше NOTIFICATION_RETRY_MAX_SECONDS); после max_attempts задание остаётся
+в статусе «dead» с текстом последней ошибки. PermanentDeliveryError (нет подписок,
+нет номера, канал не настроен) — сразу «dead», без повторов.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import NotificationOutbox, PushSubscription
+
+logger = logging.getLogger(__name__)
+
+# Задание в статусе processing дольше этого считается брошенным (воркер упал)
+STALE_LOCK_SECONDS = 600
+
+
+class PermanentDeliveryError(Exception):
+    """Доставка невозможна в принципе — повторять бессмысленно"""
+
+
+# ==================== Постановка в очередь ====================
+
+def enqueue_push(user, title, body, url=None, icon=None, tag=None, data=None, notification=None):
+    """Ставит push-уведомление пользователю в очередь"""
+    if not user:
+        return None
+    return NotificationOutbox.objects.create(
+        channel=NotificationOutbox.Channel.PUSH,
+        user=user,
+        notification=notification,
+        payload={
+            'title': title,
+            'body': body,
+            'url': url,
+            'icon': icon,
+            'tag': tag,
+            'data': data or {},
+        },
+    )
+
+
+def enqueue_push_many(messages):
+    """
+    Массовая постановка push в очередь одним INSERT.
+    messages — словари с ключами аргументов enqueue_push (user, title, body, ...).
+    """
+    jobs = [
+        NotificationOutbox(
+            channel=NotificationOutbox.Channel.PUSH,
+            user=message['user'],
+            notification=message.get('notification'),
+            payload={
+                'title': message['title'],
+                'body': message['body'],
+                'url': message.get('url'),
+                'icon': message.get('icon'),
+                'tag': message.get('tag'),
+                'data': message.get('data') or {},
+            },
+        )
+        for message in messages
+        if message.get('user')
+    ]
+    return NotificationOutbox.objects.bulk_create(jobs)
+
+
+def enqueue_sms(message, user=None, phone_number=None):
+    """
+    Ставит SMS в очередь: пользователю (номер берётся из профиля на момент
+    постановки) или на произвольный номер.
+    """
+    phone = phone_number or (getattr(user, 'phone_number', None) if user else None)
+    if not phone:
+        logger.debug('SMS не поставлено в очередь: не указан номер телефона')
+        return None
+    return NotificationOutbox.objects.create(
+        channel=NotificationOutbox.Channel.SMS,
+        user=user,
+        phone_number=phone.strip()[:20],
+        payload={'message': message},
+    )
+
+
+def enqueue_email(to_email, subject, message, html_message=None):
+    """Ставит email в очередь"""
+    if not to_email:
+        logger.warning('Email адрес не указан')
+        return None
+    return NotificationOutbox.objects.create(
+        channel=NotificationOutbox.Channel.EMAIL,
+        email=to_email,
+        payload={'subject': subject, 'message': message, 'html_message': html_message},
+    )
+
+
+# ==================== Отправители ====================
+
+def _push_payload(job):
+    payload = job.payload
+    return {
+        'title': payload.get('title', ''),
+        'body': payload.get('body', ''),
+        'url': payload.get('url'),
+        'icon': payload.get('icon'),
+        'tag': payload.get('tag'),
+        'data': payload.get('data'),
+    }
+
+
+class NetworkSender:
+    """
+    Реальная отправка через users.push_utils.
+
+    send_push_many / send_sms_many — пакетный путь диспетчера: все push-задания
+    прохода уходят одной рассылкой send_push_batch (подписки одним запросом,
+    параллельная отправка), SMS — мульти-запросами клиента sms.ru.
+    """
+
+    def send(self, job):
+        return getattr(self, f'send_{job.channel}')(job)
+
+    def send_push(self, job):
+        from .push_utils import send_push_notification
+
+        if not settings.VAPID_PUBLIC_KEY or not settings.VAPID_PRIVATE_KEY:
+            raise PermanentDeliveryError('VAPID ключи не настроены')
+        if not job.user or not PushSubscription.objects.filter(user=job.user, is_active=True).exists():
+            raise PermanentDeliveryError('У пользователя нет активных push-подписок')
+        return send_push_notification(user=job.user, **_push_payload(job))
+
+    def send_push_many(self, jobs):
+        """
+        Возвращает список результатов в порядке jobs: True/False или исключение
+        (PermanentDeliveryError — у пользователя нет подписок).
+        """
+        from .push_utils import send_push_batch
+
+        if not settings.VAPID_PUBLIC_KEY or not settings.VAPID_PRIVATE_KEY:
+            return [PermanentDeliveryError('VAPID ключи не настроены')] * len(jobs)
+        subscribed = set(
+            PushSubscription.objects
+            .filter(user_id__in={job.user_id for job in jobs if job.user_id}, is_active=True)
+            .values_list('user_id', flat=True)
+        )
+        deliverable = [job for job in jobs if job.user_id in subscribed]
+        sent = dict(zip(
+            (job.id for job in deliverable),
+            send_push_batch([(job.user_id, _push_payload(job)) for job in deliverable]),
+        ))
+        return [
+            sent[job.id] if job.id in sent
+            else PermanentDeliveryError('У пользователя нет активных push-подписок')
+            for job in jobs
+        ]
+
+    def send_sms(self, job):
+        return self.send_sms_many([job])[0]
+
+    def send_sms_many(self, jobs):
+        """
+        SMS пачки уходят через клиента sms.ru мульти-запросами to[...] (результат — по номеру).
+        Постоянный отказ (неверный номер, стоп-лист, неверный ключ) — PermanentDeliveryError,
+        сетевые ошибки и лимиты sms.ru — ConnectionError (повтор с задержкой).
+        """
+        from .sms_client import SmsRuClient, get_sms_client
+
+        client = get_sms_client()
+        if isinstance(client, SmsRuClient) and not client.api_id:
+            raise PermanentDeliveryError('SMS_RU_API_ID не настроен')
+        results = client.send_many([(job.phone_number, job.payload.get('message', '')) for job in jobs])
+        return [
+            True if result.ok
+            else PermanentDeliveryError(result.error) if result.permanent
+            else ConnectionError(result.error)
+            for result in results
+        ]
+
+    def send_email(self, job):
+        from .push_utils import send_email_notification
+
+        if not settings.EMAIL_HOST_USER or not settings.EMAIL_HOST_PASSWORD:
+            raise PermanentDeliveryError('Настройки email не заданы')
+        payload = job.payload
+        return send_email_notification(
+            to_email=job.email,
+            subject=payload.get('subject', ''),
+            message=payload.get('message', ''),
+            html_message=payload.get('html_message'),
+        )
+
+
+class LocalSender:
+    """
+    Локальная заглушка: ничего не отправляет в сеть, запоминает задания
+    в LocalSender.outbox (общий список на процесс — удобно проверять в тестах).
+    """
+    outbox = []
+
+    def send(self, job):
+        LocalSender.outbox.append({
+            'id': job.id,
+            'channel': job.channel,
+            'user_id': job.user_id,
+            'phone_number': job.phone_number,
+            'email': job.email,
+            'payload': job.payload,
+        })
+        return True
+
+
+def get_sender():
+    path = getattr(settings, 'NOTIFICATION_SENDER', 'users.notification_outbox.NetworkSender')
+    return import_string(path)()
+
+
+# ==================== Диспетчер ====================
+
+def _retry_delay(attempts):
+    base = getattr(settings, 'NOTIFICATION_RETRY_BASE_SECONDS', 30)
+    cap = getattr(settings, 'NOTIFICATION_RETRY_MAX_SECONDS', 3600)
+    return timedelta(seconds=min(cap, base * 2 ** max(attempts - 1, 0)))
+
+
+def _claim(batch_size, now):
+    """Забирает пачку готовых заданий, помечая их processing (без двойной отправки)"""
+    stale = now - timedelta(seconds=STALE_LOCK_SECONDS)
+    with transaction.atomic():
+        ids = list(
+            NotificationOutbox.objects
+            .select_for_update(skip_locked=True)
+            .filter(
+                Q(status=NotificationOutbox.Status.PENDING, next_attempt_at__lte=now)
+                | Q(status=NotificationOutbox.Status.PROCESSING, locked_at__lt=stale)
+            )
+            .order_by('next_attempt_at', 'id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if ids:
+            NotificationOutbox.objects.filter(pk__in=ids).update(
+                status=NotificationOutbox.Status.PROCESSING,
+                locked_at=now,
+            )
+    return list(NotificationOutbox.objects.filter(pk__in=ids).select_related('user').order_by('id'))
+
+
+def _send(job, sender):
+    try:
+        return sender.send(job)
+    except Exception as exc:  # noqa: BLE001 — разбирается в _deliver
+        return exc
+
+
+def _deliver(job, outcome, now):
+    """Фиксирует результат отправки: outcome — True/False или исключение отправителя"""
+    from projects.models import Notification
+
+    job.attempts += 1
+    job.locked_at = None
+    if isinstance(outcome, PermanentDeliveryError):
+        ok, error, permanent = False, str(outcome), True
+    elif isinstance(outcome, Exception):
+        logger.error('Ошибка отправки уведомления #%s: %s', job.id, outcome, exc_info=outcome)
+        ok, error, permanent = False, f'{type(outcome).__name__}: {outcome}', False
+    else:
+        ok = bool(outcome)
+        error = '' if ok else 'Отправитель вернул неуспех'
+        permanent = False
+
+    if ok:
+        job.status = NotificationOutbox.Status.SENT
+        job.sent_at = now
+        job.last_error = ''
+        if job.notification_id:
+            Notification.objects.filter(pk=job.notification_id).update(is_sent=True, sent_at=now)
+    elif permanent or job.attempts >= job.max_attempts:
+        job.status = NotificationOutbox.Status.DEAD
+        job.last_error = error
+        logger.warning('Уведомление #%s не доставлено (%s): %s', job.id, job.channel, error)
+    else:
+        job.status = NotificationOutbox.Status.PENDING
+        job.next_attempt_at = now + _retry_delay(job.attempts)
+        job.last_error = error
+    job.save(update_fields=['status', 'attempts', 'locked_at', 'next_attempt_at', 'sent_at', 'last_error'])
+    return job.status
+
+
+def dispatch_pending(batch_size=100, sender=None, now=None):
+    """
+    Один проход диспетчера. Возвращает словарь {статус: количество} по
+    обработанным заданиям.
+
+    Если отправитель умеет send_<канал>_many (push, sms), задания этого канала
+    отправляются одной пакетной рассылкой, остальные — по одному.
+    """
+    sender = sender or get_sender()
+    now = now or timezone.now()
+    jobs = _claim(batch_size, now)
+
+    outcomes = {}
+    for channel in (NotificationOutbox.Channel.PUSH, NotificationOutbox.Channel.SMS):
+        send_many = getattr(sender, f'send_{channel}_many', None)
+        channel_jobs = [job for job in jobs if job.channel == channel]
+        if not channel_jobs or send_many is None:
+            continue
+        try:
+            results = send_many(channel_jobs)
+        except Exception as exc:  # noqa: BLE001 — вся пачка канала уйдёт на повтор (или в dead)
+            results = [exc] * len(channel_jobs)
+        outcomes.update((job.id, result) for job, result in zip(channel_jobs, results))
+
+    stats = {}
+    for job in jobs:
+        outcome = outcomes[job.id] if job.id in outcomes else _send(job, sender)
+        job_status = _deliver(job, outcome, now)
+        stats[job_status] = stats.get(job_status, 0) + 1
+    return stats
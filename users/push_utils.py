@@ -3,17 +3,232 @@
 """
 import json
 import logging
-from typing import Dict, Optional
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, List, Optional
 from urllib.parse import urlparse
 from django.conf import settings
 from django.core.mail import send_mail, EmailMessage
-from pywebpush import webpush, WebPushException
+from py_vapid import Vapid, Vapid01
+from pywebpush import WebPusher, WebPushException
 import requests
+from requests.adapters import HTTPAdapter
+from .sms_client import get_sms_client
 from .models import PushSubscription, User
 
 logger = logging.getLogger(__name__)
 
 
+# ==================== Web Push ====================
+
+# Параллельных отправок push при рассылке (и размер пула соединений на origin)
+PUSH_MAX_WORKERS = getattr(settings, 'PUSH_MAX_WORKERS', 8)
+# VAPID JWT живёт 12 часов (как в pywebpush); перевыпускаем за час до истечения
+VAPID_TOKEN_TTL = 12 * 60 * 60
+VAPID_REFRESH_MARGIN = 60 * 60
+PUSH_TIMEOUT = 10
+
+_push_lock = threading.Lock()
+# (ключ, sub, origin) -> (exp, заголовки Authorization/Crypto-Key)
+_vapid_headers_cache = {}
+# origin push-сервиса -> requests.Session с keep-alive
+_push_sessions = {}
+
+
+def _vapid_sub_claim() -> str:
+    claim_subject = settings.VAPID_CLAIM_EMAIL.strip() if settings.VAPID_CLAIM_EMAIL else ''
+    if claim_subject.startswith('mailto:'):
+        return claim_subject
+    if '@' in claim_subject:
+        return f'mailto:{claim_subject}'
+    if claim_subject.startswith('http://') or claim_subject.startswith('https://'):
+        return claim_subject
+    return 'mailto:support@marketingdoors.ru'
+
+
+@lru_cache(maxsize=4)
+def _load_vapid(private_key: str) -> Vapid01:
+    # Как и pywebpush: путь к PEM-файлу или сам ключ (base64url / PEM)
+    if os.path.isfile(private_key):
+        return Vapid.from_file(private_key_file=private_key)
+    return Vapid.from_string(private_key=private_key)
+
+
+def _endpoint_origin(endpoint: str) -> str:
+    endpoint_url = urlparse(endpoint)
+    return f"{endpoint_url.scheme}://{endpoint_url.netloc}"
+
+
+def _vapid_headers(origin: str) -> Dict:
+    """VAPID-заголовки для push-сервиса: подписываем один раз на origin, кэшируем до истечения"""
+    private_key = settings.VAPID_PRIVATE_KEY
+    sub_claim = _vapid_sub_claim()
+    cache_key = (private_key, sub_claim, origin)
+    now = time.time()
+    # Подпись под блокировкой: потоки пула не подписывают один origin параллельно
+    with _push_lock:
+        cached = _vapid_headers_cache.get(cache_key)
+        if not cached or cached[0] - now <= VAPID_REFRESH_MARGIN:
+            exp = int(now) + VAPID_TOKEN_TTL
+            headers = _load_vapid(private_key).sign({'sub': sub_claim, 'aud': origin, 'exp': exp})
+            cached = _vapid_headers_cache[cache_key] = (exp, headers)
+    return dict(cached[1])
+
+
+def _push_session(origin: str) -> requests.Session:
+    with _push_lock:
+        session = _push_sessions.get(origin)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=PUSH_MAX_WORKERS)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _push_sessions[origin] = session
+        return session
+
+
+def _build_push_data(user_id, title, body, url=None, icon=None, tag=None, data=None) -> Dict:
+    return {
+        'title': title,
+        'body': body,
+        'icon': icon or '/icon-192x192.png',
+        'badge': '/icon-192x192.png',
+        'tag': tag or f'notification-{user_id}',
+        'data': {
+            'url': url or '/notifications',
+            **(data or {}),
+        },
+        'vibrate': [200, 100, 200],
+        'requireInteraction': False,
+        'actions': [
+            {'action': 'open', 'title': 'Открыть'},
+            {'action': 'close', 'title': 'Закрыть'},
+        ],
+    }
+
+
+def _send_to_subscription(subscription: PushSubscription, data: str):
+    """
+    Отправка на одну подписку (выполняется в пуле потоков, БД не трогает).
+    Возвращает (доставлено, подписку_нужно_деактивировать).
+    """
+    origin = _endpoint_origin(subscription.endpoint)
+    subscription_info = {
+        'endpoint': subscription.endpoint,
+        'keys': {
+            'p256dh': subscription.p256dh,
+            'auth': subscription.auth,
+        },
+    }
+    try:
+        response = WebPusher(subscription_info, requests_session=_push_session(origin)).send(
+            data,
+            _vapid_headers(origin),
+            ttl=0,
+            timeout=PUSH_TIMEOUT,
+        )
+        if response.status_code > 202:
+            raise WebPushException(
+                f'Push failed: {response.status_code} {response.reason}\nResponse body:{response.text}',
+                response=response,
+            )
+        logger.info('Push-уведомление отправлено на %s', subscription.endpoint)
+        return True, False
+    except WebPushException as e:
+        logger.error(f'Ошибка отправки push-уведомления: {e}')
+        error_body = ''
+        status_code = None
+        if e.response is not None:
+            status_code = e.response.status_code
+            try:
+                error_body = e.response.text
+            except Exception:
+                error_body = str(e.response)
+        logger.debug(
+            'Подробнее об ошибке push: status=%s, body=%s',
+            status_code,
+            error_body,
+        )
+        # Если подписка невалидна (410 Gone, 404 Not Found), деактивируем её
+        should_deactivate = status_code in (410, 404) or (
+            status_code == 403 and bool(error_body) and 'BadJwtToken' in error_body
+        )
+        return False, should_deactivate
+    except Exception as e:
+        logger.error(f'Неожиданная ошибка при отправке push-уведомления: {e}', exc_info=True)
+        return False, False
+
+
+def send_push_batch(messages, max_workers: Optional[int] = None) -> List[bool]:
+    """
+    Пакетная рассылка push.
+
+    Args:
+        messages: список пар (пользователь или его id, payload), где payload —
+            словарь с ключами title, body и необязательными url, icon, tag, data
+        max_workers: ограничение параллельных отправок (по умолчанию PUSH_MAX_WORKERS)
+
+    Подписки всех получателей читаются одним запросом, VAPID JWT подписывается
+    один раз на push-сервис, отправка идёт в ограниченном пуле потоков через
+    keep-alive сессии по origin, невалидные подписки деактивируются одним UPDATE.
+
+    Returns:
+        Список флагов в порядке messages: True — доставлено хотя бы на одно устройство
+    """
+    messages = list(messages)
+    results = [False] * len(messages)
+    if not messages:
+        return results
+    if not settings.VAPID_PUBLIC_KEY or not settings.VAPID_PRIVATE_KEY:
+        logger.warning('VAPID ключи не настроены, push-уведомления недоступны')
+        return results
+
+    user_ids = [getattr(user, 'pk', user) for user, _ in messages]
+    subscriptions_by_user = defaultdict(list)
+    for subscription in PushSubscription.objects.filter(user_id__in=set(user_ids), is_active=True):
+        subscriptions_by_user[subscription.user_id].append(subscription)
+
+    tasks = []
+    for index, (user_id, (_, payload)) in enumerate(zip(user_ids, messages)):
+        subscriptions = subscriptions_by_user.get(user_id)
+        if not subscriptions:
+            logger.debug('У пользователя #%s нет активных push-подписок', user_id)
+            continue
+        data = json.dumps(_build_push_data(user_id, **payload))
+        tasks.extend((index, subscription, data) for subscription in subscriptions)
+
+    if not tasks:
+        return results
+
+    workers = max(1, min(max_workers or PUSH_MAX_WORKERS, len(tasks)))
+    if workers == 1:
+        outcomes = [_send_to_subscription(subscription, data) for _, subscription, data in tasks]
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='webpush') as pool:
+            outcomes = list(pool.map(lambda task: _send_to_subscription(task[1], task[2]), tasks))
+
+    dead_ids = []
+    for (index, subscription, _), (sent, deactivate) in zip(tasks, outcomes):
+        if sent:
+            results[index] = True
+        if deactivate:
+            dead_ids.append(subscription.pk)
+
+    if dead_ids:
+        PushSubscription.objects.filter(pk__in=dead_ids).update(is_active=False)
+        logger.info('Подписки %s помечены как неактивные', dead_ids)
+
+    logger.info(
+        'Push-рассылка: сообщений %s, отправок %s, успешно %s, деактивировано подписок %s',
+        len(messages), len(tasks), sum(1 for sent, _ in outcomes if sent), len(dead_ids),
+    )
+    return results
+
+
 def send_push_notification(
     user: User,
     title: str,
@@ -24,7 +239,7 @@ def send_push_notification(
     data: Optional[Dict] = None,
 ) -> bool:
     """
-    Отправляет push-уведомление пользователю
+    Отправляет push-уведомление пользователю (на все его активные подписки)
     
     Args:
         user: Пользователь, которому отправляется уведомление
@@ -38,123 +253,8 @@ def send_push_notification(
     Returns:
         True если уведомление успешно отправлено хотя бы на одно устройство
     """
-    if not settings.VAPID_PUBLIC_KEY or not settings.VAPID_PRIVATE_KEY:
-        logger.warning('VAPID ключи не настроены, push-уведомления недоступны')
-        return False
-    
-    # Получаем активные подписки пользователя
-    subscriptions = PushSubscription.objects.filter(user=user, is_active=True)
-    
-    if not subscriptions.exists():
-        logger.debug(f'У пользователя {user.username} нет активных push-подписок')
-        return False
-    
-    success_count = 0
-    failed_count = 0
-    
-    # Данные для уведомления
-    notification_data = {
-        'title': title,
-        'body': body,
-        'icon': icon or '/icon-192x192.png',
-        'badge': '/icon-192x192.png',
-        'tag': tag or f'notification-{user.id}',
-        'data': {
-            'url': url or '/notifications',
-            **(data or {}),
-        },
-        'vibrate': [200, 100, 200],
-        'requireInteraction': False,
-        'actions': [
-            {'action': 'open', 'title': 'Открыть'},
-            {'action': 'close', 'title': 'Закрыть'},
-        ],
-    }
-    
-    # Отправляем уведомление на каждую активную подписку
-    for subscription in subscriptions:
-        try:
-            subscription_info = {
-                'endpoint': subscription.endpoint,
-                'keys': {
-                    'p256dh': subscription.p256dh,
-                    'auth': subscription.auth,
-                },
-            }
-            
-            # Формируем VAPID claims
-            endpoint_url = urlparse(subscription.endpoint)
-            endpoint_origin = f"{endpoint_url.scheme}://{endpoint_url.netloc}"
-
-            claim_subject = settings.VAPID_CLAIM_EMAIL.strip() if settings.VAPID_CLAIM_EMAIL else ''
-            if claim_subject.startswith('mailto:'):
-                sub_claim = claim_subject
-            elif '@' in claim_subject:
-                sub_claim = f'mailto:{claim_subject}'
-            elif claim_subject.startswith('http://') or claim_subject.startswith('https://'):
-                sub_claim = claim_subject
-            else:
-                sub_claim = 'mailto:support@marketingdoors.ru'
-
-            vapid_claims = {
-                'sub': sub_claim,
-                'aud': endpoint_origin,
-            }
-
-            # Отправляем push-уведомление
-            # pywebpush автоматически определит формат приватного ключа (base64url или PEM)
-            webpush(
-                subscription_info=subscription_info,
-                data=json.dumps(notification_data),
-                vapid_private_key=settings.VAPID_PRIVATE_KEY,
-                vapid_claims=vapid_claims,
-            )
-            
-            success_count += 1
-            logger.info(f'Push-уведомление отправлено пользователю {user.username} на {subscription.endpoint}')
-            
-        except WebPushException as e:
-            failed_count += 1
-            logger.error(f'Ошибка отправки push-уведомления: {e}')
-            error_body = ''
-            status_code = None
-            if e.response is not None:
-                status_code = e.response.status_code
-                try:
-                    error_body = e.response.text
-                except Exception:
-                    error_body = str(e.response)
-            logger.debug(
-                'Подробнее об ошибке push: status=%s, body=%s',
-                status_code,
-                error_body,
-            )
-            
-            # Если подписка невалидна (410 Gone, 404 Not Found), деактивируем её
-            should_deactivate = False
-            if status_code in (410, 404):
-                should_deactivate = True
-            elif status_code == 403 and error_body and 'BadJwtToken' in error_body:
-                should_deactivate = True
-
-            if should_deactivate:
-                subscription.is_active = False
-                subscription.save(update_fields=['is_active'])
-                logger.info(
-                    'Подписка %s помечена как неактивная (status=%s)',
-                    subscription.id,
-                    status_code,
-                )
-            
-        except Exception as e:
-            failed_count += 1
-            logger.error(f'Неожиданная ошибка при отправке push-уведомления: {e}', exc_info=True)
-    
-    logger.info(
-        f'Push-уведомление для {user.username}: отправлено {success_count}, ошибок {failed_count}'
-    )
-    
-    return success_count > 0
+    payload = {'title': title, 'body': body, 'url': url, 'icon': icon, 'tag': tag, 'data': data}
+    return send_push_batch([(user, payload)])[0]
 
 
 def send_push_to_multiple_users(
@@ -167,7 +267,7 @@ def send_push_to_multiple_users(
     data: Optional[Dict] = None,
 ) -> int:
     """
-    Отправляет push-уведомление нескольким пользователям
+    Отправляет push-уведомление нескольким пользователям (одной пакетной рассылкой)
     
     Args:
         users: QuerySet или список пользователей
@@ -179,15 +279,10 @@ def send_push_to_multiple_users(
         data: Дополнительные данные
     
     Returns:
-        Количество успешно отправленных уведомлений
+        Количество пользователей, получивших уведомление
     """
-    success_count = 0
-    
-    for user in users:
-        if send_push_notification(user, title, body, url, icon, tag, data):
-            success_count += 1
-    
-    return success_count
+    payload = {'title': title, 'body': body, 'url': url, 'icon': icon, 'tag': tag, 'data': data}
+    return sum(send_push_batch([(user, payload) for user in users]))
 
 
 def send_sms_notification(
@@ -204,105 +299,11 @@ def send_sms_notification(
     Returns:
         True если SMS успешно отправлено
     """
-    if not settings.SMS_RU_API_ID:
-        logger.warning('SMS_RU_API_ID не настроен, SMS-уведомления недоступны')
-        return False
-    
     # Проверяем наличие номера телефона у пользователя
     if not user.phone_number:
         logger.debug(f'У пользователя {user.username} не указан номер телефона')
         return False
-    
-    # Очищаем номер телефона от пробелов и других символов
-    phone_number = user.phone_number.strip().replace(' ', '').replace('-', '').replace('(', '').replace(')', '')
-    
-    # Убираем + если есть
-    if phone_number.startswith('+'):
-        phone_number = phone_number[1:]
-    
-    if not phone_number:
-        logger.warning(f'Номер телефона пользователя {user.username} пустой после очистки')
-        return False
-    
-    try:
-        # Формируем URL для отправки SMS
-        url = 'https://sms.ru/sms/send'
-        params = {
-            'api_id': settings.SMS_RU_API_ID,
-            'to': phone_number,
-            'msg': message,
-            'json': 1,
-        }
-        
-        # Отправляем запрос
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()
-        
-        # Парсим ответ
-        result = response.json()
-        
-        if result.get('status') == 'OK' and result.get('status_code') == 100:
-            # Проверяем статус отправки для конкретного номера
-            sms_data = result.get('sms', {})
-            phone_key = phone_number
-            # Если номер в ответе с другим форматом, ищем его
-            if phone_key not in sms_data:
-                # Пробуем найти номер в любом формате
-                for key in sms_data.keys():
-                    if key.replace('+', '').replace(' ', '') == phone_number:
-                        phone_key = key
-                        break
-            
-            if phone_key in sms_data:
-                sms_status = sms_data[phone_key]
-                if sms_status.get('status') == 'OK' and sms_status.get('status_code') == 100:
-                    logger.info(
-                        'SMS отправлено пользователю %s на номер %s (ID: %s)',
-                        user.username,
-                        phone_number,
-                        sms_status.get('sms_id', 'N/A')
-                    )
-                    return True
-                else:
-                    logger.error(
-                        'Ошибка отправки SMS пользователю %s: %s (код: %s)',
-                        user.username,
-                        sms_status.get('status_text', 'Неизвестная ошибка'),
-                        sms_status.get('status_code', 'N/A')
-                    )
-                    return False
-            else:
-                logger.warning(
-                    'Номер %s не найден в ответе sms.ru для пользователя %s',
-                    phone_number,
-                    user.username
-                )
-                return False
-        else:
-            logger.error(
-                'Ошибка API sms.ru для пользователя %s: %s (код: %s)',
-                user.username,
-                result.get('status', 'ERROR'),
-                result.get('status_code', 'N/A')
-            )
-            return False
-            
-    except requests.exceptions.RequestException as e:
-        logger.error(
-            'Ошибка сети при отправке SMS пользователю %s: %s',
-            user.username,
-            e,
-            exc_info=True
-        )
-        return False
-    except Exception as e:
-        logger.error(
-            'Неожиданная ошибка при отправке SMS пользователю %s: %s',
-            user.username,
-            e,
-            exc_info=True
-        )
-        return False
+    return send_sms_to_phone(user.phone_number, message)
 
 
 def send_sms_to_phone(
@@ -311,6 +312,7 @@ def send_sms_to_phone(
 ) -> bool:
     """
     Отправляет SMS-уведомление на указанный номер телефона через sms.ru
+    (клиент процесса users.sms_client.get_sms_client — общая сессия и лимитер)
     
     Args:
         phone_number: Номер телефона получателя
@@ -319,102 +321,10 @@ def send_sms_to_phone(
     Returns:
         True если SMS успешно отправлено
     """
-    if not settings.SMS_RU_API_ID:
-        logger.warning('SMS_RU_API_ID не настроен, SMS-уведомления недоступны')
-        return False
-    
     if not phone_number:
         logger.debug('Номер телефона не указан')
         return False
-    
-    # Очищаем номер телефона от пробелов и других символов
-    cleaned_phone = phone_number.strip().replace(' ', '').replace('-', '').replace('(', '').replace(')', '')
-    
-    # Убираем + если есть
-    if cleaned_phone.startswith('+'):
-        cleaned_phone = cleaned_phone[1:]
-    
-    if not cleaned_phone:
-        logger.warning('Номер телефона пустой после очистки')
-        return False
-    
-    try:
-        # Формируем URL для отправки SMS
-        url = 'https://sms.ru/sms/send'
-        params = {
-            'api_id': settings.SMS_RU_API_ID,
-            'to': cleaned_phone,
-            'msg': message,
-            'json': 1,
-        }
-        
-        # Отправляем запрос
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()
-        
-        # Парсим ответ
-        result = response.json()
-        
-        if result.get('status') == 'OK' and result.get('status_code') == 100:
-            # Проверяем статус отправки для конкретного номера
-            sms_data = result.get('sms', {})
-            phone_key = cleaned_phone
-            # Если номер в ответе с другим форматом, ищем его
-            if phone_key not in sms_data:
-                # Пробуем найти номер в любом формате
-                for key in sms_data.keys():
-                    if key.replace('+', '').replace(' ', '') == cleaned_phone:
-                        phone_key = key
-                        break
-            
-            if phone_key in sms_data:
-                sms_status = sms_data[phone_key]
-                if sms_status.get('status') == 'OK' and sms_status.get('status_code') == 100:
-                    logger.info(
-                        'SMS отправлено на номер %s (ID: %s)',
-                        cleaned_phone,
-                        sms_status.get('sms_id', 'N/A')
-                    )
-                    return True
-                else:
-                    logger.error(
-                        'Ошибка отправки SMS на номер %s: %s (код: %s)',
-                        cleaned_phone,
-                        sms_status.get('status_text', 'Неизвестная ошибка'),
-                        sms_status.get('status_code', 'N/A')
-                    )
-                    return False
-            else:
-                logger.warning(
-                    'Номер %s не найден в ответе sms.ru',
-                    cleaned_phone
-                )
-                return False
-        else:
-            logger.error(
-                'Ошибка API sms.ru для номера %s: %s (код: %s)',
-                cleaned_phone,
-                result.get('status', 'ERROR'),
-                result.get('status_code', 'N/A')
-            )
-            return False
-            
-    except requests.exceptions.RequestException as e:
-        logger.error(
-            'Ошибка сети при отправке SMS на номер %s: %s',
-            cleaned_phone,
-            e,
-            exc_info=True
-        )
-        return False
-    except Exception as e:
-        logger.error(
-            'Неожиданная ошибка при отправке SMS на номер %s: %s',
-            cleaned_phone,
-            e,
-            exc_info=True
-        )
-        return False
+    return get_sms_client().send(phone_number, message).ok
 
 
 def send_email_notification(
@@ -0,0 +1,249 @@
+"""
+Клиент SMS-шлюза sms.ru.
+
+Раньше каждое SMS отправлялось отдельным requests.get (новое соединение на сообщение),
+а нормализация номера и разбор ответа были скопированы в send_sms_notification и
+send_sms_to_phone. Теперь:
+
+- SmsRuClient держит один requests.Session (keep-alive) и token bucket
+  (SMS_RU_RATE_PER_SECOND запросов в секунду, всплеск до SMS_RU_BURST);
+- send_many() отправляет пачку одним POST через мульти-форму sms.ru
+  `to[79990000000]=текст` (до SMS_RU_BATCH_SIZE номеров за запрос) и раскладывает
+  статусы из ответа обратно по номерам;
+- FakeSmsGateway — локальный шлюз с тем же интерфейсом, ничего не отправляет
+  (тесты, разработка). Выбирается настройкой SMS_CLIENT.
+
+Клиент процесса — get_sms_client(). Бизнес-код сам SMS не шлёт: задания ставятся
+в очередь (users.notification_outbox), а диспетчер отправляет их пачкой через клиента.
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+
+import requests
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+SMS_RU_SEND_URL = 'https://sms.ru/sms/send'
+# Код успешной постановки в sms.ru (и для запроса, и для отдельного номера)
+SMS_RU_OK = 100
+# Отказы sms.ru, которые повтор не исправит: неверный номер или нет маршрута (202, 207),
+# номер в стоп-листе (209), пустой или слишком длинный текст, несогласованный отправитель,
+# ошибки запроса и неверный ключ API. Остальные коды — лимиты (206, 230–233),
+# «сервис временно недоступен» (220), нехватка средств (201), ошибка сервера (500) —
+# временные, как и сетевые ошибки.
+SMS_RU_PERMANENT_CODES = frozenset({
+    200, 202, 203, 204, 205, 207, 208, 209, 210, 211, 212, 213, 300, 301, 302,
+})
+
+
+def normalize_phone(phone: Optional[str]) -> str:
+    """Номер в формате sms.ru: без пробелов, скобок, дефисов и ведущего «+»"""
+    if not phone:
+        return ''
+    cleaned = phone.strip().replace(' ', '').replace('-', '').replace('(', '').replace(')', '')
+    if cleaned.startswith('+'):
+        cleaned = cleaned[1:]
+    return cleaned
+
+
+@dataclass
+class SmsResult:
+    """Результат отправки на один номер"""
+    phone: str
+    ok: bool
+    sms_id: str = ''
+    status_code: Optional[int] = None
+    error: str = ''
+
+    @property
+    def permanent(self) -> bool:
+        """Отказ, который не исправит повтор: пустой номер или постоянный код sms.ru"""
+        return not self.ok and (not self.phone or self.status_code in SMS_RU_PERMANENT_CODES)
+
+
+class TokenBucket:
+    """Ограничитель частоты запросов: rate токенов в секунду, не больше capacity в запасе"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Ждёт, пока не освободится токен (rate <= 0 — без ограничения)"""
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def _chunks(messages, size):
+    """
+    Делит пары (номер, текст) на запросы по size номеров. Один номер дважды в запросе
+    не встречается (в форме to[...] он стал бы одним ключом) — повтор уходит в следующий.
+    """
+    chunk, phones = [], set()
+    for index, (phone, text) in enumerate(messages):
+        if len(chunk) >= size or phone in phones:
+            yield chunk
+            chunk, phones = [], set()
+        chunk.append((index, phone, text))
+        phones.add(phone)
+    if chunk:
+        yield chunk
+
+
+class SmsRuClient:
+    """HTTP-клиент sms.ru с постоянной сессией и ограничением частоты"""
+
+    def __init__(self, api_id=None, rate=None, burst=None, batch_size=None, timeout=10, session=None):
+        self.api_id = api_id if api_id is not None else settings.SMS_RU_API_ID
+        self.batch_size = batch_size or getattr(settings, 'SMS_RU_BATCH_SIZE', 100)
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        self.bucket = TokenBucket(
+            rate if rate is not None else getattr(settings, 'SMS_RU_RATE_PER_SECOND', 5),
+            burst or getattr(settings, 'SMS_RU_BURST', 5),
+        )
+
+    def send(self, phone: str, message: str) -> SmsResult:
+        return self.send_many([(phone, message)])[0]
+
+    def send_many(self, messages) -> List[SmsResult]:
+        """
+        messages — список пар (номер, текст). Возвращает SmsResult в том же порядке.
+        Сетевая ошибка или отказ API помечает неуспешными все номера своего запроса.
+        """
+        messages = [(normalize_phone(phone), text) for phone, text in messages]
+        results = [None] * len(messages)
+        if not self.api_id:
+            logger.warning('SMS_RU_API_ID не настроен, SMS-уведомления недоступны')
+            return [SmsResult(phone, False, error='SMS_RU_API_ID не настроен') for phone, _ in messages]
+
+        valid = []
+        for index, (phone, text) in enumerate(messages):
+            if phone:
+                valid.append((phone, text))
+            else:
+                results[index] = SmsResult(phone, False, error='Номер телефона пустой после очистки')
+        positions = [index for index, result in enumerate(results) if result is None]
+
+        for chunk in _chunks(valid, self.batch_size):
+            for (local_index, phone, _), result in zip(chunk, self._send_chunk(chunk)):
+                results[positions[local_index]] = result
+        return results
+
+    def _send_chunk(self, chunk):
+        data = {'api_id': self.api_id, 'json': 1}
+        for _, phone, text in chunk:
+            data[f'to[{phone}]'] = text
+        self.bucket.acquire()
+        try:
+            response = self.session.post(SMS_RU_SEND_URL, data=data, timeout=self.timeout)
+            response.raise_for_status()
+            payload = response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.error('Ошибка сети при отправке SMS (%s номеров): %s', len(chunk), e, exc_info=True)
+            return [SmsResult(phone, False, error=f'{type(e).__name__}: {e}') for _, phone, _ in chunk]
+        return self._parse(payload, [phone for _, phone, _ in chunk])
+
+    @staticmethod
+    def _parse(payload, phones) -> List[SmsResult]:
+        if payload.get('status') != 'OK' or payload.get('status_code') != SMS_RU_OK:
+            error = f"Ошибка API sms.ru: {payload.get('status', 'ERROR')} (код: {payload.get('status_code', 'N/A')})"
+            logger.error('%s, номеров в запросе: %s', error, len(phones))
+            return [SmsResult(phone, False, status_code=payload.get('status_code'), error=error) for phone in phones]
+
+        # sms.ru может вернуть номер в другом формате — сопоставляем по цифрам
+        statuses = {normalize_phone(key): value for key, value in (payload.get('sms') or {}).items()}
+        results = []
+        for phone in phones:
+            status = statuses.get(phone)
+            if status is None:
+                logger.warning('Номер %s не найден в ответе sms.ru', phone)
+                results.append(SmsResult(phone, False, error='Номер не найден в ответе sms.ru'))
+            elif status.get('status') == 'OK' and status.get('status_code') == SMS_RU_OK:
+                logger.info('SMS отправлено на номер %s (ID: %s)', phone, status.get('sms_id', 'N/A'))
+                results.append(SmsResult(phone, True, sms_id=str(status.get('sms_id', '')), status_code=SMS_RU_OK))
+            else:
+                error = status.get('status_text', 'Неизвестная ошибка')
+                logger.error(
+                    'Ошибка отправки SMS на номер %s: %s (код: %s)',
+                    phone, error, status.get('status_code', 'N/A'),
+                )
+                results.append(SmsResult(phone, False, status_code=status.get('status_code'), error=error))
+        return results
+
+
+class FakeSmsGateway:
+    """
+    Локальный шлюз: ничего не отправляет, запоминает сообщения в FakeSmsGateway.sent
+    (общий список на процесс) и число «запросов» в FakeSmsGateway.request_count.
+    Номера из fail_numbers получают постоянный отказ sms.ru 207 «нет маршрута».
+    """
+    sent = []
+    request_count = 0
+    fail_numbers = set()
+
+    def __init__(self, batch_size=None, **kwargs):
+        self.batch_size = batch_size or getattr(settings, 'SMS_RU_BATCH_SIZE', 100)
+
+    @classmethod
+    def reset(cls):
+        cls.sent.clear()
+        cls.request_count = 0
+        cls.fail_numbers = set()
+
+    def send(self, phone: str, message: str) -> SmsResult:
+        return self.send_many([(phone, message)])[0]
+
+    def send_many(self, messages) -> List[SmsResult]:
+        messages = [(normalize_phone(phone), text) for phone, text in messages]
+        results = [None] * len(messages)
+        for chunk in _chunks(messages, self.batch_size):
+            FakeSmsGateway.request_count += 1
+            for index, phone, text in chunk:
+                if not phone:
+                    results[index] = SmsResult(phone, False, error='Номер телефона пустой после очистки')
+                elif phone in FakeSmsGateway.fail_numbers:
+                    results[index] = SmsResult(phone, False, status_code=207, error='Нет маршрута для номера')
+                else:
+                    FakeSmsGateway.sent.append({'phone': phone, 'message': text})
+                    results[index] = SmsResult(phone, True, sms_id=f'fake-{len(FakeSmsGateway.sent)}', status_code=SMS_RU_OK)
+        return results
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_sms_client():
+    """Клиент процесса (класс из настройки SMS_CLIENT) — одна сессия и один лимитер на воркер"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            path = getattr(settings, 'SMS_CLIENT', 'users.sms_client.SmsRuClient')
+            _client = import_string(path)()
+        return _client
+
+
+def reset_sms_client():
+    """Сбрасывает клиента процесса (после смены настроек, в тестах)"""
+    global _client
+    with _client_lock:
+        _client = None
@@ -1,3 +1,288 @@
-from django.test import TestCase
+"""
+Тесты очереди уведомлений.
+Запуск: venv/bin/python manage.py test users --settings=marketingdoors.test_settings
+"""
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from py_vapid import Vapid01, b64urlencode
+from cryptography.hazmat.primitives import serialization
+
+from . import push_utils
+from .models import NotificationOutbox, PushSubscription
+from .sms_client import FakeSmsGateway, SmsRuClient, reset_sms_client
+from .notification_outbox import (
+    LocalSender, NetworkSender, PermanentDeliveryError, dispatch_pending, enqueue_email, enqueue_push,
+    enqueue_push_many, enqueue_sms,
+)
+
+User = get_user_model()
+
+
+class FlakySender:
+    """Отправитель, который падает заданное число раз, затем отправляет"""
+
+    def __init__(self, failures):
+        self.failures = failures
+
+    def send(self, job):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError('sms.ru недоступен')
+        return True
+
+
+class PermanentSender:
+    def send(self, job):
+        raise PermanentDeliveryError('нет подписок')
+
+
+@override_settings(NOTIFICATION_RETRY_BASE_SECONDS=10, NOTIFICATION_RETRY_MAX_SECONDS=60)
+class NotificationOutboxTest(TestCase):
+    def setUp(self):
+        LocalSender.outbox.clear()
+        self.user = User.objects.create_user(username='u', password='x', phone_number='+7 (999) 000-00-00')
+
+    def test_local_sender_drains_queue(self):
+        enqueue_push(self.user, 'Заголовок', 'Текст', url='/orders/1')
+        enqueue_sms('Привет', user=self.user)
+        enqueue_email('or@example.com', 'Тема', 'Текст')
+
+        call_command('run_notification_dispatcher', '--once', stdout=open('/dev/null', 'w'))
+
+        self.assertEqual([m['channel'] for m in LocalSender.outbox], ['push', 'sms', 'email'])
+        self.assertEqual(LocalSender.outbox[1]['phone_number'], '+7 (999) 000-00-00')
+        self.assertFalse(NotificationOutbox.objects.exclude(status=NotificationOutbox.Status.SENT).exists())
+
+    def test_retry_with_backoff_then_sent(self):
+        job = enqueue_sms('Привет', user=self.user)
+        sender = FlakySender(failures=2)
+        now = timezone.now()
+
+        with self.assertLogs('users.notification_outbox', 'ERROR'):
+            self.assertEqual(dispatch_pending(sender=sender, now=now), {'pending': 1})
+        job.refresh_from_db()
+        self.assertEqual(job.next_attempt_at, now + timedelta(seconds=10))
+        self.assertIn('ConnectionError', job.last_error)
+
+        # До наступления срока повтора задание не берётся
+        self.assertEqual(dispatch_pending(sender=sender, now=now + timedelta(seconds=5)), {})
+
+        later = now + timedelta(seconds=10)
+        with self.assertLogs('users.notification_outbox', 'ERROR'):
+            dispatch_pending(sender=sender, now=later)
+        job.refresh_from_db()
+        self.assertEqual(job.next_attempt_at, later + timedelta(seconds=20))
+
+        dispatch_pending(sender=sender, now=later + timedelta(seconds=20))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (NotificationOutbox.Status.SENT, 3))
+
+    def test_dead_letter(self):
+        job = enqueue_sms('Привет', user=self.user)
+        job.max_attempts = 2
+        job.save()
+        sender = FlakySender(failures=10)
+        now = timezone.now()
+        with self.assertLogs('users.notification_outbox', 'ERROR'):
+            dispatch_pending(sender=sender, now=now)
+            dispatch_pending(sender=sender, now=now + timedelta(hours=1))
+        job.refresh_from_db()
+        self.assertEqual(job.status, NotificationOutbox.Status.DEAD)
+
+        permanent = enqueue_push(self.user, 'Заголовок', 'Текст')
+        with self.assertLogs('users.notification_outbox', 'WARNING'):
+            dispatch_pending(sender=PermanentSender(), now=now + timedelta(hours=2))
+        permanent.refresh_from_db()
+        self.assertEqual((permanent.status, permanent.attempts), (NotificationOutbox.Status.DEAD, 1))
+
+
+def _vapid_private_key():
+    vapid = Vapid01()
+    vapid.generate_keys()
+    raw = vapid.private_key.private_numbers().private_value.to_bytes(32, 'big')
+    return b64urlencode(raw)
+
+
+def _client_keys():
+    """Ключи браузерной подписки (p256dh/auth), чтобы WebPusher смог зашифровать payload"""
+    client = Vapid01()
+    client.generate_keys()
+    p256dh = client.public_key.public_bytes(
+        serialization.Encoding.X962, serialization.PublicFormat.UncompressedPoint,
+    )
+    return b64urlencode(p256dh), b64urlencode(b'0123456789abcdef')
+
+
+class FakeResponse:
+    def __init__(self, status_code, text=''):
+        self.status_code = status_code
+        self.text = text
+        self.reason = ''
+        self.headers = {}
+
+
+class PushBatchTest(TestCase):
+    def setUp(self):
+        push_utils._vapid_headers_cache.clear()
+        push_utils._push_sessions.clear()
+        p256dh, auth = _client_keys()
+        self.users = []
+        for index, endpoint in enumerate([
+            'https://fcm.googleapis.com/fcm/send/a',
+            'https://fcm.googleapis.com/fcm/send/b',
+            'https://updates.push.services.mozilla.com/wpush/v2/c',
+        ]):
+            user = User.objects.create_user(username=f'u{index}', password='x')
+            PushSubscription.objects.create(user=user, endpoint=endpoint, p256dh=p256dh, auth=auth)
+            self.users.append(user)
+        self.no_subscription = User.objects.create_user(username='nosub', password='x')
+
+    def _send(self, responses):
+        calls = []
+
+        def fake_post(session, url, data=None, headers=None, timeout=None):
+            calls.append((url, headers['Authorization'], session))
+            return responses.get(url, FakeResponse(201))
+
+        with override_settings(VAPID_PUBLIC_KEY='pub', VAPID_PRIVATE_KEY=_vapid_private_key()), \
+                mock.patch('requests.Session.post', autospec=True, side_effect=fake_post):
+            jobs = enqueue_push_many([
+                {'user': user, 'title': 'Заголовок', 'body': 'Текст'}
+                for user in [*self.users, self.no_subscription]
+            ])
+            with self.assertLogs('users.notification_outbox', 'WARNING'):
+                stats = dispatch_pending(sender=NetworkSender())
+        return jobs, stats, calls
+
+    def test_batch_fan_out(self):
+        dead_endpoint = 'https://fcm.googleapis.com/fcm/send/b'
+        jobs, stats, calls = self._send({dead_endpoint: FakeResponse(410)})
+
+        self.assertEqual(len(jobs), 4)
+        self.assertEqual(stats, {'sent': 2, 'pending': 1, 'dead': 1})
+        self.assertEqual(len(calls), 3)
+        # JWT подписан один раз на push-сервис, сессия одна на origin
+        by_origin = {}
+        for url, authorization, session in calls:
+            by_origin.setdefault(url.split('/')[2], set()).add((authorization, id(session)))
+        self.assertEqual({origin: len(values) for origin, values in by_origin.items()}, {
+            'fcm.googleapis.com': 1,
+            'updates.push.services.mozilla.com': 1,
+        })
+        self.assertFalse(PushSubscription.objects.get(endpoint=dead_endpoint).is_active)
+        self.assertEqual(PushSubscription.objects.filter(is_active=True).count(), 2)
+
+    def test_subscriptions_loaded_in_one_query(self):
+        messages = [(user, {'title': 'T', 'body': 'B'}) for user in self.users]
+        with override_settings(VAPID_PUBLIC_KEY='pub', VAPID_PRIVATE_KEY=_vapid_private_key()), \
+                mock.patch('requests.Session.post', return_value=FakeResponse(201)):
+            with self.assertNumQueries(1):
+                self.assertEqual(push_utils.send_push_batch(messages), [True, True, True])
+
+
+class SmsClientTest(TestCase):
+    def setUp(self):
+        FakeSmsGateway.reset()
+        reset_sms_client()
+
+    def test_multi_recipient_request(self):
+        session = mock.Mock()
+        session.post.return_value.json.return_value = {
+            'status': 'OK', 'status_code': 100,
+            'sms': {
+                '79990000001': {'status': 'OK', 'status_code': 100, 'sms_id': '1-1'},
+                '79990000002': {'status': 'ERROR', 'status_code': 207, 'status_text': 'Нет маршрута'},
+                '79990000003': {'status': 'ERROR', 'status_code': 230, 'status_text': 'Превышен лимит'},
+            },
+        }
+        client = SmsRuClient(api_id='key', rate=0, session=session)
+
+        results = client.send_many([
+            ('+7 (999) 000-00-01', 'Первое'),
+            ('', 'Без номера'),
+            ('+7 999 000-00-02', 'Второе'),
+            ('+7 999 000-00-03', 'Третье'),
+        ])
+
+        self.assertEqual([r.ok for r in results], [True, False, False, False])
+        self.assertEqual((results[0].sms_id, results[2].status_code), ('1-1', 207))
+        # Пустой номер и «нет маршрута» не исправит повтор, лимит sms.ru — временный
+        self.assertEqual([r.permanent for r in results], [False, True, True, False])
+        session.post.assert_called_once()
+        self.assertEqual(session.post.call_args.kwargs['data'], {
+            'api_id': 'key', 'json': 1,
+            'to[79990000001]': 'Первое',
+            'to[79990000002]': 'Второе',
+            'to[79990000003]': 'Третье',
+        })
+
+    @override_settings(SMS_RU_BATCH_SIZE=2)
+    def test_dispatcher_batches_sms(self):
+        for index in range(5):
+            enqueue_sms(f'Напоминание {index}', phone_number=f'+7 999 000-00-0{index}')
+        FakeSmsGateway.fail_numbers = {'79990000003'}
+
+        with self.assertLogs('users.notification_outbox', 'WARNING'):
+            stats = dispatch_pending(sender=NetworkSender())
+
+        # Отказ «нет маршрута» (207) — постоянный: задание сразу dead, без повторов
+        self.assertEqual(stats, {'sent': 4, 'dead': 1})
+        # 5 номеров по 2 в запросе — 3 обращения к шлюзу вместо 5
+        self.assertEqual(FakeSmsGateway.request_count, 3)
+        self.assertEqual(FakeSmsGateway.sent[0], {'phone': '79990000000', 'message': 'Напоминание 0'})
+
+
+class RunCronsTest(TestCase):
+    def test_schedule_and_failures(self):
+        import datetime
+        import io
+
+        from django.core.management.base import CommandError
+
+        from .management.commands.run_crons import CRON_JOBS, CronJob
+
+        now = timezone.now()
+        hourly = CronJob('x', every=3600)
+        self.assertTrue(hourly.is_due(None, now))
+        self.assertFalse(hourly.is_due(now - timedelta(minutes=59), now))
+        self.assertTrue(hourly.is_due(now - timedelta(minutes=60), now))
+        local = timezone.localtime(now)
+        daily = CronJob('x', daily_at=(local - timedelta(minutes=1)).time())
+        if daily.daily_at < local.time():
+            self.assertTrue(daily.is_due(now - timedelta(days=1), now))
+            self.assertFalse(daily.is_due(now, now))
+        self.assertFalse(CronJob('x', daily_at=datetime.time(23, 59, 59, 999999)).is_due(None, now))
+
+        # Кроны с push — только 9:00–19:59 пн–пт, как в crontab из orders/CRON.md
+        reminders = {job.command: job for job in CRON_JOBS}['check_action_reminders']
+        monday = timezone.make_aware(datetime.datetime(2026, 10, 12))
+        self.assertEqual(reminders.every, 600)
+        self.assertTrue(reminders.is_due(None, monday.replace(hour=9)))
+        self.assertTrue(reminders.is_due(None, monday.replace(hour=19, minute=59)))
+        self.assertFalse(reminders.is_due(None, monday.replace(hour=20)))
+        self.assertFalse(reminders.is_due(None, monday.replace(hour=8, minute=59)))
+        self.assertFalse(reminders.is_due(None, monday.replace(day=17, hour=12)))
+        self.assertTrue(CronJob('x', every=600).is_due(None, monday.replace(hour=3)))
+
+        out = io.StringIO()
+        call_command('run_crons', '--once', '--only', 'check_action_reminders', stdout=out)
+        self.assertIn('Обработано: 0', out.getvalue())
+        self.assertIn('check_action_reminders:', out.getvalue())
+
+        out = io.StringIO()
+        with mock.patch(
+            'orders.management.commands.check_action_reminders.Command.handle', side_effect=RuntimeError('сбой'),
+        ), self.assertRaisesMessage(CommandError, 'check_action_reminders'):
+            call_command(
+                'run_crons', '--once', '--only', 'check_action_reminders', '--only', 'check_measurement_not_done',
+                stdout=out, stderr=io.StringIO(),
+            )
+        # Задача после упавшей выполнилась, транзакция теста жива
+        self.assertIn('check_measurement_not_done:', out.getvalue())
+        self.assertEqual(User.objects.count(), 0)
@@ -387,11 +387,16 @@ class WebDashboardView(View):
         return redirect('users:web_dashboard')
     
     def _get_task_summary(self, user):
-        """Количество задач по категориям для дашборда"""
-        from projects.models import Complaint, ComplaintStatus
-        from django.db.models import Q
-        from django.utils import timezone
+        """Количество задач по категориям для дашборда (плитки — projects.dashboard)"""
+        from projects.dashboard import dashboard_counts
+        from marketingdoors import dashboard_cache
         
+        return dashboard_cache.cached_counters(
+            dashboard_cache.COMPLAINTS, user, lambda: self._build_task_summary(user, dashboard_counts),
+            scope='web',
+        )
+    
+    def _build_task_summary(self, user, dashboard_counts):
         summaries = []
         
         # Для монтажника используем страницу планирования, для остальных - список рекламаций
@@ -400,173 +405,23 @@ class WebDashboardView(View):
         else:
             base_url = reverse('projects:complaint_list')
         
-        def add_summary(key, label, query, url_param=None):
-            count = Complaint.objects.filter(query).count()
+        for tile, count in dashboard_counts(user, web=True):
             # Для монтажника формируем URL с параметром filter, для остальных - с my_tasks
             if user.role == 'installer':
-                if url_param:
-                    url = f"{base_url}?filter={url_param}"
+                if tile.url_param:
+                    url = f"{base_url}?filter={tile.url_param}"
                 else:
                     url = base_url  # Для "В работе" без фильтра
             else:
-                url = f"{base_url}?my_tasks={key}"
+                url = f"{base_url}?my_tasks={tile.key}"
             
             summaries.append({
-                'key': key,
-                'label': label,
+                'key': tile.key,
+                'label': tile.label,
                 'count': count,
                 'url': url,
             })
         
-        completed_statuses = {
-            ComplaintStatus.COMPLETED,
-            ComplaintStatus.RESOLVED,
-            ComplaintStatus.CLOSED,
-        }
-        active_statuses = [choice[0] for choice in ComplaintStatus.choices if choice[0] not in completed_statuses]
-        sm_overdue_filter = (
-            Q(status='sm_response_overdue') |
-            Q(status='factory_approved', sm_response_deadline__lt=timezone.now())
-        )
-
-        if user.role == 'installer':
-            add_summary(
-                'in_work',
-                'В работе',
-                (Q(installer_assigned=user) | Q(initiator=user)) & Q(status__in=active_statuses),
-                url_param=None  # Без фильтра - показываем все активные
-            )
-            add_summary(
-                'needs_planning',
-                'Требуют планирования',
-                Q(installer_assigned=user, status__in=['waiting_installer_date', 'needs_planning', 'installer_not_planned', 'installer_overdue']),
-                url_param='needs_planning'
-            )
-            add_summary(
-                'planned',
-                'Запланированные работы',
-                Q(installer_assigned=user, status__in=['installation_planned', 'both_planned']),
-                url_param='planned'
-            )
-            add_summary(
-                'completed',
-                'Завершено',
-                Q(installer_assigned=user, status__in=['under_sm_review', 'completed']),
-                url_param='completed'
-            )
-        elif user.role == 'manager':
-            add_summary(
-                'in_work',
-                'В работе',
-                (Q(manager=user) | Q(initiator=user) | Q(recipient=user)) & Q(status__in=active_statuses)
-            )
-            add_summary(
-                'in_progress',
-                'Нужно запустить в производство',
-                Q(manager=user, status='in_progress')
-            )
-            add_summary(
-                'on_warehouse',
-                'Готово к отгрузке',
-                Q(manager=user, status='on_warehouse')
-            )
-            add_summary(
-                'shipping_overdue',
-                'Отгрузка просрочена',
-                Q(manager=user, status='shipping_overdue')
-            )
-        elif user.role == 'service_manager':
-            if user.city:
-                city_filter = Q(initiator__city=user.city)
-            else:
-                city_filter = Q()
-
-            add_summary(
-                'in_work',
-                'В работе',
-                (Q(status__in=active_statuses) & city_filter) | Q(initiator=user, status__in=active_statuses)
-            )
-            add_summary(
-                'new',
-                'Новые рекламации',
-                Q(status='new') & city_filter
-            )
-            add_summary(
-                'review',
-                'Ожидают проверки',
-                Q(status__in=['under_sm_review', 'factory_approved', 'factory_rejected']) & city_filter
-            )
-            add_summary(
-                'overdue',
-                'Просроченные ответы',
-                sm_overdue_filter & city_filter
-            )
-        elif user.role == 'complaint_department':
-            add_summary(
-                'in_work',
-                'В работе',
-                Q(complaint_type='factory', status__in=active_statuses)
-            )
-            add_summary(
-                'pending',
-                'Ожидают ответа',
-                Q(complaint_type='factory', status='sent')
-            )
-            add_summary(
-                'overdue',
-                'Просрочен ответ',
-                Q(complaint_type='factory', status='factory_response_overdue')
-            )
-        elif user.role == 'leader':
-            user_city = getattr(user, 'city', None)
-            if user_city:
-                leader_city_filter = Q(initiator__city=user_city)
-            else:
-                # Если у руководителя не задан город, не показываем чужие города
-                leader_city_filter = Q(pk__in=[])
-
-            add_summary(
-                'new',
-                'Новые рекламации',
-                Q(status='new') & leader_city_filter
-            )
-            add_summary(
-                'factory_overdue',
-                'Ответ фабрики просрочен',
-                Q(status='factory_response_overdue') & leader_city_filter
-            )
-            add_summary(
-                'shipping_overdue',
-                'Отгрузка просрочена',
-                Q(status='shipping_overdue') & leader_city_filter
-            )
-            add_summary(
-                'sm_overdue',
-                'Ответ СМ просрочен',
-                sm_overdue_filter & leader_city_filter
-            )
-        elif user.role == 'admin':
-            add_summary(
-                'new',
-                'Новые рекламации',
-                Q(status='new')
-            )
-            add_summary(
-                'factory_overdue',
-                'Ответ фабрики просрочен',
-                Q(status='factory_response_overdue')
-            )
-            add_summary(
-                'shipping_overdue',
-                'Отгрузка просрочена',
-                Q(status='shipping_overdue')
-            )
-            add_summary(
-                'sm_overdue',
-                'Ответ СМ просрочен',
-                sm_overdue_filter
-            )
-        
         return summaries
 
 